@@ -0,0 +1,285 @@
+"""
+IVF-flat approximate nearest-neighbour index over an ``EmbeddingMatrix``.
+
+Normalised chunk vectors are clustered with spherical k-means; each chunk is
+assigned to its closest centroid. A query scores the centroids, probes the
+``nprobe`` best inverted lists, and re-ranks only those candidates with an exact
+cosine product, so returned similarities are identical to a brute-force scan.
+
+Assignments are stored per segment key (see ``EmbeddingMatrix.layout``), so new
+documents and delta segments are added without touching existing ones and the
+index survives matrix rebuilds. Persisted as a
+single ``.npz`` file next to ``document_index.json``.
+"""
+
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from vector_store import EmbeddingMatrix
+
+logger = logging.getLogger(__name__)
+
+TRAIN_SAMPLES_PER_LIST = 40  # k-means training rows per inverted list
+TRAIN_ITERATIONS = 10
+ASSIGN_BATCH_ROWS = 8192  # Rows scored against the centroids at a time
+RETRAIN_GROWTH = 4.0  # Retrain once the corpus has grown this much since training
+
+
+def default_nlist(n_rows: int) -> int:
+    """Number of inverted lists for a corpus of ``n_rows`` (~sqrt(N))."""
+    return int(min(65536, max(16, round(np.sqrt(n_rows)))))
+
+
+class IVFIndex:
+    """Inverted-file index: centroids plus per-segment list assignments."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else None
+        self._lock = threading.RLock()
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_rows = 0
+        self._assignments: Dict[str, np.ndarray] = {}
+        self._lists_key = None
+        self._lists: List[np.ndarray] = []
+        self._unassigned = np.zeros(0, dtype=np.int64)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def nlist(self) -> int:
+        return 0 if self.centroids is None else self.centroids.shape[0]
+
+    @property
+    def document_ids(self) -> List[str]:
+        return list(self._assignments)
+
+    def _invalidate(self):
+        self._lists_key = None
+
+    # ------------------------------------------------------------------
+    # Training and assignment
+    # ------------------------------------------------------------------
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Closest centroid for each (normalised) row."""
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), ASSIGN_BATCH_ROWS):
+            batch = np.asarray(vectors[start : start + ASSIGN_BATCH_ROWS], dtype=np.float32)
+            assignments[start : start + len(batch)] = np.argmax(batch @ self.centroids.T, axis=1)
+        return assignments
+
+    def train(self, matrix: EmbeddingMatrix, nlist: Optional[int] = None, seed: int = 0):
+        """Cluster the matrix's rows with spherical k-means and assign every document."""
+        start_time = time.time()
+        n_rows = len(matrix)
+        nlist = min(nlist or default_nlist(n_rows), n_rows)
+        rng = np.random.default_rng(seed)
+
+        sample_size = min(n_rows, nlist * TRAIN_SAMPLES_PER_LIST)
+        sample_rows = np.sort(rng.choice(n_rows, size=sample_size, replace=False))
+        sample = matrix.gather(sample_rows)
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+
+        for _ in range(TRAIN_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty lists from random sample rows
+                sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+
+        with self._lock:
+            self.centroids = centroids.astype(np.float32)
+            self.trained_rows = n_rows
+            self._assignments = {key: self.assign(segment.vectors) for key, _, segment in matrix.layout()}
+            self._invalidate()
+
+        logger.info(
+            f"🗂️  Built ANN index: {nlist} lists over {n_rows} chunks in {time.time() - start_time:.1f}s "
+            f"(trained on {sample_size})"
+        )
+
+    def add_document(self, key: str, vectors: np.ndarray) -> bool:
+        """Assign a segment's rows to existing lists. Returns False if the index is untrained."""
+        with self._lock:
+            if not self.trained or not len(vectors) or vectors.shape[1] != self.centroids.shape[1]:
+                return False
+            self._assignments[key] = self.assign(vectors)
+            self._invalidate()
+            return True
+
+    def prune(self, keys: Iterable[str]) -> int:
+        """Drop assignments for segments not in ``keys``. Returns how many were removed."""
+        keep = set(keys)
+        with self._lock:
+            stale = [key for key in self._assignments if key not in keep]
+            for key in stale:
+                del self._assignments[key]
+            if stale:
+                self._invalidate()
+            return len(stale)
+
+    def update(self, matrix: EmbeddingMatrix, min_rows: int) -> bool:
+        """
+        Bring the index in line with a fully synced matrix.
+
+        Trains once the matrix has ``min_rows`` rows (or retrains after it has
+        grown by ``RETRAIN_GROWTH``), assigns segments the index has not seen
+        and drops segments that are gone. Returns True if anything changed.
+        """
+        with self._lock:
+            n_rows = len(matrix)
+            if n_rows < min_rows:
+                return False
+            if not self.trained or self.centroids.shape[1] != matrix.dim or n_rows > self.trained_rows * RETRAIN_GROWTH:
+                self.train(matrix)
+                return True
+
+            changed = self.prune(matrix.segment_keys) > 0
+            for key, _, segment in matrix.layout():
+                assignments = self._assignments.get(key)
+                if assignments is None or len(assignments) != len(segment):
+                    changed |= self.add_document(key, segment.vectors)
+            return changed
+
+    def reset(self):
+        """Forget centroids and assignments."""
+        with self._lock:
+            self.centroids = None
+            self.trained_rows = 0
+            self._assignments = {}
+            self._invalidate()
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def _build_lists(self, matrix: EmbeddingMatrix):
+        """Materialise inverted lists of global rows for the matrix's current layout."""
+        key = (matrix.generation, id(matrix))
+        if self._lists_key == key:
+            return
+
+        assigned_rows, assigned_lists, unassigned = [], [], []
+        for doc_key, base, segment in matrix.layout():
+            assignments = self._assignments.get(doc_key)
+            rows = np.arange(base, base + len(segment), dtype=np.int64)
+            if assignments is None or len(assignments) != len(segment):
+                # Not indexed yet: always scanned so new documents are never missed
+                unassigned.append(rows)
+            else:
+                assigned_rows.append(rows)
+                assigned_lists.append(assignments)
+
+        if assigned_rows:
+            rows = np.concatenate(assigned_rows)
+            lists = np.concatenate(assigned_lists)
+            order = np.argsort(lists, kind="stable")
+            counts = np.bincount(lists, minlength=self.nlist)
+            self._lists = np.split(rows[order], np.cumsum(counts)[:-1])
+        else:
+            self._lists = [np.zeros(0, dtype=np.int64)] * self.nlist
+        self._unassigned = np.concatenate(unassigned) if unassigned else np.zeros(0, dtype=np.int64)
+        self._lists_key = key
+
+    def candidates(self, matrix: EmbeddingMatrix, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Global rows in the ``nprobe`` lists closest to a normalised query."""
+        with self._lock:
+            self._build_lists(matrix)
+            nprobe = max(1, min(nprobe, self.nlist))
+            centroid_scores = self.centroids @ query
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+            return np.concatenate([self._lists[i] for i in probe] + [self._unassigned])
+
+    def search(
+        self,
+        matrix: EmbeddingMatrix,
+        query_embedding: Sequence[float],
+        top_k: int,
+        min_similarity: float = 0.0,
+        nprobe: int = 16,
+    ) -> List[Dict[str, Any]]:
+        """
+        Approximate top-k: probe ``nprobe`` lists, then re-rank candidates exactly.
+
+        Falls back to an exact scan if the index is untrained or the probed lists
+        hold fewer than ``top_k`` candidates.
+        """
+        with matrix._lock:
+            if not self.trained or matrix.dim != self.centroids.shape[1]:
+                return matrix.search(query_embedding, top_k, min_similarity)
+
+            query = matrix.normalize_query(query_embedding)
+            if query is None:
+                return []
+
+            rows = self.candidates(matrix, query, nprobe)
+            if len(rows) < top_k:
+                return matrix.search(query_embedding, top_k, min_similarity)
+
+            scores = matrix.gather(rows) @ query
+            return matrix.select(scores, top_k, min_similarity, rows=rows)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path: Optional[Path] = None):
+        """Write centroids and assignments atomically."""
+        path = Path(path or self.path)
+        with self._lock:
+            if not self.trained:
+                return
+            doc_ids = list(self._assignments)
+            arrays = [self._assignments[doc_id] for doc_id in doc_ids]
+            offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+            if arrays:
+                offsets[1:] = np.cumsum([len(a) for a in arrays])
+
+            tmp_path = path.with_name(path.name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    centroids=self.centroids,
+                    trained_rows=np.int64(self.trained_rows),
+                    doc_ids=np.array(doc_ids, dtype=str),
+                    offsets=offsets,
+                    assignments=np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int32),
+                )
+            os.replace(tmp_path, path)
+
+    def load(self, path: Optional[Path] = None) -> bool:
+        """Load a saved index. Returns False if there is none (or it is unreadable)."""
+        path = Path(path or self.path)
+        if not path.exists():
+            return False
+        try:
+            with np.load(path) as data:
+                centroids = data["centroids"].astype(np.float32)
+                offsets = data["offsets"]
+                assignments = data["assignments"]
+                doc_ids = [str(doc_id) for doc_id in data["doc_ids"]]
+                trained_rows = int(data["trained_rows"])
+        except Exception as e:
+            logger.error(f"⚠️ Could not load ANN index {path}: {e}")
+            return False
+
+        with self._lock:
+            self.centroids = centroids
+            self.trained_rows = trained_rows
+            self._assignments = {doc_id: assignments[offsets[i] : offsets[i + 1]] for i, doc_id in enumerate(doc_ids)}
+            self._invalidate()
+        return True
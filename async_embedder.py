@@ -1,28 +1,222 @@
 """
-Production async embedding implementation using AsyncClient.
-
-Based on ollama-python community best practices:
-- Uses AsyncClient with asyncio instead of ThreadPoolExecutor
-- Implements proper concurrency control with Semaphore
-- Handles large batches efficiently
+Native asyncio embedding path.
+
+``embed_batch_async`` used to run the synchronous batcher in the default
+thread pool, so its concurrency was bounded by that pool's threads. It now
+talks to the nodes through one ``httpx.AsyncClient`` per event loop:
+
+- Texts are packed into sub-batches bounded by count and estimated tokens.
+  A sub-batch is only routed and sized when a node has a free slot, by the
+  pool's own ``_select_node``, so the async path follows the same routing
+  strategy as every other request, uses the batch size learned so far and
+  stops sending to nodes found to be down.
+- A semaphore per node caps the requests in flight to it
+  (``FLOCKPARSER_ASYNC_PER_NODE``, 4 by default). Everything else waits as a
+  coroutine, so thousands of pending embeds cost no threads.
+- Batch sizes, throughput, hedging latencies and pool stats are recorded
+  through the pool's ``EmbedBatcher``, the same as on the threaded path.
+
+Sync code can call ``embed_batch_async_sync``; the async servers await
+``embed_batch_async`` (or ``pool.embed_batch_async``) directly.
 """
 
 import asyncio
 import logging
-from typing import List, Dict, Any
+import os
+import time
+import weakref
+from typing import Any, Collection, Dict, List, Optional, Set
+
+from embed_batcher import EMBED_OPTIONS, EMBED_TIMEOUT, NODE_DOWN_ERRORS, batcher_for, estimate_tokens
+from http_pool import close_async_session, get_async_session
 
 logger = logging.getLogger(__name__)
 
+PER_NODE_CONCURRENCY = int(os.getenv("FLOCKPARSER_ASYNC_PER_NODE", "4"))  # Requests in flight per node
+
+
+class AsyncEmbedder:
+    """
+    Embed texts over asyncio, with per-node concurrency limits.
+
+    Args:
+        pool: SOLLOL OllamaPool instance (routing, nodes and the shared ``EmbedBatcher``)
+        per_node: Requests in flight per node
+        timeout: Per-request timeout in seconds
+    """
+
+    def __init__(self, pool, per_node: int = PER_NODE_CONCURRENCY, timeout: float = EMBED_TIMEOUT):
+        self.pool = pool
+        self.per_node = max(1, per_node)
+        self.timeout = timeout
+        # Semaphores belong to an event loop, so keep one set per loop
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def batcher(self):
+        return batcher_for(self.pool)
+
+    def _semaphore(self, node: str) -> asyncio.Semaphore:
+        per_loop = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        semaphore = per_loop.get(node)
+        if semaphore is None:
+            semaphore = per_loop[node] = asyncio.Semaphore(self.per_node)
+        return semaphore
+
+    def _route(self, model: str, priority: int, exclude: Collection[str] = ()) -> Optional[str]:
+        """Node for the next sub-batch from the pool's routing, skipping nodes that already failed it."""
+        node, _ = self.pool._select_node(payload={"model": model}, priority=priority)
+        node_key = f"{node['host']}:{node['port']}"
+        if node_key not in exclude:
+            return node_key
+        for node in self.pool.nodes:
+            node_key = f"{node['host']}:{node['port']}"
+            if node_key not in exclude:
+                return node_key
+        return None
+
+    async def embed(self, model: str, texts: List[str], priority: int = 5, **kwargs) -> List[Optional[Dict[str, Any]]]:
+        """
+        Embed ``texts`` in order; a text that could not be embedded gets None.
+
+        Sub-batches are routed and sized one at a time, as nodes have free
+        slots, so each one uses the batch size learned from the requests
+        before it and nodes found to be down get no further work.
+
+        Keyword arguments that ``/api/embed`` understands (``keep_alive``,
+        ``options``, ``truncate``, ``dimensions``) are sent with every request.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        if not texts or not self.pool.nodes:
+            return results
+
+        options = {key: kwargs[key] for key in EMBED_OPTIONS if kwargs.get(key) is not None}
+        down: Set[str] = set()  # Nodes that could not be reached during this call
+        busy: Dict[str, int] = {}
+        running: Set[asyncio.Task] = set()
+
+        def finished(task, node):
+            running.discard(task)
+            busy[node] -= 1
+
+        position = 0
+        while position < len(texts):
+            node = self._free_node(model, priority, busy, down)
+            if node is None:
+                if not running:
+                    logger.error(f"❌ {len(texts) - position} texts not embedded: no reachable node left")
+                    break
+                await asyncio.wait(set(running), return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            batch = self._pack(node, texts, position)
+            position = batch[-1] + 1
+            busy[node] = busy.get(node, 0) + 1
+            task = asyncio.create_task(self._embed_batch(node, model, texts, batch, results, options, priority, down))
+            running.add(task)
+            task.add_done_callback(lambda task, node=node: finished(task, node))
+
+        if running:
+            await asyncio.gather(*running)
+        return results
+
+    def _free_node(self, model: str, priority: int, busy: Dict[str, int], down: Collection[str]) -> Optional[str]:
+        """The routed node, or another reachable one if it has no free slot (None = wait for a slot)."""
+        routed = self._route(model, priority, exclude=down)
+        if routed is None or busy.get(routed, 0) < self.per_node:
+            return routed
+        for node in self.pool.nodes:
+            node_key = f"{node['host']}:{node['port']}"
+            if node_key not in down and busy.get(node_key, 0) < self.per_node:
+                return node_key
+        return None
+
+    def _pack(self, node: str, texts: List[str], position: int) -> List[int]:
+        """Positions of the next sub-batch from ``position``, bounded by the node's size and the token budget."""
+        batcher = self.batcher
+        size = batcher.sizer.get(node)
+        batch: List[int] = []
+        tokens = 0
+        while position < len(texts) and len(batch) < size:
+            cost = estimate_tokens(texts[position])
+            if batch and tokens + cost > batcher.max_batch_tokens:
+                break
+            batch.append(position)
+            tokens += cost
+            position += 1
+        return batch
+
+    async def _embed_batch(self, node, model, texts, batch, results, options, priority, down, tried=frozenset()):
+        """Embed ``batch`` on ``node``: move to another node if it is down, split it if the request fails."""
+        try:
+            embeddings = await self._post(node, model, [texts[i] for i in batch], options)
+        except NODE_DOWN_ERRORS as e:
+            down.add(node)
+            tried = tried | {node}
+            retry = self._route(model, priority, exclude=tried | down)
+            if retry is None:
+                logger.error(f"❌ {len(batch)} texts not embedded: no reachable node left ({e})")
+                return
+            logger.warning(f"⚠️  {node} unreachable for embeddings ({e}); sending {len(batch)} texts to {retry}")
+            await self._embed_batch(retry, model, texts, batch, results, options, priority, down, tried)
+            return
+        except Exception as e:
+            self.batcher.sizer.failed(node)
+            if len(batch) == 1:
+                logger.error(f"⚠️ Error embedding text {batch[0]} on {node}: {e}")
+                return
+            middle = len(batch) // 2
+            logger.warning(f"⚠️  Embedding batch of {len(batch)} failed on {node} ({e}); splitting")
+            await asyncio.gather(
+                self._embed_batch(node, model, texts, batch[:middle], results, options, priority, down, tried),
+                self._embed_batch(node, model, texts, batch[middle:], results, options, priority, down, tried),
+            )
+            return
+
+        for index, embedding in zip(batch, embeddings):
+            results[index] = {"model": model, "embeddings": [embedding]}
+
+    async def _post(self, node: str, model: str, inputs: List[str], options: Dict[str, Any]) -> List[List[float]]:
+        batcher = self.batcher
+        async with self._semaphore(node):
+            start = time.time()
+            error: Optional[Exception] = None
+            try:
+                response = await get_async_session().post(
+                    f"http://{node}/api/embed",
+                    json={"model": model, "input": inputs, **options},
+                    timeout=self.timeout,
+                )
+                return batcher.accept(node, model, len(inputs), response, start)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                batcher.report(node, model, len(inputs), time.time() - start, error)
+
+
+def async_embedder_for(pool) -> AsyncEmbedder:
+    """The pool's shared async embedder (created on first use)."""
+    embedder = getattr(pool, "async_embedder", None)
+    if embedder is None:
+        embedder = pool.async_embedder = AsyncEmbedder(pool)
+    return embedder
 
-async def embed_batch_async(pool, model: str, texts: List[str], max_concurrent: int = None) -> List[Dict[str, Any]]:
+
+async def embed_batch_async(
+    pool, model: str, texts: List[str], max_concurrent: int = None, **kwargs
+) -> List[Dict[str, Any]]:
     """
-    Production async embedding using ollama-python recommended pattern.
+    Embed texts across the pool's nodes on the running event loop.
 
     Args:
         pool: SOLLOL OllamaPool instance
         model: Embedding model name
         texts: List of texts to embed
-        max_concurrent: Max concurrent requests (default: nodes * 4)
+        max_concurrent: Requests in flight per node (None = ``FLOCKPARSER_ASYNC_PER_NODE``)
+        **kwargs: /api/embed parameters (keep_alive, options, truncate, dimensions) and ``priority``
 
     Returns:
         List of embedding results
@@ -30,56 +224,30 @@ async def embed_batch_async(pool, model: str, texts: List[str], max_concurrent:
     if not texts:
         return []
 
-    batch_size = len(texts)
-    results = [None] * batch_size
-
-    # Set concurrency limit based on number of nodes
-    if max_concurrent is None:
-        max_concurrent = len(pool.nodes) * 4
-        max_concurrent = max(4, min(max_concurrent, 16))  # Between 4-16
-
-    logger.info(f"🔀 Async embedding: {max_concurrent} concurrent tasks across {len(pool.nodes)} nodes")
-
-    # Semaphore to limit concurrent requests
-    semaphore = asyncio.Semaphore(max_concurrent)
-    completed = 0
-
-    async def embed_single(index, text):
-        """Embed single text with concurrency control."""
-        async with semaphore:
-            try:
-                # SOLLOL's embed is synchronous, run in executor
-                loop = asyncio.get_event_loop()
-                result = await loop.run_in_executor(None, lambda: pool.embed(model, text, priority=7))
-                return index, result, None
-            except Exception as e:
-                return index, None, e
-
-    # Create all tasks
-    tasks = [embed_single(i, text) for i, text in enumerate(texts)]
-
-    # Process with progress tracking
-    for coro in asyncio.as_completed(tasks):
-        index, result, error = await coro
-        completed += 1
-
-        # Show progress every 50 embeddings
-        if completed % 50 == 0 or completed == batch_size:
-            progress_pct = (completed * 100) // batch_size
-            logger.info(f"   Progress: {completed}/{batch_size} embeddings ({progress_pct}%)")
-
-        if error:
-            logger.error(f"⚠️ Error embedding text {index}: {error}")
-        else:
-            results[index] = result
+    embedder = async_embedder_for(pool) if max_concurrent is None else AsyncEmbedder(pool, per_node=max_concurrent)
+    logger.info(f"🔀 Async embedding: {len(texts)} texts across {len(pool.nodes)} nodes")
+    results = await embedder.embed(model, list(texts), **kwargs)
 
+    failed = sum(1 for result in results if result is None)
+    if failed:
+        logger.error(f"⚠️ {failed}/{len(texts)} texts could not be embedded")
     return results
 
 
-def embed_batch_async_sync(pool, model: str, texts: List[str], max_concurrent: int = None) -> List[Dict[str, Any]]:
+def embed_batch_async_sync(
+    pool, model: str, texts: List[str], max_concurrent: int = None, **kwargs
+) -> List[Dict[str, Any]]:
     """
     Synchronous wrapper for async embedding.
 
-    Allows calling from synchronous code while using async under the hood.
+    Runs a private event loop, so it must not be called from a thread that
+    is already running one (await ``embed_batch_async`` there instead).
     """
-    return asyncio.run(embed_batch_async(pool, model, texts, max_concurrent))
+
+    async def run():
+        try:
+            return await embed_batch_async(pool, model, texts, max_concurrent, **kwargs)
+        finally:
+            await close_async_session()
+
+    return asyncio.run(run())
@@ -0,0 +1,108 @@
+"""
+Timing for streamed chat replies.
+
+Ollama's ``/api/chat`` with ``"stream": true`` returns one JSON chunk per
+generated token and a final ``done`` chunk carrying ``eval_count`` and
+``eval_duration``. Streaming lets the CLI, the Web UI and the API show the
+answer as it is generated, and separates the two numbers a blocking call
+hides: time to first token (queueing, model load and prompt evaluation) and
+decode speed in tokens per second.
+
+``StreamTimer`` measures a stream chunk by chunk (usable from sync and async
+code); ``ChatStream`` wraps a synchronous chunk iterator and yields the
+answer's text pieces while timing them.
+"""
+
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+
+class StreamTimer:
+    """Time to first token, generation time and decode rate of one streamed reply."""
+
+    def __init__(self):
+        self.start = time.time()
+        self.first_token: Optional[float] = None
+        self.end: Optional[float] = None
+        self.tokens = 0  # Content chunks received (about one token each)
+        self.eval_count: Optional[int] = None  # Tokens generated, as reported by Ollama
+        self.eval_duration: Optional[int] = None  # Nanoseconds spent generating them
+
+    def observe(self, chunk: Dict[str, Any]) -> str:
+        """Record one stream chunk; returns its text ("" for chunks without content)."""
+        message = chunk.get("message") or {}
+        token = message.get("content") or ""
+        if token:
+            if self.first_token is None:
+                self.first_token = time.time()
+            self.tokens += 1
+        if chunk.get("done"):
+            self.eval_count = chunk.get("eval_count")
+            self.eval_duration = chunk.get("eval_duration")
+            self.finish()
+        return token
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.time()
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """Seconds from the request to the first token (None if nothing was generated)."""
+        return self.first_token - self.start if self.first_token is not None else None
+
+    @property
+    def generation_time(self) -> float:
+        """Seconds from the request to the last chunk."""
+        return (self.end or time.time()) - self.start
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Decode rate: Ollama's own count when reported, otherwise chunks after the first over wall time."""
+        if self.eval_count and self.eval_duration:
+            return self.eval_count / (self.eval_duration / 1e9)
+        if self.first_token is None or self.tokens < 2:
+            return 0.0
+        decode_time = (self.end or time.time()) - self.first_token
+        return (self.tokens - 1) / decode_time if decode_time > 0 else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        """Timing fields for logs and API responses."""
+        return {
+            "ttft": round(self.ttft, 3) if self.ttft is not None else None,
+            "generation_time": round(self.generation_time, 3),
+            "tokens": self.eval_count or self.tokens,
+            "tokens_per_second": round(self.tokens_per_second, 1),
+        }
+
+
+class ChatStream:
+    """
+    Iterate a streamed chat reply as text pieces while timing it.
+
+    The timer starts on iteration, so wrapping a lazy chunk generator measures
+    from the moment the request is actually sent. After iteration ``answer``
+    holds the full reply.
+    """
+
+    def __init__(self, chunks: Iterable[Dict[str, Any]]):
+        self._chunks = chunks
+        self.timer = StreamTimer()
+        self._parts: List[str] = []
+
+    def __iter__(self) -> Iterator[str]:
+        self.timer = StreamTimer()
+        try:
+            for chunk in self._chunks:
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                token = self.timer.observe(chunk)
+                if token:
+                    self._parts.append(token)
+                    yield token
+        finally:
+            self.timer.finish()
+
+    @property
+    def answer(self) -> str:
+        return "".join(self._parts)
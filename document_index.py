@@ -0,0 +1,305 @@
+"""
+SQLite-backed document index for FlockParser.
+
+Replaces rewriting the whole ``document_index.json`` on every registration:
+each document is one row, so adding, updating or removing a document is a
+single-row transaction instead of a whole-file rewrite. Ids come from a
+counter that only ever increases (even across processes and after documents
+are removed), and listing or counting documents reads a few columns rather
+than every chunk reference. WAL mode lets the CLI, the background API thread
+and the MCP server read while another process writes; a reader sees a
+document entirely or not at all, never a torn file.
+
+``load`` and ``replace`` keep the ``{"documents": [...]}`` shape used by the
+rest of the code and by the legacy JSON file, which ``open_document_index``
+imports on first use.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_COLUMNS = ("id", "original", "text_path", "processed_date", "chunk_count")
+
+
+class DocumentIndex:
+    """Document index entries keyed by id, in registration order."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0  # Commits on this connection (PRAGMA data_version only counts other connections')
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents (seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL UNIQUE, "
+                "original TEXT, text_path TEXT, processed_date TEXT, source_sha256 TEXT, "
+                "chunk_count INTEGER NOT NULL DEFAULT 0, entry TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS documents_original ON documents (original)")
+            conn.execute("CREATE INDEX IF NOT EXISTS documents_sha256 ON documents (source_sha256)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _row(entry: Dict[str, Any]) -> tuple:
+        return (
+            entry["id"],
+            entry.get("original"),
+            entry.get("text_path"),
+            entry.get("processed_date"),
+            entry.get("source_sha256"),
+            len(entry.get("chunks", [])),
+            json.dumps(entry),
+        )
+
+    def _put(self, conn: sqlite3.Connection, entries: Iterable[Dict[str, Any]]):
+        # Updating in place keeps a document's position (seq) in the index
+        conn.executemany(
+            "INSERT INTO documents (id, original, text_path, processed_date, source_sha256, chunk_count, entry) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET original = excluded.original, "
+            "text_path = excluded.text_path, processed_date = excluded.processed_date, "
+            "source_sha256 = excluded.source_sha256, chunk_count = excluded.chunk_count, entry = excluded.entry",
+            [self._row(entry) for entry in entries],
+        )
+
+    @staticmethod
+    def _raise_counter(conn: sqlite3.Connection, last_id: int):
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES ('last_id', ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = MAX(value, excluded.value)",
+            (last_id,),
+        )
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def allocate_id(self) -> str:
+        """Reserve a new ``doc_N`` id. Ids are never handed out twice, even after removals."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if not conn.execute("SELECT 1 FROM counters WHERE name = 'last_id'").fetchone():
+                    # First id for an index written before the counter existed
+                    highest = conn.execute(
+                        "SELECT MAX(CAST(SUBSTR(id, 5) AS INTEGER)) FROM documents WHERE id LIKE 'doc\\_%' ESCAPE '\\'"
+                    ).fetchone()[0]
+                    self._raise_counter(conn, highest or 0)
+                (number,) = conn.execute(
+                    "UPDATE counters SET value = value + 1 WHERE name = 'last_id' RETURNING value"
+                ).fetchone()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return f"doc_{number}"
+
+    def put(self, entry: Dict[str, Any]):
+        """Add a document, or update the entry with the same id in place."""
+        self.put_many([entry])
+
+    def put_many(self, entries: Iterable[Dict[str, Any]]):
+        """Add or update several documents in one transaction."""
+        entries = list(entries)
+        if not entries:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._put(conn, entries)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._writes += 1
+
+    def remove(self, doc_id: str) -> bool:
+        """Delete a document's entry. Returns False if it was not indexed."""
+        with self._lock:
+            self._writes += 1
+            return self._connect().execute("DELETE FROM documents WHERE id = ?", (doc_id,)).rowcount > 0
+
+    def replace(self, index_data: Dict[str, Any]) -> int:
+        """
+        Make the index hold exactly ``index_data["documents"]``. Returns the number of rows written.
+
+        Only entries that differ from the stored ones are rewritten. This is the
+        bulk path for whole-index edits (migrations, re-embedding); everyday
+        registration uses ``put`` / ``remove`` so concurrent writers cannot
+        overwrite each other's documents.
+        """
+        documents = index_data.get("documents", [])
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                stored = dict(conn.execute("SELECT id, entry FROM documents"))
+                changed = [doc for doc in documents if stored.get(doc["id"]) != json.dumps(doc)]
+                self._put(conn, changed)
+                keep = {doc["id"] for doc in documents}
+                conn.executemany("DELETE FROM documents WHERE id = ?", [(i,) for i in stored if i not in keep])
+                if index_data.get("next_id"):
+                    self._raise_counter(conn, int(index_data["next_id"]) - 1)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._writes += 1
+        return len(changed)
+
+    def clear(self):
+        """Delete every entry (the id counter keeps counting)."""
+        with self._lock:
+            self._writes += 1
+            self._connect().execute("DELETE FROM documents")
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Entry for ``doc_id``, or None."""
+        with self._lock:
+            row = self._connect().execute("SELECT entry FROM documents WHERE id = ?", (doc_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find(self, original: Optional[str] = None, source_sha256: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Oldest entry with the given source path or source content hash, or None."""
+        column, value = ("original", original) if original is not None else ("source_sha256", source_sha256)
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(f"SELECT entry FROM documents WHERE {column} = ? ORDER BY seq LIMIT 1", (value,))
+                .fetchone()
+            )
+        return json.loads(row[0]) if row else None
+
+    def lookup(self) -> Tuple["_ColumnLookup", "_ColumnLookup"]:
+        """(by_path, by_content_hash) lookups with ``.get``, answered by indexed queries instead of a full load."""
+        return _ColumnLookup(self, "original"), _ColumnLookup(self, "source_sha256")
+
+    def documents(self) -> List[Dict[str, Any]]:
+        """Every entry, in registration order."""
+        with self._lock:
+            rows = self._connect().execute("SELECT entry FROM documents ORDER BY seq").fetchall()
+        return [json.loads(entry) for (entry,) in rows]
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        """id, original, text_path, processed_date and chunk_count of every document (entries are not parsed)."""
+        with self._lock:
+            rows = (
+                self._connect().execute(f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM documents ORDER BY seq").fetchall()
+            )
+        return [dict(zip(SUMMARY_COLUMNS, row)) for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def chunk_count(self) -> int:
+        """Total chunks over every document."""
+        with self._lock:
+            return self._connect().execute("SELECT COALESCE(SUM(chunk_count), 0) FROM documents").fetchone()[0]
+
+    def data_version(self) -> int:
+        """
+        Counter that changes whenever another connection commits to the index.
+
+        Cheap enough to poll: it reads no rows, and unlike the file mtime it
+        also sees commits that are still in the WAL.
+        """
+        with self._lock:
+            return self._connect().execute("PRAGMA data_version").fetchone()[0]
+
+    def version(self) -> Tuple[int, int]:
+        """Changes whenever the index is written, by another connection (``data_version``) or this one."""
+        with self._lock:
+            return self._connect().execute("PRAGMA data_version").fetchone()[0], self._writes
+
+    def load(self) -> Dict[str, Any]:
+        """The whole index as ``{"documents": [...], "next_id": N}``."""
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM counters WHERE name = 'last_id'").fetchone()
+        return {"documents": self.documents(), "next_id": (row[0] if row else 0) + 1}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def import_json(self, json_path) -> int:
+        """Import a legacy ``document_index.json``. Returns the number of documents imported."""
+        with open(json_path, "r") as f:
+            index_data = json.load(f)
+        documents = [doc for doc in index_data.get("documents", []) if doc.get("id")]
+        self.put_many(documents)
+        numbers = [int(doc["id"][4:]) for doc in documents if doc["id"].startswith("doc_") and doc["id"][4:].isdigit()]
+        last_id = max([int(index_data.get("next_id") or 1) - 1] + numbers)
+        with self._lock:
+            self._raise_counter(self._connect(), last_id)
+        return len(documents)
+
+
+class _ColumnLookup:
+    """Dict-style ``get`` over one indexed column of a ``DocumentIndex``."""
+
+    def __init__(self, index: DocumentIndex, column: str):
+        self._index = index
+        self._column = column
+
+    def get(self, value: str) -> Optional[Dict[str, Any]]:
+        return self._index.find(**{self._column: value})
+
+
+def index_path(json_path) -> Path:
+    """SQLite index file kept next to (and replacing) a ``document_index.json``."""
+    json_path = Path(json_path)
+    return json_path.with_name(json_path.stem + ".db")
+
+
+def open_document_index(json_path) -> DocumentIndex:
+    """
+    Open the index stored next to ``json_path``, importing the JSON file if present.
+
+    The JSON file is renamed to ``*.json.migrated`` after a successful import.
+    An unreadable JSON file is left in place and the index starts empty.
+    """
+    json_path = Path(json_path)
+    index = DocumentIndex(index_path(json_path))
+    if json_path.exists():
+        logger.info(f"📦 Migrating {json_path.name} to the SQLite document index...")
+        start_time = time.time()
+        try:
+            imported = index.import_json(json_path)
+        except (json.JSONDecodeError, OSError, KeyError, TypeError) as e:
+            logger.error(f"⚠️ Could not read legacy document index {json_path}: {e}")
+            return index
+        migrated_file = json_path.with_name(json_path.name + ".migrated")
+        try:
+            json_path.replace(migrated_file)
+        except FileNotFoundError:
+            pass  # Another process finished the same import first
+        logger.info(
+            f"✅ Imported {imported} documents in {time.time() - start_time:.1f}s (old file: {migrated_file.name})"
+        )
+    return index
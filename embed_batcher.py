@@ -0,0 +1,406 @@
+"""
+Batched ``/api/embed`` dispatch across Ollama nodes.
+
+Ollama's ``/api/embed`` takes a list of inputs, but every embedding path used
+to send one text per request, so a 300-chunk PDF cost 300 round trips plus
+300 sets of request parsing and scheduling on the node. ``EmbedBatcher``
+packs texts into sub-batches instead:
+
+- The texts are split between nodes in proportion to each node's measured
+  throughput (chunks/sec, an EWMA kept by ``NodeThroughput``). A node that
+  runs out of work steals the back half of the queue that would take longest
+  to finish, and near the end no node takes more than its throughput share
+  of what is left, so the slowest node never holds the tail.
+- A sub-batch is bounded by a count, which ``AdaptiveBatchSize`` tunes per
+  node from observed latency, and by an estimated token budget, so a batch of
+  long chunks stays a reasonable request size.
+- Results are written back by input position, so the output order matches
+  the input order.
+- With a ``Hedger``, a sub-batch that runs past the node's p95 (per-text
+  p95 times the batch size) is also sent to the fastest other node, and
+  the first answer wins.
+- A sub-batch that fails is split in half and retried until the failing
+  text is isolated (its result is None). A node that cannot be reached
+  hands its remaining texts back to the other nodes.
+
+The learned throughputs can be persisted to a JSON file so the next run
+starts with a warm split instead of an even one.
+
+Results keep the shape of a single ``embed`` response
+(``{"model": ..., "embeddings": [vector]}``), one per input.
+"""
+
+import functools
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+import httpx
+
+from hedging import Hedger
+from http_pool import get_session
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = int(os.getenv("FLOCKPARSER_EMBED_BATCH_MAX", "128"))  # Upper bound on texts per request
+MAX_BATCH_TOKENS = int(os.getenv("FLOCKPARSER_EMBED_BATCH_TOKENS", "16384"))  # Estimated tokens per request
+INITIAL_BATCH_SIZE = 16  # Starting size for a node with no latency history
+TARGET_BATCH_SECONDS = float(os.getenv("FLOCKPARSER_EMBED_TARGET_SECONDS", "2.0"))  # Latency the tuner aims for
+EMBED_TIMEOUT = 300.0
+THROUGHPUT_ALPHA = 0.3  # EWMA weight of the newest chunks/sec sample
+DEFAULT_THROUGHPUT = 1.0  # chunks/sec assumed when no node has any history
+EMBED_OPTIONS = ("keep_alive", "options", "truncate", "dimensions")  # /api/embed fields passed through
+
+# Failures that mean the node is unreachable (splitting the batch would not help)
+NODE_DOWN_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+def estimate_tokens(text: str) -> int:
+    """Conservative token estimate: 1 token ≈ 3.5 chars."""
+    return int(len(text) / 3.5) + 1
+
+
+class AdaptiveBatchSize:
+    """
+    Per-node sub-batch size tuned from request latency.
+
+    The size doubles while full batches finish in under half the target
+    latency. It shrinks in proportion when a batch overshoots the target,
+    and halves when a request fails.
+    """
+
+    def __init__(
+        self,
+        initial: int = INITIAL_BATCH_SIZE,
+        minimum: int = 1,
+        maximum: int = MAX_BATCH_SIZE,
+        target_seconds: float = TARGET_BATCH_SECONDS,
+    ):
+        self.initial = max(minimum, min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, node: str) -> int:
+        with self._lock:
+            return self._sizes.get(node, self.initial)
+
+    def observe(self, node: str, size: int, seconds: float):
+        """Record that a ``size``-text batch took ``seconds`` on ``node`` (excluding model load time)."""
+        with self._lock:
+            current = self._sizes.get(node, self.initial)
+            if seconds > self.target_seconds:
+                current = min(current, max(self.minimum, int(size * self.target_seconds / seconds)))
+            elif size >= current and seconds < self.target_seconds / 2:
+                # Only full batches say anything about a larger size
+                current = min(self.maximum, current * 2)
+            self._sizes[node] = current
+
+    def failed(self, node: str):
+        with self._lock:
+            self._sizes[node] = max(self.minimum, self._sizes.get(node, self.initial) // 2)
+
+    def sizes(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._sizes)
+
+
+class NodeThroughput:
+    """
+    Per-node embedding throughput (chunks/sec) as an exponentially weighted moving average.
+
+    Args:
+        alpha: Weight of the newest sample
+        path: JSON file the rates are loaded from and saved to (None = in memory only)
+        initial: Starting rates (e.g. primed stats); rates loaded from ``path`` take precedence
+    """
+
+    def __init__(
+        self,
+        alpha: float = THROUGHPUT_ALPHA,
+        path: Optional[Path] = None,
+        initial: Optional[Dict[str, float]] = None,
+    ):
+        self.alpha = alpha
+        self.path = Path(path) if path else None
+        self._rates: Dict[str, float] = {node: rate for node, rate in (initial or {}).items() if rate and rate > 0}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if self.path is not None:
+            self.load()
+
+    def rate(self, node: str) -> float:
+        """Chunks/sec for ``node`` (an unmeasured node is assumed to be average)."""
+        with self._lock:
+            if node in self._rates:
+                return self._rates[node]
+            if self._rates:
+                return sum(self._rates.values()) / len(self._rates)
+            return DEFAULT_THROUGHPUT
+
+    def observe(self, node: str, count: int, seconds: float):
+        """Fold in a request that embedded ``count`` texts in ``seconds``."""
+        if count <= 0 or seconds <= 0:
+            return
+        sample = count / seconds
+        with self._lock:
+            previous = self._rates.get(node)
+            self._rates[node] = sample if previous is None else self.alpha * sample + (1 - self.alpha) * previous
+            self._dirty = True
+
+    def rates(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._rates)
+
+    def load(self):
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f).get("node_throughput", {})
+            with self._lock:
+                self._rates.update({node: float(rate) for node, rate in saved.items() if float(rate) > 0})
+        except Exception as e:
+            logger.warning(f"⚠️  Could not load node throughput from {self.path}: {e}")
+
+    def save(self):
+        """Write the rates to ``path`` if they changed since the last save."""
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "node_throughput": {node: round(rate, 4) for node, rate in self._rates.items()},
+                "updated": time.time(),
+            }
+            self._dirty = False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning(f"⚠️  Could not save node throughput to {self.path}: {e}")
+
+
+def partition(count: int, rates: Dict[str, float]) -> Dict[str, deque]:
+    """Split positions ``0..count-1`` into contiguous runs sized in proportion to ``rates``."""
+    total = sum(rates.values())
+    queues: Dict[str, deque] = {}
+    start = 0
+    cumulative = 0.0
+    for node, rate in rates.items():
+        cumulative += rate
+        end = round(count * cumulative / total)
+        queues[node] = deque(range(start, end))
+        start = end
+    return queues
+
+
+class EmbedBatcher:
+    """
+    Embed many texts with batched ``/api/embed`` requests spread over nodes.
+
+    Args:
+        nodes: Callable returning the node keys (``host:port``) to use by default
+        sizer: Batch size tuner (kept across calls so the tuning carries over)
+        throughput: Per-node chunks/sec used to split the work (saved after every ``embed`` call)
+        max_batch_tokens: Estimated token budget per request
+        timeout: Per-request timeout in seconds
+        on_batch: Called as ``on_batch(node, model, count, seconds, error)`` after every request
+        hedger: Races slow sub-batches against a duplicate on another node (None = no hedging)
+    """
+
+    def __init__(
+        self,
+        nodes: Callable[[], Sequence[str]],
+        sizer: Optional[AdaptiveBatchSize] = None,
+        throughput: Optional[NodeThroughput] = None,
+        max_batch_tokens: int = MAX_BATCH_TOKENS,
+        timeout: float = EMBED_TIMEOUT,
+        on_batch: Optional[Callable[[str, str, int, float, Optional[Exception]], None]] = None,
+        hedger: Optional[Hedger] = None,
+    ):
+        self._nodes = nodes
+        self.sizer = sizer or AdaptiveBatchSize()
+        self.throughput = throughput or NodeThroughput()
+        self.max_batch_tokens = max_batch_tokens
+        self.timeout = timeout
+        self.on_batch = on_batch
+        self.hedger = hedger
+
+    def embed(
+        self, model: str, texts: Sequence[str], nodes: Optional[Sequence[str]] = None, **kwargs
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Embed ``texts`` in order; a text that could not be embedded gets None.
+
+        ``nodes`` restricts the work to those node keys. Keyword arguments
+        that ``/api/embed`` understands (``keep_alive``, ``options``,
+        ``truncate``, ``dimensions``) are sent with every request; others
+        (e.g. ``priority``) are ignored.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        node_keys = list(dict.fromkeys(nodes or self._nodes()))
+        if not texts or not node_keys:
+            return results
+
+        options = {key: kwargs[key] for key in EMBED_OPTIONS if kwargs.get(key) is not None}
+        rates = {node: self.throughput.rate(node) for node in node_keys}
+        queues = partition(len(texts), rates)
+        down: Set[str] = set()
+        lock = threading.Lock()
+
+        def take(node: str) -> List[int]:
+            with lock:
+                own = queues[node]
+                if not own:
+                    victim = self._victim(node, queues, rates, down)
+                    if victim is None:
+                        return []
+                    stolen = [queues[victim].pop() for _ in range((len(queues[victim]) + 1) // 2)]
+                    own.extend(reversed(stolen))
+
+                # Near the end, take no more than this node's throughput share of what is left
+                remaining = sum(len(queue) for queue in queues.values())
+                live_rate = sum(rate for n, rate in rates.items() if n not in down)
+                size = min(self.sizer.get(node), max(1, math.ceil(remaining * rates[node] / live_rate)))
+
+                batch: List[int] = []
+                tokens = 0
+                while own and len(batch) < size:
+                    cost = estimate_tokens(texts[own[0]])
+                    if batch and tokens + cost > self.max_batch_tokens:
+                        break
+                    batch.append(own.popleft())
+                    tokens += cost
+            return batch
+
+        def work(node: str):
+            while True:
+                batch = take(node)
+                if not batch:
+                    return
+                peers = [n for n in node_keys if n != node and n not in down]
+                try:
+                    self._embed_split(node, model, texts, batch, results, options, peers)
+                except NODE_DOWN_ERRORS as e:
+                    # Leave its texts for the other nodes to steal
+                    with lock:
+                        queues[node].extendleft(reversed(batch))
+                        down.add(node)
+                    logger.warning(f"⚠️  {node} unreachable for embeddings ({e}); {len(batch)} texts requeued")
+                    return
+
+        # A node can go down after the others ran out of work; rerun the live ones until nothing is left
+        while True:
+            live = [node for node in node_keys if node not in down]
+            if not live:
+                break
+            if len(live) == 1:
+                work(live[0])
+            else:
+                with ThreadPoolExecutor(max_workers=len(live), thread_name_prefix="embed-batch") as executor:
+                    list(executor.map(work, live))
+            if not any(queues.values()):
+                break
+
+        self.throughput.save()
+        pending = sum(len(queue) for queue in queues.values())
+        if pending:
+            logger.error(f"❌ {pending} texts not embedded: no reachable node left")
+        return results
+
+    @staticmethod
+    def _victim(node: str, queues: Dict[str, deque], rates: Dict[str, float], down: Set[str]) -> Optional[str]:
+        """The node whose queue would take longest to finish (queues of unreachable nodes first)."""
+        candidates = [(n in down, len(queue) / rates[n], n) for n, queue in queues.items() if n != node and queue]
+        return max(candidates)[2] if candidates else None
+
+    def _embed_split(self, node, model, texts, batch, results, options, peers=()):
+        """Embed ``batch`` on ``node``, halving it on failure until the bad text is isolated."""
+        inputs = [texts[i] for i in batch]
+        try:
+            primary = functools.partial(self._post, node, model, inputs, options)
+            hedge, delay = None, None
+            if self.hedger is not None and peers:
+                delay = self.hedger.delay(_latency_key(node, model), scale=len(inputs))
+                if delay is not None:
+                    backup = max(peers, key=self.throughput.rate)
+                    hedge = functools.partial(self._post, backup, model, inputs, options)
+            embeddings = primary() if self.hedger is None else self.hedger.run(primary, hedge, delay)
+        except NODE_DOWN_ERRORS:
+            raise
+        except Exception as e:
+            self.sizer.failed(node)
+            if len(batch) == 1:
+                logger.error(f"⚠️ Error embedding text {batch[0]} on {node}: {e}")
+                return
+            middle = len(batch) // 2
+            logger.warning(f"⚠️  Embedding batch of {len(batch)} failed on {node} ({e}); splitting")
+            self._embed_split(node, model, texts, batch[:middle], results, options, peers)
+            self._embed_split(node, model, texts, batch[middle:], results, options, peers)
+            return
+
+        for index, embedding in zip(batch, embeddings):
+            results[index] = {"model": model, "embeddings": [embedding]}
+
+    def _post(self, node: str, model: str, inputs: List[str], options: Dict[str, Any]) -> List[List[float]]:
+        start = time.time()
+        error: Optional[Exception] = None
+        try:
+            response = get_session().post(
+                f"http://{node}/api/embed", json={"model": model, "input": inputs, **options}, timeout=self.timeout
+            )
+            return self.accept(node, model, len(inputs), response, start)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.report(node, model, len(inputs), time.time() - start, error)
+
+    def accept(self, node: str, model: str, count: int, response, start: float) -> List[List[float]]:
+        """Check an /api/embed response for ``count`` texts and feed its timing to the tuners."""
+        response.raise_for_status()
+        data = response.json()
+        embeddings = data.get("embeddings") or []
+        if len(embeddings) != count:
+            raise ValueError(f"expected {count} embeddings, got {len(embeddings)}")
+        # Model load time says nothing about how large a batch the node handles well
+        load_seconds = (data.get("load_duration") or 0) / 1e9
+        seconds = max(0.0, time.time() - start - load_seconds)
+        self.sizer.observe(node, count, seconds)
+        self.throughput.observe(node, count, seconds)
+        if self.hedger is not None:
+            self.hedger.latency.observe(_latency_key(node, model), seconds / count)
+        return embeddings
+
+    def report(self, node: str, model: str, count: int, seconds: float, error: Optional[Exception]):
+        """Pass one finished request to the ``on_batch`` hook."""
+        if self.on_batch is not None:
+            self.on_batch(node, model, count, seconds, error)
+
+
+def _latency_key(node: str, model: str) -> str:
+    """Hedging latency key for per-text embedding time on ``node``."""
+    return f"{node}/api/embed[per-text]:{model}"
+
+
+def batcher_for(pool) -> EmbedBatcher:
+    """The pool's shared batcher (created over its nodes on first use)."""
+    batcher = getattr(pool, "embed_batcher", None)
+    if batcher is None:
+        batcher = EmbedBatcher(lambda: [f"{node['host']}:{node['port']}" for node in pool.nodes])
+        pool.embed_batcher = batcher
+    return batcher
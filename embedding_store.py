@@ -0,0 +1,329 @@
+"""
+SQLite-backed embedding cache for FlockParser.
+
+Replaces the monolithic ``embedding_cache.json``: every vector is one row keyed
+by (model, model digest, MD5 of its text) and stored as a float32 BLOB, so a
+lookup is a primary-key read and a new embedding is a single insert instead of
+a whole-file rewrite. Vectors from different embedding models (or different
+builds of the same model) live side by side and are never served for another.
+WAL mode lets the CLI, the background API thread and the MCP executor read
+while a document is being ingested.
+
+``EmbeddingLRUCache`` sits in front of the store for query embeddings that
+are requested over and over (chat, MCP ``query_documents``, Web UI search).
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MIGRATE_BATCH_ROWS = 5000  # Rows inserted per transaction when importing the JSON cache
+QUERY_BATCH_KEYS = 500  # Keys per IN (...) lookup, below SQLite's host-parameter limit
+
+
+class EmbeddingNamespace(NamedTuple):
+    """Which model produced a vector: name, Ollama digest ("" if unknown) and dimension (None until known)."""
+
+    model: str
+    digest: str = ""
+    dim: Optional[int] = None
+
+
+def _to_blob(embedding: Sequence[float]) -> bytes:
+    return np.asarray(embedding, dtype=np.float32).tobytes()
+
+
+def _from_blob(blob: bytes) -> List[float]:
+    return np.frombuffer(blob, dtype=np.float32).tolist()
+
+
+class EmbeddingStore:
+    """Keyed embedding cache: O(1) lookups and append-only writes, namespaced by model."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS vectors (model TEXT NOT NULL, digest TEXT NOT NULL, key TEXT NOT NULL, "
+                "dim INTEGER NOT NULL, vector BLOB NOT NULL, PRIMARY KEY (model, digest, key))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS models (model TEXT PRIMARY KEY, digest TEXT NOT NULL, dim INTEGER)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _where(namespace: EmbeddingNamespace) -> Tuple[str, list]:
+        clause, params = "model = ? AND digest = ?", [namespace.model, namespace.digest]
+        if namespace.dim is not None:
+            clause += " AND dim = ?"
+            params.append(namespace.dim)
+        return clause, params
+
+    def get(self, namespace: EmbeddingNamespace, key: str) -> Optional[List[float]]:
+        """Return the cached embedding for ``key`` under ``namespace`` or None."""
+        clause, params = self._where(namespace)
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(f"SELECT vector FROM vectors WHERE {clause} AND key = ?", params + [key])
+                .fetchone()
+            )
+        return _from_blob(row[0]) if row else None
+
+    def get_many(self, namespace: EmbeddingNamespace, keys: Iterable[str]) -> Dict[str, List[float]]:
+        """Return cached embeddings for whichever of ``keys`` are present under ``namespace``."""
+        keys = list(dict.fromkeys(keys))
+        clause, params = self._where(namespace)
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(keys), QUERY_BATCH_KEYS):
+                batch = keys[start : start + QUERY_BATCH_KEYS]
+                placeholders = ",".join("?" * len(batch))
+                for key, blob in conn.execute(
+                    f"SELECT key, vector FROM vectors WHERE {clause} AND key IN ({placeholders})", params + batch
+                ):
+                    found[key] = _from_blob(blob)
+        return found
+
+    def missing(self, namespace: EmbeddingNamespace, keys: Iterable[str]) -> List[str]:
+        """Keys (deduplicated, in order) with no vector under ``namespace``."""
+        keys = list(dict.fromkeys(keys))
+        clause, params = self._where(namespace)
+        present = set()
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(keys), QUERY_BATCH_KEYS):
+                batch = keys[start : start + QUERY_BATCH_KEYS]
+                placeholders = ",".join("?" * len(batch))
+                present.update(
+                    key
+                    for (key,) in conn.execute(
+                        f"SELECT key FROM vectors WHERE {clause} AND key IN ({placeholders})", params + batch
+                    )
+                )
+        return [key for key in keys if key not in present]
+
+    def count(self, namespace: Optional[EmbeddingNamespace] = None) -> int:
+        """Number of cached vectors, overall or under one namespace."""
+        with self._lock:
+            conn = self._connect()
+            if namespace is None:
+                return conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+            clause, params = self._where(namespace)
+            return conn.execute(f"SELECT COUNT(*) FROM vectors WHERE {clause}", params).fetchone()[0]
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def namespaces(self) -> List[Tuple[EmbeddingNamespace, int]]:
+        """Every (namespace, vector count) present in the cache."""
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute("SELECT model, digest, dim, COUNT(*) FROM vectors GROUP BY model, digest, dim")
+                .fetchall()
+            )
+        return [(EmbeddingNamespace(model, digest, dim), count) for model, digest, dim, count in rows]
+
+    def put(self, namespace: EmbeddingNamespace, key: str, embedding: Sequence[float]):
+        """Store one embedding (empty embeddings are not cached)."""
+        self.put_many(namespace, [(key, embedding)])
+
+    def put_many(self, namespace: EmbeddingNamespace, items: Iterable[Tuple[str, Sequence[float]]]) -> int:
+        """
+        Store several embeddings in one transaction. Returns how many were written.
+
+        Empty embeddings, and embeddings whose length differs from a known
+        ``namespace.dim``, are not stored.
+        """
+        rows = []
+        for key, embedding in items:
+            if embedding is None or not len(embedding):
+                continue
+            if namespace.dim is not None and len(embedding) != namespace.dim:
+                logger.warning(
+                    f"⚠️ Not caching {namespace.model} vector of dimension {len(embedding)} != {namespace.dim}"
+                )
+                continue
+            rows.append((namespace.model, namespace.digest, key, len(embedding), _to_blob(embedding)))
+        if not rows:
+            return 0
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO vectors (model, digest, key, dim, vector) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            conn.commit()
+        return len(rows)
+
+    def remember_model(self, namespace: EmbeddingNamespace):
+        """Record the latest digest and dimension seen for a model (used when Ollama is unreachable)."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO models (model, digest, dim) VALUES (?, ?, ?)",
+                (namespace.model, namespace.digest, namespace.dim),
+            )
+            conn.commit()
+
+    def known_model(self, model: str) -> Optional[EmbeddingNamespace]:
+        """Last namespace recorded for ``model``, or None."""
+        with self._lock:
+            row = self._connect().execute("SELECT digest, dim FROM models WHERE model = ?", (model,)).fetchone()
+        return EmbeddingNamespace(model, row[0], row[1]) if row else None
+
+    def clear(self):
+        """Delete every cached embedding."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM vectors")
+            conn.execute("DELETE FROM models")
+            conn.commit()
+            conn.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def import_json(self, json_path, namespace: EmbeddingNamespace) -> int:
+        """Import a legacy ``{md5: embedding}`` JSON cache into ``namespace``. Returns the number imported."""
+        with open(json_path, "r") as f:
+            cache = json.load(f)
+
+        imported = 0
+        items = list(cache.items())
+        for start in range(0, len(items), MIGRATE_BATCH_ROWS):
+            imported += self.put_many(namespace, items[start : start + MIGRATE_BATCH_ROWS])
+        return imported
+
+    def adopt_unnamespaced(self, namespace: EmbeddingNamespace) -> int:
+        """
+        Move vectors from the earlier single-key ``embeddings`` table into ``namespace``.
+
+        Those vectors were produced by whichever model was configured at the
+        time, so the caller passes the namespace of the current model.
+        """
+        with self._lock:
+            conn = self._connect()
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'embeddings'").fetchone()
+            if not exists:
+                return 0
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO vectors (model, digest, key, dim, vector) "
+                "SELECT ?, ?, key, dim, vector FROM embeddings WHERE dim > 0",
+                (namespace.model, namespace.digest),
+            )
+            conn.execute("DROP TABLE embeddings")
+            conn.commit()
+            return cursor.rowcount
+
+
+class EmbeddingLRUCache:
+    """
+    Thread-safe in-process LRU cache of embeddings with a byte budget and optional TTL.
+
+    Vectors are held as float32 arrays; ``max_bytes`` bounds their total size.
+    """
+
+    ENTRY_OVERHEAD_BYTES = 200  # Approximate per-entry cost of the key, tuple and dict slot
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _entry_bytes(self, vector: np.ndarray) -> int:
+        return vector.nbytes + self.ENTRY_OVERHEAD_BYTES
+
+    def _remove(self, key: Hashable):
+        vector, _ = self._entries.pop(key)
+        self._bytes -= self._entry_bytes(vector)
+
+    def get(self, key: Hashable) -> Optional[List[float]]:
+        """Return the embedding for ``key`` (marking it most recently used) or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            vector, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return vector.tolist()
+
+    def put(self, key: Hashable, embedding: Sequence[float]):
+        """Cache an embedding, evicting least recently used entries to stay within budget."""
+        if embedding is None or not len(embedding):
+            return
+        vector = np.asarray(embedding, dtype=np.float32)
+        size = self._entry_bytes(vector)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (vector, time.monotonic())
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,140 @@
+"""
+Process pool for CPU-bound document extraction.
+
+PyMuPDF, PyPDF2 and text cleaning hold the GIL, so extracting several PDFs
+from threads still uses one core. ``ExtractionPool`` runs extraction in worker
+processes and hands results back to the caller as they finish, so the caller
+(one process, one embedding dispatcher) embeds document N while the workers
+are already extracting the documents after it.
+
+At most ``max_in_flight`` items are submitted at a time, which bounds how many
+extracted texts can pile up in memory while the parent is busy embedding.
+"""
+
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+START_METHOD = os.getenv("FLOCKPARSER_EXTRACTION_START_METHOD", "forkserver")  # How worker processes start
+
+
+def default_workers() -> int:
+    """One worker per CPU core."""
+    return max(1, os.cpu_count() or 1)
+
+
+def pool_context():
+    """
+    Multiprocessing context for extraction worker pools (``START_METHOD``, else spawn).
+
+    Not fork: the CLI and the API server already run background threads
+    (residency poller, request stats publisher, observability bridge, Dask,
+    uvicorn, job workers, httpx) by the time they extract, and a forked child
+    can deadlock on a lock one of them held. forkserver children come from a
+    clean single-threaded process instead.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    for method in (START_METHOD, "spawn"):
+        if method in methods:
+            return multiprocessing.get_context(method)
+    return None
+
+
+class ExtractionPool:
+    """
+    Bounded process pool that yields ``(item, result, error)`` as work completes.
+
+    Args:
+        workers: Worker processes (defaults to one per CPU core)
+        max_in_flight: Items submitted but not yet consumed (defaults to 2x workers)
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_in_flight: Optional[int] = None):
+        self.workers = max(1, workers or default_workers())
+        self.max_in_flight = max(self.workers, max_in_flight or 2 * self.workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=pool_context())
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def map_unordered(
+        self, fn: Callable[..., Any], items: Iterable[Any]
+    ) -> Iterator[Tuple[Any, Any, Optional[BaseException]]]:
+        """
+        Run ``fn(item)`` in the workers, yielding ``(item, result, error)`` in completion order.
+
+        ``fn`` must be a picklable module-level function. A failing item is
+        yielded with its exception instead of aborting the rest. If a worker
+        dies (e.g. a crash inside a PDF library) the pool is restarted and the
+        items that were in flight are re-run one at a time, so only an item
+        that kills a worker on its own is reported as failed.
+        """
+        pending = iter(items)
+        in_flight = {}
+        suspects = deque()  # In flight when a worker died; re-run alone to find the culprit
+        running_alone = False
+
+        def submit(item):
+            in_flight[self._get_executor().submit(fn, item)] = item
+
+        def fill():
+            nonlocal running_alone
+            if suspects:
+                if not in_flight:
+                    submit(suspects.popleft())
+                    running_alone = True
+                return
+            running_alone = False
+            for item in pending:
+                submit(item)
+                if len(in_flight) >= self.max_in_flight:
+                    break
+
+        fill()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            broken = []
+            for future in done:
+                item = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    broken.append((item, e))
+                    continue
+                except Exception as e:
+                    yield item, None, e
+                else:
+                    yield item, result, None
+
+            if broken:
+                # Every outstanding future of a broken pool fails; restart and re-run them
+                broken.extend((in_flight.pop(future), None) for future in list(in_flight))
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                logger.warning(f"⚠️ Extraction worker crashed; restarting pool ({len(broken)} item(s) affected)")
+                if running_alone:
+                    item, error = broken[0]
+                    yield item, None, error or BrokenProcessPool("worker process died")
+                else:
+                    suspects.extend(item for item, _ in broken)
+
+            fill()
@@ -1,17 +1,28 @@
 import os
+import sys
+import asyncio
+import functools
+import json
+import time
 import numpy as np
-import pdfplumber
-import pytesseract
 import chromadb
 import uvicorn
 from fastapi import FastAPI, UploadFile, File, HTTPException, Security, Depends, Body
+from fastapi.responses import StreamingResponse
 from fastapi.security.api_key import APIKeyHeader
 from pydantic import BaseModel
-from PIL import Image
 from pathlib import Path
 from typing import Optional, List
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
 import ollama
-import json
+
+from document_index import index_path, open_document_index
+from extraction_pool import pool_context
+from pdf_extraction import extract_text_with_pdfplumber
+from job_queue import DEFAULT_PRIORITY, TERMINAL_STATES, JobQueue, JobRunner
+from chat_stream import StreamTimer
+from http_pool import client_options, ollama_client
 
 
 # Pydantic Models for Request Bodies
@@ -21,6 +32,15 @@ class QueryRequest(BaseModel):
     n_results: int = 3
 
 
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest]
+
+
+class ChatRequest(BaseModel):
+    query: str
+    n_results: int = 3
+
+
 # API Key Configuration
 API_KEY = os.getenv("FLOCKPARSE_API_KEY", "your-secret-api-key-change-this")
 API_KEY_NAME = "X-API-Key"
@@ -29,6 +49,25 @@ api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 # Model caching configuration for faster inference
 EMBEDDING_KEEP_ALIVE = "1h"  # Embedding model used frequently
 CHAT_KEEP_ALIVE = "15m"  # Chat model used less frequently
+CHAT_MODEL = "llama3.1:latest"
+CHAT_SYSTEM_PROMPT = (
+    "You are FlockParser AI, a helpful assistant that answers questions "
+    "based on the provided document context. Only use information from the context. "
+    "If you don't know or the answer isn't in the context, say so."
+)
+
+# Blocking work runs in bounded pools so the event loop keeps serving /health and /query during ingestion
+IO_WORKERS = int(os.getenv("FLOCKPARSE_IO_WORKERS", "8"))  # ChromaDB, document index and file reads
+INGEST_WORKERS = int(os.getenv("FLOCKPARSE_INGEST_WORKERS", "2"))  # Background job workers (uploads, process_pdf)
+EXTRACT_WORKERS = int(os.getenv("FLOCKPARSE_EXTRACT_WORKERS", "2"))  # pdfplumber/OCR (CPU-bound, own processes)
+
+# Concurrent requests allowed per route group; excess requests wait up to ROUTE_WAIT_SECONDS, then get 429
+QUERY_CONCURRENCY = int(os.getenv("FLOCKPARSE_QUERY_CONCURRENCY", "16"))
+LLM_CONCURRENCY = int(os.getenv("FLOCKPARSE_LLM_CONCURRENCY", "4"))
+ROUTE_WAIT_SECONDS = float(os.getenv("FLOCKPARSE_ROUTE_WAIT_SECONDS", "30"))
+
+# Upper bound on queries per /query/batch call (the ChromaDB query and any fallback embedding cover all of them)
+MAX_BATCH_QUERIES = 256
 
 
 async def verify_api_key(api_key: str = Security(api_key_header)):
@@ -40,8 +79,80 @@ async def verify_api_key(api_key: str = Security(api_key_header)):
     return api_key
 
 
+class RouteLimit:
+    """Caps concurrent requests on a group of routes (``async with limit:``)."""
+
+    def __init__(self, name, limit, max_wait=ROUTE_WAIT_SECONDS):
+        self.name = name
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def __aenter__(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many concurrent {self.name} requests, retry later",
+                headers={"Retry-After": str(int(self.max_wait) or 1)},
+            )
+        return self
+
+    async def __aexit__(self, *exc):
+        self._semaphore.release()
+
+
+query_limit = RouteLimit("query", QUERY_CONCURRENCY)
+llm_limit = RouteLimit("LLM", LLM_CONCURRENCY)
+
+io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="flockparse-io")
+_extract_pool = None
+
+
+def get_extract_pool():
+    """Process pool for PDF text extraction of uploads (created on first use)."""
+    global _extract_pool
+    if _extract_pool is None:
+        # Not the platform default (fork): this process already runs uvicorn, io_pool, job and stats threads
+        _extract_pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS, mp_context=pool_context())
+    return _extract_pool
+
+
+async def run_blocking(executor, func, *args, **kwargs):
+    """Run a blocking call in ``executor`` without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+_ollama_clients = {}
+
+
+def get_ollama_client():
+    """Async Ollama client for the running event loop (its connection pool is bound to the loop)."""
+    loop = asyncio.get_running_loop()
+    client = _ollama_clients.get(loop)
+    if client is None:
+        for stale in [other for other in _ollama_clients if other.is_closed()]:
+            del _ollama_clients[stale]
+        client = _ollama_clients[loop] = ollama.AsyncClient(**client_options())
+    return client
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Run the background job workers while the app is up; jobs interrupted by the last shutdown resume here."""
+    job_runner.start()
+    yield
+    job_runner.stop()
+
+
 # Initialize FastAPI app
-app = FastAPI(title="FlockParse API", description="GPU-aware document processing with authentication", version="1.0.4")
+app = FastAPI(
+    lifespan=lifespan,
+    title="FlockParse API",
+    description="GPU-aware document processing with authentication",
+    version="1.0.4",
+)
 
 # ChromaDB setup - Use CLI's database for shared access
 chroma_client = chromadb.PersistentClient(path="./chroma_db_cli")
@@ -50,31 +161,36 @@ collection = chroma_client.get_or_create_collection(name="documents", metadata={
 # Knowledge base paths (shared with CLI)
 KB_DIR = Path("./knowledge_base")
 KB_DIR.mkdir(exist_ok=True)
-INDEX_FILE = KB_DIR / "document_index.json"
+INDEX_FILE = KB_DIR / "document_index.json"  # Legacy JSON index; documents live in the SQLite index next to it
+_document_index = None
 
-# Text Extraction from PDF (including OCR for images)
+# Background jobs for uploads and local processing (persist across restarts)
+JOBS_DB = KB_DIR / "jobs.db"
+job_queue = JobQueue(JOBS_DB)
+JOB_STREAM_INTERVAL = 0.5  # Seconds between progress checks on /jobs/{id}/stream
 
 
-def extract_text_from_pdf(file_path):
-    text = []
-    with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            extracted_text = page.extract_text()
-            if extracted_text:
-                text.append(extracted_text)
-            else:
-                # OCR for scanned images
-                image = page.to_image().original
-                ocr_text = pytesseract.image_to_string(Image.open(image))
-                text.append(ocr_text)
-    return "\n".join(text)
+def index_exists():
+    return INDEX_FILE.exists() or index_path(INDEX_FILE).exists()
+
+
+def get_document_index():
+    """Shared SQLite document index (the CLI writes it; the JSON index is imported on first use)."""
+    global _document_index
+    if _document_index is None:
+        _document_index = open_document_index(INDEX_FILE)
+    return _document_index
+
+
+# Text Extraction from PDF (including OCR for images); runs in get_extract_pool()'s worker processes
+extract_text_from_pdf = extract_text_with_pdfplumber
 
 
 # Convert text to embeddings using Ollama
 
 
 def embed_text(text):
-    response = ollama.embed(model="mxbai-embed-large", input=text, keep_alive=EMBEDDING_KEEP_ALIVE)
+    response = ollama_client().embed(model="mxbai-embed-large", input=text, keep_alive=EMBEDDING_KEEP_ALIVE)
     # Response has 'embeddings' (list of lists) not 'embedding'
     embeddings = response.embeddings if hasattr(response, "embeddings") else []
     embedding = embeddings[0] if embeddings else []
@@ -93,8 +209,8 @@ def store_document(file_name, content):
 
 
 def summarize_text(text):
-    response = ollama.chat(
-        model="llama3.1:latest",
+    response = ollama_client().chat(
+        model=CHAT_MODEL,
         messages=[{"role": "user", "content": f"Summarize this document:\n{text}"}],
         keep_alive=CHAT_KEEP_ALIVE,
     )
@@ -110,6 +226,82 @@ def search_documents(query):
     return results
 
 
+# Async variants used by the routes: Ollama calls go through the async client,
+# ChromaDB calls run in the I/O pool
+
+
+async def embed_texts_async(texts):
+    response = await get_ollama_client().embed(
+        model="mxbai-embed-large", input=list(texts), keep_alive=EMBEDDING_KEEP_ALIVE
+    )
+    return [list(embedding) for embedding in response.embeddings]
+
+
+async def embed_text_async(text):
+    embeddings = await embed_texts_async([text])
+    return np.array(embeddings[0] if embeddings else [])
+
+
+async def store_document_async(file_name, content):
+    await embed_text_async(content)
+    await run_blocking(
+        io_pool, collection.add, documents=[content], metadatas=[{"file_name": file_name}], ids=[file_name]
+    )
+
+
+async def summarize_text_async(text):
+    response = await get_ollama_client().chat(
+        model=CHAT_MODEL,
+        messages=[{"role": "user", "content": f"Summarize this document:\n{text}"}],
+        keep_alive=CHAT_KEEP_ALIVE,
+    )
+    return response["message"]["content"]
+
+
+async def search_documents_async(query, n_results=3):
+    query_embedding = await embed_text_async(query)
+    return await run_blocking(
+        io_pool, collection.query, query_embeddings=[query_embedding.tolist()], n_results=n_results
+    )
+
+
+def hit_source(hit):
+    return (hit.get("metadata") or {}).get("file_name", hit.get("id"))
+
+
+def chat_messages(query, hits):
+    """System and user messages answering ``query`` from the formatted search ``hits``."""
+    context = "\n\n".join(f"From {hit_source(hit)}:\n{hit['content']}" for hit in hits)
+    return [
+        {"role": "system", "content": CHAT_SYSTEM_PROMPT},
+        {"role": "user", "content": f"CONTEXT: {context}\n\nQUESTION: {query}"},
+    ]
+
+
+async def chat_with_documents(query, n_results=3):
+    hits = format_query_results(await search_documents_async(query, n_results), 0)
+    response = await get_ollama_client().chat(
+        model=CHAT_MODEL, messages=chat_messages(query, hits), keep_alive=CHAT_KEEP_ALIVE
+    )
+    return response["message"]["content"]
+
+
+def format_query_results(results, i):
+    """Format the i-th query's hits from a ChromaDB query result for SynapticLlamas."""
+    formatted_results = []
+    if results and results.get("documents") and i < len(results["documents"]):
+        for j, doc in enumerate(results["documents"][i]):
+            formatted_results.append(
+                {
+                    "content": doc,
+                    "metadata": results["metadatas"][i][j] if results.get("metadatas") else {},
+                    "distance": results["distances"][i][j] if results.get("distances") else None,
+                    "id": results["ids"][i][j] if results.get("ids") else None,
+                }
+            )
+    return formatted_results
+
+
 # FastAPI Routes
 
 
@@ -129,22 +321,26 @@ async def root():
             "/documents",
             "/process-local",
             "/process-directory",
+            "/jobs",
+            "/chat",
         ],
     }
 
 
 @app.post("/upload/")
-async def upload_file(file: UploadFile = File(...), api_key: str = Depends(verify_api_key)):
-    """Upload and process a PDF file (requires authentication)"""
+async def upload_file(
+    file: UploadFile = File(...), priority: int = DEFAULT_PRIORITY, api_key: str = Depends(verify_api_key)
+):
+    """Upload a PDF and queue it for processing; returns a job id (requires authentication)"""
     try:
         file_path = f"./uploads/{file.filename}"
-        with open(file_path, "wb") as buffer:
-            buffer.write(await file.read())
-
-        text_content = extract_text_from_pdf(file_path)
-        store_document(file.filename, text_content)
+        content = await file.read()
+        await run_blocking(io_pool, Path(file_path).write_bytes, content)
 
-        return {"message": "File uploaded and processed.", "file_name": file.filename}
+        job_id = await submit_job("upload", {"file_path": file_path, "file_name": file.filename}, priority)
+        return {"message": "File uploaded and queued for processing.", "file_name": file.filename, "job_id": job_id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -153,11 +349,14 @@ async def upload_file(file: UploadFile = File(...), api_key: str = Depends(verif
 async def get_summary(file_name: str, api_key: str = Depends(verify_api_key)):
     """Get AI-generated summary of a document (requires authentication)"""
     try:
-        doc = collection.get(where={"file_name": file_name})
+        doc = await run_blocking(io_pool, collection.get, where={"file_name": file_name})
         if not doc["documents"]:
             raise HTTPException(status_code=404, detail="Document not found.")
-        summary = summarize_text(doc["documents"][0])
+        async with llm_limit:
+            summary = await summarize_text_async(doc["documents"][0])
         return {"file_name": file_name, "summary": summary}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -166,31 +365,94 @@ async def get_summary(file_name: str, api_key: str = Depends(verify_api_key)):
 async def search(query: str, api_key: str = Depends(verify_api_key)):
     """Search across documents (requires authentication)"""
     try:
-        results = search_documents(query)
+        async with query_limit:
+            results = await search_documents_async(query)
         return {"query": query, "results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/chat/")
+async def chat(request: ChatRequest, api_key: str = Depends(verify_api_key)):
+    """Answer a question from the documents (requires authentication)"""
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    try:
+        async with llm_limit:
+            answer = await chat_with_documents(request.query, request.n_results)
+        return {"query": request.query, "response": answer}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/chat/stream")
+async def stream_chat_answer(request: ChatRequest, api_key: str = Depends(verify_api_key)):
+    """
+    Server-sent events with the answer's tokens as they are generated, then a
+    final event with the sources and timing (requires authentication)
+    """
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    retrieval_start = time.time()
+    try:
+        async with query_limit:
+            hits = format_query_results(await search_documents_async(request.query, request.n_results), 0)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    retrieval_time = time.time() - retrieval_start
+
+    async def events():
+        # Errors after the response has started can only be reported in the stream
+        timer = StreamTimer()
+        try:
+            async with llm_limit:
+                stream = await get_ollama_client().chat(
+                    model=CHAT_MODEL,
+                    messages=chat_messages(request.query, hits),
+                    stream=True,
+                    keep_alive=CHAT_KEEP_ALIVE,
+                )
+                async for chunk in stream:
+                    token = timer.observe(chunk)
+                    if token:
+                        yield f"data: {json.dumps({'token': token})}\n\n"
+            timer.finish()
+        except HTTPException as e:
+            yield f"data: {json.dumps({'error': e.detail})}\n\n"
+            return
+        except Exception as e:
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            return
+
+        timing = {"retrieval": round(retrieval_time, 3), **timer.summary()}
+        sources = [hit_source(hit) for hit in hits]
+        yield f"data: {json.dumps({'done': True, 'sources': sources, 'timing': timing})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 
 @app.get("/documents/")
 async def list_documents(api_key: str = Depends(verify_api_key)):
     """List all documents in the knowledge base (requires authentication)"""
     try:
-        if not INDEX_FILE.exists():
+        if not index_exists():
             return {"documents": [], "total": 0}
 
-        with open(INDEX_FILE, "r") as f:
-            index_data = json.load(f)
-
         documents = []
-        for doc in index_data.get("documents", []):
+        for doc in await run_blocking(io_pool, get_document_index().summaries):
             documents.append(
                 {
                     "id": doc["id"],
                     "filename": Path(doc["original"]).name,
                     "original_path": doc["original"],
                     "processed_date": doc["processed_date"],
-                    "chunks": len(doc.get("chunks", [])),
+                    "chunks": doc["chunk_count"],
                 }
             )
 
@@ -203,31 +465,27 @@ async def list_documents(api_key: str = Depends(verify_api_key)):
 async def get_document(doc_id: str, api_key: str = Depends(verify_api_key)):
     """Get details for a specific document (requires authentication)"""
     try:
-        if not INDEX_FILE.exists():
+        if not index_exists():
             raise HTTPException(status_code=404, detail="No documents found")
 
-        with open(INDEX_FILE, "r") as f:
-            index_data = json.load(f)
+        doc = await run_blocking(io_pool, get_document_index().get, doc_id)
+        if doc is None:
+            raise HTTPException(status_code=404, detail=f"Document {doc_id} not found")
 
-        for doc in index_data.get("documents", []):
-            if doc["id"] == doc_id:
-                # Read the text file
-                text_content = ""
-                if Path(doc["text_path"]).exists():
-                    with open(doc["text_path"], "r") as tf:
-                        text_content = tf.read()
+        # Read the text file
+        text_content = ""
+        if Path(doc["text_path"]).exists():
+            text_content = await run_blocking(io_pool, Path(doc["text_path"]).read_text)
 
-                return {
-                    "id": doc["id"],
-                    "filename": Path(doc["original"]).name,
-                    "original_path": doc["original"],
-                    "text_path": doc["text_path"],
-                    "processed_date": doc["processed_date"],
-                    "chunks": len(doc.get("chunks", [])),
-                    "content": text_content,
-                }
-
-        raise HTTPException(status_code=404, detail=f"Document {doc_id} not found")
+        return {
+            "id": doc["id"],
+            "filename": Path(doc["original"]).name,
+            "original_path": doc["original"],
+            "text_path": doc["text_path"],
+            "processed_date": doc["processed_date"],
+            "chunks": len(doc.get("chunks", [])),
+            "content": text_content,
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -235,8 +493,8 @@ async def get_document(doc_id: str, api_key: str = Depends(verify_api_key)):
 
 
 @app.post("/process-local/")
-async def process_local_pdf(file_path: str, api_key: str = Depends(verify_api_key)):
-    """Process a PDF file from the local filesystem (requires authentication)"""
+async def process_local_pdf(file_path: str, priority: int = DEFAULT_PRIORITY, api_key: str = Depends(verify_api_key)):
+    """Queue a PDF file from the local filesystem for processing; returns a job id (requires authentication)"""
     try:
         pdf_path = Path(file_path).expanduser().resolve()
 
@@ -246,23 +504,13 @@ async def process_local_pdf(file_path: str, api_key: str = Depends(verify_api_ke
         if not pdf_path.suffix.lower() == ".pdf":
             raise HTTPException(status_code=400, detail="File must be a PDF")
 
-        # Import processing function from CLI
-        # Note: This requires flockparsecli to be importable
-        try:
-            import sys
-
-            sys.path.insert(0, str(Path(__file__).parent))
-            from flockparsecli import process_pdf
-
-            # Process the PDF (this will add it to the knowledge base)
-            process_pdf(pdf_path)
-
-            return {"message": "PDF processed successfully", "file_path": str(pdf_path), "filename": pdf_path.name}
-        except ImportError as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Cannot import flockparsecli: {str(e)}. Make sure FlockParser CLI is available.",
-            )
+        job_id = await submit_job("process_pdf", {"files": [str(pdf_path)]}, priority)
+        return {
+            "message": "PDF queued for processing",
+            "file_path": str(pdf_path),
+            "filename": pdf_path.name,
+            "job_id": job_id,
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -270,51 +518,183 @@ async def process_local_pdf(file_path: str, api_key: str = Depends(verify_api_ke
 
 
 @app.post("/process-directory/")
-async def process_local_directory(directory_path: str, api_key: str = Depends(verify_api_key)):
-    """Process all PDFs in a directory from the local filesystem (requires authentication)"""
+async def process_local_directory(
+    directory_path: str, priority: int = DEFAULT_PRIORITY, api_key: str = Depends(verify_api_key)
+):
+    """Queue all PDFs in a directory from the local filesystem; returns a job id (requires authentication)"""
     try:
         dir_path = Path(directory_path).expanduser().resolve()
 
         if not dir_path.exists() or not dir_path.is_dir():
             raise HTTPException(status_code=404, detail=f"Directory not found: {directory_path}")
 
-        pdf_files = list(dir_path.glob("*.pdf"))
+        pdf_files = sorted(dir_path.glob("*.pdf"))
         if not pdf_files:
             return {"message": "No PDF files found in directory", "processed": 0}
 
-        # Import processing function from CLI
-        try:
-            import sys
-
-            sys.path.insert(0, str(Path(__file__).parent))
-            from flockparsecli import process_pdf
-
-            processed_files = []
-            for pdf_path in pdf_files:
-                try:
-                    process_pdf(pdf_path)
-                    processed_files.append(pdf_path.name)
-                except Exception as e:
-                    # Continue processing other files even if one fails
-                    pass
-
-            return {
-                "message": f"Processed {len(processed_files)} PDFs",
-                "directory": str(dir_path),
-                "processed": len(processed_files),
-                "files": processed_files,
-            }
-        except ImportError as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Cannot import flockparsecli: {str(e)}. Make sure FlockParser CLI is available.",
-            )
+        job_id = await submit_job(
+            "process_directory", {"directory": str(dir_path), "files": [str(pdf) for pdf in pdf_files]}, priority
+        )
+        return {
+            "message": f"Queued {len(pdf_files)} PDFs for processing",
+            "directory": str(dir_path),
+            "queued": len(pdf_files),
+            "job_id": job_id,
+        }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Background jobs
+
+
+def cli_process_pdf():
+    """``process_pdf`` from the CLI (imported on first use; it sets up the embedding cluster)."""
+    try:
+        sys.path.insert(0, str(Path(__file__).parent))
+        from flockparsecli import process_pdf
+
+        return process_pdf
+    except ImportError as e:
+        raise RuntimeError(f"Cannot import flockparsecli: {str(e)}. Make sure FlockParser CLI is available.")
+
+
+def run_upload_job(ctx):
+    """Extract and store an uploaded PDF."""
+    ctx.report(force=True, stage="extracting", file=ctx.params["file_name"])
+    text_content = get_extract_pool().submit(extract_text_from_pdf, ctx.params["file_path"]).result()
+    ctx.check_cancelled()
+    ctx.report(force=True, stage="embedding", characters=len(text_content))
+    store_document(ctx.params["file_name"], text_content)
+    return {"file_name": ctx.params["file_name"], "characters": len(text_content)}
+
+
+def run_process_files_job(ctx):
+    """
+    Run ``process_pdf`` over ``params["files"]``, reporting per-page and per-file progress.
+
+    Files finished by an earlier (interrupted) run are skipped, and one file
+    failing does not stop the rest; its error is kept in the result.
+    """
+    process_pdf = cli_process_pdf()
+    files = ctx.params["files"]
+    progress = ctx.progress
+    done = set(progress.get("completed", []))
+    progress.setdefault("completed", [])
+    progress.setdefault("errors", {})
+    ctx.report(force=True, stage="processing", files_total=len(files))
+
+    run_start = time.time()
+    run_pages = run_chunks = 0
+    for pdf_file in files:
+        if pdf_file in done:
+            continue
+        ctx.check_cancelled()
+        pdf_name = Path(pdf_file).name
+        base_pages = progress.get("pages_extracted", 0)
+        base_chunks = progress.get("chunks_embedded", 0)
+        file_counts = {"pages_extracted": 0, "chunks_embedded": 0}
+
+        def on_progress(**counts):
+            file_counts.update({key: counts[key] for key in file_counts if key in counts})
+            elapsed = max(time.time() - run_start, 1e-6)
+            ctx.report(
+                pages_extracted=base_pages + file_counts["pages_extracted"],
+                chunks_embedded=base_chunks + file_counts["chunks_embedded"],
+                pages_per_second=round((run_pages + file_counts["pages_extracted"]) / elapsed, 2),
+                chunks_per_second=round((run_chunks + file_counts["chunks_embedded"]) / elapsed, 2),
+            )
+
+        ctx.report(force=True, current_file=pdf_name)
+        try:
+            outcome = process_pdf(Path(pdf_file), on_progress=on_progress)
+            if outcome is None:
+                progress["errors"][pdf_name] = "Text extraction failed"
+        except Exception as e:
+            progress["errors"][pdf_name] = str(e)
+
+        run_pages += file_counts["pages_extracted"]
+        run_chunks += file_counts["chunks_embedded"]
+        progress["completed"].append(pdf_file)
+        ctx.report(force=True, files_done=len(progress["completed"]), files_failed=len(progress["errors"]))
+
+    failed = progress["errors"]
+    processed_files = [Path(f).name for f in progress["completed"] if Path(f).name not in failed]
+    return {
+        "message": f"Processed {len(processed_files)} PDFs",
+        "processed": len(processed_files),
+        "failed": len(failed),
+        "files": processed_files,
+        "errors": failed,
+    }
+
+
+JOB_HANDLERS = {
+    "upload": run_upload_job,
+    "process_pdf": run_process_files_job,
+    "process_directory": run_process_files_job,
+}
+job_runner = JobRunner(job_queue, JOB_HANDLERS, workers=INGEST_WORKERS)
+
+
+async def submit_job(kind, params, priority=DEFAULT_PRIORITY):
+    job_id = await run_blocking(io_pool, job_queue.submit, kind, params, priority)
+    job_runner.wake()
+    return job_id
+
+
+@app.get("/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = 50, api_key: str = Depends(verify_api_key)):
+    """List recent background jobs, newest first (requires authentication)"""
+    jobs = await run_blocking(io_pool, job_queue.list_jobs, status, limit)
+    return {"jobs": jobs, "total": len(jobs)}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, api_key: str = Depends(verify_api_key)):
+    """Status, progress and result of a background job (requires authentication)"""
+    job = await run_blocking(io_pool, job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str, api_key: str = Depends(verify_api_key)):
+    """Server-sent events with the job's state whenever it changes, until it finishes (requires authentication)"""
+    if await run_blocking(io_pool, job_queue.get, job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    async def events():
+        last_update = None
+        while True:
+            job = await run_blocking(io_pool, job_queue.get, job_id)
+            if job is None:
+                return
+            if job["updated"] != last_update:
+                last_update = job["updated"]
+                yield f"data: {json.dumps(job)}\n\n"
+            if job["status"] in TERMINAL_STATES:
+                return
+            await asyncio.sleep(JOB_STREAM_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, api_key: str = Depends(verify_api_key)):
+    """Cancel a queued job, or stop a running one after its current file (requires authentication)"""
+    status = await run_blocking(io_pool, job_queue.cancel, job_id)
+    if status is None:
+        job = await run_blocking(io_pool, job_queue.get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        raise HTTPException(status_code=409, detail=f"Job {job_id} already {job['status']}")
+    return {"id": job_id, "status": status, "cancel_requested": status == "running"}
+
+
 # SynapticLlamas Compatibility Endpoints
 
 
@@ -322,16 +702,14 @@ async def process_local_directory(directory_path: str, api_key: str = Depends(ve
 async def health_check():
     """Health check endpoint for SynapticLlamas compatibility (public)"""
     try:
-        doc_index_exists = INDEX_FILE.exists()
+        doc_index_exists = index_exists()
         chroma_healthy = collection is not None
 
         # Count documents if index exists
         doc_count = 0
         if doc_index_exists:
             try:
-                with open(INDEX_FILE, "r") as f:
-                    index_data = json.load(f)
-                    doc_count = len(index_data.get("documents", []))
+                doc_count = await run_blocking(io_pool, get_document_index().count)
             except Exception:
                 pass
 
@@ -350,22 +728,15 @@ async def health_check():
 async def get_stats():
     """Get statistics about knowledge base (SynapticLlamas compatibility - public)"""
     try:
-        if not INDEX_FILE.exists():
+        if not index_exists():
             return {"total_documents": 0, "total_chunks": 0, "knowledge_base_size": 0, "available": True}
 
-        with open(INDEX_FILE, "r") as f:
-            index_data = json.load(f)
-
-        documents = index_data.get("documents", [])
+        documents = await run_blocking(io_pool, get_document_index().summaries)
         total_docs = len(documents)
-        total_chunks = sum(len(doc.get("chunks", [])) for doc in documents)
+        total_chunks = sum(doc["chunk_count"] for doc in documents)
 
         # Calculate total KB size
-        kb_size = 0
-        for doc in documents:
-            text_path = Path(doc.get("text_path", ""))
-            if text_path.exists():
-                kb_size += text_path.stat().st_size
+        kb_size = await run_blocking(io_pool, knowledge_base_size, documents)
 
         return {
             "total_documents": total_docs,
@@ -376,8 +747,8 @@ async def get_stats():
                 {
                     "id": doc["id"],
                     "filename": Path(doc["original"]).name,
-                    "chunks": len(doc.get("chunks", [])),
-                    "processed_date": doc.get("processed_date", ""),
+                    "chunks": doc["chunk_count"],
+                    "processed_date": doc.get("processed_date") or "",
                 }
                 for doc in documents
             ],
@@ -386,6 +757,16 @@ async def get_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def knowledge_base_size(documents):
+    """Total bytes of the documents' extracted text files."""
+    kb_size = 0
+    for doc in documents:
+        text_path = Path(doc.get("text_path") or "")
+        if text_path.is_file():
+            kb_size += text_path.stat().st_size
+    return kb_size
+
+
 @app.post("/query")
 async def query_with_embedding(request: QueryRequest):
     """Query with pre-computed embedding (SynapticLlamas compatibility - public)
@@ -394,30 +775,65 @@ async def query_with_embedding(request: QueryRequest):
     This allows load balancing of embedding generation while centralizing document storage.
     """
     try:
-        # If embedding provided, use it directly (SynapticLlamas mode)
-        if request.embedding:
-            query_embedding = request.embedding
-        else:
-            # Otherwise generate embedding locally (fallback mode)
-            query_embedding = embed_text(request.query).tolist()
+        async with query_limit:
+            # If embedding provided, use it directly (SynapticLlamas mode)
+            if request.embedding:
+                query_embedding = request.embedding
+            else:
+                # Otherwise generate embedding locally (fallback mode)
+                query_embedding = (await embed_text_async(request.query)).tolist()
 
-        # Query ChromaDB with the embedding
-        results = collection.query(query_embeddings=[query_embedding], n_results=request.n_results)
+            # Query ChromaDB with the embedding
+            results = await run_blocking(
+                io_pool, collection.query, query_embeddings=[query_embedding], n_results=request.n_results
+            )
 
         # Format results for SynapticLlamas
-        formatted_results = []
-        if results and results.get("documents"):
-            for i, doc in enumerate(results["documents"][0]):
-                formatted_results.append(
-                    {
-                        "content": doc,
-                        "metadata": results["metadatas"][0][i] if results.get("metadatas") else {},
-                        "distance": results["distances"][0][i] if results.get("distances") else None,
-                        "id": results["ids"][0][i] if results.get("ids") else None,
-                    }
-                )
+        formatted_results = format_query_results(results, 0)
 
         return {"query": request.query, "results": formatted_results, "total_results": len(formatted_results)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/query/batch")
+async def query_with_embeddings_batch(request: BatchQueryRequest):
+    """Query with several pre-computed embeddings at once (SynapticLlamas fan-out - public)
+
+    All queries go to ChromaDB in a single query call instead of one request and
+    scan per sub-query. Queries without an embedding are embedded together in one
+    Ollama call. Results come back in request order.
+    """
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+
+    try:
+        if not request.queries:
+            return {"results": []}
+
+        async with query_limit:
+            embeddings = [query.embedding for query in request.queries]
+            missing = [i for i, embedding in enumerate(embeddings) if not embedding]
+            if missing:
+                # Fallback mode: embed every query that came without an embedding in one request
+                missing_embeddings = await embed_texts_async([request.queries[i].query for i in missing])
+                for i, embedding in zip(missing, missing_embeddings):
+                    embeddings[i] = embedding
+
+            n_results = max(query.n_results for query in request.queries)
+            results = await run_blocking(io_pool, collection.query, query_embeddings=embeddings, n_results=n_results)
+
+        batch_results = []
+        for i, query in enumerate(request.queries):
+            formatted_results = format_query_results(results, i)[: query.n_results]
+            batch_results.append(
+                {"query": query.query, "results": formatted_results, "total_results": len(formatted_results)}
+            )
+        return {"results": batch_results}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
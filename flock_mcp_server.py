@@ -18,8 +18,8 @@ sys.path.append(str(Path(__file__).parent))
 
 from flockparsecli import (  # noqa: E402
     process_pdf,
-    load_document_index,
-    get_similar_chunks,
+    document_summaries,
+    get_similar_chunks_async,
     load_balancer,
     CHAT_MODEL,
     CHAT_KEEP_ALIVE,
@@ -178,10 +178,9 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             import sys
 
             print(f"[MCP] Starting query_documents for: {query[:50]}...", file=sys.stderr)
-            loop = asyncio.get_event_loop()
             print("[MCP] Calling get_similar_chunks", file=sys.stderr)
             chunks = await asyncio.wait_for(
-                loop.run_in_executor(executor, get_similar_chunks, query, top_k), timeout=60.0  # 1 minute timeout
+                get_similar_chunks_async(query, top_k, executor=executor), timeout=60.0  # 1 minute timeout
             )
             print(f"[MCP] get_similar_chunks completed, found {len(chunks)} chunks", file=sys.stderr)
 
@@ -217,7 +216,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             # Get relevant chunks with timeout
             print("[MCP] Getting relevant chunks", file=sys.stderr)
             chunks = await asyncio.wait_for(
-                loop.run_in_executor(executor, get_similar_chunks, question, context_chunks),
+                get_similar_chunks_async(question, context_chunks, executor=executor),
                 timeout=60.0,  # 1 minute timeout
             )
             print(f"[MCP] Got {len(chunks)} chunks", file=sys.stderr)
@@ -289,16 +288,16 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
 
     elif name == "list_documents":
         try:
-            index_data = load_document_index()
-            if not index_data["documents"]:
+            documents = document_summaries()
+            if not documents:
                 return [TextContent(type="text", text="📚 No documents have been processed yet.")]
 
-            result = f"📚 Knowledge Base: {len(index_data['documents'])} documents\n\n"
-            for i, doc in enumerate(index_data["documents"], 1):
+            result = f"📚 Knowledge Base: {len(documents)} documents\n\n"
+            for i, doc in enumerate(documents, 1):
                 doc_name = Path(doc["original"]).name
                 result += f"{i}. **{doc_name}**\n"
                 result += f"   ID: {doc['id']} | Processed: {doc['processed_date'][:10]}\n"
-                result += f"   Chunks: {len(doc['chunks'])}\n\n"
+                result += f"   Chunks: {doc['chunk_count']}\n\n"
 
             return [TextContent(type="text", text=result)]
         except Exception as e:
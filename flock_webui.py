@@ -11,7 +11,16 @@ import time
 
 # Import FlockParse functionality
 sys.path.append(str(Path(__file__).parent))
-from flockparsecli import process_pdf, load_document_index, get_similar_chunks, load_balancer  # noqa: E402
+from flockparsecli import (  # noqa: E402
+    CHAT_SYSTEM_PROMPT,
+    document_summaries,
+    find_chat_node,
+    get_similar_chunks,
+    load_balancer,
+    process_pdf,
+    stream_chat,
+)
+from chat_stream import ChatStream  # noqa: E402
 
 # Page configuration
 st.set_page_config(
@@ -76,9 +85,9 @@ with st.sidebar:
 
     # Load document stats
     try:
-        index_data = load_document_index()
-        doc_count = len(index_data.get("documents", []))
-        total_chunks = sum(len(doc.get("chunks", [])) for doc in index_data.get("documents", []))
+        documents = document_summaries()
+        doc_count = len(documents)
+        total_chunks = sum(doc["chunk_count"] for doc in documents)
     except Exception:
         doc_count = 0
         total_chunks = 0
@@ -262,52 +271,66 @@ elif page == "💬 Chat with Documents":
 
         # Get AI response
         with st.chat_message("assistant"):
-            with st.spinner("Searching documents and generating response..."):
-                try:
+            try:
+                with st.spinner("Searching documents..."):
                     # Get similar chunks
                     chunks = get_similar_chunks(user_question, top_k=5)
+                    chat_node = find_chat_node() if chunks else None
 
-                    if not chunks:
-                        response = (
-                            "❓ **No documents found.**\n\n"
-                            "I don't have any documents to search. "
-                            "Please upload and process some PDFs first using the '📤 Upload & Process' tab."
-                        )
-                    else:
-                        # Build context from chunks
-                        context = "\n\n".join([f"From {chunk['doc_name']}:\n{chunk['text']}" for chunk in chunks[:3]])
-
-                        # Simple response (could use chat_with_documents for more sophisticated responses)
-                        response = f"Based on your documents:\n\n{context}\n\n---\n**Sources:** " + ", ".join(
-                            set(c["doc_name"] for c in chunks[:3])
-                        )
-
+                if not chunks:
+                    response = (
+                        "❓ **No documents found.**\n\n"
+                        "I don't have any documents to search. "
+                        "Please upload and process some PDFs first using the '📤 Upload & Process' tab."
+                    )
                     st.write(response)
+                else:
+                    # Build context from chunks
+                    context = "\n\n".join([f"From {chunk['doc_name']}:\n{chunk['text']}" for chunk in chunks[:3]])
+                    messages = [
+                        {"role": "system", "content": CHAT_SYSTEM_PROMPT},
+                        {"role": "user", "content": f"CONTEXT FROM DOCUMENTS:\n{context}\n\nQUESTION: {user_question}"},
+                    ]
+
+                    # Stream the answer into the page as it is generated
+                    stream = ChatStream(stream_chat(messages, chat_node))
+                    answer = st.write_stream(stream)
+
+                    sources = ", ".join(sorted(set(c["doc_name"] for c in chunks[:3])))
+                    response = f"{answer}\n\n---\n**Sources:** {sources}"
+                    st.markdown(f"---\n**Sources:** {sources}")
+
+                    timing = stream.timer.summary()
+                    if timing["ttft"] is not None:
+                        st.caption(
+                            f"⏱️ First token {timing['ttft']:.2f}s · Generation {timing['generation_time']:.2f}s · "
+                            f"{timing['tokens_per_second']:.1f} tokens/s"
+                        )
 
-                    # Add assistant response to history
-                    st.session_state.chat_history.append({"role": "assistant", "content": response})
+                # Add assistant response to history
+                st.session_state.chat_history.append({"role": "assistant", "content": response})
 
-                except ConnectionError:
-                    error_msg = (
-                        "🔌 **Connection Error:** Cannot connect to Ollama service.\n\n"
-                        "💡 **Fix:** Ensure Ollama is running with `ollama serve`"
-                    )
-                    st.error(error_msg)
-                    st.session_state.chat_history.append({"role": "assistant", "content": error_msg})
-                except FileNotFoundError:
-                    error_msg = (
-                        "📂 **Database Error:** ChromaDB database not found.\n\n"
-                        "💡 **Fix:** Process at least one document first to create the database."
-                    )
-                    st.error(error_msg)
-                    st.session_state.chat_history.append({"role": "assistant", "content": error_msg})
-                except Exception as e:
-                    error_msg = f"❌ **Unexpected Error:** {type(e).__name__}"
-                    st.error(error_msg)
-                    with st.expander("📋 Error Details"):
-                        st.code(str(e))
-                        st.caption("Report at: https://github.com/B-A-M-N/FlockParser/issues")
-                    st.session_state.chat_history.append({"role": "assistant", "content": error_msg})
+            except ConnectionError:
+                error_msg = (
+                    "🔌 **Connection Error:** Cannot connect to Ollama service.\n\n"
+                    "💡 **Fix:** Ensure Ollama is running with `ollama serve`"
+                )
+                st.error(error_msg)
+                st.session_state.chat_history.append({"role": "assistant", "content": error_msg})
+            except FileNotFoundError:
+                error_msg = (
+                    "📂 **Database Error:** ChromaDB database not found.\n\n"
+                    "💡 **Fix:** Process at least one document first to create the database."
+                )
+                st.error(error_msg)
+                st.session_state.chat_history.append({"role": "assistant", "content": error_msg})
+            except Exception as e:
+                error_msg = f"❌ **Unexpected Error:** {type(e).__name__}"
+                st.error(error_msg)
+                with st.expander("📋 Error Details"):
+                    st.code(str(e))
+                    st.caption("Report at: https://github.com/B-A-M-N/FlockParser/issues")
+                st.session_state.chat_history.append({"role": "assistant", "content": error_msg})
 
     # Clear chat button
     if st.button("🗑️ Clear Chat History"):
@@ -437,15 +460,14 @@ elif page == "🔍 Search Documents":
     st.subheader("📚 Indexed Documents")
 
     try:
-        index_data = load_document_index()
-        documents = index_data.get("documents", [])
+        documents = document_summaries()
 
         if documents:
             for doc in documents:
                 with st.expander(f"📄 {Path(doc['original']).name}"):
                     st.write(f"**Document ID:** {doc['id']}")
                     st.write(f"**Processed:** {doc['processed_date']}")
-                    st.write(f"**Chunks:** {len(doc['chunks'])}")
+                    st.write(f"**Chunks:** {doc['chunk_count']}")
                     st.write(f"**Path:** {doc['text_path']}")
         else:
             st.info("No documents indexed yet. Upload and process some PDFs!")
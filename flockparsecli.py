@@ -1,5 +1,6 @@
 # CRITICAL: Enable unbuffered output FIRST to prevent CLI display freezing
 # This ensures real-time progress messages are visible during async operations
+import asyncio
 import os
 import sys
 
@@ -63,17 +64,25 @@ def visible_input(prompt):
     return sys.stdin.readline().strip()
 
 
+# Helper function to stream chat replies token by token
+def stream_output(text):
+    """Write text to stdout at once, without adding a newline."""
+    # Deliberately bypasses the logger: tokens are fragments of one line, which
+    # the logger would split into separate records with a level prefix each
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
 from pathlib import Path
-from PyPDF2 import PdfReader
 import docx
 import subprocess
-import tempfile
 import json
 import numpy as np
 from datetime import datetime
+import sqlite3
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
+import multiprocessing
 import socket
 import requests
 import chromadb
@@ -84,6 +93,24 @@ from sollol.adaptive_parallelism import AdaptiveParallelismStrategy
 from sollol import OllamaPool  # Direct SOLLOL integration
 from sollol_compat import add_flockparser_methods  # FlockParser compatibility layer
 from parallel_embedder import embed_batch_parallel  # Legacy parallel embedding
+from vector_store import (
+    EmbeddingMatrix,
+    Segment,
+    document_segment_keys,
+    document_segments,
+    document_texts,
+    migrate_document,
+    remove_segment,
+    write_segment,
+)  # Binary vector store
+from ann_index import IVFIndex  # Approximate nearest-neighbour index
+from embedding_store import EmbeddingLRUCache, EmbeddingNamespace, EmbeddingStore  # Embedding cache + LRU
+from document_index import index_path, open_document_index  # Crash-safe SQLite document index
+from ingest_pipeline import IngestPipeline  # Pipelined extraction -> chunking -> embedding
+from extraction_pool import ExtractionPool  # Multi-process PDF extraction
+from pdf_extraction import EXTRACTION_WORKERS, extract_pdf, extract_text_from_pdf  # Runs in extraction workers
+from chat_stream import ChatStream  # Streamed chat replies with TTFT / tokens-per-second timing
+from http_pool import get_session, ollama_client  # Shared keep-alive connections for direct Ollama calls
 
 # 🚀 AVAILABLE COMMANDS:
 COMMANDS = """
@@ -110,6 +137,8 @@ COMMANDS = """
    🧹 cleanup_models    → Unload all non-priority models
    🔀 parallelism_report → Show adaptive parallelism analysis
    🧹 clear_cache       → Clear embedding cache (keeps documents)
+   📦 migrate_kb        → Convert legacy per-chunk JSON files to binary vector segments
+   🔁 reembed [model]   → Embed all chunks with a model, computing only uncached (model, text) pairs
    🗑️  clear_db          → Clear ChromaDB vector store (removes all documents)
    ❌ exit              → Quit the program
 
@@ -125,12 +154,27 @@ CHAT_MODEL = "qwen3:8b"  # Fast and fits in available RAM (5.2 GB)
 # Keep models in VRAM for faster inference (prevents reloading)
 EMBEDDING_KEEP_ALIVE = "1h"  # Embedding model used frequently for chunking/search
 CHAT_KEEP_ALIVE = "15m"  # Chat model used less frequently
+EMBEDDING_LRU_MAX_BYTES = 64 * 1024 * 1024  # In-process cache of recent query embeddings
+EMBEDDING_LRU_TTL = 3600  # Seconds before a cached query embedding is re-read (None = no expiry)
+REEMBED_BATCH_SIZE = 256  # Chunks per embed_batch call in the 'reembed' job
+
+# ⚡ INGESTION PIPELINE
+# Overlap extraction, chunking and embedding with bounded queues between stages
+INGEST_PIPELINE_ENABLED = True
+INGEST_EMBED_BATCH_SIZE = 32  # Chunks per embedding micro-batch
+INGEST_EMBED_WORKERS = 2  # Micro-batches in flight at once
+INGEST_QUEUE_SIZE = 64  # Capacity of each inter-stage queue (backpressure)
+# Extraction workers, page sharding and OCR thresholds are set in pdf_extraction.py
+DELTA_COMPACT_RATIO = 0.5  # Rewrite a revised document as one segment once this share of its rows is tombstoned
 
 # 📊 RAG CONFIGURATION
 # Retrieval settings for chat
 RETRIEVAL_TOP_K = 10  # Number of chunks to retrieve (default: 10)
 RETRIEVAL_MIN_SIMILARITY = 0.3  # Minimum similarity score (0.0-1.0)
 CHUNKS_TO_SHOW = 10  # Number of source chunks to display (show all retrieved)
+RETRIEVAL_ANN_ENABLED = True  # Use the IVF index for large knowledge bases (exact scan otherwise)
+RETRIEVAL_ANN_MIN_CHUNKS = 20000  # Build the index once the knowledge base has this many chunks
+RETRIEVAL_ANN_NPROBE = 16  # Index lists probed per query (higher = better recall, slower)
 
 # Acceptable model variations (allows flexible matching)
 ACCEPTABLE_EMBEDDING_MODELS = [
@@ -182,6 +226,10 @@ PROCESSED_DIR.mkdir(exist_ok=True)
 KB_DIR = _SCRIPT_DIR / "knowledge_base"
 KB_DIR.mkdir(exist_ok=True)
 
+# 🧊 Binary vector segments (one .npy + texts sidecar per document)
+SEGMENTS_DIR = KB_DIR / "segments"
+SEGMENTS_DIR.mkdir(exist_ok=True)
+
 # 🗄️ ChromaDB Vector Store (production storage)
 CHROMA_DB_DIR = _SCRIPT_DIR / "chroma_db_cli"
 CHROMA_DB_DIR.mkdir(exist_ok=True)
@@ -262,7 +310,7 @@ def setup_load_balancer():
             f"✅ Dashboard event flushing enabled (batch_size={observer.batch_size}, timeout={observer.batch_timeout}s)"
         )
 
-    # Load primed performance stats if available
+    # Load primed performance stats if available (starting point for nodes without learned throughput)
     primed_stats_file = _SCRIPT_DIR / "sollol_primed_stats.json"
     if primed_stats_file.exists():
         try:
@@ -413,14 +461,34 @@ def setup_dashboard():
 
 
 # 💾 Index file for tracking processed documents
-INDEX_FILE = KB_DIR / "document_index.json"
+INDEX_FILE = KB_DIR / "document_index.json"  # Legacy format, imported into the SQLite index next to it
+_document_indexes = {}  # INDEX_FILE -> DocumentIndex
+_document_index_lock = threading.Lock()
+_matrix_synced_at = None  # (index, index version, matrix, matrix generation) at the last embedding matrix sync
+_matrix_sync_lock = threading.Lock()
 
 # 🔄 Cache for embeddings to avoid regenerating
-EMBEDDING_CACHE_FILE = KB_DIR / "embedding_cache.json"
+EMBEDDING_CACHE_FILE = KB_DIR / "embedding_cache.json"  # Legacy format, imported into the SQLite cache
+EMBEDDING_DB_FILE = KB_DIR / "embedding_cache.db"
+embedding_store = EmbeddingStore(EMBEDDING_DB_FILE)
+_embedding_store_lock = threading.Lock()
+_embedding_store_ready = False
+_embedding_namespaces = {}  # model -> EmbeddingNamespace (digest resolved once per process)
+
+# ⚡ Hot query embeddings shared by chat, the MCP server and the Web UI
+embedding_lru = EmbeddingLRUCache(max_bytes=EMBEDDING_LRU_MAX_BYTES, ttl=EMBEDDING_LRU_TTL)
+
+# 🧮 Resident matrix of normalised chunk embeddings (built lazily from the index)
+embedding_matrix = EmbeddingMatrix()
+
+# 🗂️ IVF index over the matrix, persisted next to the document index
+ANN_INDEX_FILE = KB_DIR / "ann_index.npz"
+ann_index = IVFIndex(ANN_INDEX_FILE)
+ann_index.load()
 
 
 def load_embedding_cache():
-    """Load the embedding cache from disk."""
+    """Load the legacy JSON embedding cache from disk."""
     if not EMBEDDING_CACHE_FILE.exists():
         return {}
     try:
@@ -431,66 +499,383 @@ def load_embedding_cache():
 
 
 def save_embedding_cache(cache):
-    """Save the embedding cache to disk."""
+    """Save the legacy JSON embedding cache to disk."""
     with open(EMBEDDING_CACHE_FILE, "w") as f:
         json.dump(cache, f)
 
 
-def get_cached_embedding(text, use_load_balancer=True):
-    """Get embedding from cache or generate new one."""
+def _lookup_model_digest(model):
+    """Ask Ollama for a model's digest; returns None if Ollama or the model is unavailable."""
+    try:
+        result = ollama.list()
+        # Handle both dict and object response formats
+        models = result.models if hasattr(result, "models") else result.get("models", [])
+        for entry in models:
+            if isinstance(entry, dict):
+                name, digest = entry.get("model") or entry.get("name", ""), entry.get("digest", "")
+            else:
+                name, digest = getattr(entry, "model", ""), getattr(entry, "digest", "")
+            if name == model or (":" not in model and name == f"{model}:latest"):
+                return digest or None
+    except Exception as e:
+        logger.debug(f"Could not look up digest for {model}: {e}")
+    return None
+
+
+def get_embedding_namespace(model=None):
+    """
+    Cache namespace (model, digest, dimension) for an embedding model.
+
+    The digest comes from Ollama once per process; if Ollama is unreachable the
+    last digest recorded in the cache is used so cached vectors stay usable.
+    """
+    model = model or EMBEDDING_MODEL
+    namespace = _embedding_namespaces.get(model)
+    if namespace is not None:
+        return namespace
+
+    known = embedding_store.known_model(model)
+    digest = _lookup_model_digest(model)
+    if digest is None:
+        namespace = known or EmbeddingNamespace(model)
+    elif known and known.digest == digest:
+        namespace = known
+    else:
+        if known:
+            logger.info(f"🔄 {model} digest changed - cached vectors from the previous build will not be reused")
+        namespace = EmbeddingNamespace(model, digest)
+        embedding_store.remember_model(namespace)
+
+    _embedding_namespaces[model] = namespace
+    return namespace
+
+
+def _learn_dimension(namespace, embedding):
+    """Record a namespace's dimension from its first embedding; returns the (possibly updated) namespace."""
+    if namespace.dim is not None or not embedding:
+        return namespace
+    namespace = namespace._replace(dim=len(embedding))
+    embedding_store.remember_model(namespace)
+    _embedding_namespaces[namespace.model] = namespace
+    return namespace
+
+
+def migrate_embedding_cache():
+    """Import embedding_cache.json (and pre-namespace SQLite rows) under the current embedding model."""
+    namespace = get_embedding_namespace()
+    adopted = embedding_store.adopt_unnamespaced(namespace)
+    if adopted:
+        logger.info(f"📦 Assigned {adopted} cached embeddings to {namespace.model}")
+
+    if not EMBEDDING_CACHE_FILE.exists():
+        return adopted
+
+    logger.info("📦 Migrating embedding_cache.json to the SQLite embedding cache...")
+    start_time = time.time()
+    try:
+        imported = embedding_store.import_json(EMBEDDING_CACHE_FILE, namespace)
+    except (json.JSONDecodeError, OSError) as e:
+        logger.error(f"⚠️ Could not read legacy embedding cache: {e}")
+        return 0
+
+    migrated_file = EMBEDDING_CACHE_FILE.with_name(EMBEDDING_CACHE_FILE.name + ".migrated")
+    EMBEDDING_CACHE_FILE.replace(migrated_file)
+    logger.info(
+        f"✅ Imported {imported} embeddings in {time.time() - start_time:.1f}s (old file: {migrated_file.name})"
+    )
+    return imported
+
+
+def get_embedding_store():
+    """Return the SQLite embedding cache, importing any legacy JSON cache on first use."""
+    global _embedding_store_ready
+    if not _embedding_store_ready:
+        with _embedding_store_lock:
+            if not _embedding_store_ready:
+                migrate_embedding_cache()
+                _embedding_store_ready = True
+    return embedding_store
+
+
+def _cached_query_embedding(text):
+    """(namespace, text hash, cached embedding or None) for a text, from the in-process LRU, then the store."""
     import hashlib
 
-    cache = load_embedding_cache()
+    namespace = get_embedding_namespace()
 
     # Create hash of text for cache key
     text_hash = hashlib.md5(text.encode()).hexdigest()
+    lru_key = (namespace.model, namespace.digest, text_hash)
 
-    if text_hash in cache:
-        return cache[text_hash]
+    cached = embedding_lru.get(lru_key)
+    if cached is None:
+        cached = get_embedding_store().get(namespace, text_hash)
+        if cached is not None:
+            embedding_lru.put(lru_key, cached)
+    return namespace, text_hash, cached
+
+
+def _cache_query_embedding(namespace, text_hash, embedding):
+    """Remember a freshly computed embedding in the store and the in-process LRU."""
+    lru_key = (namespace.model, namespace.digest, text_hash)
+    namespace = _learn_dimension(namespace, embedding)
+    get_embedding_store().put(namespace, text_hash, embedding)
+    embedding_lru.put(lru_key, embedding)
+
+
+def get_cached_embedding(text, use_load_balancer=True):
+    """Get embedding from cache or generate new one."""
+    namespace, text_hash, cached = _cached_query_embedding(text)
+    if cached is not None:
+        return cached
 
     # Generate new embedding using load balancer
     if use_load_balancer:
         embedding_result = load_balancer.embed(EMBEDDING_MODEL, text, keep_alive=EMBEDDING_KEEP_ALIVE, priority=7)
     else:
-        embedding_result = ollama.embed(model=EMBEDDING_MODEL, input=text, keep_alive=EMBEDDING_KEEP_ALIVE)
+        embedding_result = ollama_client().embed(model=EMBEDDING_MODEL, input=text, keep_alive=EMBEDDING_KEEP_ALIVE)
 
     embeddings = embedding_result.get("embeddings", [])
     embedding = embeddings[0] if embeddings else []
 
     # Cache it
-    cache[text_hash] = embedding
-    save_embedding_cache(cache)
+    _cache_query_embedding(namespace, text_hash, embedding)
+    return embedding
+
 
+async def get_cached_embedding_async(text, executor=None):
+    """
+    ``get_cached_embedding`` for code running on an event loop.
+
+    A cache miss is embedded through the pool's native asyncio path, so
+    waiting for Ollama costs a coroutine rather than a thread. Without a
+    pool the blocking call runs in ``executor``.
+    """
+    if load_balancer is None or not hasattr(load_balancer, "embed_batch_async"):
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, get_cached_embedding, text, load_balancer is not None
+        )
+
+    namespace, text_hash, cached = _cached_query_embedding(text)
+    if cached is not None:
+        return cached
+
+    results = await load_balancer.embed_batch_async(
+        EMBEDDING_MODEL, [text], priority=7, keep_alive=EMBEDDING_KEEP_ALIVE
+    )
+    embeddings = (results[0] or {}).get("embeddings", []) if results else []
+    embedding = embeddings[0] if embeddings else []
+    if embedding:
+        _cache_query_embedding(namespace, text_hash, embedding)
     return embedding
 
 
+def embedding_cache_report():
+    """Log in-process embedding cache counters."""
+    stats = embedding_lru.stats()
+    logger.info("\n⚡ Query Embedding Cache (in-process LRU):")
+    logger.info(
+        f"   Entries: {stats['entries']} ({stats['bytes'] / 1024 / 1024:.1f} / "
+        f"{stats['max_bytes'] / 1024 / 1024:.0f} MB)"
+    )
+    logger.info(f"   Hits: {stats['hits']} | Misses: {stats['misses']} | Hit rate: {stats['hit_rate'] * 100:.1f}%")
+    logger.info(f"   Evictions: {stats['evictions']} | Expired: {stats['expirations']}")
+
+    logger.info("\n🗄️  Embedding Cache (SQLite, per model):")
+    for namespace, count in embedding_store.namespaces():
+        digest = namespace.digest[:12] or "unknown digest"
+        logger.info(f"   {namespace.model} ({digest}, dim {namespace.dim}): {count} vectors")
+
+
+def get_document_index():
+    """Return the SQLite document index for INDEX_FILE, importing a legacy JSON index on first use."""
+    with _document_index_lock:
+        index = _document_indexes.get(INDEX_FILE)
+        if index is None or not index.path.exists():
+            index = _document_indexes[INDEX_FILE] = open_document_index(INDEX_FILE)
+        return index
+
+
 def load_document_index():
-    """Load the document index or create it if it doesn't exist."""
-    if not INDEX_FILE.exists():
+    """Load the whole document index ({"documents": [...]}); empty if there is none yet."""
+    if not INDEX_FILE.exists() and not index_path(INDEX_FILE).exists():
         return {"documents": []}
 
     try:
-        with open(INDEX_FILE, "r") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        logger.error("⚠️ Error loading index file. Creating a new one.")
+        return get_document_index().load()
+    except sqlite3.DatabaseError as e:
+        logger.error(f"⚠️ Error loading index file: {e}")
         return {"documents": []}
 
 
+def sync_embedding_matrix():
+    """
+    Bring ``embedding_matrix`` in line with the document index.
+
+    Checking costs one ``PRAGMA data_version`` read; the index is only loaded
+    after it was written (by this process or another one) or after the
+    matrix itself was changed or replaced.
+    """
+    global _matrix_synced_at
+    if not INDEX_FILE.exists() and not index_path(INDEX_FILE).exists():
+        return
+    with _matrix_sync_lock:
+        index = get_document_index()
+        # Read the version first: a write that lands during the load is picked up next time
+        index_version = (id(index), index.version())
+        if _matrix_synced_at == index_version + (id(embedding_matrix), embedding_matrix.generation):
+            return
+        embedding_matrix.sync(load_document_index())
+        _matrix_synced_at = index_version + (id(embedding_matrix), embedding_matrix.generation)
+
+
+def document_summaries():
+    """id, original, text_path, processed_date and chunk_count of every document (entries are not loaded)."""
+    if not INDEX_FILE.exists() and not index_path(INDEX_FILE).exists():
+        return []
+    return get_document_index().summaries()
+
+
 def save_document_index(index_data):
-    """Save the document index to disk."""
-    with open(INDEX_FILE, "w") as f:
-        json.dump(index_data, f, indent=4)
+    """
+    Make the document index hold exactly ``index_data``.
+
+    Only for whole-index edits: it removes documents another process added
+    since ``index_data`` was loaded. Single documents go through
+    ``get_document_index().put`` / ``remove``.
+    """
+    get_document_index().replace(index_data)
     logger.info(f"✅ Document index updated with {len(index_data['documents'])} documents")
 
 
-def register_document(pdf_path, txt_path, content, chunks=None):
-    """Register a processed document in the knowledge base index."""
-    # Load existing index
-    index_data = load_document_index()
+def file_sha256(path, block_size=1 << 20):
+    """SHA-256 of a file's contents, read in blocks."""
+    import hashlib
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
 
-    # Create document record
-    document_id = f"doc_{len(index_data['documents']) + 1}"
+def ingest_lookup(index_data):
+    """(by_path, by_content_hash) maps over indexed documents, for O(1) change checks."""
+    by_path, by_sha = {}, {}
+    for doc in index_data["documents"]:
+        by_path[doc.get("original")] = doc
+        if doc.get("source_sha256"):
+            by_sha.setdefault(doc["source_sha256"], doc)
+    return by_path, by_sha
+
+
+def check_ingested(pdf_path, lookup=None):
+    """
+    Compare a PDF with what is already in the knowledge base.
+
+    Returns ``(status, fingerprint, entry)``. The status is "unchanged" when
+    size and mtime match the indexed copy (the file is not even read) or its
+    content hash matches an indexed document, "changed" when the path is
+    indexed with different content, and "new" otherwise.
+    """
+    pdf_path = Path(pdf_path)
+    by_path, by_sha = lookup or get_document_index().lookup()
+    stat = pdf_path.stat()
+    fingerprint = {"source_size": stat.st_size, "source_mtime": stat.st_mtime}
+
+    entry = by_path.get(str(pdf_path))
+    if entry and entry.get("source_sha256") and all(entry.get(key) == fingerprint[key] for key in fingerprint):
+        return "unchanged", {**fingerprint, "source_sha256": entry["source_sha256"]}, entry
+
+    fingerprint["source_sha256"] = file_sha256(pdf_path)
+    same_content = by_sha.get(fingerprint["source_sha256"])
+    if same_content and fingerprint["source_size"]:
+        return "unchanged", fingerprint, same_content
+    return ("changed" if entry else "new"), fingerprint, entry
+
+
+def refresh_fingerprint(entry, pdf_path, fingerprint):
+    """Record a new mtime for a touched-but-identical file so the next check skips hashing. True if updated."""
+    if (
+        entry
+        and entry.get("original") == str(pdf_path)
+        and entry.get("source_sha256") == fingerprint["source_sha256"]
+        and entry.get("source_mtime") != fingerprint["source_mtime"]
+    ):
+        entry.update(fingerprint)
+        get_document_index().put(entry)
+        return True
+    return False
+
+
+def _drop_document(doc):
+    """Remove a document from the index, the resident matrix, the ANN index and disk."""
+    get_document_index().remove(doc["id"])
+    embedding_matrix.remove_document(doc["id"])
+    keys = set(document_segment_keys(doc))
+    if ann_index.prune(key for key in ann_index.document_ids if key not in keys):
+        ann_index.save()
+    for path in document_segments(doc):
+        remove_segment(path)
+    for chunk_ref in doc.get("chunks", []):
+        if chunk_ref.get("file"):
+            Path(chunk_ref["file"]).unlink(missing_ok=True)
+
+
+def _match_previous_chunks(previous, chunks, chunk_hashes):
+    """
+    Match a revised document's chunks to its indexed version by content hash.
+
+    Returns ``(reused, stale)``: the previous chunk ref for each new chunk whose
+    text is unchanged (None where it is new or edited), and the previous refs
+    no new chunk matched. Repeated texts are matched one-to-one.
+    """
+    import hashlib
+
+    old_ids, old_texts = document_texts(previous)
+    refs = {ref["chunk_id"]: ref for ref in previous.get("chunks", [])}
+    available = {}
+    for chunk_id, text in zip(old_ids, old_texts):
+        available.setdefault(hashlib.md5(text.encode()).hexdigest(), []).append(refs[chunk_id])
+
+    reused = [available[h].pop(0) if available.get(h) else None for h in chunk_hashes]
+    stale = [ref for matches in available.values() for ref in matches]
+    return reused, stale
+
+
+def _compact_document(doc, segment_path):
+    """Rewrite a document's live rows as one segment (no re-embedding); returns the updated entry."""
+    segments = [Segment.open(path) for path in document_segments(doc)]
+    refs = doc["chunks"]
+    dim = segments[0].dim if segments else 0
+    vectors = np.zeros((len(refs), dim), dtype=np.float32)
+    for i, ref in enumerate(refs):
+        vectors[i] = segments[ref.get("part", 0)].vectors[ref["row"]]
+    texts = [segments[ref.get("part", 0)].text(ref["row"]) for ref in refs]
+    Segment(vectors, texts=texts).save(segment_path)
+
+    compacted = {key: value for key, value in doc.items() if key != "segments"}
+    compacted["segment"] = str(segment_path)
+    compacted["chunks"] = [{"chunk_id": ref["chunk_id"], "row": row} for row, ref in enumerate(refs)]
+    return compacted
+
+
+def register_document(pdf_path, txt_path, content, chunks=None, fingerprint=None, stats=None):
+    """
+    Register a processed document in the knowledge base index.
+
+    A document already indexed under the same path is updated, not duplicated.
+    When its vectors came from the current embedding model, the update is a
+    delta: chunks whose text is unchanged keep their stored vectors, only new
+    or edited chunks are embedded (into a delta segment), and the rows of
+    chunks that disappeared are tombstoned. Otherwise the previous version is
+    replaced. ``fingerprint`` (from ``check_ingested``) is stored so unchanged
+    files are skipped next time; if ``stats`` (a dict) is given it receives
+    chunk/embedding counts.
+    """
+    # Look up the previous version by path (an indexed query, not a full index load)
+    index = get_document_index()
+    previous = index.find(original=str(pdf_path))
 
     # Get PDF filename for better logging (especially in parallel mode)
     from pathlib import Path
@@ -499,27 +884,54 @@ def register_document(pdf_path, txt_path, content, chunks=None):
 
     # Generate embeddings and chunks for search
     chunks = chunks or chunk_text(content)
-    chunk_embeddings = []
-
-    # Batch process embeddings for better performance
-    logger.info(f"🔄 [{pdf_name}] Processing {len(chunks)} chunks in batches...")
 
     import hashlib
 
-    cache = load_embedding_cache()
+    store = get_embedding_store()
+    namespace = get_embedding_namespace()
+    chunk_hashes = [hashlib.md5(chunk.encode()).hexdigest() for chunk in chunks]
+
+    # A revision embedded with the same model only needs its changed chunks
+    reused, stale = [None] * len(chunks), []
+    delta = bool(
+        previous
+        and previous.get("segment")
+        and previous.get("embedding_model") == namespace.model
+        and previous.get("embedding_digest") == namespace.digest
+    )
+    if delta:
+        try:
+            reused, stale = _match_previous_chunks(previous, chunks, chunk_hashes)
+        except Exception as e:
+            logger.error(f"⚠️ Could not read previous chunks of {previous['id']}, replacing it: {e}")
+            delta = False
+    if delta:
+        document_id = previous["id"]
+        pending = [i for i, ref in enumerate(reused) if ref is None]
+        logger.info(
+            f"🧩 [{pdf_name}] Revision of {document_id}: {len(chunks) - len(pending)} chunks unchanged, "
+            f"{len(pending)} new or edited, {len(stale)} removed"
+        )
+    else:
+        document_id = index.allocate_id()
+        pending = list(range(len(chunks)))
+
+    # Batch process embeddings for better performance
+    logger.info(f"🔄 [{pdf_name}] Processing {len(pending)} chunks in batches...")
+
+    cache = store.get_many(namespace, (chunk_hashes[i] for i in pending))
     uncached_chunks = []
     uncached_indices = []
 
     # Check cache first
     cached_count = 0
-    for i, chunk in enumerate(chunks):
-        text_hash = hashlib.md5(chunk.encode()).hexdigest()
+    for i in pending:
+        text_hash = chunk_hashes[i]
         if text_hash not in cache:
-            uncached_chunks.append(chunk)
+            uncached_chunks.append(chunks[i])
             uncached_indices.append(i)
         else:
             cached_count += 1
-
     # Log cache status explicitly
     if cached_count > 0:
         logger.info(
@@ -582,60 +994,196 @@ def register_document(pdf_path, txt_path, content, chunks=None):
 
         # Cache the embeddings
         cached_count = 0
-        for chunk, result in zip(uncached_chunks, all_results):
+        new_embeddings = []
+        for i, result in zip(uncached_indices, all_results):
             if result:
-                text_hash = hashlib.md5(chunk.encode()).hexdigest()
                 embeddings = result.get("embeddings", [])
                 embedding = embeddings[0] if embeddings else []
-                cache[text_hash] = embedding
+                cache[chunk_hashes[i]] = embedding
+                new_embeddings.append((chunk_hashes[i], embedding))
                 cached_count += 1
 
-        # Save cache once after all embeddings complete
-        save_embedding_cache(cache)
+        # Write all new embeddings in one transaction
+        if new_embeddings:
+            namespace = _learn_dimension(namespace, new_embeddings[0][1])
+        store.put_many(namespace, new_embeddings)
         logger.info(f"✅ [{pdf_name}] Embedded and cached {cached_count}/{len(uncached_chunks)} chunks")
     else:
         logger.info(f"✅ [{pdf_name}] All chunks found in cache!")
 
-    # Now process all chunks
-    for i, chunk in enumerate(chunks):
+    # Store the embedded chunks as one binary segment (float32 vectors + texts sidecar);
+    # a revision writes only its new chunks, as a delta segment next to the existing ones
+    embeddings = [cache.get(chunk_hashes[i], []) for i in pending]
+    seq = previous.get("segment_seq", 0) + 1 if delta else 0
+    segment_path = SEGMENTS_DIR / (f"{document_id}.{seq}" if delta else document_id)
+    stored = []
+    if pending or not delta:
         try:
-            # Show progress every 50 chunks
-            if i % 50 == 0 and i > 0:
-                logger.info(f"🔄 Processed {i}/{len(chunks)} chunks...")
+            stored = write_segment(segment_path, [chunks[i] for i in pending], embeddings)
+        except Exception as e:
+            logger.error(f"⚠️ Error writing vector segment for {document_id}: {e}")
+
+    if len(stored) < len(pending):
+        logger.warning(f"⚠️ [{pdf_name}] {len(pending) - len(stored)} chunk(s) had no embedding and were skipped")
+
+    obsolete = []
+    if delta:
+        if pending and not stored:
+            remove_segment(segment_path)
+        numbers = [ref["chunk_id"].rsplit("_", 1)[-1] for ref in previous.get("chunks", [])]
+        next_chunk = previous.get("next_chunk", max((int(n) + 1 for n in numbers if n.isdigit()), default=0))
+        part = len(document_segments(previous))
+        new_refs = {
+            pending[j]: {"chunk_id": f"{document_id}_chunk_{next_chunk + k}", "row": row, "part": part}
+            for k, (row, j) in enumerate(enumerate(stored))
+        }
+        chunk_embeddings = [reused[i] or new_refs[i] for i in range(len(chunks)) if reused[i] or i in new_refs]
+        doc_entry = {
+            **previous,
+            "text_path": str(txt_path),
+            "processed_date": datetime.now().isoformat(),
+            **(fingerprint or {}),
+            "segments": previous.get("segments", []) + ([str(segment_path)] if stored else []),
+            "segment_seq": seq,
+            "next_chunk": next_chunk + len(stored),
+            "revision": previous.get("revision", 0) + 1,
+            "chunks": chunk_embeddings,
+        }
+        new_paths = [str(segment_path)] if stored else []
+
+        # Once tombstones dominate, fold the live rows into one segment (vectors are copied, not re-embedded)
+        total_rows = sum(len(Segment.open(path)) for path in document_segments(doc_entry))
+        if total_rows and (total_rows - len(chunk_embeddings)) / total_rows >= DELTA_COMPACT_RATIO:
+            compact_path = SEGMENTS_DIR / f"{document_id}.{seq + 1}"
+            try:
+                obsolete = document_segments(doc_entry)
+                doc_entry = _compact_document(doc_entry, compact_path)
+                doc_entry["segment_seq"] = seq + 1
+                new_paths = [str(compact_path)]
+                logger.info(f"🗜️  [{pdf_name}] Compacted {document_id}: {total_rows} rows -> {len(chunk_embeddings)}")
+            except Exception as e:
+                obsolete = []
+                logger.error(f"⚠️ Error compacting {document_id}: {e}")
+        if not doc_entry.get("segments"):
+            doc_entry.pop("segments", None)
 
-            # Get embedding from cache
-            text_hash = hashlib.md5(chunk.encode()).hexdigest()
-            embedding = cache.get(text_hash, [])
+        index.put(doc_entry)
+        logger.info(f"🧩 [{pdf_name}] Updated {document_id} in place: +{len(stored)} chunks, {len(stale)} tombstoned")
+    else:
+        chunk_embeddings = [{"chunk_id": f"{document_id}_chunk_{i}", "row": row} for row, i in enumerate(stored)]
+
+        # Add document to index
+        doc_entry = {
+            "id": document_id,
+            "original": str(pdf_path),
+            "text_path": str(txt_path),
+            "processed_date": datetime.now().isoformat(),
+            "segment": str(segment_path),
+            "embedding_model": namespace.model,
+            "embedding_digest": namespace.digest,
+            **(fingerprint or {}),
+            "chunks": chunk_embeddings,
+        }
+        new_paths = [str(segment_path)] if stored else []
+
+        index.put(doc_entry)
+        if previous:
+            try:
+                _drop_document(previous)
+                logger.info(f"🔁 [{pdf_name}] Replaced {previous['id']} with {document_id}")
+            except Exception as e:
+                logger.error(f"⚠️ Error removing previous version {previous.get('id')}: {e}")
+    logger.info(f"✅ Document index updated with {index.count()} documents")
+    for path in obsolete:
+        if path not in document_segments(doc_entry):
+            remove_segment(path)
+
+    if stats is not None:
+        stats.update(
+            {
+                "chunks": len(chunks),
+                "embedded": len(uncached_chunks),
+                "reused": len(chunks) - len(uncached_chunks),
+                "replaced": previous["id"] if previous else None,
+                "tombstoned": len(stale),
+            }
+        )
 
-            # Store chunk with its embedding
-            chunk_file = KB_DIR / f"{document_id}_chunk_{i}.json"
-            chunk_data = {"text": chunk, "embedding": embedding}
+    # Update the resident retrieval matrix in place (no rebuild)
+    try:
+        if delta:
+            embedding_matrix.update_document(doc_entry)
+        elif stored:
+            embedding_matrix.load_document(doc_entry)
+    except Exception as e:
+        logger.error(f"⚠️ Error adding {document_id} to embedding matrix: {e}")
 
-            with open(chunk_file, "w") as f:
-                json.dump(chunk_data, f)
+    # Assign the new rows to existing ANN lists (training happens at query time)
+    try:
+        changed = False
+        if delta:
+            stale_keys = set(document_segment_keys(previous)) - set(document_segment_keys(doc_entry))
+            changed = ann_index.prune(key for key in ann_index.document_ids if key not in stale_keys) > 0
+        for path in new_paths:
+            changed |= ann_index.add_document(Path(path).name, Segment.open(path).vectors)
+        if changed:
+            ann_index.save()
+    except Exception as e:
+        logger.error(f"⚠️ Error adding {document_id} to ANN index: {e}")
+    return document_id
 
-            # Remember the chunk reference
-            chunk_embeddings.append({"chunk_id": f"{document_id}_chunk_{i}", "file": str(chunk_file)})
-        except Exception as e:
-            logger.error(f"⚠️ Error embedding chunk {i}: {e}")
 
-    # Add document to index
-    doc_entry = {
-        "id": document_id,
-        "original": str(pdf_path),
-        "text_path": str(txt_path),
-        "processed_date": datetime.now().isoformat(),
-        "chunks": chunk_embeddings,
-    }
+def _split_large_text(text, max_size):
+    """Recursively split text that's too large."""
+    if len(text) <= max_size:
+        return [text]
 
-    index_data["documents"].append(doc_entry)
-    save_document_index(index_data)
-    return document_id
+    # Try splitting by sentences first
+    sentences = text.replace("! ", "!|").replace("? ", "?|").replace(". ", ".|").split("|")
 
+    chunks = []
+    current = []
+    current_len = 0
 
-def chunk_text(text, chunk_size=512, overlap=100):
+    for sent in sentences:
+        sent = sent.strip()
+        if not sent:
+            continue
+
+        # If single sentence exceeds limit, split by words
+        if len(sent) > max_size:
+            words = sent.split()
+            # Calculate words per chunk (with safety margin)
+            words_per_chunk = int((max_size / len(sent)) * len(words) * 0.9)
+            words_per_chunk = max(50, words_per_chunk)  # At least 50 words
+
+            for i in range(0, len(words), words_per_chunk):
+                word_chunk = " ".join(words[i : i + words_per_chunk])
+                if word_chunk:
+                    chunks.append(word_chunk)
+            continue
+
+        # Add sentence to current chunk
+        if current_len + len(sent) > max_size and current:
+            chunks.append(" ".join(current))
+            current = [sent]
+            current_len = len(sent)
+        else:
+            current.append(sent)
+            current_len += len(sent)
+
+    if current:
+        chunks.append(" ".join(current))
+
+    return chunks
+
+
+def iter_chunks(paragraphs, chunk_size=512, overlap=100):
     """
-    Split text into overlapping chunks with intelligent token-aware splitting.
+    Yield chunks from a stream of paragraphs as soon as each one is final.
+
+    Produces exactly the chunks ``chunk_text`` would for the same paragraphs,
+    so ingestion can start embedding while later pages are still being extracted.
 
     Args:
         chunk_size: Target chunk size in tokens (approximate via chars * 0.25)
@@ -647,54 +1195,12 @@ def chunk_text(text, chunk_size=512, overlap=100):
     MAX_CHARS = MAX_TOKENS * 4  # ~1920 chars
     TARGET_CHARS = chunk_size * 4  # ~2048 chars for chunk_size=512
 
-    def split_large_text(text, max_size):
-        """Recursively split text that's too large."""
-        if len(text) <= max_size:
-            return [text]
-
-        # Try splitting by sentences first
-        sentences = text.replace("! ", "!|").replace("? ", "?|").replace(". ", ".|").split("|")
-
-        chunks = []
-        current = []
-        current_len = 0
-
-        for sent in sentences:
-            sent = sent.strip()
-            if not sent:
-                continue
-
-            # If single sentence exceeds limit, split by words
-            if len(sent) > max_size:
-                words = sent.split()
-                # Calculate words per chunk (with safety margin)
-                words_per_chunk = int((max_size / len(sent)) * len(words) * 0.9)
-                words_per_chunk = max(50, words_per_chunk)  # At least 50 words
-
-                for i in range(0, len(words), words_per_chunk):
-                    word_chunk = " ".join(words[i : i + words_per_chunk])
-                    if word_chunk:
-                        chunks.append(word_chunk)
-                continue
-
-            # Add sentence to current chunk
-            if current_len + len(sent) > max_size and current:
-                chunks.append(" ".join(current))
-                current = [sent]
-                current_len = len(sent)
-            else:
-                current.append(sent)
-                current_len += len(sent)
-
-        if current:
-            chunks.append(" ".join(current))
-
-        return chunks
-
-    # Split into paragraphs first
-    paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
+    def validated(chunk):
+        # Ensure no chunk exceeds MAX_CHARS
+        if len(chunk) > MAX_CHARS:
+            return _split_large_text(chunk, MAX_CHARS)
+        return [chunk]
 
-    chunks = []
     current_chunk = []
     current_length = 0
 
@@ -705,19 +1211,19 @@ def chunk_text(text, chunk_size=512, overlap=100):
         if para_len > MAX_CHARS:
             # Finalize current chunk if any
             if current_chunk:
-                chunks.append("\n\n".join(current_chunk))
+                yield from validated("\n\n".join(current_chunk))
                 current_chunk = []
                 current_length = 0
 
             # Split the large paragraph
-            para_chunks = split_large_text(para, MAX_CHARS)
-            chunks.extend(para_chunks)
+            for para_chunk in _split_large_text(para, MAX_CHARS):
+                yield from validated(para_chunk)
             continue
 
         # Check if adding this paragraph exceeds target size
         if current_length + para_len > TARGET_CHARS and current_chunk:
             # Finalize current chunk
-            chunks.append("\n\n".join(current_chunk))
+            yield from validated("\n\n".join(current_chunk))
 
             # Start new chunk with overlap (keep last paragraph if small enough)
             if overlap > 0 and current_chunk and len(current_chunk[-1]) < overlap:
@@ -730,68 +1236,91 @@ def chunk_text(text, chunk_size=512, overlap=100):
             current_chunk.append(para)
             current_length += para_len
 
-    # Add final chunk
+    # Add final chunk (split once as a safety check, then validated like the rest)
     if current_chunk:
-        final_chunk = "\n\n".join(current_chunk)
-        # Safety check
-        if len(final_chunk) > MAX_CHARS:
-            chunks.extend(split_large_text(final_chunk, MAX_CHARS))
-        else:
-            chunks.append(final_chunk)
+        for final_chunk in validated("\n\n".join(current_chunk)):
+            yield from validated(final_chunk)
 
-    # Final validation: ensure no chunk exceeds MAX_CHARS
-    validated_chunks = []
-    for chunk in chunks:
-        if len(chunk) > MAX_CHARS:
-            validated_chunks.extend(split_large_text(chunk, MAX_CHARS))
-        else:
-            validated_chunks.append(chunk)
 
-    return validated_chunks
+def chunk_text(text, chunk_size=512, overlap=100):
+    """
+    Split text into overlapping chunks with intelligent token-aware splitting.
+
+    Args:
+        chunk_size: Target chunk size in tokens (approximate via chars * 0.25)
+        overlap: Number of characters to overlap between chunks
+    """
+    # Split into paragraphs first
+    paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
+    return list(iter_chunks(paragraphs, chunk_size, overlap))
 
 
 def list_documents():
     """List all processed documents in the knowledge base."""
-    index_data = load_document_index()
-    if not index_data["documents"]:
+    documents = document_summaries()
+    if not documents:
         logger.info("📚 No documents have been processed yet.")
         return
 
-    logger.info(f"\n📚 Knowledge Base: {len(index_data['documents'])} documents")
+    logger.info(f"\n📚 Knowledge Base: {len(documents)} documents")
     logger.info("-" * 60)
-    for i, doc in enumerate(index_data["documents"]):
+    for i, doc in enumerate(documents):
         logger.info(f"{i+1}. {Path(doc['original']).name}")
         logger.info(f"   ID: {doc['id']} | Processed: {doc['processed_date'][:10]}")
-        logger.info(f"   Chunks: {len(doc['chunks'])}")
+        logger.info(f"   Chunks: {doc['chunk_count']}")
         logger.info("-" * 60)
 
 
 def get_similar_chunks(query, top_k=None, min_similarity=None):
     """Find text chunks similar to the query using vector similarity with adaptive top-k."""
+    try:
+        # Get embedding for the query from cache
+        query_embedding = get_cached_embedding(query)
+    except Exception as e:
+        logger.error(f"⚠️ Error searching knowledge base: {e}")
+        return []
+    return search_chunks(query_embedding, top_k, min_similarity)
+
+
+async def get_similar_chunks_async(query, top_k=None, min_similarity=None, executor=None):
+    """
+    ``get_similar_chunks`` for code running on an event loop.
+
+    The query embedding is awaited (see ``get_cached_embedding_async``); only
+    the matrix search runs in ``executor``.
+    """
+    try:
+        query_embedding = await get_cached_embedding_async(query, executor)
+    except Exception as e:
+        logger.error(f"⚠️ Error searching knowledge base: {e}")
+        return []
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, search_chunks, query_embedding, top_k, min_similarity
+    )
+
+
+def search_chunks(query_embedding, top_k=None, min_similarity=None):
+    """Find the chunks most similar to an already computed query embedding, with adaptive top-k."""
     # Use configured defaults if not specified
     if min_similarity is None:
         min_similarity = RETRIEVAL_MIN_SIMILARITY
 
     try:
-        # Get embedding for the query from cache
-        query_embedding = get_cached_embedding(query)
-
         if not query_embedding:
             logger.error("⚠️ Failed to generate query embedding")
             return []
 
-        # Load document index
-        index_data = load_document_index()
+        # Load any documents not yet resident (a no-op unless the index changed)
+        sync_embedding_matrix()
+        total_chunks = len(embedding_matrix) - embedding_matrix.tombstoned
 
         # Check if we have documents
-        if not index_data["documents"]:
+        if not total_chunks:
             logger.info("📚 No documents in knowledge base yet")
             return []
 
         # Adaptive top-k based on total chunks in database
         if top_k is None:
-            total_chunks = sum(len(doc["chunks"]) for doc in index_data["documents"])
-
             # Scale top_k based on database size
             if total_chunks < 50:
                 adaptive_k = min(total_chunks, 5)  # Very small DB, use fewer
@@ -807,39 +1336,15 @@ def get_similar_chunks(query, top_k=None, min_similarity=None):
         else:
             logger.info(f"   📊 Using fixed top-k: {top_k}")
 
-        # Collect all chunks with their embeddings
-        chunks_with_similarity = []
-
-        for doc in index_data["documents"]:
-            for chunk_ref in doc["chunks"]:
-                try:
-                    # Load chunk data
-                    chunk_file = Path(chunk_ref["file"])
-                    if chunk_file.exists():
-                        with open(chunk_file, "r") as f:
-                            chunk_data = json.load(f)
-
-                        # Calculate cosine similarity
-                        chunk_embedding = chunk_data.get("embedding", [])
-                        if chunk_embedding:
-                            similarity = cosine_similarity(query_embedding, chunk_embedding)
-                            if similarity >= min_similarity:
-                                chunks_with_similarity.append(
-                                    {
-                                        "doc_id": doc["id"],
-                                        "doc_name": Path(doc["original"]).name,
-                                        "text": chunk_data["text"],
-                                        "similarity": similarity,
-                                    }
-                                )
-                except Exception as e:
-                    logger.error(f"⚠️ Error processing chunk {chunk_ref['chunk_id']}: {e}")
-
-        # Sort by similarity (highest first) and get top k
-        chunks_with_similarity.sort(key=lambda x: x["similarity"], reverse=True)
-
-        # Return top k results
-        results = chunks_with_similarity[:top_k]
+        # Score every resident chunk in one pass
+        if RETRIEVAL_ANN_ENABLED and len(embedding_matrix) >= RETRIEVAL_ANN_MIN_CHUNKS:
+            if ann_index.update(embedding_matrix, RETRIEVAL_ANN_MIN_CHUNKS):
+                ann_index.save()
+            results = ann_index.search(
+                embedding_matrix, query_embedding, top_k, min_similarity, nprobe=RETRIEVAL_ANN_NPROBE
+            )
+        else:
+            results = embedding_matrix.search(query_embedding, top_k, min_similarity)
 
         # Print retrieval stats
         logger.info(f"   Found {len(results)} relevant chunks (similarity >= {min_similarity:.2f})")
@@ -891,215 +1396,111 @@ def embed_text(text):
         return None
 
 
-def clean_extracted_text(text):
-    """Clean extracted text by normalizing Unicode and fixing common LaTeX/PDF extraction issues."""
-    import re
-    import unicodedata
-
-    if not text:
-        return text
-
-    # Step 1: Normalize Unicode (convert composed chars to decomposed and back)
-    text = unicodedata.normalize("NFKC", text)
-
-    # Step 2: Fix common Unicode escape sequences that appear as literal text
-    # Replace \uXXXX patterns with actual Unicode characters
-    def replace_unicode_escapes(match):
-        try:
-            code = match.group(1)
-            return chr(int(code, 16))
-        except:
-            return match.group(0)
-
-    text = re.sub(r"\\u([0-9a-fA-F]{4})", replace_unicode_escapes, text)
-    text = re.sub(r"\\x([0-9a-fA-F]{2})", replace_unicode_escapes, text)
-
-    # Step 3: Clean up common LaTeX remnants that get corrupted
-    # Replace common Greek letter codes with their actual Unicode
-    greek_map = {
-        r"\\alpha": "α",
-        r"\\beta": "β",
-        r"\\gamma": "γ",
-        r"\\delta": "δ",
-        r"\\epsilon": "ε",
-        r"\\zeta": "ζ",
-        r"\\eta": "η",
-        r"\\theta": "θ",
-        r"\\iota": "ι",
-        r"\\kappa": "κ",
-        r"\\lambda": "λ",
-        r"\\mu": "μ",
-        r"\\nu": "ν",
-        r"\\xi": "ξ",
-        r"\\pi": "π",
-        r"\\rho": "ρ",
-        r"\\sigma": "σ",
-        r"\\tau": "τ",
-        r"\\upsilon": "υ",
-        r"\\phi": "φ",
-        r"\\chi": "χ",
-        r"\\psi": "ψ",
-        r"\\omega": "ω",
-        # Capital letters
-        r"\\Gamma": "Γ",
-        r"\\Delta": "Δ",
-        r"\\Theta": "Θ",
-        r"\\Lambda": "Λ",
-        r"\\Xi": "Ξ",
-        r"\\Pi": "Π",
-        r"\\Sigma": "Σ",
-        r"\\Phi": "Φ",
-        r"\\Psi": "Ψ",
-        r"\\Omega": "Ω",
+def summarize_page_report(page_report):
+    """Extraction metadata for process_pdf's JSON: methods used, total time and per-page details."""
+    methods = {}
+    for page in page_report:
+        methods[page["method"]] = methods.get(page["method"], 0) + 1
+    return {
+        "extraction_method": "+".join(methods) or "unknown",
+        "extraction_seconds": round(sum(page["seconds"] for page in page_report), 3),
+        "pages_by_method": methods,
+        "pages": page_report,
     }
 
-    for latex, unicode_char in greek_map.items():
-        text = text.replace(latex, unicode_char)
 
-    # Step 4: Fix spacing issues - add space after periods if missing
-    text = re.sub(r"\.([A-Z])", r". \1", text)
+def _page_paragraphs(page_text):
+    """Paragraphs of one extracted page, split exactly as process_pdf's clean text is."""
+    for line in page_text.split("\n"):
+        line = line.strip()
+        if line and not line.startswith("--- Page"):
+            yield line
 
-    # Step 5: Remove excessive whitespace
-    text = re.sub(r"[ \t]+", " ", text)  # Multiple spaces to single space
-    text = re.sub(r"\n{3,}", "\n\n", text)  # Multiple newlines to double newline
-
-    return text.strip()
-
-
-def extract_text_from_pdf(pdf_path):
-    """Extracts text from a PDF file using multiple methods for better reliability."""
-    pdf_path_str = str(pdf_path)
-    extracted_text = ""
-
-    # Method 1: Try PyMuPDF (fitz) first - better word spacing preservation
-    try:
-        import fitz  # PyMuPDF
 
-        logger.info("🔍 Attempting extraction with PyMuPDF (better word spacing)...")
+def start_ingest_pipeline(name):
+    """Start a pipeline that chunks extracted pages and embeds them into the cache as they arrive."""
+    import hashlib
 
-        doc = fitz.open(pdf_path_str)
-        pymupdf_text = ""
+    store = get_embedding_store()
 
-        for page_num, page in enumerate(doc):
-            # extract_text() with "text" mode preserves word spacing better
-            page_text = page.get_text("text")
-            if page_text:
-                # Clean the text immediately after extraction
-                page_text = clean_extracted_text(page_text)
-                pymupdf_text += f"{page_text}\n\n"
-            else:
-                logger.warning(f"⚠️ PyMuPDF: No text extracted from page {page_num + 1}")
+    def text_hash(text):
+        return hashlib.md5(text.encode()).hexdigest()
 
-        doc.close()
+    def chunker(pages):
+        return iter_chunks(para for page in pages for para in _page_paragraphs(page))
 
-        if pymupdf_text.strip():
-            logger.info(f"✅ PyMuPDF successfully extracted {len(pymupdf_text)} characters")
-            extracted_text = pymupdf_text
-        else:
-            logger.warning("⚠️ PyMuPDF extraction yielded no text, trying alternative method...")
-    except ImportError:
-        logger.warning("⚠️ PyMuPDF not installed (pip install pymupdf), falling back to PyPDF2...")
-    except Exception as e:
-        logger.warning(f"⚠️ PyMuPDF extraction error: {e}")
+    def filter_uncached(texts):
+        by_hash = {text_hash(text): text for text in texts}
+        return [by_hash[h] for h in store.missing(get_embedding_namespace(), by_hash)]
 
-    # Method 2: Try PyPDF2 as fallback (has known word spacing issues)
-    if not extracted_text:
-        try:
-            logger.info("🔍 Attempting extraction with PyPDF2...")
-            reader = PdfReader(pdf_path_str)
-            pypdf_text = ""
-
-            for page_num, page in enumerate(reader.pages):
-                page_text = page.extract_text()
-                if page_text:
-                    pypdf_text += f"{page_text}\n\n"
-                else:
-                    logger.warning(f"⚠️ PyPDF2: No text extracted from page {page_num + 1}")
+    def embed(texts):
+        results = load_balancer.embed_batch(
+            model=EMBEDDING_MODEL,
+            inputs=texts,
+            priority=7,
+            use_adaptive=True,
+            keep_alive=EMBEDDING_KEEP_ALIVE,
+        )
+        return [((result or {}).get("embeddings") or [[]])[0] for result in results]
+
+    def store_results(pairs):
+        namespace = _learn_dimension(get_embedding_namespace(), pairs[0][1])
+        store.put_many(namespace, [(text_hash(text), embedding) for text, embedding in pairs])
+
+    return IngestPipeline(
+        chunker,
+        embed,
+        store_results,
+        filter_fn=filter_uncached,
+        batch_size=INGEST_EMBED_BATCH_SIZE,
+        embed_workers=INGEST_EMBED_WORKERS,
+        queue_size=INGEST_QUEUE_SIZE,
+        name=name,
+    )
 
-            if pypdf_text.strip():
-                logger.info(f"✅ PyPDF2 successfully extracted {len(pypdf_text)} characters")
-                logger.warning("⚠️ PyPDF2 may have word spacing issues - install pymupdf for better quality")
-                extracted_text = pypdf_text
-            else:
-                logger.warning("⚠️ PyPDF2 extraction yielded no text, trying alternative method...")
-        except Exception as e:
-            logger.warning(f"⚠️ PyPDF2 extraction error: {e}")
 
-    # Method 3: If PyMuPDF and PyPDF2 failed, try pdftotext if available
-    if not extracted_text:
-        try:
-            logger.info("🔍 Attempting extraction with pdftotext (if installed)...")
-            with tempfile.NamedTemporaryFile(suffix=".txt") as temp:
-                # Try to use pdftotext (from poppler-utils) if installed
-                result = subprocess.run(
-                    ["pdftotext", "-layout", pdf_path_str, temp.name], capture_output=True, text=True
-                )
+def finish_ingest_pipeline(pipeline):
+    """Drain an ingestion pipeline and log what it did."""
+    stats = pipeline.finish()
+    logger.info(
+        f"⚡ [{pipeline.name}] Pipelined embedding: {stats['embedded']} embedded, {stats['skipped']} already cached, "
+        f"{stats['failed']} failed ({stats['chunks']} chunks from {stats['pages']} pages, "
+        f"{stats['batches']} micro-batches, {stats['seconds']:.1f}s overlapped with extraction)"
+    )
+    return stats
 
-                if result.returncode == 0:
-                    with open(temp.name, "r", encoding="utf-8") as f:
-                        pdftotext_text = f.read()
 
-                    if pdftotext_text.strip():
-                        logger.info(f"✅ pdftotext successfully extracted {len(pdftotext_text)} characters")
-                        extracted_text = pdftotext_text
-                    else:
-                        logger.warning("⚠️ pdftotext extraction yielded no text")
-                else:
-                    logger.warning(f"⚠️ pdftotext error: {result.stderr}")
-        except FileNotFoundError:
-            logger.warning("⚠️ pdftotext not found on system, skipping alternative extraction")
-        except Exception as e:
-            logger.warning(f"⚠️ Alternative extraction error: {e}")
+def _counting_pages(on_page, on_progress):
+    """Wrap an ``on_page`` callback so each extracted page is also reported to ``on_progress``."""
+    pages = 0
 
-    # Method 4: If still no text, try OCR (for scanned documents)
-    if not extracted_text or len(extracted_text.strip()) < 100:
-        try:
-            logger.info("🔍 Attempting OCR extraction (for scanned/image-based PDFs)...")
-            from pdf2image import convert_from_path
-            import pytesseract
-
-            # Convert PDF to images
-            images = convert_from_path(pdf_path_str, dpi=300)
-            logger.info(f"📄 Converted PDF to {len(images)} image(s)")
-
-            ocr_text = ""
-            for i, image in enumerate(images, 1):
-                logger.info(f"   OCR processing page {i}/{len(images)}...")
-                page_text = pytesseract.image_to_string(image, lang="eng")
-                if page_text.strip():
-                    ocr_text += f"--- Page {i} ---\n\n{page_text.strip()}\n\n"
-
-            if ocr_text.strip():
-                logger.info(f"✅ OCR successfully extracted {len(ocr_text)} characters")
-                extracted_text = ocr_text
-            else:
-                logger.warning("⚠️ OCR extraction yielded no text")
-
-        except ImportError:
-            logger.warning("⚠️ OCR libraries not available (pdf2image, pytesseract)")
-            logger.info("   Install with: pip install pdf2image pytesseract")
-            logger.info("   Also need: sudo apt-get install tesseract-ocr poppler-utils")
-        except Exception as e:
-            logger.warning(f"⚠️ OCR extraction error: {e}")
+    def page_done(page_text):
+        nonlocal pages
+        pages += 1
+        if on_page:
+            on_page(page_text)
+        on_progress(pages_extracted=pages)
 
-    # Check if we have any text after trying all methods
-    if not extracted_text:
-        logger.error("❌ Failed to extract text with all available methods")
-        return ""
+    return page_done
 
-    # Process the text to make it more readable
-    processed_text = ""
-    pages = extracted_text.split("\f")  # Form feed character often separates PDF pages
 
-    for page_num, page_content in enumerate(pages):
-        if page_content.strip():
-            processed_text += f"--- Page {page_num + 1} ---\n\n{page_content.strip()}\n\n"
+def process_pdf(pdf_path, extracted_text=None, page_report=None, fingerprint=None, on_progress=None):
+    """
+    Extracts text from PDF, embeds it, and saves clean conversions.
 
-    return processed_text.strip()
+    PDFs already in the knowledge base with the same content are skipped, and a
+    changed PDF replaces its previous version. Returns ``{"status": "skipped" |
+    "added" | "updated", ...}`` with chunk counts, or None on failure.
 
+    ``extracted_text`` (and its ``page_report``) may be passed when extraction
+    already ran elsewhere, e.g. in an extraction worker process; the PDF is then
+    not re-read. ``fingerprint`` is passed by callers that already ran
+    ``check_ingested``.
 
-def process_pdf(pdf_path):
-    """Extracts text from PDF, embeds it, and saves clean conversions."""
+    ``on_progress``, if given, is called with keyword counts as work completes:
+    ``pages_extracted`` after each page, then ``chunks`` and ``chunks_embedded``
+    once the document is registered.
+    """
     start_time = time.time()
 
     pdf_path = Path(pdf_path).resolve()
@@ -1107,12 +1508,38 @@ def process_pdf(pdf_path):
         logger.error(f"❌ Error: File not found → {pdf_path}")
         return
 
+    if fingerprint is None:
+        status, fingerprint, entry = check_ingested(pdf_path)
+        if status == "unchanged":
+            logger.info(f"⏭️  Skipping '{pdf_path.name}': unchanged since it was indexed as {entry['id']}")
+            refresh_fingerprint(entry, pdf_path, fingerprint)
+            return {"status": "skipped", "bytes": fingerprint["source_size"]}
+
     logger.info(f"📄 Processing '{pdf_path.name}'...")
 
-    # Extract text from PDF using multiple methods
-    extracted_text = extract_text_from_pdf(pdf_path)
+    # Embed pages while the rest of the document is still being extracted
+    pipeline = None
+    if page_report is None:
+        page_report = []
+    if extracted_text is None:
+        if INGEST_PIPELINE_ENABLED and load_balancer is not None:
+            pipeline = start_ingest_pipeline(pdf_path.stem)
+
+        on_page = pipeline.add_page if pipeline else None
+        if on_progress:
+            on_page = _counting_pages(on_page, on_progress)
+
+        # Extract text from PDF using multiple methods
+        try:
+            extracted_text = extract_text_from_pdf(pdf_path, on_page=on_page, page_report=page_report)
+        except Exception:
+            if pipeline:
+                pipeline.finish()
+            raise
 
     if not extracted_text:
+        if pipeline:
+            pipeline.finish()
         logger.error(f"❌ Failed to extract text from {pdf_path.name}")
         logger.info("💡 This PDF might be:")
         logger.info("   - Scanned (image-based) without OCR")
@@ -1181,7 +1608,7 @@ def process_pdf(pdf_path):
         "title": pdf_filename,
         "content": clean_text,
         "metadata": {
-            "extraction_method": "PyPDF2/pdftotext",
+            **summarize_page_report(page_report),
             "file_size_bytes": pdf_path.stat().st_size,
             "formats_generated": ["txt", "md", "docx", "json"],
         },
@@ -1190,17 +1617,27 @@ def process_pdf(pdf_path):
         json.dump(json_data, json_file, indent=2, ensure_ascii=False)
     logger.info(f"✅ Saved JSON → {json_path}")
 
+    # Wait for in-flight embeddings; register_document then finds them cached
+    if pipeline:
+        finish_ingest_pipeline(pipeline)
+
     # Add to knowledge base for chat capability
     logger.info(f"🧠 [{pdf_path.stem}] Adding document to knowledge base...")
     chunks = chunk_text(clean_text)
     logger.info(f"📊 [{pdf_path.stem}] Document divided into {len(chunks)} semantic chunks")
 
-    doc_id = register_document(pdf_path, txt_path, clean_text, chunks)
+    stats = {}
+    doc_id = register_document(pdf_path, txt_path, clean_text, chunks, fingerprint=fingerprint, stats=stats)
     logger.info(f"✅ Document registered with ID: {doc_id}")
+    if on_progress:
+        on_progress(
+            pages_extracted=len(page_report), chunks=len(chunks), chunks_embedded=stats.get("embedded", len(chunks))
+        )
 
     elapsed_time = time.time() - start_time
     logger.info(f"🎯 Completed processing {pdf_path.name}")
     logger.info(f"⏱️  Total time: {elapsed_time:.2f}s ({elapsed_time/60:.1f} minutes)")
+    return {"status": "updated" if stats.get("replaced") else "added", "doc_id": doc_id, **stats}
 
 
 def process_directory(dir_path):
@@ -1220,54 +1657,58 @@ def process_directory(dir_path):
         logger.warning(f"⚠️ No PDFs found in {dir_path}")
         return
 
-    logger.info(f"📂 Found {len(pdf_files)} PDFs. Processing...")
+    logger.info(f"📂 Found {len(pdf_files)} PDFs. Checking for changes...")
+
+    # Skip PDFs whose content is already indexed (size+mtime first, hashing only if those changed)
+    fingerprints = {}
+    seen_content = set()
+    skipped = 0
+    skipped_bytes = 0
+    for pdf in pdf_files:
+        status, fingerprint, entry = check_ingested(pdf)
+        duplicate = fingerprint["source_size"] and fingerprint["source_sha256"] in seen_content
+        if status == "unchanged" or duplicate:
+            skipped += 1
+            skipped_bytes += fingerprint["source_size"]
+            refresh_fingerprint(entry, pdf, fingerprint)
+            continue
+        seen_content.add(fingerprint["source_sha256"])
+        fingerprints[pdf] = fingerprint
+
+    if skipped:
+        logger.info(f"⏭️  Skipping {skipped} unchanged PDF(s) ({skipped_bytes / 1024 / 1024:.1f} MB not re-read)")
+    todo = [pdf for pdf in pdf_files if pdf in fingerprints]
+    if not todo:
+        logger.info("✅ Knowledge base already up to date")
+        return
 
-    # Determine if we should use parallel batch processing
     num_nodes = len(load_balancer.nodes) if load_balancer and load_balancer.nodes else 1
-    num_pdfs = len(pdf_files)
-
-    # Process PDFs sequentially to avoid nested parallelism issues
-    # Each PDF uses parallel embedding internally for optimal performance
-    use_parallel_batch = False
-    unique_hosts = load_balancer.count_unique_physical_hosts() if load_balancer and num_nodes > 1 else 1
-
-    logger.info(
-        f"ℹ️  Sequential PDF processing: {num_nodes} node(s) available\n"
-        f"   (Each PDF uses parallel embedding across all nodes for maximum speed)"
-    )
-
-    # Process PDFs: parallel if beneficial, sequential otherwise
-    if use_parallel_batch:
-        # Parallel batch processing: process multiple PDFs concurrently
-        # Each PDF processing will internally use SOLLOL's embedding parallelization
-        max_workers = min(unique_hosts, num_pdfs)
-
-        logger.info(f"🚀 Starting {max_workers} parallel workers...\n")
+    num_pdfs = len(todo)
+    workers = min(EXTRACTION_WORKERS, num_pdfs)
+    results = []
+
+    if workers > 1:
+        # Extraction is CPU-bound and GIL-limited: run it in worker processes.
+        # Embedding stays in this process, so the only parallelism across
+        # Ollama nodes is SOLLOL's embed_batch (no nested per-PDF parallelism).
+        logger.info(
+            f"🚀 Extracting with {workers} worker processes; "
+            f"embedding dispatched from this process across {num_nodes} node(s)\n"
+        )
 
         completed = 0
         failed = 0
-
-        # Import thread-local from sollol_compat for parallelism signaling
-        from sollol_compat import _thread_local
-
-        def process_pdf_with_context(pdf):
-            """Wrapper that sets PDF parallel mode flag before processing."""
-            # Signal that we're in PDF parallel mode (avoid nested embedding parallelism)
-            _thread_local.in_pdf_parallel_mode = True
-            try:
-                return process_pdf(pdf)
-            finally:
-                _thread_local.in_pdf_parallel_mode = False
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all PDF processing tasks with context
-            future_to_pdf = {executor.submit(process_pdf_with_context, pdf): pdf for pdf in pdf_files}
-
-            # Process results as they complete
-            for future in as_completed(future_to_pdf):
-                pdf = future_to_pdf[future]
+        with ExtractionPool(workers) as pool:
+            for pdf, extracted, error in pool.map_unordered(extract_pdf, todo):
                 try:
-                    future.result()
+                    if error is not None:
+                        raise error
+                    extracted_text, page_report = extracted
+                    results.append(
+                        process_pdf(
+                            pdf, extracted_text=extracted_text, page_report=page_report, fingerprint=fingerprints[pdf]
+                        )
+                    )
                     completed += 1
                     logger.info(f"✅ Progress: {completed}/{num_pdfs} PDFs completed")
                 except Exception as e:
@@ -1277,16 +1718,67 @@ def process_directory(dir_path):
         if failed > 0:
             logger.warning(f"⚠️  {failed}/{num_pdfs} PDFs failed to process")
     else:
-        # Sequential batch processing (original behavior)
+        logger.info(
+            f"ℹ️  Sequential PDF processing: {num_nodes} node(s) available\n"
+            f"   (Each PDF uses parallel embedding across all nodes for maximum speed)"
+        )
         # SOLLOL's intelligent load balancing handles parallelization during embedding
-        for i, pdf in enumerate(pdf_files, 1):
+        for i, pdf in enumerate(todo, 1):
             logger.info(f"📄 Processing {i}/{num_pdfs}: {pdf.name}")
-            process_pdf(pdf)
+            results.append(process_pdf(pdf, fingerprint=fingerprints[pdf]))
 
     elapsed_time = time.time() - start_time
     logger.info("✅ All PDFs processed!")
     logger.info(f"⏱️  Total batch time: {elapsed_time:.2f}s ({elapsed_time/60:.1f} minutes)")
-    logger.info(f"📊 Average: {elapsed_time/len(pdf_files):.2f}s per PDF")
+    logger.info(f"📊 Average: {elapsed_time/num_pdfs:.2f}s per processed PDF")
+
+    results = [result for result in results if isinstance(result, dict)]
+    statuses = [result.get("status") for result in results]
+    chunks = sum(result.get("chunks", 0) for result in results)
+    embedded = sum(result.get("embedded", 0) for result in results)
+    logger.info(
+        f"♻️  Incremental ingest: {statuses.count('added')} new, {statuses.count('updated')} updated, "
+        f"{skipped} unchanged skipped; {embedded}/{chunks} chunks embedded, {chunks - embedded} reused from cache"
+    )
+
+
+CHAT_SYSTEM_PROMPT = (
+    "You are FlockParser AI, a helpful assistant that answers questions based on the user's documents. "
+    "IMPORTANT: Extract and cite specific facts, equations, data points, and findings from the documents. "
+    "DO NOT just list chapter titles or section names - provide the actual content and details. "
+    "Include specific values, measurements, formulas, and conclusions when available. "
+    "Only use information from the provided document context. "
+    "If you don't know or the answer isn't in the context, say so."
+)
+
+
+def find_chat_node():
+    """URL of a node that already has CHAT_MODEL loaded, or None to let SOLLOL route."""
+    # SOLLOL's loaded_models tracking does not sync from /api/ps, so read the
+    # residency map kept current by the background tracker (no network calls here)
+    nodes = load_balancer.model_residency.nodes_with(CHAT_MODEL)
+    return nodes[0] if nodes else None
+
+
+def stream_chat(messages, node_url=None):
+    """
+    Yield ``/api/chat`` chunks for ``messages`` as CHAT_MODEL generates them.
+
+    With ``node_url`` the request goes straight to that node; otherwise SOLLOL
+    picks one and streams through its metadata-tracking wrapper. Wrap the
+    result in ``ChatStream`` to get text pieces plus TTFT and tokens/sec.
+    """
+    if node_url:
+        payload = {"model": CHAT_MODEL, "messages": messages, "stream": True, "keep_alive": CHAT_KEEP_ALIVE}
+        with get_session().stream("POST", f"{node_url}/api/chat", json=payload, timeout=300) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if line:
+                    yield json.loads(line)
+    else:
+        yield from load_balancer.chat(
+            model=CHAT_MODEL, messages=messages, stream=True, keep_alive=CHAT_KEEP_ALIVE, priority=5
+        )
 
 
 def chat():
@@ -1443,16 +1935,6 @@ def chat():
                 f"from {len(docs_included)} document(s) (~{current_tokens} tokens, {num_passes} passes × {BASE_CONTEXT_TOKENS} tokens)"
             )
 
-            # Build prompt with context and chat history
-            system_prompt = (
-                "You are FlockParser AI, a helpful assistant that answers questions based on the user's documents. "
-                "IMPORTANT: Extract and cite specific facts, equations, data points, and findings from the documents. "
-                "DO NOT just list chapter titles or section names - provide the actual content and details. "
-                "Include specific values, measurements, formulas, and conclusions when available. "
-                "Only use information from the provided document context. "
-                "If you don't know or the answer isn't in the context, say so."
-            )
-
             # Build user message with context and optional history
             user_message_parts = []
 
@@ -1466,64 +1948,26 @@ def chat():
             user_message_parts.append(f"\nQUESTION: {user_query}")
             user_message = "\n".join(user_message_parts)
 
-            # Generate response using LLM with load balancing
+            # Stream the response so the first tokens show while the rest is generated
             logger.info("🤖 Generating response...")
-            generation_start = time.time()
             try:
-                # WORKAROUND: Explicitly use node that has qwen3:8b loaded
-                # SOLLOL's loaded_models tracking is not syncing from /api/ps (bug)
-                # Node .154 cannot load qwen3:8b (insufficient RAM: needs 5.6GB, has 5.0GB)
-                # Only node .15 can run qwen3:8b, so temporarily force routing there
-                import requests
-
-                chat_node = None
-                for node in load_balancer.nodes:
-                    node_url = f"http://{node['host']}:{node['port']}"
-                    try:
-                        ps_resp = requests.get(f"{node_url}/api/ps", timeout=2)
-                        if ps_resp.status_code == 200:
-                            loaded = ps_resp.json().get("models", [])
-                            # Check if qwen3:8b is loaded on this node
-                            if any(CHAT_MODEL in m.get("name", "") for m in loaded):
-                                chat_node = node_url
-                                logger.info(f"   ✅ Using {node_url} (has {CHAT_MODEL} loaded)")
-                                break
-                    except:
-                        continue
-
-                if not chat_node:
-                    logger.warning(f"   ⚠️  {CHAT_MODEL} not loaded on any node, using SOLLOL routing")
-
-                # Make direct request to the node with the model loaded
+                chat_node = find_chat_node()
                 if chat_node:
-                    payload = {
-                        "model": CHAT_MODEL,
-                        "messages": [
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": user_message},
-                        ],
-                        "stream": False,
-                    }
-                    resp = requests.post(f"{chat_node}/api/chat", json=payload, timeout=300)
-                    resp.raise_for_status()
-                    response = resp.json()
+                    logger.info(f"   ✅ Using {chat_node} (has {CHAT_MODEL} loaded)")
                 else:
-                    # Fallback to SOLLOL routing
-                    response = load_balancer.chat(
-                        model=CHAT_MODEL,
-                        messages=[
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": user_message},
-                        ],
-                        keep_alive=CHAT_KEEP_ALIVE,
-                        priority=5,
-                    )
-
-                generation_time = time.time() - generation_start
-                answer = response["message"]["content"]
+                    logger.warning(f"   ⚠️  {CHAT_MODEL} not loaded on any node, using SOLLOL routing")
 
-                # Display response
-                logger.info(f"\n🤖 AI: {answer}")
+                messages = [
+                    {"role": "system", "content": CHAT_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_message},
+                ]
+                stream = ChatStream(stream_chat(messages, chat_node))
+                stream_output("\n🤖 AI: ")
+                for token in stream:
+                    stream_output(token)
+                stream_output("\n")
+                answer = stream.answer
+                timer = stream.timer
 
                 # Update chat history
                 chat_history.append((user_query, answer))
@@ -1537,7 +1981,10 @@ def chat():
                 total_time = time.time() - response_start_time
                 logger.info("\n⏱️  Response timing:")
                 logger.info(f"   Retrieval: {retrieval_time:.2f}s")
-                logger.info(f"   Generation: {generation_time:.2f}s")
+                if timer.ttft is not None:
+                    logger.info(f"   Time to first token: {timer.ttft:.2f}s")
+                logger.info(f"   Generation: {timer.generation_time:.2f}s")
+                logger.info(f"   Tokens/sec: {timer.tokens_per_second:.1f} ({timer.eval_count or timer.tokens} tokens)")
                 logger.info(f"   Total: {total_time:.2f}s")
 
             except Exception as e:
@@ -1627,10 +2074,13 @@ def check_dependencies():
 def clear_cache():
     """Clear the embedding cache."""
     try:
-        if EMBEDDING_CACHE_FILE.exists():
+        if EMBEDDING_CACHE_FILE.exists() or len(embedding_store):
             confirm = visible_input("⚠️  This will delete the embedding cache. Continue? (yes/no): ").strip().lower()
             if confirm == "yes":
-                EMBEDDING_CACHE_FILE.unlink()
+                embedding_store.clear()
+                embedding_lru.clear()
+                if EMBEDDING_CACHE_FILE.exists():
+                    EMBEDDING_CACHE_FILE.unlink()
                 logger.info("✅ Embedding cache cleared successfully")
                 logger.info("   Next PDF processing will regenerate embeddings")
             else:
@@ -1720,17 +2170,18 @@ def unload_model(model_name: str):
         try:
             # Use keep_alive=0 to unload immediately
             if "embed" in model_name.lower():
-                response = requests.post(
+                response = get_session().post(
                     f"{node_url}/api/embed", json={"model": model_name, "input": "unload", "keep_alive": 0}, timeout=10
                 )
             else:
-                response = requests.post(
+                response = get_session().post(
                     f"{node_url}/api/generate",
                     json={"model": model_name, "prompt": "unload", "keep_alive": 0},
                     timeout=10,
                 )
 
             if response.status_code == 200:
+                load_balancer.model_residency.mark_unloaded(model_name, node_url)
                 logger.info(f"   ✅ {node_url}: Unloaded {model_name}")
             else:
                 logger.warning(f"   ⚠️  {node_url}: Status {response.status_code}")
@@ -1748,22 +2199,17 @@ def cleanup_models():
     logger.info("\n🧹 Cleaning up non-priority models...")
     logger.info(f"   Priority models: {', '.join(priority_models)}")
 
-    models_to_unload = set()
+    # Check what's loaded on each node (all nodes at once, refreshing the residency map)
+    placement = load_balancer.model_residency.poll()
+    for node_url in load_balancer.model_residency.unreachable():
+        logger.error(f"   ⚠️  Error checking {node_url}: no response from /api/ps")
 
-    # Check what's loaded on each node
-    for node_url in load_balancer.instances:
-        try:
-            response = requests.get(f"{node_url}/api/ps", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                for model in data.get("models", []):
-                    model_name = model.get("name", "")
-                    # Check if this model is NOT a priority model
-                    is_priority = any(priority in model_name for priority in priority_models)
-                    if not is_priority and model_name:
-                        models_to_unload.add(model_name)
-        except Exception as e:
-            logger.error(f"   ⚠️  Error checking {node_url}: {e}")
+    models_to_unload = set()
+    for model_name in placement:
+        # Check if this model is NOT a priority model
+        is_priority = any(priority in model_name for priority in priority_models)
+        if not is_priority:
+            models_to_unload.add(model_name)
 
     if not models_to_unload:
         logger.info("\n✅ No non-priority models to unload")
@@ -1816,20 +2262,170 @@ def clear_db():
         if clear_index == "yes":
             if INDEX_FILE.exists():
                 INDEX_FILE.unlink()
+            get_document_index().clear()
             logger.info("✅ Document index cleared")
 
-        # Optionally clear JSON knowledge base
-        clear_json = visible_input("Also clear legacy JSON knowledge base? (yes/no): ").strip().lower()
+        # Optionally clear JSON knowledge base and vector segments
+        clear_json = visible_input("Also clear JSON knowledge base and vector segments? (yes/no): ").strip().lower()
         if clear_json == "yes":
             json_files = list(KB_DIR.glob("*.json"))
             for f in json_files:
                 f.unlink()
-            logger.info(f"✅ Cleared {len(json_files)} JSON files from knowledge base")
+            segment_files = [f for f in SEGMENTS_DIR.iterdir() if f.is_file()]
+            for f in segment_files:
+                f.unlink()
+            embedding_matrix.reset()
+            ANN_INDEX_FILE.unlink(missing_ok=True)
+            ann_index.reset()
+            logger.info(
+                f"✅ Cleared {len(json_files)} JSON files and {len(segment_files)} segment files from knowledge base"
+            )
 
     except Exception as e:
         logger.error(f"❌ Error clearing database: {e}")
 
 
+def migrate_knowledge_base():
+    """Convert legacy per-chunk JSON documents into binary vector segments."""
+    index_data = load_document_index()
+    legacy_docs = [doc for doc in index_data["documents"] if not doc.get("segment")]
+
+    if not legacy_docs:
+        logger.info("✅ Knowledge base already uses binary vector segments - nothing to migrate")
+        return
+
+    logger.info(f"📦 Migrating {len(legacy_docs)} document(s) to binary vector segments...")
+    start_time = time.time()
+
+    legacy_files = []
+    migrated_chunks = 0
+    index = get_document_index()
+    for doc in legacy_docs:
+        try:
+            migrated, files = migrate_document(doc, SEGMENTS_DIR)
+            index.put(migrated)
+            legacy_files.extend(files)
+            migrated_chunks += len(migrated["chunks"])
+            logger.info(f"   ✅ {doc['id']}: {len(migrated['chunks'])} chunks")
+        except Exception as e:
+            logger.error(f"   ❌ {doc.get('id', '?')}: {e}")
+
+    embedding_matrix.reset()
+
+    elapsed = time.time() - start_time
+    logger.info(f"✅ Migrated {migrated_chunks} chunks in {elapsed:.1f}s")
+
+    if legacy_files:
+        confirm = visible_input(f"Delete {len(legacy_files)} legacy chunk JSON files? (yes/no): ").strip().lower()
+        if confirm == "yes":
+            for f in legacy_files:
+                f.unlink(missing_ok=True)
+            logger.info(f"✅ Deleted {len(legacy_files)} legacy chunk files")
+        else:
+            logger.info("ℹ️ Legacy chunk files kept (no longer referenced by the index)")
+
+
+def reembed_corpus(model=None, batch_size=REEMBED_BATCH_SIZE):
+    """
+    Embed every stored chunk with ``model``, computing only (model, text) pairs not already cached.
+
+    With the configured EMBEDDING_MODEL the document segments are rewritten from
+    the cache afterwards, so switching models only pays for texts never embedded
+    with the new model. Any other model just pre-fills the cache.
+    """
+    import hashlib
+
+    model = model or EMBEDDING_MODEL
+    store = get_embedding_store()
+    namespace = get_embedding_namespace(model)
+    index_data = load_document_index()
+    if not index_data["documents"]:
+        logger.info("📚 No documents in knowledge base yet")
+        return
+
+    # Gather every stored chunk text once
+    doc_texts = {}
+    texts_by_hash = {}
+    for doc in index_data["documents"]:
+        try:
+            chunk_ids, texts = document_texts(doc)
+        except Exception as e:
+            logger.error(f"⚠️ Could not read chunks of {doc.get('id', '?')}: {e}")
+            continue
+        doc_texts[doc["id"]] = (chunk_ids, texts)
+        for text in texts:
+            texts_by_hash.setdefault(hashlib.md5(text.encode()).hexdigest(), text)
+
+    missing = store.missing(namespace, texts_by_hash)
+    logger.info(
+        f"🔁 Re-embedding with {model}: {len(texts_by_hash)} unique chunks, "
+        f"{len(texts_by_hash) - len(missing)} already cached, {len(missing)} to compute"
+    )
+
+    start_time = time.time()
+    computed = 0
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start : start + batch_size]
+        results = load_balancer.embed_batch(
+            model=model,
+            inputs=[texts_by_hash[text_hash] for text_hash in batch],
+            priority=5,
+            use_adaptive=True,
+            keep_alive=EMBEDDING_KEEP_ALIVE,
+        )
+        new_embeddings = []
+        for text_hash, result in zip(batch, results):
+            embeddings = (result or {}).get("embeddings", [])
+            if embeddings:
+                new_embeddings.append((text_hash, embeddings[0]))
+        if new_embeddings:
+            namespace = _learn_dimension(namespace, new_embeddings[0][1])
+        computed += store.put_many(namespace, new_embeddings)
+        logger.info(f"   📥 {min(start + batch_size, len(missing))}/{len(missing)} processed ({computed} embedded)")
+
+    elapsed = time.time() - start_time
+    logger.info(f"✅ Computed {computed}/{len(missing)} missing embeddings in {elapsed:.1f}s")
+
+    if model != EMBEDDING_MODEL:
+        logger.info(f"ℹ️ Cache pre-filled for {model}; set EMBEDDING_MODEL and run 'reembed' again to switch")
+        return
+
+    # Rewrite segments whose vectors came from another model or build (delta segments fold into one)
+    rewritten = []
+    obsolete = []
+    for doc in index_data["documents"]:
+        if doc["id"] not in doc_texts:
+            continue
+        if doc.get("embedding_model") == namespace.model and doc.get("embedding_digest") == namespace.digest:
+            continue
+        chunk_ids, texts = doc_texts[doc["id"]]
+        cached = store.get_many(namespace, (hashlib.md5(text.encode()).hexdigest() for text in texts))
+        embeddings = [cached.get(hashlib.md5(text.encode()).hexdigest(), []) for text in texts]
+        # A fresh segment name (like compaction), so processes that have the old one mapped reload it
+        seq = doc.get("segment_seq", 0) + 1
+        segment_path = SEGMENTS_DIR / f"{doc['id']}.{seq}"
+        stored = write_segment(segment_path, texts, embeddings)
+        obsolete.extend(path for path in document_segments(doc) if path != str(segment_path))
+
+        updated = {key: value for key, value in doc.items() if key not in ("chunks", "segments")}
+        updated["segment"] = str(segment_path)
+        updated["segment_seq"] = seq
+        updated["revision"] = doc.get("revision", 0) + 1
+        updated["embedding_model"] = namespace.model
+        updated["embedding_digest"] = namespace.digest
+        updated["chunks"] = [{"chunk_id": chunk_ids[j], "row": row} for row, j in enumerate(stored)]
+        rewritten.append(updated)
+
+    if rewritten:
+        get_document_index().put_many(rewritten)
+        for path in obsolete:
+            remove_segment(path)
+        embedding_matrix.reset()
+        ANN_INDEX_FILE.unlink(missing_ok=True)
+        ann_index.reset()
+    logger.info(f"✅ Rewrote vector segments for {len(rewritten)} document(s) with {model}")
+
+
 def vram_report():
     """Show detailed VRAM usage report for all nodes."""
     monitor = VRAMMonitor()
@@ -1998,6 +2594,7 @@ def main():
             load_balancer.verify_models_on_nodes()
         elif action == "lb_stats":
             load_balancer.print_stats()
+            embedding_cache_report()
         elif action == "set_routing" and arg:
             load_balancer.set_routing_strategy(arg)
         elif action == "vram_report":
@@ -2026,6 +2623,10 @@ def main():
             clear_cache()
         elif action == "clear_db":
             clear_db()
+        elif action == "migrate_kb":
+            migrate_knowledge_base()
+        elif action == "reembed":
+            reembed_corpus(arg or None)
         elif action == "exit":
             logger.info("👋 Exiting. See you next time!")
             load_balancer.print_stats()  # Show stats on exit
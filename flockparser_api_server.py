@@ -3,24 +3,35 @@
 FlockParser HTTP API Server
 
 Provides REST API access to FlockParser document index for remote SynapticLlamas instances.
-Compatible with the existing JSON-based document storage structure.
+Reads the SQLite document index written by FlockParser (a legacy
+document_index.json is imported on first use). The corpus is loaded into memory
+once; a background thread polls the index and applies newly ingested documents,
+so queries never touch the index or the chunk files.
 """
+
 import os
 import json
 import logging
+import threading
+import time
 from pathlib import Path
 from typing import List, Dict, Optional
-import numpy as np
 
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
 
+from document_index import index_path, open_document_index
+from vector_store import EmbeddingMatrix
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+# Upper bound on queries per /query/batch call (the score matrix is queries x chunks)
+MAX_BATCH_QUERIES = 256
+
 
 class QueryRequest(BaseModel):
     """Request model for document query."""
@@ -47,6 +58,18 @@ class QueryResponse(BaseModel):
     total_found: int
 
 
+class BatchQueryRequest(BaseModel):
+    """Request model for several document queries scored together."""
+
+    queries: List[QueryRequest]
+
+
+class BatchQueryResponse(BaseModel):
+    """Response model for a batch query: one result per query, in request order."""
+
+    results: List[QueryResponse]
+
+
 class StatsResponse(BaseModel):
     """Response model for statistics."""
 
@@ -59,7 +82,13 @@ class StatsResponse(BaseModel):
 class FlockParserAPIServer:
     """HTTP API server for FlockParser document index."""
 
-    def __init__(self, flockparser_path: str = "/home/joker/FlockParser", host: str = "0.0.0.0", port: int = 8765):
+    def __init__(
+        self,
+        flockparser_path: str = "/home/joker/FlockParser",
+        host: str = "0.0.0.0",
+        port: int = 8765,
+        reload_interval: float = 2.0,
+    ):
         """
         Initialize FlockParser API server.
 
@@ -67,12 +96,25 @@ class FlockParserAPIServer:
             flockparser_path: Path to FlockParser installation
             host: Host to bind to
             port: Port to listen on
+            reload_interval: Seconds between checks of the document index for new documents
         """
         self.flockparser_path = Path(flockparser_path)
         self.knowledge_base_path = self.flockparser_path / "knowledge_base"
         self.document_index_path = self.flockparser_path / "document_index.json"
+        self._index = None
         self.host = host
         self.port = port
+        self.reload_interval = reload_interval
+
+        # Resident corpus: memory-mapped document vectors plus the index snapshot they were loaded from
+        self.matrix = EmbeddingMatrix()
+        self._index_data: Dict = {"documents": [], "next_id": 1}
+        self._stats = StatsResponse(available=False, documents=0, chunks=0, document_names=[])
+        self._data_version: Optional[int] = None
+        self._last_reload: Optional[float] = None
+        self._reload_lock = threading.Lock()
+        self._stop_watching = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
 
         # Initialize FastAPI
         self.app = FastAPI(
@@ -92,10 +134,11 @@ class FlockParserAPIServer:
         self._register_routes()
 
         # Check availability
-        self.available = self.document_index_path.exists()
+        self.available = self._index_exists()
         if self.available:
+            self.refresh()
             doc_count = self._count_documents()
-            logger.info(f"✅ FlockParser API initialized ({doc_count} documents)")
+            logger.info(f"✅ FlockParser API initialized ({doc_count} documents, {len(self.matrix)} chunks resident)")
         else:
             logger.warning(f"⚠️  Document index not found at {self.document_index_path}")
 
@@ -113,29 +156,16 @@ class FlockParserAPIServer:
             return {
                 "status": "healthy",
                 "available": self.available,
-                "document_index_exists": self.document_index_path.exists(),
+                "document_index_exists": self._index_exists(),
+                "documents": self._count_documents(),
+                "resident_chunks": len(self.matrix),
+                "last_reload": self._last_reload,
             }
 
         @self.app.get("/stats", response_model=StatsResponse)
         async def get_stats():
             """Get statistics about document knowledge base."""
-            if not self.available:
-                return StatsResponse(available=False, documents=0, chunks=0, document_names=[])
-
-            try:
-                with open(self.document_index_path, "r") as f:
-                    index_data = json.load(f)
-
-                documents = index_data.get("documents", [])
-                total_chunks = sum(len(doc.get("chunks", [])) for doc in documents)
-                doc_names = [Path(doc["original"]).name for doc in documents]
-
-                return StatsResponse(
-                    available=True, documents=len(documents), chunks=total_chunks, document_names=doc_names
-                )
-            except Exception as e:
-                logger.error(f"Error getting statistics: {e}")
-                raise HTTPException(status_code=500, detail=str(e))
+            return self._stats
 
         @self.app.get("/documents")
         async def get_document_index():
@@ -143,13 +173,7 @@ class FlockParserAPIServer:
             if not self.available:
                 raise HTTPException(status_code=503, detail="Document index not available")
 
-            try:
-                with open(self.document_index_path, "r") as f:
-                    index_data = json.load(f)
-                return index_data
-            except Exception as e:
-                logger.error(f"Error reading document index: {e}")
-                raise HTTPException(status_code=500, detail=str(e))
+            return self._index_data
 
         @self.app.get("/chunk/{chunk_id}")
         async def get_chunk(chunk_id: str):
@@ -158,13 +182,16 @@ class FlockParserAPIServer:
                 raise HTTPException(status_code=503, detail="Document index not available")
 
             try:
-                # Find chunk file
+                # Legacy per-chunk JSON file
                 chunk_path = self.knowledge_base_path / f"{chunk_id}.json"
-                if not chunk_path.exists():
-                    raise HTTPException(status_code=404, detail=f"Chunk {chunk_id} not found")
+                if chunk_path.exists():
+                    with open(chunk_path, "r") as f:
+                        return json.load(f)
 
-                with open(chunk_path, "r") as f:
-                    chunk_data = json.load(f)
+                # Binary vector segment
+                chunk_data = self.matrix.get_chunk(chunk_id)
+                if chunk_data is None:
+                    raise HTTPException(status_code=404, detail=f"Chunk {chunk_id} not found")
                 return chunk_data
             except HTTPException:
                 raise
@@ -184,89 +211,156 @@ class FlockParserAPIServer:
                 raise HTTPException(status_code=503, detail="Document index not available")
 
             try:
-                query_embedding = np.array(request.query_embedding)
-
-                # Load document index
-                with open(self.document_index_path, "r") as f:
-                    index_data = json.load(f)
-
-                documents = index_data.get("documents", [])
-                if not documents:
+                if not len(self.matrix):
                     return QueryResponse(chunks=[], total_found=0)
 
-                # Collect all chunks with similarities
-                chunks_with_similarity = []
-
-                for doc in documents:
-                    for chunk_ref in doc.get("chunks", []):
-                        try:
-                            chunk_file = Path(chunk_ref["file"])
-                            if chunk_file.exists():
-                                with open(chunk_file, "r") as f:
-                                    chunk_data = json.load(f)
-
-                                chunk_embedding = chunk_data.get("embedding", [])
-                                if chunk_embedding:
-                                    similarity = self._cosine_similarity(query_embedding, np.array(chunk_embedding))
-
-                                    if similarity >= request.min_similarity:
-                                        chunks_with_similarity.append(
-                                            {
-                                                "text": chunk_data["text"],
-                                                "doc_name": Path(doc["original"]).name,
-                                                "similarity": float(similarity),
-                                                "doc_id": doc["id"],
-                                            }
-                                        )
-                        except Exception as e:
-                            logger.debug(f"Error processing chunk: {e}")
-
-                # Sort by similarity and return top k
-                chunks_with_similarity.sort(key=lambda x: x["similarity"], reverse=True)
-                results = chunks_with_similarity[: request.top_k]
+                # Score every resident chunk in one pass (the watcher keeps the matrix current)
+                found = self.matrix.search_counted(request.query_embedding, request.top_k, request.min_similarity)
+                if found is None:
+                    raise HTTPException(
+                        status_code=400, detail="Query embedding is empty or does not match the index dimension"
+                    )
+                total_found, results = found
 
                 logger.info(
                     f"Query: '{request.query[:60]}...' -> "
-                    f"Found {len(results)} chunks (from {len(chunks_with_similarity)} total matches)"
+                    f"Found {len(results)} chunks (from {total_found} total matches)"
                 )
 
-                return QueryResponse(
-                    chunks=[ChunkResult(**chunk) for chunk in results], total_found=len(chunks_with_similarity)
+                return QueryResponse(chunks=[ChunkResult(**chunk) for chunk in results], total_found=total_found)
+
+            except HTTPException:
+                raise
+            except Exception as e:
+                logger.error(f"Error querying documents: {e}")
+                raise HTTPException(status_code=500, detail=str(e))
+
+        @self.app.post("/query/batch", response_model=BatchQueryResponse)
+        async def query_documents_batch(request: BatchQueryRequest):
+            """
+            Query documents with several pre-computed embeddings at once.
+
+            All queries are scored against the corpus in one matrix-matrix product;
+            each still gets its own top_k and min_similarity.
+            """
+            if not self.available:
+                raise HTTPException(status_code=503, detail="Document index not available")
+            if len(request.queries) > MAX_BATCH_QUERIES:
+                raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+
+            try:
+                if not request.queries or not len(self.matrix):
+                    return BatchQueryResponse(
+                        results=[QueryResponse(chunks=[], total_found=0) for _ in request.queries]
+                    )
+
+                # A query whose embedding is empty or of the wrong dimension just finds nothing
+                found = self.matrix.search_batch_counted(
+                    [query.query_embedding for query in request.queries],
+                    [query.top_k for query in request.queries],
+                    [query.min_similarity for query in request.queries],
                 )
+                results = [
+                    QueryResponse(chunks=[ChunkResult(**chunk) for chunk in chunks], total_found=total_found)
+                    for total_found, chunks in found
+                ]
 
+                logger.info(
+                    f"Batch query: {len(results)} queries -> "
+                    f"Found {sum(len(result.chunks) for result in results)} chunks"
+                )
+
+                return BatchQueryResponse(results=results)
+
+            except HTTPException:
+                raise
             except Exception as e:
                 logger.error(f"Error querying documents: {e}")
                 raise HTTPException(status_code=500, detail=str(e))
 
+    def _index_exists(self) -> bool:
+        """True if a SQLite document index or a legacy JSON index is present."""
+        return self.document_index_path.exists() or index_path(self.document_index_path).exists()
+
+    @property
+    def index(self):
+        """SQLite document index (opened on first use)."""
+        if self._index is None:
+            self._index = open_document_index(self.document_index_path)
+        return self._index
+
     def _count_documents(self) -> int:
         """Count documents in FlockParser knowledge base."""
-        try:
-            with open(self.document_index_path, "r") as f:
-                index = json.load(f)
-            return len(index.get("documents", []))
-        except Exception as e:
-            logger.debug(f"Could not count documents: {e}")
-            return 0
-
-    def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
-        """Calculate cosine similarity between two vectors."""
-        try:
-            dot_product = np.dot(vec1, vec2)
-            norm1 = np.linalg.norm(vec1)
-            norm2 = np.linalg.norm(vec2)
+        return len(self._index_data.get("documents", []))
 
-            if norm1 == 0 or norm2 == 0:
-                return 0.0
+    def refresh(self) -> bool:
+        """
+        Apply index changes made since the last check to the resident corpus.
 
-            return float(dot_product / (norm1 * norm2))
-        except Exception as e:
-            logger.error(f"Error calculating similarity: {e}")
-            return 0.0
+        Polling costs one ``PRAGMA data_version`` read; the index is only loaded
+        when another process has committed to it, and the matrix then loads just
+        the documents it does not hold yet (dropping removed ones). Returns True
+        if anything was reloaded.
+        """
+        with self._reload_lock:
+            if not self.available:
+                if not self._index_exists():
+                    return False
+                self.available = True
+                logger.info(f"📂 Document index appeared at {self.document_index_path}")
+
+            # Read the version first: a commit that lands during the load is picked up next time
+            version = self.index.data_version()
+            if version == self._data_version:
+                return False
+
+            index_data = self.index.load()
+            added = self.matrix.sync(index_data)
+            documents = index_data.get("documents", [])
+            self._stats = StatsResponse(
+                available=True,
+                documents=len(documents),
+                chunks=sum(len(doc.get("chunks", [])) for doc in documents),
+                document_names=[Path(doc["original"]).name for doc in documents],
+            )
+            self._index_data = index_data
+            self._data_version = version
+            self._last_reload = time.time()
+            if added and self._watcher is not None:
+                logger.info(f"🔄 Loaded {added} new chunks ({len(documents)} documents, {len(self.matrix)} resident)")
+            return True
+
+    def _watch(self):
+        """Poll the document index until stopped."""
+        while not self._stop_watching.wait(self.reload_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"⚠️  Error reloading document index: {e}")
+
+    def start_watcher(self):
+        """Start the background thread that keeps the resident corpus current."""
+        if self._watcher is None or not self._watcher.is_alive():
+            self._stop_watching.clear()
+            self._watcher = threading.Thread(target=self._watch, daemon=True, name="FlockParserIndexWatcher")
+            self._watcher.start()
+            logger.info(f"👀 Watching document index every {self.reload_interval:g}s")
+
+    def stop_watcher(self):
+        """Stop the index watcher thread."""
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.reload_interval + 1)
+            self._watcher = None
 
     def run(self):
         """Start the API server."""
         logger.info(f"🚀 Starting FlockParser API server on {self.host}:{self.port}")
-        uvicorn.run(self.app, host=self.host, port=self.port, log_level="info")
+        self.start_watcher()
+        try:
+            uvicorn.run(self.app, host=self.host, port=self.port, log_level="info")
+        finally:
+            self.stop_watcher()
 
 
 def main():
@@ -282,10 +376,18 @@ def main():
     )
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Host to bind to (default: 0.0.0.0)")
     parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument(
+        "--reload-interval",
+        type=float,
+        default=2.0,
+        help="Seconds between checks for newly ingested documents (default: 2)",
+    )
 
     args = parser.parse_args()
 
-    server = FlockParserAPIServer(flockparser_path=args.path, host=args.host, port=args.port)
+    server = FlockParserAPIServer(
+        flockparser_path=args.path, host=args.host, port=args.port, reload_interval=args.reload_interval
+    )
     server.run()
 
 
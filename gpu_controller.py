@@ -3,11 +3,12 @@ GPU Controller for FlockParse
 Programmatically control GPU/CPU assignment for models on distributed nodes
 """
 
-import requests
 import json
 import time
 from typing import Dict, List, Optional, Tuple
 
+from http_pool import get_session
+
 
 class GPUController:
     """Control GPU/CPU assignment for Ollama models across distributed nodes."""
@@ -21,7 +22,7 @@ class GPUController:
         Returns which models are in VRAM vs RAM.
         """
         try:
-            response = requests.get(f"{node_url}/api/ps", timeout=5)
+            response = get_session().get(f"{node_url}/api/ps", timeout=5)
             if response.status_code != 200:
                 return {"error": "Failed to connect"}
 
@@ -70,7 +71,7 @@ class GPUController:
         try:
             # Step 1: Unload the model (by setting keep_alive to 0)
             print(f"🔄 Unloading {model_name} from {node_url}...")
-            unload_response = requests.post(
+            unload_response = get_session().post(
                 f"{node_url}/api/generate",
                 json={"model": model_name, "keep_alive": 0},  # Unload immediately
                 timeout=10,
@@ -83,7 +84,7 @@ class GPUController:
 
             # For embedding models, use embed endpoint
             if "embed" in model_name.lower():
-                load_response = requests.post(
+                load_response = get_session().post(
                     f"{node_url}/api/embed",
                     json={
                         "model": model_name,
@@ -95,7 +96,7 @@ class GPUController:
                 )
             else:
                 # For chat models, use generate endpoint
-                load_response = requests.post(
+                load_response = get_session().post(
                     f"{node_url}/api/generate",
                     json={
                         "model": model_name,
@@ -145,12 +146,12 @@ class GPUController:
             print(f"🔄 Forcing {model_name} to CPU on {node_url}...")
 
             # Unload model
-            requests.post(f"{node_url}/api/generate", json={"model": model_name, "keep_alive": 0}, timeout=10)
+            get_session().post(f"{node_url}/api/generate", json={"model": model_name, "keep_alive": 0}, timeout=10)
             time.sleep(2)
 
             # Reload with CPU-only configuration
             if "embed" in model_name.lower():
-                requests.post(
+                get_session().post(
                     f"{node_url}/api/embed",
                     json={
                         "model": model_name,
@@ -161,7 +162,7 @@ class GPUController:
                     timeout=30,
                 )
             else:
-                requests.post(
+                get_session().post(
                     f"{node_url}/api/generate",
                     json={
                         "model": model_name,
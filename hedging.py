@@ -0,0 +1,154 @@
+"""
+Hedged requests: cut tail latency when one node stalls.
+
+A node that runs out of VRAM (or is otherwise stuck) can take many times its
+usual latency, and the last chunks of a batch then wait for it. ``Hedger``
+watches each node's latency distribution; when a request runs past that
+node's p95, a duplicate goes to another node and whichever answers first
+wins. The loser is cancelled if it has not started yet, otherwise its
+result is discarded when it arrives.
+
+Hedges are limited by a budget: at most ``budget`` extra requests per
+request sent (5% by default, 0 disables hedging), so a pool that is slow
+across the board is not flooded with duplicates.
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+HEDGE_BUDGET = float(os.getenv("FLOCKPARSER_HEDGE_BUDGET", "0.05"))  # Hedges allowed per request (0 disables)
+HEDGE_BURST = 5.0  # Hedges that can be saved up during a quiet period
+MIN_SAMPLES = 20  # Latencies needed before a node's p95 is trusted
+LATENCY_WINDOW = 200  # Most recent latencies kept per key
+HEDGE_WORKERS = 64  # Threads running hedgeable requests
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Rolling window of latencies (seconds) per key, with percentile lookups."""
+
+    def __init__(self, window: int = LATENCY_WINDOW, min_samples: int = MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, key: str, q: float = 0.95) -> Optional[float]:
+        """The ``q`` quantile of ``key``'s latencies, or None until ``min_samples`` are in."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class Hedger:
+    """
+    Run a request, and a duplicate on another node if it outlives the p95.
+
+    Args:
+        budget: Hedges allowed per request (e.g. 0.05 = at most one in twenty)
+        latency: Latency history the hedge delays are taken from
+    """
+
+    def __init__(self, budget: float = HEDGE_BUDGET, latency: Optional[LatencyTracker] = None):
+        self.budget = budget
+        self.latency = latency or LatencyTracker()
+        self._credit = 1.0 if budget > 0 else 0.0
+        self._stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "over_budget": 0}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0
+
+    def delay(self, key: str, scale: float = 1.0) -> Optional[float]:
+        """Seconds to wait before hedging a request tracked under ``key`` (None = do not hedge)."""
+        if not self.enabled:
+            return None
+        p95 = self.latency.percentile(key)
+        return None if p95 is None else p95 * scale
+
+    def run(self, primary: Callable[[], T], hedge: Optional[Callable[[], T]], delay: Optional[float]) -> T:
+        """
+        Return ``primary()``, racing it against ``hedge()`` once ``delay`` seconds have passed.
+
+        Without a hedge or a delay the primary runs inline. If the first
+        attempt to finish fails, the other one still gets to answer; if
+        both fail, the primary's error is raised.
+        """
+        with self._lock:
+            self._stats["requests"] += 1
+            self._credit = min(HEDGE_BURST, self._credit + self.budget)
+        if hedge is None or delay is None:
+            return primary()
+
+        # Time the delay from when the primary starts, not from submission: waiting in
+        # the pool's queue behind other requests must not count towards the p95
+        started = threading.Event()
+
+        def run_primary():
+            started.set()
+            return primary()
+
+        first = self._pool().submit(run_primary)
+        started.wait()
+        try:
+            return first.result(timeout=delay)
+        except FutureTimeout:
+            pass
+
+        with self._lock:
+            if self._credit < 1:
+                self._stats["over_budget"] += 1
+                allowed = False
+            else:
+                self._credit -= 1
+                self._stats["hedged"] += 1
+                allowed = True
+        if not allowed:
+            return first.result()
+
+        logger.info(f"🔀 Request running past p95 ({delay:.2f}s); hedging on another node")
+        second = self._pool().submit(hedge)
+        pending = {first, second}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    if future is second:
+                        with self._lock:
+                            self._stats["hedge_wins"] += 1
+                    return future.result()
+        return first.result()  # Both failed: surface the primary's error
+
+    def stats(self) -> Dict[str, float]:
+        """Request and hedge counts, with the share of hedges that beat the original request."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["hedge_win_rate"] = stats["hedge_wins"] / stats["hedged"] if stats["hedged"] else 0.0
+        return stats
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+            return self._executor
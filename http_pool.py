@@ -0,0 +1,128 @@
+"""
+Process-wide HTTP connection pool for direct Ollama calls.
+
+Calls that bypass SOLLOL's pool session (chat on a chosen node, model
+unloads, GPU placement, residency polling, sequential embedding) used to open
+a new TCP connection, or build a new ``ollama.Client``, every time. They now
+share one keep-alive ``httpx.Client``, which pools connections per host and is
+safe to use from many threads, and one cached ``ollama.Client`` per Ollama
+host. HTTP/2 is negotiated when the ``h2`` package is installed and the node
+is served over TLS; plain ``http://`` nodes use keep-alive HTTP/1.1.
+Async code gets one ``httpx.AsyncClient`` per event loop (async clients
+cannot be shared across loops) with the same limits.
+
+Pool sizes and timeouts come from the environment:
+
+- ``FLOCKPARSER_HTTP_MAX_CONNECTIONS``: open connections across all hosts (100)
+- ``FLOCKPARSER_HTTP_MAX_KEEPALIVE``: idle connections kept for reuse (32)
+- ``FLOCKPARSER_HTTP_KEEPALIVE_EXPIRY``: seconds an idle connection is kept (60)
+- ``FLOCKPARSER_HTTP_CONNECT_TIMEOUT``: connect timeout in seconds (5)
+- ``FLOCKPARSER_HTTP_TIMEOUT``: default read/write timeout in seconds (300)
+
+Per-request ``timeout=`` arguments still override the default.
+"""
+
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+import ollama
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = int(os.getenv("FLOCKPARSER_HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("FLOCKPARSER_HTTP_MAX_KEEPALIVE", "32"))
+KEEPALIVE_EXPIRY = float(os.getenv("FLOCKPARSER_HTTP_KEEPALIVE_EXPIRY", "60"))
+CONNECT_TIMEOUT = float(os.getenv("FLOCKPARSER_HTTP_CONNECT_TIMEOUT", "5"))
+REQUEST_TIMEOUT = float(os.getenv("FLOCKPARSER_HTTP_TIMEOUT", "300"))
+
+_lock = threading.Lock()
+_session: Optional[httpx.Client] = None
+_ollama_clients: Dict[str, ollama.Client] = {}
+_async_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+
+        return True
+    except ImportError:
+        return False
+
+
+def client_options() -> Dict[str, Any]:
+    """httpx client keyword arguments with the pool's limits and timeouts (also accepted by ``ollama.Client``)."""
+    return {
+        "limits": httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+        "http2": http2_available(),
+    }
+
+
+def get_session() -> httpx.Client:
+    """The shared HTTP client for direct requests to Ollama nodes."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = httpx.Client(**client_options())
+                logger.debug(f"🔌 Shared HTTP pool ready (max {MAX_CONNECTIONS} connections)")
+    return _session
+
+
+def get_async_session() -> httpx.AsyncClient:
+    """The shared async HTTP client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_sessions.get(loop)
+        if client is None or client.is_closed:
+            client = _async_sessions[loop] = httpx.AsyncClient(**client_options())
+    return client
+
+
+async def close_async_session():
+    """Close the running event loop's async client (call before the loop is closed)."""
+    with _lock:
+        client = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def ollama_client(host: Optional[str] = None) -> ollama.Client:
+    """Cached ``ollama.Client`` for ``host`` (None: ``OLLAMA_HOST`` or localhost) using the pool's limits."""
+    key = host or ""
+    client = _ollama_clients.get(key)
+    if client is None:
+        with _lock:
+            client = _ollama_clients.get(key)
+            if client is None:
+                client = _ollama_clients[key] = ollama.Client(host=host, **client_options())
+    return client
+
+
+def close():
+    """Close every pooled connection (registered to run at exit)."""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+        for client in _ollama_clients.values():
+            try:
+                client._client.close()
+            except Exception:
+                pass
+        _ollama_clients.clear()
+
+
+atexit.register(close)
@@ -0,0 +1,203 @@
+"""
+Pipelined ingestion for FlockParser: overlap extraction, chunking and embedding.
+
+Pages are pushed in as the extractor produces them and flow through bounded
+queues:
+
+    add_page() -> [pages] -> chunker thread -> [micro-batches] -> embed workers -> [results] -> writer thread
+
+The chunker emits chunks as soon as they are final, embedding starts with the
+first micro-batch rather than after the whole document is extracted, and
+vectors are written to the store as they arrive. Bounded queues give
+backpressure so a fast extractor cannot run arbitrarily far ahead of the
+embedding nodes. End-to-end time approaches the slowest stage instead of the
+sum of all stages.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()  # End-of-stream marker passed between stages
+
+
+class IngestPipeline:
+    """
+    Bounded-queue pipeline: pages -> chunks -> embedding micro-batches -> store.
+
+    Args:
+        chunker: Turns an iterable of page texts into an iterable of chunks
+            (consumed lazily, so chunks are emitted while pages still arrive)
+        embed_fn: Embeds a list of texts, returning one embedding per text
+            (an empty list for failures)
+        store_fn: Persists a list of (text, embedding) pairs
+        filter_fn: Optional; returns the texts of a batch that still need
+            embedding (e.g. not already cached)
+        batch_size: Chunks per embedding micro-batch
+        embed_workers: Micro-batches embedded concurrently
+        queue_size: Capacity of each inter-stage queue
+        max_batch_wait: Seconds a partial batch may wait for more chunks while
+            extraction is stalled before it is sent anyway
+    """
+
+    def __init__(
+        self,
+        chunker: Callable[[Iterable[str]], Iterable[str]],
+        embed_fn: Callable[[List[str]], List[Sequence[float]]],
+        store_fn: Callable[[List[Tuple[str, Sequence[float]]]], None],
+        filter_fn: Optional[Callable[[List[str]], List[str]]] = None,
+        batch_size: int = 32,
+        embed_workers: int = 2,
+        queue_size: int = 64,
+        max_batch_wait: float = 0.5,
+        name: str = "ingest",
+    ):
+        self.chunker = chunker
+        self.embed_fn = embed_fn
+        self.store_fn = store_fn
+        self.filter_fn = filter_fn
+        self.batch_size = max(1, batch_size)
+        self.max_batch_wait = max_batch_wait
+        self.name = name
+
+        self._pages: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._batches: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._results: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._pending: List[str] = []
+        self._seen = set()
+        self._input_done = False
+        self._lock = threading.Lock()
+        self.errors: List[str] = []
+        self.stats: Dict[str, float] = {
+            "pages": 0,
+            "chunks": 0,
+            "batches": 0,
+            "skipped": 0,
+            "embedded": 0,
+            "failed": 0,
+            "stored": 0,
+            "embed_seconds": 0.0,
+            "store_seconds": 0.0,
+        }
+
+        self._start_time = time.time()
+        self._chunk_thread = threading.Thread(target=self._chunk_stage, name=f"{name}-chunk", daemon=True)
+        self._embed_threads = [
+            threading.Thread(target=self._embed_stage, name=f"{name}-embed-{i}", daemon=True)
+            for i in range(max(1, embed_workers))
+        ]
+        self._store_thread = threading.Thread(target=self._store_stage, name=f"{name}-store", daemon=True)
+        for thread in [self._chunk_thread, *self._embed_threads, self._store_thread]:
+            thread.start()
+
+    def _count(self, key: str, amount: float = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _fail(self, stage: str, error: Exception):
+        logger.warning(f"⚠️ [{self.name}] {stage} stage error: {error}")
+        with self._lock:
+            self.errors.append(f"{stage}: {error}")
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def add_page(self, text: str):
+        """Feed one page of extracted text (blocks while the pipeline is saturated)."""
+        if text:
+            self._count("pages")
+            self._pages.put(text)
+
+    def finish(self) -> Dict[str, float]:
+        """Signal end of input, wait for every stage to drain and return the stats."""
+        self._pages.put(_DONE)
+        self._chunk_thread.join()
+        for _ in self._embed_threads:
+            self._batches.put(_DONE)
+        for thread in self._embed_threads:
+            thread.join()
+        self._results.put(_DONE)
+        self._store_thread.join()
+
+        self.stats["seconds"] = time.time() - self._start_time
+        return dict(self.stats)
+
+    # ------------------------------------------------------------------
+    # Stages
+    # ------------------------------------------------------------------
+
+    def _page_stream(self) -> Iterator[str]:
+        """Pages as they arrive; flushes a waiting partial batch whenever input stalls."""
+        while True:
+            try:
+                page = self._pages.get(timeout=self.max_batch_wait)
+            except queue.Empty:
+                self._flush_batch()
+                continue
+            if page is _DONE:
+                self._input_done = True
+                return
+            yield page
+
+    def _flush_batch(self):
+        if self._pending:
+            self._batches.put(self._pending)
+            self._count("batches")
+            self._pending = []
+
+    def _chunk_stage(self):
+        try:
+            for chunk in self.chunker(self._page_stream()):
+                self._count("chunks")
+                # Identical chunks only need one embedding
+                if chunk in self._seen:
+                    continue
+                self._seen.add(chunk)
+                self._pending.append(chunk)
+                if len(self._pending) >= self.batch_size:
+                    self._flush_batch()
+            self._flush_batch()
+        except Exception as e:
+            self._fail("chunk", e)
+            # Keep draining so the producer never blocks on a full queue
+            while not self._input_done and self._pages.get() is not _DONE:
+                pass
+
+    def _embed_stage(self):
+        while True:
+            batch = self._batches.get()
+            if batch is _DONE:
+                return
+            try:
+                start = time.time()
+                todo = self.filter_fn(batch) if self.filter_fn else batch
+                self._count("skipped", len(batch) - len(todo))
+                if todo:
+                    embeddings = self.embed_fn(todo)
+                    done = [(text, emb) for text, emb in zip(todo, embeddings) if emb is not None and len(emb)]
+                    self._count("embedded", len(done))
+                    self._count("failed", len(todo) - len(done))
+                    if done:
+                        self._results.put(done)
+                self._count("embed_seconds", time.time() - start)
+            except Exception as e:
+                self._count("failed", len(batch))
+                self._fail("embed", e)
+
+    def _store_stage(self):
+        while True:
+            results = self._results.get()
+            if results is _DONE:
+                return
+            try:
+                start = time.time()
+                self.store_fn(results)
+                self._count("stored", len(results))
+                self._count("store_seconds", time.time() - start)
+            except Exception as e:
+                self._fail("store", e)
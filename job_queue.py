@@ -0,0 +1,315 @@
+"""
+Persistent background job queue for long-running API work.
+
+Ingestion endpoints used to do all their processing inside the HTTP request,
+so large batches hit proxy timeouts and per-file errors disappeared. Jobs are
+now rows in a SQLite database (WAL mode, like the document index): an
+endpoint submits a job and returns its id at once, worker threads claim jobs
+by priority, and progress is written back to the row where ``/jobs/{id}`` can
+read it.
+
+Jobs survive restarts: anything still ``running`` when the process stopped is
+queued again on start-up with its last progress, so handlers can skip the
+work they had already finished. Cancellation is cooperative: a queued job is
+cancelled immediately, a running one when its handler next calls
+``JobContext.check_cancelled``.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRIORITY = 5  # Higher runs first
+TERMINAL_STATES = ("completed", "failed", "cancelled")
+JOB_COLUMNS = (
+    "id",
+    "kind",
+    "params",
+    "priority",
+    "status",
+    "progress",
+    "result",
+    "error",
+    "cancel_requested",
+    "attempts",
+    "created",
+    "started",
+    "finished",
+    "updated",
+)
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job has been cancelled."""
+
+
+class JobQueue:
+    """Jobs stored in SQLite, claimed highest priority first, then oldest first."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL UNIQUE, "
+                "kind TEXT NOT NULL, params TEXT NOT NULL, priority INTEGER NOT NULL, status TEXT NOT NULL, "
+                "progress TEXT NOT NULL DEFAULT '{}', result TEXT, error TEXT, "
+                "cancel_requested INTEGER NOT NULL DEFAULT 0, attempts INTEGER NOT NULL DEFAULT 0, "
+                "created REAL NOT NULL, started REAL, finished REAL, updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, seq)")
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _job(row) -> Dict[str, Any]:
+        job = dict(zip(JOB_COLUMNS, row))
+        job["params"] = json.loads(job["params"])
+        job["progress"] = json.loads(job["progress"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def submit(self, kind: str, params: Dict[str, Any], priority: int = DEFAULT_PRIORITY) -> str:
+        """Queue a job; returns its id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO jobs (id, kind, params, priority, status, created, updated) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(params), int(priority), now, now),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job with ``job_id``, or None."""
+        with self._lock:
+            row = (
+                self._connect().execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            )
+        return self._job(row) if row else None
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent jobs first, optionally only those in ``status``."""
+        query = f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs"
+        args: tuple = ()
+        if status:
+            query += " WHERE status = ?"
+            args = (status,)
+        with self._lock:
+            rows = self._connect().execute(query + " ORDER BY seq DESC LIMIT ?", args + (limit,)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Mark the next queued job as running and return it (None if the queue is empty)."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority DESC, seq LIMIT 1"
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', started = COALESCE(started, ?), "
+                        "attempts = attempts + 1, updated = ? WHERE id = ?",
+                        (now, now, row[0]),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(row[0]) if row else None
+
+    def update_progress(self, job_id: str, progress: Dict[str, Any]):
+        """Replace a job's progress record."""
+        with self._lock:
+            self._connect().execute(
+                "UPDATE jobs SET progress = ?, updated = ? WHERE id = ?", (json.dumps(progress), time.time(), job_id)
+            )
+
+    def finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None):
+        """Move a job to a terminal state."""
+        now = time.time()
+        with self._lock:
+            self._connect().execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ?, updated = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, now, now, job_id),
+            )
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel a job. Returns its new status: ``cancelled`` for a queued job,
+        ``running`` (with cancellation requested) for one in progress, or None
+        if the job does not exist or has already finished.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            if conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ?, updated = ? WHERE id = ? AND status = 'queued'",
+                (now, now, job_id),
+            ).rowcount:
+                return "cancelled"
+            if conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, updated = ? WHERE id = ? AND status = 'running'", (now, job_id)
+            ).rowcount:
+                return "running"
+        return None
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._connect().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def requeue_interrupted(self) -> int:
+        """
+        Queue jobs left ``running`` by a previous process again (keeping their
+        progress); those whose cancellation was pending are cancelled instead.
+        Returns the number of jobs requeued.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ?, updated = ? "
+                "WHERE status = 'running' AND cancel_requested = 1",
+                (now, now),
+            )
+            return conn.execute(
+                "UPDATE jobs SET status = 'queued', updated = ? WHERE status = 'running'", (now,)
+            ).rowcount
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class JobContext:
+    """What a handler sees of its job: params, progress reporting and cancellation checks."""
+
+    def __init__(self, queue: JobQueue, job: Dict[str, Any], report_interval: float = 0.5):
+        self.queue = queue
+        self.job_id = job["id"]
+        self.kind = job["kind"]
+        self.params = job["params"]
+        # Progress saved by an interrupted run, so a resumed handler can skip finished work
+        self.progress: Dict[str, Any] = dict(job.get("progress") or {})
+        self.report_interval = report_interval
+        self._last_report = 0.0
+
+    def report(self, force: bool = False, **fields):
+        """Merge ``fields`` into the progress record; writes are rate-limited unless ``force``."""
+        self.progress.update(fields)
+        now = time.time()
+        if force or now - self._last_report >= self.report_interval:
+            self.queue.update_progress(self.job_id, self.progress)
+            self._last_report = now
+
+    def check_cancelled(self):
+        """Raise ``JobCancelled`` if cancellation was requested."""
+        if self.queue.cancel_requested(self.job_id):
+            raise JobCancelled(self.job_id)
+
+
+class JobRunner:
+    """
+    Worker threads that run queued jobs.
+
+    Args:
+        queue: Job queue to claim from
+        handlers: Job kind -> ``handler(ctx)`` returning a JSON-serialisable result
+        workers: Number of worker threads
+        poll_interval: Seconds an idle worker waits before checking the queue again
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handlers: Dict[str, Callable[[JobContext], Any]],
+        workers: int = 2,
+        poll_interval: float = 1.0,
+    ):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        """Requeue interrupted jobs and start the workers."""
+        if self._threads:
+            return
+        resumed = self.queue.requeue_interrupted()
+        if resumed:
+            logger.info(f"🔁 Resuming {resumed} interrupted job(s)")
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True, name=f"JobWorker-{i}")
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the workers after their current job (running jobs resume on the next start)."""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wake(self):
+        """Have an idle worker check the queue now (call after submitting)."""
+        self._wake.set()
+
+    def _work(self):
+        while not self._stop.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self.run(job)
+
+    def run(self, job: Dict[str, Any]):
+        """Run one claimed job to a terminal state."""
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            self.queue.finish(job["id"], "failed", error=f"Unknown job kind: {job['kind']}")
+            return
+
+        ctx = JobContext(self.queue, job)
+        logger.info(f"⚙️  Job {job['id'][:8]} ({job['kind']}) started")
+        try:
+            result = handler(ctx)
+        except JobCancelled:
+            self.queue.update_progress(job["id"], ctx.progress)
+            self.queue.finish(job["id"], "cancelled")
+            logger.info(f"🛑 Job {job['id'][:8]} cancelled")
+        except Exception as e:
+            self.queue.update_progress(job["id"], ctx.progress)
+            self.queue.finish(job["id"], "failed", error=str(e))
+            logger.error(f"❌ Job {job['id'][:8]} failed: {e}")
+        else:
+            self.queue.update_progress(job["id"], ctx.progress)
+            self.queue.finish(job["id"], "completed", result=result)
+            logger.info(f"✅ Job {job['id'][:8]} completed")
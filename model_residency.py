@@ -0,0 +1,139 @@
+"""
+Background tracker of which models are loaded on which Ollama nodes.
+
+Chat used to ask every node's ``/api/ps`` in turn before each answer, so a
+slow or dead node added seconds before generation started. The tracker polls
+all nodes concurrently on a background thread and keeps a model -> nodes map
+with the time each placement was last confirmed; the chat path and request
+routing read the map without touching the network.
+
+Requests that succeed (or models that are unloaded) update the map at once,
+so it does not lag a full interval behind what FlockParser itself did.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from http_pool import get_session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 5.0  # Seconds between /api/ps sweeps
+DEFAULT_POLL_TIMEOUT = 2.0  # Per-node /api/ps timeout
+
+
+def canonical_model(name: str) -> str:
+    """Model name as /api/ps reports it (an untagged name means ``:latest``)."""
+    return name if ":" in name else f"{name}:latest"
+
+
+class ModelResidencyTracker:
+    """
+    Model -> {node URL: last confirmed} map refreshed from ``/api/ps``.
+
+    Args:
+        nodes: Callable returning the current node URLs (``http://host:port``)
+        interval: Seconds between polls
+        timeout: Per-node request timeout
+        max_workers: Nodes polled in parallel
+    """
+
+    def __init__(
+        self,
+        nodes: Callable[[], Iterable[str]],
+        interval: float = DEFAULT_POLL_INTERVAL,
+        timeout: float = DEFAULT_POLL_TIMEOUT,
+        max_workers: int = 16,
+    ):
+        self._nodes = nodes
+        self.interval = interval
+        self.timeout = timeout
+        self.max_workers = max(1, max_workers)
+        self._placement: Dict[str, Dict[str, float]] = {}
+        self._unreachable: Set[str] = set()
+        self.last_poll: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _loaded_models(self, node_url: str) -> Optional[Set[str]]:
+        """Models loaded on ``node_url``, or None if it did not answer."""
+        try:
+            response = get_session().get(f"{node_url}/api/ps", timeout=self.timeout)
+            if response.status_code != 200:
+                return None
+            return {canonical_model(m.get("name", "")) for m in response.json().get("models", []) if m.get("name")}
+        except Exception as e:
+            logger.debug(f"/api/ps failed on {node_url}: {e}")
+            return None
+
+    def poll(self) -> Dict[str, List[str]]:
+        """Query every node now (concurrently) and return the refreshed model -> nodes map."""
+        node_urls = list(self._nodes())
+        if node_urls:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(node_urls))) as executor:
+                results = dict(zip(node_urls, executor.map(self._loaded_models, node_urls)))
+        else:
+            results = {}
+
+        now = time.time()
+        with self._lock:
+            placement: Dict[str, Dict[str, float]] = {}
+            for node_url, models in results.items():
+                for model in models or ():
+                    placement.setdefault(model, {})[node_url] = now
+            self._placement = placement
+            self._unreachable = {node_url for node_url, models in results.items() if models is None}
+            self.last_poll = now
+        return self.placement()
+
+    def nodes_with(self, model: str, max_age: Optional[float] = None) -> List[str]:
+        """Nodes holding ``model``, most recently confirmed first (optionally only those seen within ``max_age`` s)."""
+        now = time.time()
+        with self._lock:
+            seen = self._placement.get(canonical_model(model), {})
+            nodes = [(ts, node) for node, ts in seen.items() if max_age is None or now - ts <= max_age]
+        return [node for ts, node in sorted(nodes, reverse=True)]
+
+    def placement(self) -> Dict[str, List[str]]:
+        """Model -> nodes holding it."""
+        with self._lock:
+            return {model: list(nodes) for model, nodes in self._placement.items()}
+
+    def unreachable(self) -> Set[str]:
+        """Nodes that did not answer the last poll."""
+        with self._lock:
+            return set(self._unreachable)
+
+    def mark_loaded(self, model: str, node_url: str):
+        """Record that ``model`` is now loaded on ``node_url`` (e.g. after a request there succeeded)."""
+        with self._lock:
+            self._placement.setdefault(canonical_model(model), {})[node_url] = time.time()
+
+    def mark_unloaded(self, model: str, node_url: str):
+        with self._lock:
+            self._placement.get(canonical_model(model), {}).pop(node_url, None)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning(f"⚠️  Model residency poll failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start polling in the background (the first poll runs immediately)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="ModelResidencyTracker")
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout + 1)
+            self._thread = None
@@ -0,0 +1,420 @@
+"""
+PDF text extraction, kept free of the CLI's start-up side effects.
+
+``ExtractionPool`` workers start with forkserver (or spawn), which imports the
+module of the function they run. The extraction code used to live in
+``flockparsecli``, so every worker re-ran the CLI's import: the ChromaDB
+client, the Redis probe, SOLLOL set-up and the ANN index load, just to run
+PyMuPDF/PyPDF2/OCR. This module imports only the PDF and OCR libraries, and
+the pools submit its entry points (``extract_pdf``, ``extract_page_range``,
+and ``extract_text_with_pdfplumber`` for the API server's uploads).
+``flockparsecli`` re-exports ``extract_text_from_pdf`` for its callers.
+"""
+
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import time
+
+from PyPDF2 import PdfReader
+
+from extraction_pool import ExtractionPool, default_workers
+from logging_config import setup_logging
+
+logger = setup_logging()
+
+# Worker processes extracting PDFs in process_directory (1 = sequential); embedding stays in the CLI process
+EXTRACTION_WORKERS = int(os.getenv("FLOCKPARSER_EXTRACTION_WORKERS", "0")) or default_workers()
+PAGE_SHARD_MIN_PAGES = 200  # PDFs with at least this many pages are split into page ranges across workers
+PAGE_SHARD_SIZE = 50  # Pages per range handed to one worker
+OCR_MIN_PAGE_CHARS = 50  # Pages whose text layer has fewer characters than this are OCR'd
+
+
+def clean_extracted_text(text):
+    """Clean extracted text by normalizing Unicode and fixing common LaTeX/PDF extraction issues."""
+    import re
+    import unicodedata
+
+    if not text:
+        return text
+
+    # Step 1: Normalize Unicode (convert composed chars to decomposed and back)
+    text = unicodedata.normalize("NFKC", text)
+
+    # Step 2: Fix common Unicode escape sequences that appear as literal text
+    # Replace \uXXXX patterns with actual Unicode characters
+    def replace_unicode_escapes(match):
+        try:
+            code = match.group(1)
+            return chr(int(code, 16))
+        except:
+            return match.group(0)
+
+    text = re.sub(r"\\u([0-9a-fA-F]{4})", replace_unicode_escapes, text)
+    text = re.sub(r"\\x([0-9a-fA-F]{2})", replace_unicode_escapes, text)
+
+    # Step 3: Clean up common LaTeX remnants that get corrupted
+    # Replace common Greek letter codes with their actual Unicode
+    greek_map = {
+        r"\\alpha": "α",
+        r"\\beta": "β",
+        r"\\gamma": "γ",
+        r"\\delta": "δ",
+        r"\\epsilon": "ε",
+        r"\\zeta": "ζ",
+        r"\\eta": "η",
+        r"\\theta": "θ",
+        r"\\iota": "ι",
+        r"\\kappa": "κ",
+        r"\\lambda": "λ",
+        r"\\mu": "μ",
+        r"\\nu": "ν",
+        r"\\xi": "ξ",
+        r"\\pi": "π",
+        r"\\rho": "ρ",
+        r"\\sigma": "σ",
+        r"\\tau": "τ",
+        r"\\upsilon": "υ",
+        r"\\phi": "φ",
+        r"\\chi": "χ",
+        r"\\psi": "ψ",
+        r"\\omega": "ω",
+        # Capital letters
+        r"\\Gamma": "Γ",
+        r"\\Delta": "Δ",
+        r"\\Theta": "Θ",
+        r"\\Lambda": "Λ",
+        r"\\Xi": "Ξ",
+        r"\\Pi": "Π",
+        r"\\Sigma": "Σ",
+        r"\\Phi": "Φ",
+        r"\\Psi": "Ψ",
+        r"\\Omega": "Ω",
+    }
+
+    for latex, unicode_char in greek_map.items():
+        text = text.replace(latex, unicode_char)
+
+    # Step 4: Fix spacing issues - add space after periods if missing
+    text = re.sub(r"\.([A-Z])", r". \1", text)
+
+    # Step 5: Remove excessive whitespace
+    text = re.sub(r"[ \t]+", " ", text)  # Multiple spaces to single space
+    text = re.sub(r"\n{3,}", "\n\n", text)  # Multiple newlines to double newline
+
+    return text.strip()
+
+
+def _pdf_page_count(pdf_path_str):
+    """Number of pages in a PDF, or 0 if it cannot be determined."""
+    try:
+        import fitz  # PyMuPDF
+
+        with fitz.open(pdf_path_str) as doc:
+            return len(doc)
+    except Exception:
+        pass
+    try:
+        return len(PdfReader(pdf_path_str).pages)
+    except Exception:
+        pass
+    try:
+        from pdf2image import pdfinfo_from_path
+
+        return int(pdfinfo_from_path(pdf_path_str)["Pages"])
+    except Exception:
+        return 0
+
+
+def _ocr_page(pdf_path_str, page_num):
+    """OCR one page, rendering only that page's 300-DPI image."""
+    from pdf2image import convert_from_path
+    import pytesseract
+
+    images = convert_from_path(pdf_path_str, dpi=300, first_page=page_num + 1, last_page=page_num + 1)
+    return "".join(pytesseract.image_to_string(image, lang="eng") for image in images).strip()
+
+
+def _routed_page_records(pdf_path_str, first, last):
+    """
+    Extract pages [first, last), choosing the method page by page.
+
+    Each page is read from the native text layer (PyMuPDF, else PyPDF2); pages
+    with fewer than ``OCR_MIN_PAGE_CHARS`` characters are OCR'd individually.
+    Returns one ``{"text", "method", "seconds"}`` record per page.
+    """
+    doc = None
+    try:
+        import fitz  # PyMuPDF - better word spacing preservation
+
+        doc = fitz.open(pdf_path_str)
+        method, page_count = "pymupdf", len(doc)
+
+        def read_page(page_num):
+            # get_text() with "text" mode preserves word spacing better
+            page_text = doc[page_num].get_text("text")
+            # Clean the text immediately after extraction
+            return clean_extracted_text(page_text) if page_text else ""
+
+    except Exception as e:
+        if doc is not None:
+            doc.close()
+            doc = None
+        if not isinstance(e, ImportError):
+            logger.warning(f"⚠️ PyMuPDF could not open the PDF ({e}), falling back to PyPDF2...")
+        reader = PdfReader(pdf_path_str)
+        method, page_count = "pypdf2", len(reader.pages)
+
+        def read_page(page_num):
+            return reader.pages[page_num].extract_text() or ""
+
+    records = []
+    ocr_available = True
+    try:
+        for page_num in range(first, min(last, page_count)):
+            start = time.time()
+            page_method = method
+            try:
+                page_text = read_page(page_num)
+            except Exception as e:
+                logger.warning(f"⚠️ {method}: could not read page {page_num + 1}: {e}")
+                page_text = ""
+
+            # Little or no text layer: probably a scanned page
+            if len(page_text.strip()) < OCR_MIN_PAGE_CHARS and ocr_available:
+                try:
+                    ocr_text = _ocr_page(pdf_path_str, page_num)
+                    if len(ocr_text) > len(page_text.strip()):
+                        page_text, page_method = ocr_text, "ocr"
+                except Exception as e:
+                    logger.warning(f"⚠️ OCR unavailable, keeping the text layer for sparse pages: {e}")
+                    ocr_available = False
+
+            records.append({"text": page_text, "method": page_method, "seconds": time.time() - start})
+    finally:
+        if doc is not None:
+            doc.close()
+    return records
+
+
+def _ocr_page_records(pdf_path_str, first, last):
+    """OCR every page in [first, last), rendering a single page image at a time."""
+    records = []
+    for page_num in range(first, last):
+        logger.info(f"   OCR processing page {page_num + 1}...")
+        start = time.time()
+        records.append({"text": _ocr_page(pdf_path_str, page_num), "method": "ocr", "seconds": time.time() - start})
+    return records
+
+
+_PAGE_EXTRACTORS = {"routed": _routed_page_records, "ocr": _ocr_page_records}
+
+
+def extract_page_range(shard):
+    """Worker-process entry point: extract one (method, path, first, last) page range."""
+    method, pdf_path_str, first, last = shard
+    return _PAGE_EXTRACTORS[method](pdf_path_str, first, last)
+
+
+def _extract_pages(method, pdf_path_str, page_count, on_page=None):
+    """
+    Yield ``(page_index, record)`` for every page, in order, using ``method``.
+
+    Large PDFs (``PAGE_SHARD_MIN_PAGES``+) are split into ``PAGE_SHARD_SIZE``
+    page ranges extracted in parallel worker processes and reassembled in page
+    order as ranges complete. Inside a worker process (e.g. process_directory's
+    pool) pages are always extracted in-process to avoid nested pools.
+    """
+    workers = min(EXTRACTION_WORKERS, -(-page_count // PAGE_SHARD_SIZE))
+    if page_count < PAGE_SHARD_MIN_PAGES or workers < 2 or multiprocessing.parent_process() is not None:
+        # Extract range by range so on_page still sees pages as they are produced
+        for first in range(0, page_count, PAGE_SHARD_SIZE):
+            last = min(first + PAGE_SHARD_SIZE, page_count)
+            for offset, record in enumerate(_PAGE_EXTRACTORS[method](pdf_path_str, first, last)):
+                if on_page and record["text"]:
+                    on_page(record["text"])
+                yield first + offset, record
+        return
+
+    shards = [
+        (method, pdf_path_str, first, min(first + PAGE_SHARD_SIZE, page_count))
+        for first in range(0, page_count, PAGE_SHARD_SIZE)
+    ]
+    logger.info(f"🧩 Splitting {page_count} pages into {len(shards)} ranges across {workers} worker processes")
+
+    finished = {}
+    next_first = 0
+    with ExtractionPool(workers) as pool:
+        for (_, _, first, last), records, error in pool.map_unordered(extract_page_range, shards):
+            if error is not None:
+                logger.warning(f"⚠️ Pages {first + 1}-{last} failed to extract: {error}")
+                records = [{"text": "", "method": "failed", "seconds": 0.0}] * (last - first)
+            finished[first] = (last, records)
+
+            # Emit every range that is now contiguous with what was already emitted
+            while next_first in finished:
+                last, records = finished.pop(next_first)
+                for offset, record in enumerate(records):
+                    if on_page and record["text"]:
+                        on_page(record["text"])
+                    yield next_first + offset, record
+                next_first = last
+
+
+def extract_text_from_pdf(pdf_path, on_page=None, page_report=None):
+    """
+    Extracts text from a PDF file, choosing the extraction method page by page.
+
+    Pages come from the native text layer where one exists; only pages whose
+    text is sparser than ``OCR_MIN_PAGE_CHARS`` are OCR'd. pdftotext and a full
+    OCR pass remain as fallbacks when the text layer cannot be read at all.
+
+    If ``on_page`` is given it is called with each page's text as soon as it is
+    extracted, so downstream work can start before the whole document is done.
+    If ``page_report`` (a list) is given, one ``{"page", "method", "chars",
+    "seconds"}`` entry per page is appended to it.
+    """
+    pdf_path_str = str(pdf_path)
+    extracted_text = ""
+    report = []
+
+    def collect(method, page_count):
+        pages = []
+        for page_num, record in _extract_pages(method, pdf_path_str, page_count, on_page):
+            pages.append(record["text"])
+            report.append(
+                {
+                    "page": page_num + 1,
+                    "method": record["method"],
+                    "chars": len(record["text"]),
+                    "seconds": round(record["seconds"], 4),
+                }
+            )
+            if not record["text"]:
+                logger.warning(f"⚠️ {record['method']}: No text extracted from page {page_num + 1}")
+        # Form feeds keep page boundaries for the page markers added below
+        return "\f".join(pages)
+
+    # Method 1: native text layer per page, OCR only for sparse (scanned) pages
+    try:
+        page_count = _pdf_page_count(pdf_path_str)
+        logger.info(
+            f"🔍 Extracting {page_count} page(s) from the text layer "
+            f"(OCR for pages under {OCR_MIN_PAGE_CHARS} characters)..."
+        )
+        routed_text = collect("routed", page_count)
+        if routed_text.strip():
+            ocr_pages = sum(1 for page in report if page["method"] == "ocr")
+            logger.info(f"✅ Extracted {len(routed_text)} characters ({ocr_pages}/{len(report)} page(s) via OCR)")
+            extracted_text = routed_text
+        else:
+            logger.warning("⚠️ Text layer extraction yielded no text, trying alternative method...")
+    except Exception as e:
+        logger.warning(f"⚠️ Text layer extraction error: {e}")
+
+    # Method 2: If the text layer could not be read, try pdftotext if available
+    if not extracted_text:
+        try:
+            logger.info("🔍 Attempting extraction with pdftotext (if installed)...")
+            with tempfile.NamedTemporaryFile(suffix=".txt") as temp:
+                # Try to use pdftotext (from poppler-utils) if installed
+                start = time.time()
+                result = subprocess.run(
+                    ["pdftotext", "-layout", pdf_path_str, temp.name], capture_output=True, text=True
+                )
+
+                if result.returncode == 0:
+                    with open(temp.name, "r", encoding="utf-8") as f:
+                        pdftotext_text = f.read()
+
+                    if pdftotext_text.strip():
+                        logger.info(f"✅ pdftotext successfully extracted {len(pdftotext_text)} characters")
+                        extracted_text = pdftotext_text
+                        pages = pdftotext_text.split("\f")
+                        seconds = (time.time() - start) / len(pages)
+                        report = [
+                            {"page": i, "method": "pdftotext", "chars": len(text), "seconds": round(seconds, 4)}
+                            for i, text in enumerate(pages, 1)
+                        ]
+                        if on_page:
+                            for page_text in pages:
+                                on_page(page_text)
+                    else:
+                        logger.warning("⚠️ pdftotext extraction yielded no text")
+                else:
+                    logger.warning(f"⚠️ pdftotext error: {result.stderr}")
+        except FileNotFoundError:
+            logger.warning("⚠️ pdftotext not found on system, skipping alternative extraction")
+        except Exception as e:
+            logger.warning(f"⚠️ Alternative extraction error: {e}")
+
+    # Method 3: If still no text, OCR every page (the text layer was unreadable)
+    if not extracted_text:
+        try:
+            logger.info("🔍 Attempting OCR extraction (for scanned/image-based PDFs)...")
+            import pdf2image  # noqa: F401 - fail early if OCR libraries are missing
+            import pytesseract  # noqa: F401
+
+            # Pages are rendered and recognised one at a time, so memory stays flat
+            page_count = _pdf_page_count(pdf_path_str)
+            logger.info(f"📄 Running OCR on {page_count} page(s)")
+
+            report = []
+            ocr_text = collect("ocr", page_count)
+            if ocr_text.strip():
+                logger.info(f"✅ OCR successfully extracted {len(ocr_text)} characters")
+                extracted_text = ocr_text
+            else:
+                logger.warning("⚠️ OCR extraction yielded no text")
+
+        except ImportError:
+            logger.warning("⚠️ OCR libraries not available (pdf2image, pytesseract)")
+            logger.info("   Install with: pip install pdf2image pytesseract")
+            logger.info("   Also need: sudo apt-get install tesseract-ocr poppler-utils")
+        except Exception as e:
+            logger.warning(f"⚠️ OCR extraction error: {e}")
+
+    # Check if we have any text after trying all methods
+    if not extracted_text:
+        logger.error("❌ Failed to extract text with all available methods")
+        return ""
+
+    if page_report is not None:
+        page_report.extend(report)
+
+    # Process the text to make it more readable
+    processed_text = ""
+    pages = extracted_text.split("\f")  # Form feed character often separates PDF pages
+
+    for page_num, page_content in enumerate(pages):
+        if page_content.strip():
+            processed_text += f"--- Page {page_num + 1} ---\n\n{page_content.strip()}\n\n"
+
+    return processed_text.strip()
+
+
+def extract_text_with_pdfplumber(file_path):
+    """Text of every page via pdfplumber, OCR'ing pages without a text layer (the API server's upload extractor)."""
+    import pdfplumber
+    import pytesseract
+    from PIL import Image
+
+    text = []
+    with pdfplumber.open(file_path) as pdf:
+        for page in pdf.pages:
+            extracted_text = page.extract_text()
+            if extracted_text:
+                text.append(extracted_text)
+            else:
+                # OCR for scanned images
+                image = page.to_image().original
+                ocr_text = pytesseract.image_to_string(Image.open(image))
+                text.append(ocr_text)
+    return "\n".join(text)
+
+
+def extract_pdf(pdf_path):
+    """Worker-process entry point for whole PDFs: (text, per-page report)."""
+    page_report = []
+    return extract_text_from_pdf(pdf_path, page_report=page_report), page_report
@@ -9,6 +9,10 @@ Based on your observation: Desktop is 6x faster than laptop
 - Desktop: 6.0 chunks/sec
 - Laptop: 1.0 chunks/sec
 - Distribution: Desktop ~85%, Laptop ~15%
+
+Optional: FlockParser measures each node's chunks/sec while embedding and
+saves the rates to knowledge_base/node_throughput.json. Primed values only
+seed nodes that have not been measured yet.
 """
 
 import sys
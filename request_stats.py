@@ -0,0 +1,240 @@
+"""
+Lock-light request statistics for the pool's request hot path.
+
+Every request used to take the pool lock four or more times (totals,
+per-node dict, running average, active count) and format an INFO line on
+success, which showed up in profiles with 16 embedding workers. Now:
+
+- Each thread counts into its own shard: a request counter plus a
+  fixed-slot list per node (successes, latency sum, active requests). Only
+  the owning thread writes a shard, so recording takes no lock. A lock is
+  taken once per thread, to register its shard.
+- Readers merge the shards. ``publish`` folds the change since the last
+  publish into ``pool.stats`` under a single pool-lock acquisition. A
+  background thread calls it every ``PUBLISH_INTERVAL`` seconds, so totals,
+  success counts and latencies in those dicts lag by at most that much.
+- ``active_requests`` is the exception: SOLLOL's ``_select_node`` routes on
+  it, so ``started``/``finished`` also bump the node's ``pool.stats`` entry
+  directly (one unlocked dict read-modify-write each). Two threads updating
+  the same node at the same instant can lose one of the bumps; ``publish``
+  overwrites the entry with the exact shard count, so such an error lasts at
+  most ``PUBLISH_INTERVAL`` and is accepted.
+- ``LogThrottle`` checks the log level before building a message and emits
+  at most one line per key per interval.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PUBLISH_INTERVAL = 0.25  # Seconds between folds into pool.stats
+
+# Slots of the per-node counter struct
+SUCCEEDED, LATENCY_MS, ACTIVE = range(3)
+NODE_SLOTS = 3
+
+
+def node_defaults() -> Dict[str, float]:
+    """A fresh ``stats["node_performance"]`` entry."""
+    return {
+        "total_requests": 0,
+        "failed_requests": 0,
+        "latency_ms": 0.0,
+        "success_rate": 1.0,
+        "available": True,
+        "active_requests": 0,
+    }
+
+
+class _Shard:
+    """Counters written by one thread only."""
+
+    __slots__ = ("thread", "requests", "nodes")
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.requests = 0
+        self.nodes: Dict[str, List[float]] = {}
+
+
+class RequestStats:
+    """Per-thread request counters, merged on read."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: Tuple[_Shard, ...] = ()
+        self._retired = _Shard()  # Counts of threads that have exited
+        self._published: Tuple[int, Dict[str, List[float]]] = (0, {})
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards = self._shards + (shard,)
+        return shard
+
+    def _slots(self, node_key: str) -> List[float]:
+        nodes = self._shard().nodes
+        slots = nodes.get(node_key)
+        if slots is None:
+            slots = nodes[node_key] = [0, 0.0, 0]
+        return slots
+
+    # Hot path: no locks
+
+    def request(self):
+        self._shard().requests += 1
+
+    def started(self, node_key: str, perf: Optional[Dict[str, Any]] = None):
+        """Count a request in flight on ``node_key``, and in its ``pool.stats`` entry ``perf`` when given."""
+        self._slots(node_key)[ACTIVE] += 1
+        if perf is not None:
+            perf["active_requests"] = perf.get("active_requests", 0) + 1
+
+    def finished(self, node_key: str, perf: Optional[Dict[str, Any]] = None):
+        self._slots(node_key)[ACTIVE] -= 1
+        if perf is not None:
+            perf["active_requests"] = max(0, perf.get("active_requests", 0) - 1)
+
+    def succeeded(self, node_key: str, latency_ms: float):
+        slots = self._slots(node_key)
+        slots[SUCCEEDED] += 1
+        slots[LATENCY_MS] += latency_ms
+
+    # Readers
+
+    def merged(self) -> Tuple[int, Dict[str, List[float]]]:
+        """Request total and per-node ``[succeeded, latency_ms_sum, active]`` across all threads."""
+        requests = self._retired.requests
+        nodes = {key: list(slots) for key, slots in list(self._retired.nodes.items())}
+        for shard in self._shards:
+            requests += shard.requests
+            for key, slots in list(shard.nodes.items()):
+                merged = nodes.setdefault(key, [0, 0.0, 0])
+                for slot in range(NODE_SLOTS):
+                    merged[slot] += slots[slot]
+        return requests, nodes
+
+    def node(self, node_key: str) -> List[float]:
+        """Merged ``[succeeded, latency_ms_sum, active]`` for one node."""
+        merged = [0, 0.0, 0]
+        for shard in (self._retired,) + self._shards:
+            slots = shard.nodes.get(node_key)
+            if slots is not None:
+                for slot in range(NODE_SLOTS):
+                    merged[slot] += slots[slot]
+        return merged
+
+    def active(self, node_key: str) -> int:
+        return int(self.node(node_key)[ACTIVE])
+
+    def average_latency_ms(self, node_key: str) -> float:
+        succeeded, latency_ms, _ = self.node(node_key)
+        return latency_ms / succeeded if succeeded else 0.0
+
+    def _retire_dead_shards(self):
+        """Fold shards of exited threads into one (caller holds ``_lock``)."""
+        dead = [shard for shard in self._shards if not shard.thread.is_alive()]
+        if not dead:
+            return
+        for shard in dead:
+            self._retired.requests += shard.requests
+            for key, slots in shard.nodes.items():
+                retired = self._retired.nodes.setdefault(key, [0, 0.0, 0])
+                for slot in range(NODE_SLOTS):
+                    retired[slot] += slots[slot]
+        self._shards = tuple(shard for shard in self._shards if shard.thread.is_alive())
+
+    def publish(self, pool):
+        """Fold everything recorded since the last publish into ``pool.stats`` (one pool-lock acquisition)."""
+        with self._lock:
+            self._retire_dead_shards()
+            requests, nodes = self.merged()
+            published_requests, published_nodes = self._published
+            self._published = (requests, nodes)
+
+        node_performance = pool.stats.get("node_performance", {})
+        deltas = {}
+        for key, slots in nodes.items():
+            before = published_nodes.get(key, (0, 0.0, 0))
+            delta = [slots[SUCCEEDED] - before[SUCCEEDED], slots[LATENCY_MS] - before[LATENCY_MS]]
+            # Active counts are absolute: this also repairs a bump lost on the hot path
+            active = max(0, int(slots[ACTIVE]))
+            if any(delta) or node_performance.get(key, {}).get("active_requests", 0) != active:
+                deltas[key] = delta + [active]
+        if requests == published_requests and not deltas:
+            return
+
+        with pool._lock:
+            pool.stats["total_requests"] += requests - published_requests
+            node_performance = pool.stats.setdefault("node_performance", {})
+            for key, (succeeded, latency_ms, active) in deltas.items():
+                perf = node_performance.setdefault(key, node_defaults())
+                if succeeded:
+                    previous = perf.get("total_requests", 0)
+                    perf["latency_ms"] = (perf.get("latency_ms", 0.0) * previous + latency_ms) / (previous + succeeded)
+                    perf["total_requests"] = previous + succeeded
+                    perf["success_rate"] = (perf["total_requests"] - perf.get("failed_requests", 0)) / perf[
+                        "total_requests"
+                    ]
+                    pool.stats["successful_requests"] += succeeded
+                    pool.stats["nodes_used"][key] = pool.stats["nodes_used"].get(key, 0) + succeeded
+                perf["active_requests"] = active
+
+    def start(self, pool, interval: float = PUBLISH_INTERVAL):
+        """Publish into ``pool.stats`` every ``interval`` seconds on a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.publish(pool)
+                except Exception as e:
+                    logger.debug(f"Request stats publish failed: {e}")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, daemon=True, name="RequestStatsPublisher")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+
+class LogThrottle:
+    """
+    Level-guarded, rate-limited logging.
+
+    A message is only built (by calling ``message()``) when ``logger`` would
+    emit at ``level`` and ``interval`` seconds have passed since the last line
+    for the same key. Lines report how many were skipped in between.
+    """
+
+    def __init__(self, log: logging.Logger, level: int = logging.INFO, interval: float = 5.0):
+        self.log = log
+        self.level = level
+        self.interval = interval
+        self._last: Dict[str, float] = {}
+        self._skipped: Dict[str, int] = {}
+
+    def __call__(self, key: str, message: Callable[[], str]) -> bool:
+        if not self.log.isEnabledFor(self.level):
+            return False
+        now = time.monotonic()
+        if now - self._last.get(key, float("-inf")) < self.interval:
+            self._skipped[key] = self._skipped.get(key, 0) + 1
+            return False
+        self._last[key] = now
+        skipped = self._skipped.pop(key, 0)
+        self.log.log(self.level, message() + (f" (+{skipped} more since last report)" if skipped else ""))
+        return True
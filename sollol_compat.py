@@ -4,6 +4,7 @@ Extends SOLLOL's OllamaPool with FlockParser's expected API.
 """
 
 import atexit
+import functools
 import json
 import logging
 import os
@@ -16,6 +17,12 @@ from sollol import OllamaPool
 from sollol.discovery import discover_ollama_nodes
 from sollol.network_observer import log_ollama_error, log_ollama_request, log_ollama_response
 
+from async_embedder import async_embedder_for
+from embed_batcher import EmbedBatcher, NodeThroughput
+from hedging import Hedger
+from model_residency import DEFAULT_POLL_INTERVAL, ModelResidencyTracker
+from request_stats import LogThrottle, RequestStats, node_defaults
+
 logger = logging.getLogger(__name__)
 
 
@@ -143,6 +150,86 @@ def _normalize_operation_name(operation: str) -> str:
     return op
 
 
+def _node_url(node: Dict[str, Any]) -> str:
+    return f"http://{node['host']}:{node['port']}"
+
+
+def _select_resident_node(pool, model: Optional[str], exclude=()) -> Optional[Dict[str, Any]]:
+    """
+    Pick a node that already has ``model`` loaded, when only some nodes do.
+
+    Sending the request there skips a cold model load. Returns the least busy
+    such node, or None to leave the choice to SOLLOL (no residency tracker,
+    model loaded everywhere or nowhere, or all holders already tried).
+    """
+    tracker = getattr(pool, "model_residency", None)
+    if tracker is None or not model:
+        return None
+    resident = set(tracker.nodes_with(model))
+    holders = [node for node in pool.nodes if _node_url(node) in resident]
+    if not holders or len(holders) == len(pool.nodes):
+        return None
+    candidates = [node for node in holders if f"{node['host']}:{node['port']}" not in exclude]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda node: _active_requests(pool, f"{node['host']}:{node['port']}"))
+
+
+# At most one "request succeeded" line per node every few seconds (skipped entirely below INFO)
+_success_log = LogThrottle(logger, logging.INFO, interval=5.0)
+
+
+def _request_stats(pool) -> RequestStats:
+    """The pool's lock-free request counters (created, with their publisher thread, on first use)."""
+    stats = getattr(pool, "request_stats", None)
+    if stats is None:
+        with pool._lock:
+            stats = getattr(pool, "request_stats", None)
+            if stats is None:
+                stats = pool.request_stats = RequestStats()
+                stats.start(pool)
+    return stats
+
+
+def _active_requests(pool, node_key: str) -> int:
+    """Requests in flight on ``node_key`` (kept live in ``pool.stats``, the same count SOLLOL's ``_select_node`` reads)."""
+    return pool.stats.get("node_performance", {}).get(node_key, {}).get("active_requests", 0)
+
+
+class NodeRequestError(RuntimeError):
+    """A node answered with a non-200 status (already recorded in the stats)."""
+
+
+def _hedge_key(node_key: str, endpoint: str, model: Optional[str]) -> str:
+    """Latency history key: one distribution per node, endpoint and model."""
+    return f"{node_key}{endpoint}:{model or ''}"
+
+
+def _hedge_node(pool, model: Optional[str], exclude=()) -> Optional[Dict[str, Any]]:
+    """
+    Node to send a hedged duplicate to: not yet tried, preferring nodes that
+    hold the model, are not flagged VRAM-exhausted and have the fewest active requests.
+    """
+    perf = pool.stats.get("node_performance", {})
+    tracker = getattr(pool, "model_residency", None)
+    resident = set(tracker.nodes_with(model)) if tracker is not None and model else set()
+    candidates = [node for node in pool.nodes if f"{node['host']}:{node['port']}" not in exclude]
+    if not candidates:
+        return None
+
+    def rank(node):
+        node_key = f"{node['host']}:{node['port']}"
+        node_perf = perf.get(node_key, {})
+        return (
+            _node_url(node) not in resident,
+            bool(node_perf.get("vram_exhausted")),
+            _active_requests(pool, node_key),
+            node_perf.get("latency_ms", 0.0),
+        )
+
+    return min(candidates, key=rank)
+
+
 def _make_request_with_metadata(
     self, endpoint: str, data: Dict[str, Any], priority: int = 5, timeout: float = 300.0
 ) -> Any:
@@ -157,113 +244,72 @@ def _make_request_with_metadata(
             logger.debug(f"Cache hit for {endpoint} (key={cache_key[:16]}...)")
             return cached_response
 
-    with self._lock:
-        self.stats["total_requests"] += 1
+    stats = _request_stats(self)
+    stats.request()
 
     errors = []
     routing_decision = None
     operation = _normalize_operation_name(endpoint.split("/")[-1])
+    tried = set()
 
-    for attempt in range(len(self.nodes)):
-        _diag_log_observer("request")
-        node, decision = self._select_node(payload=data, priority=priority)
-        if decision:
-            routing_decision = decision
+    hedger = getattr(self, "hedger", None)
 
+    def send(node: Dict[str, Any]) -> Any:
+        """One attempt on ``node``; a failure is recorded in the stats and re-raised."""
         node_key = f"{node['host']}:{node['port']}"
         url = f"http://{node['host']}:{node['port']}{endpoint}"
         requested_model = data.get("model")
         existing_meta_map = getattr(self, "_flockparser_last_metadata", None)
         existing_meta = existing_meta_map.get(node_key, {}) if existing_meta_map else {}
 
-        with self._lock:
-            self.stats.setdefault("node_performance", {})
-            perf = self.stats["node_performance"].setdefault(
-                node_key,
-                {
-                    "total_requests": 0,
-                    "failed_requests": 0,
-                    "latency_ms": 0.0,
-                    "success_rate": 1.0,
-                    "available": True,
-                    "active_requests": 0,
-                },
-            )
-            perf["active_requests"] = perf.get("active_requests", 0) + 1
+        # No pool lock here: counters go to this thread's shard and the
+        # metadata writes are single dict operations (atomic under the GIL)
+        perf = self.stats.setdefault("node_performance", {}).setdefault(node_key, node_defaults())
+        stats.started(node_key, perf)
 
-            if requested_model:
-                perf["last_model"] = requested_model
-            perf["last_operation"] = operation
+        if requested_model:
+            perf["last_model"] = requested_model
+        perf["last_operation"] = operation
 
-            # Maintain compatibility metadata map (mirrors SynapticLlamas payloads)
-            meta = getattr(self, "_flockparser_last_metadata", None)
-            if meta is None:
-                meta = {}
-                self._flockparser_last_metadata = meta
-            # Only update metadata if we have a real model (don't persist "unknown")
-            tracked_model = requested_model or perf.get("last_model") or existing_meta.get("model")
-            if tracked_model:  # Only write if we have a real model value
-                meta[node_key] = {"model": tracked_model, "operation": operation}
+        # Maintain compatibility metadata map (mirrors SynapticLlamas payloads)
+        meta = self.__dict__.setdefault("_flockparser_last_metadata", {})
+        # Only update metadata if we have a real model (don't persist "unknown")
+        tracked_model = requested_model or perf.get("last_model") or existing_meta.get("model")
+        if tracked_model:  # Only write if we have a real model value
+            meta[node_key] = {"model": tracked_model, "operation": operation}
 
         start_time = time.time()
 
         log_ollama_request(backend=node_key, model=tracked_model, operation=operation, priority=priority)
 
         try:
-            logger.debug(f"Request to {url}")
+            logger.debug("Request to %s", url)
             response = self.session.post(url, json=data, timeout=timeout)
             latency_ms = (time.time() - start_time) * 1000
             self._latency_buffer.append(latency_ms)
 
             vram_exhausted = self.health_monitor.detect_vram_exhaustion(node_key, latency_ms)
             if vram_exhausted:
-                with self._lock:
-                    if node_key in self.stats["node_performance"]:
-                        self.stats["node_performance"][node_key]["vram_exhausted"] = True
+                perf["vram_exhausted"] = True
 
             self.health_monitor.update_baseline(node_key, latency_ms)
 
             if response.status_code == 200:
-                with self._lock:
-                    self.stats["successful_requests"] += 1
-                    self.stats["nodes_used"][node_key] = self.stats["nodes_used"].get(node_key, 0) + 1
-
-                    self.stats.setdefault("node_performance", {})
-                    perf = self.stats["node_performance"].setdefault(
-                        node_key,
-                        {
-                            "total_requests": 0,
-                            "failed_requests": 0,
-                            "latency_ms": 0.0,
-                            "success_rate": 1.0,
-                            "available": True,
-                            "active_requests": 0,
-                        },
-                    )
-                    perf["total_requests"] += 1
-
-                    if perf["total_requests"] == 1:
-                        perf["latency_ms"] = latency_ms
-                    else:
-                        perf["latency_ms"] = (perf["latency_ms"] * (perf["total_requests"] - 1) + latency_ms) / perf[
-                            "total_requests"
-                        ]
-
-                    perf["success_rate"] = (perf["total_requests"] - perf["failed_requests"]) / perf["total_requests"]
-                    if requested_model:
-                        perf["last_model"] = requested_model
-                    # Only persist real model values (don't write "unknown")
-                    last_model_value = perf.get("last_model") or existing_meta.get("model")
-                    perf["last_operation"] = operation
-
-                    meta = getattr(self, "_flockparser_last_metadata", None)
-                    if meta is not None and last_model_value:  # Only write if we have a real model
-                        meta[node_key] = {"model": last_model_value, "operation": operation}
-
-                logger.info(
-                    f"✅ Request succeeded: {node_key} "
-                    f"(latency: {latency_ms:.1f}ms, "
-                    f"avg: {self.stats['node_performance'][node_key]['latency_ms']:.1f}ms)"
+                # Totals, request count and running average are folded into self.stats by the publisher
+                stats.succeeded(node_key, latency_ms)
+
+                if requested_model:
+                    perf["last_model"] = requested_model
+                # Only persist real model values (don't write "unknown")
+                last_model_value = perf.get("last_model") or existing_meta.get("model")
+                perf["last_operation"] = operation
+                if last_model_value:  # Only write if we have a real model
+                    meta[node_key] = {"model": last_model_value, "operation": operation}
+
+                _success_log(
+                    node_key,
+                    lambda: f"✅ Request succeeded: {node_key} "
+                    f"(latency: {latency_ms:.1f}ms, avg: {stats.average_latency_ms(node_key):.1f}ms)",
                 )
 
                 log_ollama_response(
@@ -279,6 +325,13 @@ def _make_request_with_metadata(
                         task_type=task_type, model=data["model"], actual_duration_ms=latency_ms
                     )
 
+                tracker = getattr(self, "model_residency", None)
+                if tracker is not None and requested_model:
+                    tracker.mark_loaded(requested_model, _node_url(node))
+
+                if hedger is not None:
+                    hedger.latency.observe(_hedge_key(node_key, endpoint, requested_model), latency_ms / 1000)
+
                 response_data = response.json()
                 if cache_key is not None:
                     self.cache.set(cache_key, response_data)
@@ -293,11 +346,14 @@ def _make_request_with_metadata(
                 error=f"HTTP {response.status_code}",
                 latency_ms=latency_ms,
             )
+            raise NodeRequestError(f"{url}: HTTP {response.status_code}")
 
+        except NodeRequestError:
+            raise
         except Exception as exc:
             latency_ms = (time.time() - start_time) * 1000
             errors.append(f"{url}: {exc}")
-            logger.debug(f"Request failed: {exc}")
+            logger.debug("Request failed: %s", exc)
             self._record_failure(node_key, latency_ms)
             log_ollama_error(
                 backend=node_key,
@@ -305,12 +361,41 @@ def _make_request_with_metadata(
                 error=str(exc),
                 latency_ms=latency_ms,
             )
+            raise
 
         finally:
-            with self._lock:
-                if node_key in self.stats["node_performance"]:
-                    perf = self.stats["node_performance"][node_key]
-                    perf["active_requests"] = max(0, perf.get("active_requests", 1) - 1)
+            stats.finished(node_key, perf)
+
+    def send_hedge(node: Dict[str, Any]) -> Any:
+        tried.add(f"{node['host']}:{node['port']}")
+        return send(node)
+
+    for attempt in range(len(self.nodes)):
+        _diag_log_observer("request")
+        # Prefer a node that already holds the model (from the residency map, no network round trip)
+        node = _select_resident_node(self, data.get("model"), exclude=tried)
+        if node is None:
+            node, decision = self._select_node(payload=data, priority=priority)
+            if decision:
+                routing_decision = decision
+
+        node_key = f"{node['host']}:{node['port']}"
+        tried.add(node_key)
+
+        # If the request outlives this node's p95, race a duplicate on another node
+        hedge, delay = None, None
+        if hedger is not None:
+            delay = hedger.delay(_hedge_key(node_key, endpoint, data.get("model")))
+            backup = _hedge_node(self, data.get("model"), exclude=tried) if delay is not None else None
+            if backup is not None:
+                hedge = functools.partial(send_hedge, backup)
+
+        try:
+            if hedger is None:
+                return send(node)
+            return hedger.run(functools.partial(send, node), hedge, delay)
+        except Exception:
+            continue  # Recorded in errors; try the next node
 
     with self._lock:
         self.stats["failed_requests"] += 1
@@ -318,123 +403,99 @@ def _make_request_with_metadata(
     raise RuntimeError(f"All Ollama nodes failed. Errors: {'; '.join(errors)}")
 
 
+def _record_embed_batch(pool, node_key: str, model: str, count: int, seconds: float, error: Optional[Exception]):
+    """Account one batched /api/embed request in the pool stats, metadata map and observer."""
+    latency_ms = seconds * 1000
+    with pool._lock:
+        if error is None:
+            pool.stats["successful_requests"] += count
+            pool.stats["nodes_used"][node_key] = pool.stats["nodes_used"].get(node_key, 0) + count
+        else:
+            pool.stats["failed_requests"] += count
+
+        pool.stats.setdefault("node_performance", {})
+        perf = pool.stats["node_performance"].setdefault(node_key, node_defaults())
+        perf["total_requests"] += count
+        if error is not None:
+            perf["failed_requests"] += count
+        perf["success_rate"] = (perf["total_requests"] - perf["failed_requests"]) / perf["total_requests"]
+        if model:
+            perf["last_model"] = model
+        perf["last_operation"] = "embed_batch"
+
+        meta = getattr(pool, "_flockparser_last_metadata", None)
+        if meta is None:
+            meta = {}
+            pool._flockparser_last_metadata = meta
+        if model:  # Only persist if we have a real model
+            meta[node_key] = {"model": model, "operation": "embed_batch"}
+
+        # Live chunks/sec, read by SOLLOL's weighted distribution and the dashboard
+        batcher = getattr(pool, "embed_batcher", None)
+        if error is None and batcher is not None:
+            perf["batch_throughput"] = round(batcher.throughput.rate(node_key), 3)
+
+    log_ollama_request(backend=node_key, model=model, operation="embed_batch", priority=5)
+    if error is None:
+        log_ollama_response(backend=node_key, model=model, latency_ms=latency_ms, status_code=200)
+        tracker = getattr(pool, "model_residency", None)
+        if tracker is not None and model:
+            tracker.mark_loaded(model, f"http://{node_key}")
+    else:
+        log_ollama_error(backend=node_key, model=model, error=str(error), latency_ms=latency_ms)
+
+
+def _embed_batcher(pool) -> EmbedBatcher:
+    """
+    The pool's batched /api/embed dispatcher, reporting every request to the pool stats.
+
+    Node throughputs start from the rates learned in earlier runs (saved in the
+    knowledge base directory), falling back to primed ``batch_throughput`` stats.
+    """
+    batcher = getattr(pool, "embed_batcher", None)
+    if batcher is None:
+        primed = {
+            node_key: perf["batch_throughput"]
+            for node_key, perf in pool.stats.get("node_performance", {}).items()
+            if perf.get("batch_throughput")
+        }
+        kb_dir = getattr(pool, "_kb_dir", None)
+        throughput = NodeThroughput(path=kb_dir / "node_throughput.json" if kb_dir else None, initial=primed)
+        batcher = EmbedBatcher(
+            lambda: [f"{node['host']}:{node['port']}" for node in pool.nodes],
+            throughput=throughput,
+            on_batch=lambda *args: _record_embed_batch(pool, *args),
+            hedger=getattr(pool, "hedger", None),
+        )
+        pool.embed_batcher = batcher
+    return batcher
+
+
 def _embed_batch_sequential_with_metadata(
     self, model: str, inputs: List[str], node_key: str, priority: int = 5, **kwargs
 ) -> List[Dict[str, Any]]:
     """
-    Wrap sequential batch embedding to record last model/operation metadata.
+    Replace SOLLOL's one-request-per-text sequential path with batched /api/embed
+    requests to ``node_key`` (stats and metadata are recorded per request).
     """
-    import ollama
-
     batch_size = len(inputs)
     if batch_size == 0:
         return []
 
-    if ":" in node_key:
-        host, port = node_key.rsplit(":", 1)
-    else:
+    if ":" not in node_key:
         logger.error(f"Invalid node_key format: {node_key}, expected 'host:port'")
         return [None] * batch_size
 
-    node_url = f"http://{host}:{port}"
-    logger.info(f"➡️  Sequential mode: Processing {batch_size} embeddings on {node_key} with connection reuse")
-
-    client = ollama.Client(host=node_url)
-
-    results = []
+    batcher = _embed_batcher(self)
+    logger.info(
+        f"➡️  Sequential mode: Processing {batch_size} embeddings on {node_key} "
+        f"in batches of up to {batcher.sizer.get(node_key)}"
+    )
     start_time = time.time()
-    completed = 0
-    errors = 0
-
-    for i, text in enumerate(inputs):
-        _diag_log_observer("embed")
-
-        try:
-            log_ollama_request(backend=node_key, model=model, operation="embed", priority=priority)
-
-            embed_start = time.time()
-            result = client.embed(model=model, input=text, **kwargs)
-            embed_latency_ms = (time.time() - embed_start) * 1000
-
-            results.append(result)
-            completed += 1
-
-            with self._lock:
-                self.stats.setdefault("node_performance", {})
-                perf = self.stats["node_performance"].setdefault(
-                    node_key,
-                    {
-                        "total_requests": 0,
-                        "failed_requests": 0,
-                        "latency_ms": 0.0,
-                        "success_rate": 1.0,
-                        "available": True,
-                        "active_requests": 0,
-                    },
-                )
-                if model:
-                    perf["last_model"] = model
-                perf["last_operation"] = "embed"
-
-                # Update metadata map with real model (model is always passed to this function)
-                meta = getattr(self, "_flockparser_last_metadata", None)
-                if meta is None:
-                    meta = {}
-                    self._flockparser_last_metadata = meta
-                if model:  # Only persist if we have a real model
-                    meta[node_key] = {"model": model, "operation": "embed"}
-
-            log_ollama_response(
-                backend=node_key,
-                model=model,
-                latency_ms=embed_latency_ms,
-                status_code=200,
-            )
-
-            if (i + 1) % 50 == 0 or (i + 1) == batch_size:
-                progress_pct = ((i + 1) * 100) // batch_size
-                logger.info(f"   Progress: {i + 1}/{batch_size} embeddings ({progress_pct}%)")
-        except Exception as exc:
-            embed_latency_ms = (time.time() - embed_start) * 1000 if "embed_start" in locals() else 0
-            logger.error(f"Error embedding text {i}: {exc}")
-
-            log_ollama_error(backend=node_key, model=model, error=str(exc), latency_ms=embed_latency_ms)
-
-            results.append(None)
-            errors += 1
+    results = batcher.embed(model, inputs, nodes=[node_key], **kwargs)
 
     total_time = time.time() - start_time
-    with self._lock:
-        self.stats["successful_requests"] += completed
-        self.stats["failed_requests"] += errors
-        self.stats["nodes_used"][node_key] = self.stats["nodes_used"].get(node_key, 0) + batch_size
-
-        self.stats.setdefault("node_performance", {})
-        perf = self.stats["node_performance"].setdefault(
-            node_key,
-            {
-                "total_requests": 0,
-                "failed_requests": 0,
-                "latency_ms": 0.0,
-                "success_rate": 1.0,
-                "available": True,
-                "active_requests": 0,
-            },
-        )
-        perf["total_requests"] += batch_size
-        perf["failed_requests"] += errors
-        if model:
-            perf["last_model"] = model
-        perf["last_operation"] = "embed_batch"
-
-        # Update metadata map with real model (model is always passed to this function)
-        meta = getattr(self, "_flockparser_last_metadata", None)
-        if meta is None:
-            meta = {}
-            self._flockparser_last_metadata = meta
-        if model:  # Only persist if we have a real model
-            meta[node_key] = {"model": model, "operation": "embed_batch"}
-
+    completed = sum(1 for result in results if result is not None)
     avg_time_per_embedding = (total_time / batch_size * 1000) if batch_size > 0 else 0
     logger.info(
         f"✅ Sequential batch complete: {completed}/{batch_size} embeddings successful "
@@ -459,16 +520,15 @@ def _make_streaming_request_with_metadata(
     Without this wrapper, all streaming requests use "unknown" as the model, causing
     the dashboard to discard events from the observability bridge.
     """
-    from sollol.pool import OllamaPool as _BaseOllamaPool
-
     # Get the operation name
     operation = _normalize_operation_name(endpoint.split("/")[-1])
 
-    # Select or use specified node
+    # Select or use specified node (preferring one that already holds the model)
+    routing_decision = None
+    if node is None:
+        node = _select_resident_node(self, data.get("model"))
     if node is None:
         node, routing_decision = self._select_node(payload=data, priority=priority)
-    else:
-        routing_decision = None
 
     node_key = f"{node['host']}:{node['port']}"
     requested_model = data.get("model")
@@ -478,17 +538,7 @@ def _make_streaming_request_with_metadata(
     # Update node performance tracking with model metadata BEFORE the streaming request
     with self._lock:
         self.stats.setdefault("node_performance", {})
-        perf = self.stats["node_performance"].setdefault(
-            node_key,
-            {
-                "total_requests": 0,
-                "failed_requests": 0,
-                "latency_ms": 0.0,
-                "success_rate": 1.0,
-                "available": True,
-                "active_requests": 0,
-            },
-        )
+        perf = self.stats["node_performance"].setdefault(node_key, node_defaults())
 
         # Record model if provided in request
         if requested_model:
@@ -506,13 +556,15 @@ def _make_streaming_request_with_metadata(
         if tracked_model:  # Only write if we have a real model value
             meta[node_key] = {"model": tracked_model, "operation": operation}
 
-    # Call the original streaming request method
-    # Use the unbound method from the base class
-    original_method = _BaseOllamaPool._make_streaming_request
+    # Call SOLLOL's own streaming implementation (the class attribute is this wrapper)
     _diag_log_observer("stream")
-    for chunk in original_method(self, endpoint, data, priority, timeout, node):
+    for chunk in _base_make_streaming_request(self, endpoint, data, priority, timeout, node):
         yield chunk
 
+    tracker = getattr(self, "model_residency", None)
+    if tracker is not None and requested_model:
+        tracker.mark_loaded(requested_model, _node_url(node))
+
     # After streaming completes, ensure metadata is updated with final values
     with self._lock:
         perf = self.stats["node_performance"].get(node_key)
@@ -526,6 +578,12 @@ def _make_streaming_request_with_metadata(
                 meta[node_key] = {"model": last_model_value, "operation": operation}
 
 
+# Keep SOLLOL's streaming implementation for the wrapper to delegate to (survives a module reload)
+_base_make_streaming_request = getattr(
+    OllamaPool, "_flockparser_base_streaming_request", OllamaPool._make_streaming_request
+)
+OllamaPool._flockparser_base_streaming_request = _base_make_streaming_request
+
 OllamaPool._make_request = _make_request_with_metadata
 OllamaPool._make_streaming_request = _make_streaming_request_with_metadata
 OllamaPool._embed_batch_sequential = _embed_batch_sequential_with_metadata
@@ -884,6 +942,7 @@ def add_flockparser_methods(pool: OllamaPool, kb_dir: Path):
     # Add print_stats method
     def print_stats(self):
         """Print load balancer statistics (FlockParser-compatible)."""
+        _request_stats(self).publish(self)
         stats = self.get_stats()
 
         logger.info("\n" + "=" * 70)
@@ -907,82 +966,60 @@ def add_flockparser_methods(pool: OllamaPool, kb_dir: Path):
                 logger.info(f"    Success Rate: {perf.get('success_rate', 0) * 100:.1f}%")
                 logger.info(f"    Avg Latency: {perf.get('latency_ms', 0):.1f}ms")
 
+        hedging = self.hedger.stats() if getattr(self, "hedger", None) else None
+        if hedging and hedging["hedged"]:
+            logger.info(
+                f"\n🔀 Hedging: {hedging['hedged']} of {hedging['requests']} requests hedged, "
+                f"hedge won {hedging['hedge_wins']} ({hedging['hedge_win_rate'] * 100:.0f}%), "
+                f"{hedging['over_budget']} skipped (over budget)"
+            )
+
         logger.info("=" * 70)
 
     pool.print_stats = print_stats.__get__(pool)
 
-    # Add embed_batch method - uses Legacy FlockParser's proven parallel approach
-    def embed_batch(self, model, texts, max_workers=None, force_mode=None, use_adaptive=False, **kwargs):
+    # Batched embedding across all nodes (replaces SOLLOL's one-request-per-text embed_batch)
+    def embed_batch(self, model, inputs, max_workers=None, priority=5, use_adaptive=True, **kwargs):
         """
-        Batch embedding using Legacy FlockParser's proven parallel approach.
+        Embed ``inputs`` with batched /api/embed requests spread over all nodes.
 
-        Uses ThreadPoolExecutor with multiple workers making individual embed()
-        calls to SOLLOL, which naturally distributes load across nodes.
-
-        This approach achieved 2.26x speedup with 3 CPU nodes in Legacy.
+        Each node takes sub-batches sized from its observed latency, so faster
+        nodes take more of the work. Results come back in input order, with None
+        for texts that could not be embedded.
 
         Args:
             model: Embedding model name
-            texts: List of texts to embed
-            max_workers: Number of parallel workers (default: nodes * 2)
-            force_mode: Ignored (kept for compatibility)
-            use_adaptive: Ignored (kept for compatibility)
-            **kwargs: Additional parameters (ignored)
+            inputs: List of texts to embed
+            max_workers: Ignored (one worker per node; kept for compatibility)
+            priority: Ignored (kept for compatibility)
+            use_adaptive: Ignored (batch sizes always adapt; kept for compatibility)
+            **kwargs: /api/embed parameters (keep_alive, options, truncate, dimensions)
 
         Returns:
             List of embedding results
         """
-        import sys
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-
-        # Direct print to ensure visibility
-        print(f"🔍 CUSTOM embed_batch() CALLED with {len(texts) if texts else 0} texts", file=sys.stderr, flush=True)
-
-        if not texts:
+        if not inputs:
             return []
 
-        batch_size = len(texts)
-        results = [None] * batch_size
-
-        # Use Legacy's proven worker count: 2x number of nodes
-        if max_workers is None:
-            max_workers = len(self.nodes) * 2
-            max_workers = max(2, min(max_workers, 8))  # Between 2-8 workers
-
-        logger.info(f"🔀 Parallel embedding: {max_workers} workers across {len(self.nodes)} nodes")
-
-        completed = 0
-
-        def embed_single(index, text):
-            """Embed single text using SOLLOL's routing."""
-            try:
-                # Call SOLLOL's single embed (it handles node selection)
-                result = self.embed(model, text, priority=7)
-                return index, result, None
-            except Exception as e:
-                return index, None, e
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(embed_single, i, text): i for i, text in enumerate(texts)}
-
-            for future in as_completed(futures):
-                index, result, error = future.result()
-                completed += 1
-
-                # Show progress every 50 embeddings
-                if completed % 50 == 0 or completed == batch_size:
-                    progress_pct = (completed * 100) // batch_size
-                    logger.info(f"   Progress: {completed}/{batch_size} embeddings ({progress_pct}%)")
-
-                if error:
-                    logger.error(f"⚠️ Error embedding text {index}: {error}")
-                else:
-                    results[index] = result
-
+        start_time = time.time()
+        logger.info(f"🚀 Batch embedding {len(inputs)} texts across {len(self.nodes)} nodes")
+        results = _embed_batcher(self).embed(model, inputs, **kwargs)
+        total_time = time.time() - start_time
+        completed = sum(1 for result in results if result is not None)
+        logger.info(
+            f"✅ Embedded {completed}/{len(inputs)} texts in {total_time:.2f}s "
+            f"(batch sizes: {_embed_batcher(self).sizer.sizes()})"
+        )
+        hedger = getattr(self, "hedger", None)
+        if hedger is not None and hedger.stats()["hedged"]:
+            hedging = hedger.stats()
+            logger.info(
+                f"🔀 Hedged {hedging['hedged']} requests so far, "
+                f"hedge won {hedging['hedge_win_rate'] * 100:.0f}% of the time"
+            )
         return results
 
-    # DISABLED: Use SOLLOL's built-in embed_batch with use_adaptive=False instead
-    # pool.embed_batch = embed_batch.__get__(pool)
+    pool.embed_batch = embed_batch.__get__(pool)
 
     # Add stub methods for legacy features
     def set_routing_strategy(self, strategy):
@@ -1036,72 +1073,53 @@ def add_flockparser_methods(pool: OllamaPool, kb_dir: Path):
 
     pool.remove_node = remove_node_with_save.__get__(pool)
 
-    # Add Legacy FlockParser's proven parallel embedding method
-    # Store reference to pool for closure
-    _pool_ref = pool
-
+    # Legacy name for batch embedding (now batched /api/embed requests as well)
     def embed_batch_parallel(model, texts, max_workers=None):
         """
-        Legacy FlockParser's proven parallel embedding approach.
-
-        Uses ThreadPoolExecutor with individual embed() calls distributed
-        across nodes via round-robin. This achieved 2.26x speedup with 3 CPU nodes.
+        Embed ``texts`` across all nodes (see ``embed_batch``).
 
         Args:
             model: Embedding model name
             texts: List of texts to embed
-            max_workers: Number of parallel workers (default: nodes * 2)
+            max_workers: Ignored (kept for compatibility)
 
         Returns:
             List of embedding results
         """
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-
-        if not texts:
-            return []
-
-        batch_size = len(texts)
-        results = [None] * batch_size
-
-        # Use Legacy's proven worker count: 2x number of nodes
-        if max_workers is None:
-            max_workers = len(_pool_ref.nodes) * 2
-            max_workers = max(2, min(max_workers, 8))  # Between 2-8 workers
-
-        logger.info(f"🔀 Legacy parallel: {max_workers} workers across {len(_pool_ref.nodes)} nodes")
-
-        completed = 0
-
-        def embed_single(index, text):
-            """Embed single text using SOLLOL's routing."""
-            try:
-                # Call SOLLOL's single embed (it handles node selection)
-                result = _pool_ref.embed(model, text, priority=7)
-                return index, result, None
-            except Exception as e:
-                return index, None, e
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(embed_single, i, text): i for i, text in enumerate(texts)}
-
-            for future in as_completed(futures):
-                index, result, error = future.result()
-                completed += 1
-
-                # Show progress every 50 embeddings
-                if completed % 50 == 0 or completed == batch_size:
-                    progress_pct = (completed * 100) // batch_size
-                    logger.info(f"   Progress: {completed}/{batch_size} embeddings ({progress_pct}%)")
-
-                if error:
-                    logger.error(f"⚠️ Error embedding text {index}: {error}")
-                else:
-                    results[index] = result
-
-        return results
+        return pool.embed_batch(model, texts)
 
     pool.embed_batch_parallel = embed_batch_parallel
 
+    # Native asyncio embedding for async callers (MCP/FastAPI): coroutines, not threads, per pending request
+    async def embed_batch_async(self, model, inputs, priority=5, **kwargs):
+        """Embed ``inputs`` on the running event loop (same routing and stats as ``embed_batch``)."""
+        return await async_embedder_for(self).embed(model, list(inputs), priority=priority, **kwargs)
+
+    pool.embed_batch_async = embed_batch_async.__get__(pool)
+
+    # Lock-free request counters, published into pool.stats in the background
+    _request_stats(pool)
+
+    # Hedge requests that run past their node's p95 (shared by single requests and batched embeddings)
+    if getattr(pool, "hedger", None) is None:
+        pool.hedger = Hedger()
+
+    # Create the embed dispatcher now so the learned node throughputs are loaded (and shown) at startup
+    rates = _embed_batcher(pool).throughput.rates()
+    if rates:
+        total = sum(rates.values())
+        logger.info("📊 Learned embedding throughput:")
+        for node_key, rate in sorted(rates.items(), key=lambda item: -item[1]):
+            logger.info(f"   {node_key}: {rate:.2f} chunks/sec ({rate / total * 100:.1f}% of work)")
+
+    # Background map of which models each node has loaded (read by chat and request routing)
+    if getattr(pool, "model_residency", None) is None:
+        pool.model_residency = ModelResidencyTracker(
+            lambda: _convert_nodes_to_urls(pool.nodes),
+            interval=float(os.getenv("FLOCKPARSER_RESIDENCY_INTERVAL", DEFAULT_POLL_INTERVAL)),
+        )
+        pool.model_residency.start()
+
     # Start observability bridge (keeps SOLLOL dashboard in sync without changing routing)
     _start_observability_bridge(pool)
 
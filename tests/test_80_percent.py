@@ -29,7 +29,7 @@ class TestPDFExtractionFallbacks:
     @patch("flockparsecli.pytesseract.image_to_string")
     @patch("pdf2image.convert_from_path")
     @patch("flockparsecli.subprocess.run")
-    @patch("flockparsecli.PdfReader")
+    @patch("pdf_extraction.PdfReader")
     def test_ocr_with_multiple_pages(self, mock_pypdf2, mock_subprocess, mock_convert, mock_ocr):
         """Test OCR extraction with multiple pages"""
         # PyPDF2 returns minimal text
@@ -57,7 +57,7 @@ class TestPDFExtractionFallbacks:
         finally:
             Path(pdf_path).unlink(missing_ok=True)
 
-    @patch("flockparsecli.PdfReader")
+    @patch("pdf_extraction.PdfReader")
     def test_extract_with_page_warnings(self, mock_pypdf2):
         """Test extraction with some pages failing"""
         # Mix of successful and failing pages
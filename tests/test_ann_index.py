@@ -0,0 +1,139 @@
+"""
+Tests for the IVF-flat approximate nearest-neighbour index
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ann_index import IVFIndex  # noqa: E402
+from vector_store import EmbeddingMatrix  # noqa: E402
+
+
+def _clustered_matrix(n_docs=8, rows_per_doc=250, dim=32, seed=0):
+    """Matrix of documents whose chunks form well-separated clusters."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(20, dim))
+    matrix = EmbeddingMatrix()
+    for d in range(n_docs):
+        labels = rng.integers(0, len(centres), size=rows_per_doc)
+        vectors = centres[labels] + 0.1 * rng.normal(size=(rows_per_doc, dim))
+        ids = [f"doc_{d}_chunk_{i}" for i in range(rows_per_doc)]
+        matrix.add_document(f"doc_{d}", f"{d}.pdf", ids, ids, vectors)
+    return matrix, centres, rng
+
+
+class TestIVFIndexSearch:
+    """Test approximate search against the exact scan"""
+
+    def test_recall_matches_exact_scan(self):
+        """Probed results agree with brute force on clustered data"""
+        matrix, centres, rng = _clustered_matrix()
+        index = IVFIndex()
+        index.train(matrix, nlist=32)
+
+        hits = 0
+        for _ in range(20):
+            query = centres[rng.integers(0, len(centres))] + 0.1 * rng.normal(size=centres.shape[1])
+            exact = [r["text"] for r in matrix.search(query, top_k=10)]
+            approx = [r["text"] for r in index.search(matrix, query, top_k=10, nprobe=4)]
+            hits += len(set(exact) & set(approx))
+
+        assert hits / 200 >= 0.9
+
+    def test_rerank_similarities_are_exact(self):
+        """Returned similarities are the true cosine scores"""
+        matrix, centres, _ = _clustered_matrix()
+        index = IVFIndex()
+        index.train(matrix, nlist=32)
+
+        results = index.search(matrix, centres[0], top_k=5, nprobe=4)
+        scores = matrix.scores(centres[0])
+        rows = [matrix.chunk_ids.index(r["text"]) for r in results]
+
+        assert [r["similarity"] for r in results] == pytest.approx(list(scores[rows]), rel=1e-5)
+        assert [r["similarity"] for r in results] == sorted([r["similarity"] for r in results], reverse=True)
+
+    def test_untrained_falls_back_to_exact(self):
+        """An untrained index returns exact results"""
+        matrix, centres, _ = _clustered_matrix(n_docs=1, rows_per_doc=50)
+
+        results = IVFIndex().search(matrix, centres[0], top_k=5)
+
+        assert [r["text"] for r in results] == [r["text"] for r in matrix.search(centres[0], top_k=5)]
+
+    def test_inverted_lists_reused_between_queries(self):
+        """A second search on an unchanged matrix does not rebuild the inverted lists"""
+        matrix, centres, _ = _clustered_matrix()
+        index = IVFIndex()
+        index.train(matrix, nlist=32)
+
+        index.search(matrix, centres[0], top_k=5, nprobe=4)
+        lists = index._lists
+        index.search(matrix, centres[1], top_k=5, nprobe=4)
+
+        assert index._lists_key == (matrix.generation, id(matrix))
+        assert index._lists is lists
+
+
+class TestIVFIndexUpdates:
+    """Test incremental assignment, pruning and persistence"""
+
+    def test_unassigned_documents_are_always_candidates(self):
+        """Documents added after training are searchable before they are assigned"""
+        matrix, _, _ = _clustered_matrix(n_docs=2, rows_per_doc=200)
+        index = IVFIndex()
+        index.train(matrix, nlist=16)
+
+        query = np.ones(matrix.dim)
+        matrix.add_document("doc_new", "new.pdf", ["new"], ["new"], [query])
+
+        assert index.search(matrix, query, top_k=1, nprobe=1)[0]["doc_id"] == "doc_new"
+
+    def test_update_assigns_new_and_prunes_removed(self):
+        """update() assigns unseen documents and drops missing ones"""
+        matrix, _, rng = _clustered_matrix(n_docs=3, rows_per_doc=100)
+        index = IVFIndex()
+        assert index.update(matrix, min_rows=1000) is False
+        assert index.update(matrix, min_rows=100) is True
+        assert sorted(index.document_ids) == ["doc_0", "doc_1", "doc_2"]
+
+        matrix.add_document("doc_3", "3.pdf", ["a"], ["a"], rng.normal(size=(1, matrix.dim)))
+        assert index.update(matrix, min_rows=100) is True
+        assert "doc_3" in index.document_ids
+
+        index.prune(["doc_0"])
+        assert index.document_ids == ["doc_0"]
+
+    def test_save_and_load_roundtrip(self):
+        """Persisted index reproduces the same results"""
+        matrix, centres, _ = _clustered_matrix(n_docs=2, rows_per_doc=200)
+        index = IVFIndex()
+        index.train(matrix, nlist=16)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "ann_index.npz"
+            index.save(path)
+            loaded = IVFIndex(path)
+
+            assert loaded.load() is True
+            assert loaded.nlist == 16
+            expected = index.search(matrix, centres[1], top_k=5, nprobe=2)
+            assert loaded.search(matrix, centres[1], top_k=5, nprobe=2) == expected
+
+    def test_load_missing_file(self):
+        """Loading a missing index leaves it untrained"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            index = IVFIndex(Path(tmpdir) / "missing.npz")
+            assert index.load() is False
+            assert index.trained is False
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
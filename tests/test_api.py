@@ -7,22 +7,57 @@ import pytest
 import sys
 from pathlib import Path
 from unittest.mock import Mock, patch, MagicMock
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
 import io
+import json
 import tempfile
+import threading
+import time
+from contextlib import contextmanager
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 # Import after path is set
 try:
-    from flock_ai_api import app, API_KEY
+    from flock_ai_api import app, API_KEY, MAX_BATCH_QUERIES
 
     API_AVAILABLE = True
 except ImportError:
     API_AVAILABLE = False
     app = None
     API_KEY = "test-key"
+    MAX_BATCH_QUERIES = 256
+
+
+HEADERS = {"X-API-Key": API_KEY}
+
+
+@contextmanager
+def _job_client(tmpdir, workers=1):
+    """TestClient whose background jobs go to a temporary queue (workers=0: nothing runs)."""
+    import flock_ai_api
+    from job_queue import JobQueue, JobRunner
+
+    queue = JobQueue(Path(tmpdir) / "jobs.db")
+    runner = JobRunner(queue, flock_ai_api.JOB_HANDLERS, workers=1, poll_interval=0.05)
+    if not workers:
+        runner.start = lambda: None
+    with patch.object(flock_ai_api, "job_queue", queue), patch.object(flock_ai_api, "job_runner", runner):
+        with TestClient(app) as client:
+            yield client, queue
+    queue.close()
+
+
+def _wait_for_job(queue, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in ("completed", "failed", "cancelled"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
 
 
 @pytest.mark.skipif(not API_AVAILABLE, reason="API module not available")
@@ -208,6 +243,209 @@ class TestChatEndpoint:
         # Should handle empty query gracefully
         assert response.status_code in [200, 400]
 
+    def test_chat_stream_events(self):
+        """/chat/stream sends each token as an event, then sources and timing"""
+        search_results = {
+            "documents": [["Paris is the capital."]],
+            "metadatas": [[{"file_name": "france.pdf"}]],
+            "distances": [[0.1]],
+            "ids": [["france.pdf"]],
+        }
+
+        async def fake_search(query, n_results=3):
+            return search_results
+
+        async def chunks():
+            for token in ["Par", "is"]:
+                yield {"message": {"role": "assistant", "content": token}, "done": False}
+            yield {
+                "message": {"role": "assistant", "content": ""},
+                "done": True,
+                "eval_count": 2,
+                "eval_duration": 10**9,
+            }
+
+        client_mock = Mock()
+
+        async def fake_chat(**kwargs):
+            assert kwargs["stream"] is True
+            assert "Paris is the capital." in kwargs["messages"][-1]["content"]
+            return chunks()
+
+        client_mock.chat = fake_chat
+
+        with patch("flock_ai_api.search_documents_async", fake_search):
+            with patch("flock_ai_api.get_ollama_client", return_value=client_mock):
+                response = TestClient(app).post("/chat/stream", json={"query": "Capital?"}, headers=HEADERS)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [json.loads(line[len("data: ") :]) for line in response.text.splitlines() if line.startswith("data: ")]
+        assert [event["token"] for event in events[:-1]] == ["Par", "is"]
+        assert events[-1]["done"] is True
+        assert events[-1]["sources"] == ["france.pdf"]
+        assert events[-1]["timing"]["tokens_per_second"] == 2.0
+        assert events[-1]["timing"]["ttft"] is not None
+
+
+@pytest.mark.skipif(not API_AVAILABLE, reason="API module not available")
+class TestBatchQuery:
+    """Test the batched query endpoint"""
+
+    def test_batch_query_uses_one_collection_query(self):
+        """All queries are sent to ChromaDB together and split back per query"""
+        client = TestClient(app)
+        mock_collection = Mock()
+        mock_collection.query.return_value = {
+            "documents": [["a1", "a2"], ["b1", "b2"]],
+            "metadatas": [[{}, {}], [{}, {}]],
+            "distances": [[0.1, 0.2], [0.3, 0.4]],
+            "ids": [["a1", "a2"], ["b1", "b2"]],
+        }
+
+        with patch("flock_ai_api.collection", mock_collection):
+            response = client.post(
+                "/query/batch",
+                json={
+                    "queries": [
+                        {"query": "first", "embedding": [1.0, 0.0], "n_results": 2},
+                        {"query": "second", "embedding": [0.0, 1.0], "n_results": 1},
+                    ]
+                },
+            )
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["query"] for r in results] == ["first", "second"]
+        assert [[hit["content"] for hit in r["results"]] for r in results] == [["a1", "a2"], ["b1"]]
+        mock_collection.query.assert_called_once_with(query_embeddings=[[1.0, 0.0], [0.0, 1.0]], n_results=2)
+
+    def test_batch_query_rejects_oversized_batch(self):
+        """More than MAX_BATCH_QUERIES queries is a client error, before anything is embedded or searched"""
+        client = TestClient(app)
+        mock_collection = Mock()
+        queries = [{"query": f"q{i}", "embedding": [1.0, 0.0]} for i in range(MAX_BATCH_QUERIES + 1)]
+
+        with patch("flock_ai_api.collection", mock_collection):
+            response = client.post("/query/batch", json={"queries": queries})
+
+        assert response.status_code == 400
+        mock_collection.query.assert_not_called()
+
+
+@pytest.mark.skipif(not API_AVAILABLE, reason="API module not available")
+class TestNonBlocking:
+    """Test that slow work does not stall other routes"""
+
+    def test_health_responds_during_ingestion(self):
+        """/health answers while a queued ingestion job is still processing"""
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow_process_pdf(path, **kwargs):
+            started.set()
+            release.wait(10)
+            return {"status": "added"}
+
+        with tempfile.TemporaryDirectory() as tmpdir, _job_client(tmpdir) as (client, queue):
+            pdf_path = Path(tmpdir) / "slow.pdf"
+            pdf_path.write_bytes(b"%PDF-1.4")
+
+            with patch("flockparsecli.process_pdf", side_effect=slow_process_pdf):
+                response = client.post("/process-local/", params={"file_path": str(pdf_path)}, headers=HEADERS)
+                assert response.status_code == 200
+                assert started.wait(10)
+
+                health = client.get("/health")
+
+                assert queue.get(response.json()["job_id"])["status"] == "running"
+                release.set()
+                _wait_for_job(queue, response.json()["job_id"])
+
+        assert health.status_code == 200
+
+    def test_route_limit_rejects_when_full(self):
+        """Requests beyond a route group's limit get 429 once the wait runs out"""
+        import asyncio
+
+        from flock_ai_api import RouteLimit
+
+        async def scenario():
+            limit = RouteLimit("test", 1, max_wait=0.05)
+            async with limit:
+                with pytest.raises(HTTPException) as exc_info:
+                    async with limit:
+                        pass
+            async with limit:
+                pass
+            return exc_info.value
+
+        error = asyncio.run(scenario())
+        assert error.status_code == 429
+
+    def test_extract_pool_does_not_fork(self):
+        """Upload extraction workers do not fork this (threaded) process and run outside flock_ai_api"""
+        import flock_ai_api
+
+        with patch("flock_ai_api._extract_pool", None):
+            pool = flock_ai_api.get_extract_pool()
+            try:
+                assert pool._mp_context.get_start_method() != "fork"
+            finally:
+                pool.shutdown()
+        assert flock_ai_api.extract_text_from_pdf.__module__ == "pdf_extraction"
+
+
+@pytest.mark.skipif(not API_AVAILABLE, reason="API module not available")
+class TestBackgroundJobs:
+    """Test ingestion endpoints that run as queued jobs"""
+
+    def test_directory_job_reports_progress_and_errors(self):
+        """A directory job returns at once; per-file errors and progress end up on /jobs/{id}"""
+
+        def fake_process_pdf(path, on_progress=None):
+            if path.name == "bad.pdf":
+                raise ValueError("corrupt file")
+            on_progress(pages_extracted=1)
+            on_progress(pages_extracted=3, chunks=4, chunks_embedded=4)
+            return {"status": "added"}
+
+        with tempfile.TemporaryDirectory() as tmpdir, _job_client(tmpdir) as (client, queue):
+            for name in ("a.pdf", "bad.pdf", "c.pdf"):
+                (Path(tmpdir) / name).write_bytes(b"%PDF-1.4")
+
+            with patch("flockparsecli.process_pdf", side_effect=fake_process_pdf):
+                response = client.post("/process-directory/", params={"directory_path": tmpdir}, headers=HEADERS)
+                job_id = response.json()["job_id"]
+                _wait_for_job(queue, job_id)
+
+            job = client.get(f"/jobs/{job_id}", headers=HEADERS).json()
+
+        assert response.json()["queued"] == 3
+        assert job["status"] == "completed"
+        assert job["result"]["files"] == ["a.pdf", "c.pdf"]
+        assert job["result"]["errors"] == {"bad.pdf": "corrupt file"}
+        assert job["progress"]["pages_extracted"] == 6
+        assert job["progress"]["chunks_embedded"] == 8
+        assert job["progress"]["files_done"] == 3
+        assert "pages_per_second" in job["progress"]
+
+    def test_cancel_queued_job(self):
+        """A job that has not started yet is cancelled at once"""
+        with tempfile.TemporaryDirectory() as tmpdir, _job_client(tmpdir, workers=0) as (client, queue):
+            job_id = queue.submit("process_pdf", {"files": []})
+
+            response = client.post(f"/jobs/{job_id}/cancel", headers=HEADERS)
+            again = client.post(f"/jobs/{job_id}/cancel", headers=HEADERS)
+
+        assert response.json()["status"] == "cancelled"
+        assert again.status_code == 409
+
+    def test_unknown_job(self):
+        """Unknown job ids return 404"""
+        with tempfile.TemporaryDirectory() as tmpdir, _job_client(tmpdir, workers=0) as (client, _):
+            assert client.get("/jobs/missing", headers=HEADERS).status_code == 404
+
 
 @pytest.mark.skipif(not API_AVAILABLE, reason="API module not available")
 class TestHealthCheck:
@@ -0,0 +1,134 @@
+"""
+Tests for the FlockParser HTTP API server's resident index
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from document_index import DocumentIndex, index_path  # noqa: E402
+from flockparser_api_server import FlockParserAPIServer  # noqa: E402
+from vector_store import write_segment  # noqa: E402
+
+
+def _add_document(root, doc_id, texts, embeddings):
+    """Write a segment and register it the way the CLI does (through its own connection)."""
+    base_path = root / "segments" / doc_id
+    base_path.parent.mkdir(exist_ok=True)
+    kept = write_segment(base_path, texts, embeddings)
+    index = DocumentIndex(index_path(root / "document_index.json"))
+    index.put(
+        {
+            "id": doc_id,
+            "original": str(root / f"{doc_id}.pdf"),
+            "text_path": str(root / f"{doc_id}.txt"),
+            "processed_date": "2026-01-01T00:00:00",
+            "segment": str(base_path),
+            "chunks": [{"chunk_id": f"{doc_id}_chunk_{i}", "row": row} for row, i in enumerate(kept)],
+        }
+    )
+    index.close()
+
+
+def _query(client, embedding):
+    response = client.post(
+        "/query", json={"query": "q", "query_embedding": embedding, "top_k": 5, "min_similarity": 0.5}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.fixture
+def root():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield Path(tmpdir)
+
+
+class TestResidentIndex:
+    """Test that the corpus is loaded once and kept current"""
+
+    def test_queries_do_not_read_the_index(self, root):
+        """After start-up, /query and /stats are answered from memory"""
+        _add_document(root, "doc_1", ["alpha text", "beta text"], [[1.0, 0.0], [0.0, 1.0]])
+        server = FlockParserAPIServer(flockparser_path=str(root))
+        client = TestClient(server.app)
+
+        with patch.object(server.index, "load") as mock_load, patch.object(server.index, "summaries") as mock_sum:
+            result = _query(client, [1.0, 0.0])
+            stats = client.get("/stats").json()
+            mock_load.assert_not_called()
+            mock_sum.assert_not_called()
+
+        assert [chunk["text"] for chunk in result["chunks"]] == ["alpha text"]
+        assert stats["documents"] == 1
+        assert stats["chunks"] == 2
+
+    def test_new_documents_become_visible(self, root):
+        """A document registered by another process is picked up on the next poll"""
+        _add_document(root, "doc_1", ["alpha text"], [[1.0, 0.0]])
+        server = FlockParserAPIServer(flockparser_path=str(root))
+        client = TestClient(server.app)
+        assert not server.refresh()
+
+        _add_document(root, "doc_2", ["gamma text"], [[0.0, 1.0]])
+        assert server.refresh()
+
+        assert [chunk["doc_id"] for chunk in _query(client, [0.0, 1.0])["chunks"]] == ["doc_2"]
+        assert client.get("/stats").json()["documents"] == 2
+
+    def test_index_created_after_start(self, root):
+        """A server started before the first ingestion becomes available once the index exists"""
+        server = FlockParserAPIServer(flockparser_path=str(root))
+        assert not server.available
+
+        _add_document(root, "doc_1", ["alpha text"], [[1.0, 0.0]])
+        assert server.refresh()
+
+        assert server.available
+        assert len(_query(TestClient(server.app), [1.0, 0.0])["chunks"]) == 1
+
+
+class TestBatchQuery:
+    """Test scoring several queries in one request"""
+
+    def test_batch_matches_single_queries(self, root):
+        """Each query gets the result /query would give, in request order"""
+        _add_document(root, "doc_1", ["alpha text", "beta text", "mixed text"], [[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]])
+        server = FlockParserAPIServer(flockparser_path=str(root))
+        client = TestClient(server.app)
+        queries = [
+            {"query": "a", "query_embedding": [1.0, 0.0], "top_k": 5, "min_similarity": 0.5},
+            {"query": "b", "query_embedding": [0.0, 1.0], "top_k": 1, "min_similarity": 0.5},
+        ]
+
+        response = client.post("/query/batch", json={"queries": queries})
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert results == [client.post("/query", json=query).json() for query in queries]
+        assert [chunk["text"] for chunk in results[1]["chunks"]] == ["beta text"]
+        assert results[1]["total_found"] == 2
+
+    def test_bad_embedding_finds_nothing(self, root):
+        """A query embedding with the wrong dimension gets an empty result; the rest of the batch is answered"""
+        _add_document(root, "doc_1", ["alpha text"], [[1.0, 0.0]])
+        client = TestClient(FlockParserAPIServer(flockparser_path=str(root)).app)
+
+        queries = [{"query": "a", "query_embedding": [1.0, 0.0, 0.0]}, {"query": "b", "query_embedding": [1.0, 0.0]}]
+        response = client.post("/query/batch", json={"queries": queries})
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert results[0] == {"chunks": [], "total_found": 0}
+        assert [chunk["text"] for chunk in results[1]["chunks"]] == ["alpha text"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
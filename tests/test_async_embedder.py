@@ -0,0 +1,188 @@
+"""
+Tests for the native asyncio embedding path
+"""
+
+import asyncio
+import json
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import http_pool  # noqa: E402
+from async_embedder import AsyncEmbedder, embed_batch_async, embed_batch_async_sync  # noqa: E402
+from embed_batcher import AdaptiveBatchSize, EmbedBatcher  # noqa: E402
+
+
+class FakeOllama:
+    """Local /api/embed server recording batch sizes and the most requests it had in flight at once."""
+
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with lock:
+                    stub.batches.append(len(payload["input"]))
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                time.sleep(delay)
+                with lock:
+                    stub.in_flight -= 1
+                data = json.dumps({"embeddings": [[len(t)] for t in payload["input"]]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.node = {"host": "127.0.0.1", "port": self.server.server_address[1]}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(delay=0.0):
+        started.append(FakeOllama(delay))
+        return started[-1]
+
+    yield start
+    for server in started:
+        server.close()
+    http_pool.close()
+
+
+def _pool(nodes, batch_size=4, maximum=None):
+    """Pool stand-in: round-robin ``_select_node`` over ``nodes`` and a batcher recording every request."""
+    calls = []
+    state = {"next": 0}
+
+    def select_node(payload=None, priority=5):
+        node = nodes[state["next"] % len(nodes)]
+        state["next"] += 1
+        return node, None
+
+    pool = SimpleNamespace(nodes=nodes, _select_node=select_node)
+    pool.embed_batcher = EmbedBatcher(
+        lambda: [f"{n['host']}:{n['port']}" for n in nodes],
+        sizer=AdaptiveBatchSize(initial=batch_size, maximum=maximum or batch_size),
+        on_batch=lambda *args: calls.append(args),
+    )
+    return pool, calls
+
+
+def _texts(n):
+    return ["x" * (i + 1) for i in range(n)]
+
+
+class TestAsyncEmbedder:
+    """Test routing, concurrency limits and failover"""
+
+    def test_embeds_in_order_across_routed_nodes(self, servers):
+        """Sub-batches follow the pool's routing and results keep input order"""
+        first, second = servers(), servers()
+        pool, calls = _pool([first.node, second.node])
+
+        results = embed_batch_async_sync(pool, "m", _texts(40), max_concurrent=5)
+
+        assert [result["embeddings"][0][0] for result in results] == list(range(1, 41))
+        assert first.batches == [4] * 5 and second.batches == [4] * 5
+        assert len(calls) == 10 and all(call[4] is None for call in calls)
+
+    def test_per_node_limit(self, servers):
+        """No node sees more requests at once than its semaphore allows"""
+        server = servers(delay=0.05)
+        pool, _ = _pool([server.node], batch_size=1)
+
+        results = embed_batch_async_sync(pool, "m", _texts(30), max_concurrent=3)
+
+        assert all(result is not None for result in results)
+        assert 1 < server.max_in_flight <= 3
+
+    def test_unreachable_node_fails_over(self, servers):
+        """A sub-batch routed to a node that cannot be reached goes to another one"""
+        server = servers()
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            dead = {"host": "127.0.0.1", "port": sock.getsockname()[1]}
+        pool, _ = _pool([dead, server.node])
+
+        results = embed_batch_async_sync(pool, "m", _texts(16))
+
+        assert all(result is not None for result in results)
+        assert sum(server.batches) == 16
+
+    def test_batch_size_adapts_within_a_call(self, servers):
+        """Each sub-batch is sized from what the requests before it measured"""
+        server = servers()
+        pool, _ = _pool([server.node], batch_size=2, maximum=8)
+
+        results = embed_batch_async_sync(pool, "m", _texts(30), max_concurrent=1)
+
+        assert all(results)
+        assert server.batches == [2, 4, 8, 8, 8]
+
+    def test_down_node_gets_no_further_batches(self, servers):
+        """Once a node is found unreachable, later sub-batches are routed elsewhere"""
+        server = servers()
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            dead = {"host": "127.0.0.1", "port": sock.getsockname()[1]}
+        pool, calls = _pool([dead, server.node])
+
+        results = embed_batch_async_sync(pool, "m", _texts(32), max_concurrent=1)
+
+        assert all(results)
+        assert sum(1 for call in calls if call[0] == f"127.0.0.1:{dead['port']}") == 1
+
+    def test_runs_on_callers_loop(self, servers):
+        """Async callers await the embedder on their own loop without worker threads"""
+        server = servers()
+        pool, _ = _pool([server.node])
+
+        async def main():
+            threads_before = set(threading.enumerate())
+            results = await embed_batch_async(pool, "m", _texts(8))
+            await http_pool.close_async_session()
+            return results, set(threading.enumerate()) - threads_before
+
+        results, new_threads = asyncio.run(main())
+
+        assert len(results) == 8 and all(results)
+        # Only the fake server's request handlers may have started threads
+        assert not [thread for thread in new_threads if "process_request" not in thread.name]
+
+    def test_empty_input(self):
+        pool, _ = _pool([{"host": "127.0.0.1", "port": 1}])
+
+        assert embed_batch_async_sync(pool, "m", []) == []
+        assert asyncio.run(AsyncEmbedder(pool).embed("m", [])) == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,99 @@
+"""
+Tests for streamed chat replies and their timing
+"""
+
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from chat_stream import ChatStream, StreamTimer  # noqa: E402
+
+
+def _chunks(tokens, **final):
+    for token in tokens:
+        yield {"message": {"role": "assistant", "content": token}, "done": False}
+    yield {"message": {"role": "assistant", "content": ""}, "done": True, **final}
+
+
+class TestChatStream:
+    """Test token iteration and timing"""
+
+    def test_yields_tokens_and_collects_answer(self):
+        """Text pieces come out in order; empty chunks are skipped"""
+        stream = ChatStream(_chunks(["Hel", "lo", " world"]))
+
+        assert list(stream) == ["Hel", "lo", " world"]
+        assert stream.answer == "Hello world"
+        assert stream.timer.tokens == 3
+        assert stream.timer.ttft is not None
+        assert stream.timer.ttft <= stream.timer.generation_time
+
+    def test_uses_ollama_eval_counts(self):
+        """tokens/sec comes from eval_count / eval_duration when the final chunk has them"""
+        stream = ChatStream(_chunks(["a", "b"], eval_count=40, eval_duration=2_000_000_000))
+        list(stream)
+
+        summary = stream.timer.summary()
+        assert summary["tokens"] == 40
+        assert summary["tokens_per_second"] == 20.0
+
+    def test_fallback_rate_from_wall_clock(self):
+        """Without eval counts the rate is chunks after the first over the decode time"""
+        timer = StreamTimer()
+        timer.start, timer.first_token, timer.end, timer.tokens = 0.0, 1.0, 3.0, 5
+
+        assert timer.ttft == 1.0
+        assert timer.generation_time == 3.0
+        assert timer.tokens_per_second == 2.0
+
+    def test_no_tokens(self):
+        """An empty reply has no first-token time and a zero rate"""
+        stream = ChatStream(_chunks([]))
+
+        assert list(stream) == []
+        assert stream.timer.ttft is None
+        assert stream.timer.summary()["tokens_per_second"] == 0.0
+
+    def test_error_chunk_raises(self):
+        """An error reported mid-stream stops iteration"""
+        stream = ChatStream(iter([{"message": {"content": "a"}}, {"error": "model not found"}]))
+
+        with pytest.raises(RuntimeError, match="model not found"):
+            list(stream)
+        assert stream.answer == "a"
+
+
+class TestStreamingWrapper:
+    """Test the SOLLOL streaming wrapper in sollol_compat"""
+
+    def test_delegates_to_sollol_implementation(self):
+        """The metadata wrapper streams through SOLLOL's method instead of calling itself"""
+        sollol_compat = pytest.importorskip("sollol_compat")
+        from sollol import OllamaPool
+
+        pool = OllamaPool.__new__(OllamaPool)
+        pool._lock = threading.Lock()
+        pool.stats = {}
+        node = {"host": "10.0.0.1", "port": 11434}
+        calls = []
+
+        def fake_stream(self, endpoint, data, priority, timeout, node):
+            calls.append(endpoint)
+            yield from _chunks(["hi"])
+
+        with patch.object(sollol_compat, "_base_make_streaming_request", fake_stream):
+            chunks = list(pool._make_streaming_request("/api/chat", {"model": "m"}, node=node))
+
+        assert calls == ["/api/chat"]
+        assert chunks[0]["message"]["content"] == "hi"
+        assert pool._flockparser_last_metadata["10.0.0.1:11434"]["model"] == "m"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
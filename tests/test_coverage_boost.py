@@ -109,7 +109,7 @@ class TestPDFExtractionSpecialCases:
     """Test special PDF extraction scenarios"""
 
     @patch("flockparsecli.subprocess.run")
-    @patch("flockparsecli.PdfReader")
+    @patch("pdf_extraction.PdfReader")
     def test_extract_pdftotext_empty_output(self, mock_pypdf2, mock_subprocess):
         """Test pdftotext returning empty output"""
         # PyPDF2 returns empty
@@ -136,7 +136,7 @@ class TestPDFExtractionSpecialCases:
         finally:
             Path(pdf_path).unlink(missing_ok=True)
 
-    @patch("flockparsecli.PdfReader")
+    @patch("pdf_extraction.PdfReader")
     def test_extract_pypdf2_page_exception(self, mock_pypdf2):
         """Test handling page extraction exceptions"""
         # Some pages raise exceptions
@@ -0,0 +1,173 @@
+"""
+Tests for the SQLite document index
+"""
+
+import json
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from document_index import DocumentIndex, index_path, open_document_index  # noqa: E402
+
+
+def _entry(doc_id, original="/docs/a.pdf", n_chunks=2):
+    return {
+        "id": doc_id,
+        "original": original,
+        "text_path": original.replace(".pdf", ".txt"),
+        "processed_date": "2026-01-01T00:00:00",
+        "chunks": [{"chunk_id": f"{doc_id}_chunk_{i}", "row": i} for i in range(n_chunks)],
+    }
+
+
+@pytest.fixture
+def db_path():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield Path(tmpdir) / "document_index.db"
+
+
+class TestDocumentIndex:
+    """Test single-row writes and reads"""
+
+    def test_put_get_and_remove(self, db_path):
+        """Entries round-trip and can be removed"""
+        index = DocumentIndex(db_path)
+        index.put(_entry("doc_1"))
+
+        assert index.get("doc_1") == _entry("doc_1")
+        assert index.remove("doc_1")
+        assert not index.remove("doc_1")
+        assert index.get("doc_1") is None
+
+    def test_update_keeps_position(self, db_path):
+        """Updating an entry does not move it to the end"""
+        index = DocumentIndex(db_path)
+        index.put_many([_entry("doc_1"), _entry("doc_2", "/docs/b.pdf")])
+
+        index.put(_entry("doc_1", n_chunks=5))
+
+        assert [doc["id"] for doc in index.documents()] == ["doc_1", "doc_2"]
+        assert len(index.get("doc_1")["chunks"]) == 5
+
+    def test_find_by_path_and_hash(self, db_path):
+        """Lookups by source path and content hash"""
+        index = DocumentIndex(db_path)
+        index.put({**_entry("doc_1"), "source_sha256": "abc"})
+
+        assert index.find(original="/docs/a.pdf")["id"] == "doc_1"
+        assert index.find(source_sha256="abc")["id"] == "doc_1"
+        assert index.find(original="/docs/missing.pdf") is None
+
+    def test_summaries_and_counts(self, db_path):
+        """Listing and counting report chunk counts"""
+        index = DocumentIndex(db_path)
+        index.put_many([_entry("doc_1", n_chunks=3), _entry("doc_2", "/docs/b.pdf", n_chunks=4)])
+
+        summaries = index.summaries()
+
+        assert [s["id"] for s in summaries] == ["doc_1", "doc_2"]
+        assert summaries[1] == {
+            "id": "doc_2",
+            "original": "/docs/b.pdf",
+            "text_path": "/docs/b.txt",
+            "processed_date": "2026-01-01T00:00:00",
+            "chunk_count": 4,
+        }
+        assert index.count() == 2
+        assert index.chunk_count() == 7
+
+    def test_replace_writes_only_changes(self, db_path):
+        """replace() rewrites changed entries and deletes missing ones"""
+        index = DocumentIndex(db_path)
+        index.put_many([_entry("doc_1"), _entry("doc_2", "/docs/b.pdf")])
+
+        written = index.replace({"documents": [_entry("doc_2", "/docs/b.pdf"), _entry("doc_3", "/docs/c.pdf")]})
+
+        assert written == 1
+        assert [doc["id"] for doc in index.documents()] == ["doc_2", "doc_3"]
+
+    def test_version_sees_own_and_other_writes(self, db_path):
+        """The version changes on writes through this connection and through another one"""
+        index = DocumentIndex(db_path)
+        index.put(_entry("doc_1"))
+        version = index.version()
+        assert index.version() == version
+
+        index.put(_entry("doc_2", "/docs/b.pdf"))
+        assert index.version() != version
+
+        version = index.version()
+        other = DocumentIndex(db_path)
+        other.remove("doc_1")
+        assert index.version() != version
+        other.close()
+
+
+class TestDocumentIds:
+    """Test id allocation"""
+
+    def test_ids_are_never_reused(self, db_path):
+        """Ids keep increasing after documents are removed"""
+        index = DocumentIndex(db_path)
+        index.put_many([_entry("doc_1"), _entry("doc_7", "/docs/b.pdf")])
+
+        assert index.allocate_id() == "doc_8"
+        index.clear()
+        assert index.allocate_id() == "doc_9"
+
+    def test_concurrent_writers_lose_nothing(self, db_path):
+        """Writers with their own connections get distinct ids and keep every document"""
+
+        def writer(n):
+            index = DocumentIndex(db_path)
+            for i in range(25):
+                doc_id = index.allocate_id()
+                index.put(_entry(doc_id, f"/docs/{n}_{i}.pdf"))
+            index.close()
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        ids = [doc["id"] for doc in DocumentIndex(db_path).documents()]
+        assert len(ids) == 100
+        assert len(set(ids)) == 100
+
+
+class TestLegacyImport:
+    """Test migration from document_index.json"""
+
+    def test_json_index_is_imported_once(self, db_path):
+        """The JSON index is imported, then renamed"""
+        json_path = db_path.with_suffix(".json")
+        json_path.write_text(json.dumps({"documents": [_entry("doc_4")], "next_id": 6}))
+
+        index = open_document_index(json_path)
+
+        assert index_path(json_path) == db_path
+        assert [doc["id"] for doc in index.documents()] == ["doc_4"]
+        assert not json_path.exists()
+        assert json_path.with_name(json_path.name + ".migrated").exists()
+        assert index.allocate_id() == "doc_6"
+
+    def test_unreadable_json_starts_empty(self, db_path):
+        """A corrupt JSON index is left alone"""
+        json_path = db_path.with_suffix(".json")
+        json_path.write_text("{invalid json")
+
+        index = open_document_index(json_path)
+
+        assert index.count() == 0
+        assert json_path.exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
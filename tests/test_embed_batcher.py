@@ -0,0 +1,240 @@
+"""
+Tests for batched /api/embed dispatch
+"""
+
+import json
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import embed_batcher  # noqa: E402
+import http_pool  # noqa: E402
+from embed_batcher import AdaptiveBatchSize, EmbedBatcher, NodeThroughput, partition  # noqa: E402
+from hedging import Hedger, LatencyTracker  # noqa: E402
+
+
+class FakeOllama:
+    """Local /api/embed server: the embedding of a text is [len(text)]; inputs containing BAD fail the request."""
+
+    def __init__(self, delay=0.0):
+        self.batches = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.batches.append(list(payload["input"]))
+                time.sleep(delay)
+                if any("BAD" in text for text in payload["input"]):
+                    status, body = 500, {"error": "cannot embed"}
+                else:
+                    status, body = 200, {"model": payload["model"], "embeddings": [[len(t)] for t in payload["input"]]}
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.handle_error = lambda request, address: None  # Clients that gave up on a stalled reply
+        self.node = f"127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def ollama():
+    servers = []
+
+    def start(delay=0.0):
+        servers.append(FakeOllama(delay))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+    http_pool.close()
+
+
+def _closed_port_node():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"127.0.0.1:{sock.getsockname()[1]}"
+
+
+def _texts(n):
+    return ["x" * (i + 1) for i in range(n)]
+
+
+class TestEmbedBatcher:
+    """Test packing, ordering and failure handling"""
+
+    def test_batches_and_keeps_order(self, ollama):
+        """Texts go out several per request and come back in input order"""
+        server = ollama()
+        batcher = EmbedBatcher(lambda: [server.node], sizer=AdaptiveBatchSize(initial=8))
+
+        results = batcher.embed("m", _texts(20), keep_alive="1h", priority=7)
+
+        assert [result["embeddings"][0][0] for result in results] == list(range(1, 21))
+        assert len(server.batches) < 20
+        assert max(len(batch) for batch in server.batches) <= 8 * 2
+
+    def test_token_budget_bounds_batches(self, ollama):
+        """Long texts are split into more requests than the count limit alone would give"""
+        server = ollama()
+        batcher = EmbedBatcher(lambda: [server.node], sizer=AdaptiveBatchSize(initial=10), max_batch_tokens=100)
+
+        results = batcher.embed("m", ["y" * 140] * 10)  # ~41 estimated tokens each
+
+        assert all(result is not None for result in results)
+        assert [len(batch) for batch in server.batches] == [2, 2, 2, 2, 2]
+
+    def test_failing_text_is_isolated(self, ollama):
+        """A failed batch is split until only the bad text is left without a result"""
+        server = ollama()
+        batcher = EmbedBatcher(lambda: [server.node], sizer=AdaptiveBatchSize(initial=8))
+        texts = _texts(8)
+        texts[5] = "BAD"
+
+        results = batcher.embed("m", texts)
+
+        assert results[5] is None
+        assert all(result is not None for i, result in enumerate(results) if i != 5)
+        assert batcher.sizer.get(server.node) < 8
+
+    def test_unreachable_node_hands_work_back(self, ollama):
+        """Texts taken by a node that cannot be reached are embedded by the others"""
+        server = ollama()
+        batcher = EmbedBatcher(lambda: [_closed_port_node(), server.node], sizer=AdaptiveBatchSize(initial=4))
+
+        results = batcher.embed("m", _texts(12))
+
+        assert all(result is not None for result in results)
+        assert sum(len(batch) for batch in server.batches) == 12
+
+    def test_work_is_spread_over_nodes(self, ollama):
+        """Every node takes part of the input"""
+        first, second = ollama(), ollama()
+        batcher = EmbedBatcher(lambda: [first.node, second.node], sizer=AdaptiveBatchSize(initial=2))
+
+        results = batcher.embed("m", _texts(40))
+
+        assert all(result is not None for result in results)
+        assert first.batches and second.batches
+        assert sum(len(b) for b in first.batches + second.batches) == 40
+
+    def test_split_follows_throughput(self, ollama):
+        """Each node starts with a share of the texts proportional to its chunks/sec"""
+        fast, slow = ollama(), ollama()
+        throughput = NodeThroughput(initial={fast.node: 9.0, slow.node: 1.0})
+        batcher = EmbedBatcher(
+            lambda: [fast.node, slow.node], sizer=AdaptiveBatchSize(initial=64), throughput=throughput
+        )
+
+        results = batcher.embed("m", _texts(40))
+
+        assert all(result is not None for result in results)
+        assert sum(len(b) for b in slow.batches) <= 4
+
+    def test_fast_node_steals_the_tail(self, ollama):
+        """A node that finishes early takes work queued for a slower one"""
+        fast, slow = ollama(), ollama(delay=0.3)
+        batcher = EmbedBatcher(lambda: [fast.node, slow.node], sizer=AdaptiveBatchSize(initial=2))
+
+        results = batcher.embed("m", _texts(20))
+
+        assert all(result is not None for result in results)
+        assert sum(len(b) for b in slow.batches) < 10
+        assert batcher.throughput.rate(fast.node) > batcher.throughput.rate(slow.node)
+
+    def test_learned_rates_are_saved(self, ollama, tmp_path):
+        """Measured throughput is written out and loaded by the next batcher"""
+        server = ollama()
+        path = tmp_path / "node_throughput.json"
+        EmbedBatcher(lambda: [server.node], throughput=NodeThroughput(path=path)).embed("m", _texts(5))
+
+        assert json.loads(path.read_text())["node_throughput"][server.node] > 0
+        assert NodeThroughput(path=path, initial={server.node: 0.001}).rate(server.node) > 0.001
+
+    def test_stalled_batch_is_hedged(self, ollama):
+        """A sub-batch running past the node's p95 is answered by another node"""
+        fast, stalled = ollama(), ollama(delay=3.0)
+        hedger = Hedger(budget=1.0, latency=LatencyTracker(min_samples=1))
+        for server in (fast, stalled):
+            hedger.latency.observe(embed_batcher._latency_key(server.node, "m"), 0.01)
+        batcher = EmbedBatcher(lambda: [fast.node, stalled.node], sizer=AdaptiveBatchSize(initial=1), hedger=hedger)
+
+        start = time.time()
+        results = batcher.embed("m", _texts(2))
+
+        assert all(result is not None for result in results)
+        assert time.time() - start < 2.0
+        assert hedger.stats()["hedge_wins"] >= 1
+
+
+class TestNodeThroughput:
+    """Test the chunks/sec EWMA and the proportional split"""
+
+    def test_ewma(self):
+        throughput = NodeThroughput(alpha=0.5)
+
+        assert throughput.rate("a") == 1.0
+        throughput.observe("a", 10, 1.0)
+        assert throughput.rate("a") == 10.0
+        throughput.observe("a", 2, 1.0)
+        assert throughput.rate("a") == 6.0
+        throughput.observe("b", 2, 1.0)
+        assert throughput.rate("unmeasured") == 4.0  # Average of the known nodes
+
+    def test_partition(self):
+        queues = partition(10, {"a": 3.0, "b": 1.0, "c": 1.0})
+
+        assert [list(queue) for queue in queues.values()] == [[0, 1, 2, 3, 4, 5], [6, 7], [8, 9]]
+
+
+class TestAdaptiveBatchSize:
+    """Test the latency-driven batch size"""
+
+    def test_grows_when_fast_and_shrinks_when_slow(self):
+        sizer = AdaptiveBatchSize(initial=8, maximum=64, target_seconds=2.0)
+
+        sizer.observe("n", 8, 0.5)
+        assert sizer.get("n") == 16
+        sizer.observe("n", 3, 0.1)  # A partial batch does not grow the size
+        assert sizer.get("n") == 16
+        sizer.observe("n", 16, 8.0)
+        assert sizer.get("n") == 4
+        sizer.failed("n")
+        assert sizer.get("n") == 2
+        assert sizer.get("other") == 8
+
+    def test_bounds(self):
+        sizer = AdaptiveBatchSize(initial=4, minimum=1, maximum=8, target_seconds=1.0)
+
+        for _ in range(5):
+            sizer.observe("n", sizer.get("n"), 0.01)
+        assert sizer.get("n") == 8
+        sizer.observe("n", 8, 1000.0)
+        assert sizer.get("n") == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,247 @@
+"""
+Tests for the SQLite embedding cache and the in-process LRU in front of it
+"""
+
+import json
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from embedding_store import EmbeddingLRUCache, EmbeddingNamespace, EmbeddingStore  # noqa: E402
+
+NS = EmbeddingNamespace("mxbai-embed-large", "sha256:aaa")
+
+
+@pytest.fixture
+def store():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = EmbeddingStore(Path(tmpdir) / "embedding_cache.db")
+        yield store
+        store.close()
+
+
+class TestEmbeddingStore:
+    """Test keyed lookups and writes"""
+
+    def test_put_and_get(self, store):
+        """Stored embeddings come back as float lists"""
+        store.put(NS, "abc", [0.5, -1.0, 2.0])
+
+        assert store.get(NS, "abc") == [0.5, -1.0, 2.0]
+        assert store.get(NS, "missing") is None
+        assert len(store) == 1
+
+    def test_empty_embeddings_not_cached(self, store):
+        """Failed (empty) embeddings are not stored"""
+        store.put(NS, "empty", [])
+
+        assert store.get(NS, "empty") is None
+        assert len(store) == 0
+
+    def test_get_many_and_missing(self, store):
+        """Bulk lookup returns only present keys; missing() returns the rest"""
+        store.put_many(NS, [(f"k{i}", [float(i)]) for i in range(600)])
+
+        found = store.get_many(NS, ["k1", "k599", "nope", "k1"])
+
+        assert found == {"k1": [1.0], "k599": [599.0]}
+        assert store.missing(NS, ["k1", "nope", "k2", "other", "nope"]) == ["nope", "other"]
+
+    def test_put_replaces(self, store):
+        """Writing an existing key replaces its vector"""
+        store.put(NS, "k", [1.0])
+        store.put(NS, "k", [2.0, 3.0])
+
+        assert store.get(NS, "k") == [2.0, 3.0]
+        assert len(store) == 1
+
+    def test_persists_across_instances(self):
+        """A reopened store sees earlier writes"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "embedding_cache.db"
+            first = EmbeddingStore(path)
+            first.put(NS, "k", [1.0, 2.0])
+            first.close()
+
+            second = EmbeddingStore(path)
+            assert second.get(NS, "k") == [1.0, 2.0]
+            second.close()
+
+    def test_clear(self, store):
+        """clear() removes every embedding"""
+        store.put_many(NS, [("a", [1.0]), ("b", [2.0])])
+
+        store.clear()
+
+        assert len(store) == 0
+
+    def test_concurrent_writers(self, store):
+        """Writes from several threads are all kept"""
+
+        def write(worker):
+            for i in range(50):
+                store.put(NS, f"{worker}_{i}", [float(i)])
+
+        threads = [threading.Thread(target=write, args=(w,)) for w in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(store) == 200
+
+
+class TestEmbeddingNamespaces:
+    """Test that vectors from different models never mix"""
+
+    def test_models_coexist(self, store):
+        """The same text hash holds separate vectors per model"""
+        nomic = EmbeddingNamespace("nomic-embed-text", "sha256:bbb")
+        store.put(NS, "h", [1.0, 0.0, 0.0])
+        store.put(nomic, "h", [0.5, 0.5])
+
+        assert store.get(NS, "h") == [1.0, 0.0, 0.0]
+        assert store.get(nomic, "h") == [0.5, 0.5]
+        assert store.count(nomic) == 1
+        assert sorted(ns.model for ns, _ in store.namespaces()) == ["mxbai-embed-large", "nomic-embed-text"]
+
+    def test_digest_change_is_a_miss(self, store):
+        """A rebuilt model (new digest) does not see the old vectors"""
+        store.put(NS, "h", [1.0])
+
+        assert store.get(NS._replace(digest="sha256:new"), "h") is None
+
+    def test_dimension_is_enforced(self, store):
+        """Vectors of the wrong dimension are neither stored nor served"""
+        store.put(NS, "old", [1.0, 2.0])
+        sized = NS._replace(dim=3)
+
+        store.put(sized, "bad", [1.0, 2.0])
+
+        assert store.get(sized, "old") is None
+        assert store.get(NS, "bad") is None
+        assert store.get(NS, "old") == [1.0, 2.0]
+
+    def test_remember_model(self, store):
+        """The last digest and dimension per model are kept"""
+        assert store.known_model("mxbai-embed-large") is None
+
+        store.remember_model(NS._replace(dim=1024))
+
+        assert store.known_model("mxbai-embed-large") == NS._replace(dim=1024)
+
+
+class TestMigration:
+    """Test importing earlier cache formats"""
+
+    def test_import_json(self, store):
+        """Every non-empty legacy entry is imported into the namespace"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            legacy = Path(tmpdir) / "embedding_cache.json"
+            with open(legacy, "w") as f:
+                json.dump({"h1": [0.25, 0.5], "h2": [1.0, 0.0], "h3": []}, f)
+
+            imported = store.import_json(legacy, NS)
+
+        assert imported == 2
+        assert store.get(NS, "h1") == [0.25, 0.5]
+        assert store.get(NS, "h3") is None
+
+    def test_adopt_unnamespaced(self):
+        """Rows from the single-key table move under the given model"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "embedding_cache.db"
+            conn = sqlite3.connect(str(path))
+            conn.execute("CREATE TABLE embeddings (key TEXT PRIMARY KEY, dim INTEGER, vector BLOB)")
+            conn.execute("INSERT INTO embeddings VALUES (?, ?, ?)", ("h", 2, np.array([1, 2], np.float32).tobytes()))
+            conn.commit()
+            conn.close()
+
+            store = EmbeddingStore(path)
+            assert store.adopt_unnamespaced(NS) == 1
+            assert store.adopt_unnamespaced(NS) == 0
+            assert store.get(NS, "h") == [1.0, 2.0]
+            store.close()
+
+
+class TestEmbeddingLRUCache:
+    """Test the in-process query embedding cache"""
+
+    def test_hit_and_miss_counters(self):
+        """Lookups are counted as hits or misses"""
+        cache = EmbeddingLRUCache()
+        cache.put(("model", "a"), [1.0, 2.0])
+
+        assert cache.get(("model", "a")) == [1.0, 2.0]
+        assert cache.get(("model", "b")) is None
+        assert cache.get(("other", "a")) is None
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+
+    def test_byte_budget_evicts_least_recently_used(self):
+        """Oldest untouched entries are evicted first"""
+        entry_bytes = 4 * 4 + EmbeddingLRUCache.ENTRY_OVERHEAD_BYTES
+        cache = EmbeddingLRUCache(max_bytes=entry_bytes * 2)
+        cache.put("a", [1.0] * 4)
+        cache.put("b", [2.0] * 4)
+        cache.get("a")
+        cache.put("c", [3.0] * 4)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["bytes"] <= entry_bytes * 2
+
+    def test_ttl_expiry(self):
+        """Entries older than the TTL are treated as misses"""
+        cache = EmbeddingLRUCache(ttl=0.01)
+        cache.put("a", [1.0])
+        time.sleep(0.02)
+
+        assert cache.get("a") is None
+        assert cache.stats()["expirations"] == 1
+        assert len(cache) == 0
+
+    def test_oversized_and_empty_entries_skipped(self):
+        """Entries larger than the budget or empty are not cached"""
+        cache = EmbeddingLRUCache(max_bytes=100)
+        cache.put("big", [1.0] * 1000)
+        cache.put("empty", [])
+
+        assert len(cache) == 0
+
+    def test_concurrent_access(self):
+        """Counters stay consistent under concurrent use"""
+        cache = EmbeddingLRUCache(max_bytes=50 * (8 + EmbeddingLRUCache.ENTRY_OVERHEAD_BYTES))
+
+        def worker(n):
+            for i in range(200):
+                key = (n, i % 80)
+                if cache.get(key) is None:
+                    cache.put(key, [float(i), 0.0])
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stats = cache.stats()
+        assert stats["hits"] + stats["misses"] == 800
+        assert stats["entries"] <= 50
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,107 @@
+"""
+Tests for the multi-process extraction pool
+"""
+
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from extraction_pool import ExtractionPool  # noqa: E402
+
+
+def _square(n):
+    return n * n
+
+
+def _worker_pid(_):
+    return os.getpid()
+
+
+def _fail_on_three(n):
+    if n == 3:
+        raise ValueError("bad document")
+    return n
+
+
+_held = threading.Lock()
+
+
+def _acquire_held(_):
+    acquired = _held.acquire(timeout=2)
+    if acquired:
+        _held.release()
+    return acquired
+
+
+def _crash_on_three(n):
+    if n == 3:
+        os._exit(1)
+    return n
+
+
+class TestExtractionPool:
+    """Test fan-out to worker processes"""
+
+    def test_all_items_processed(self):
+        """Every item is yielded once with its result"""
+        with ExtractionPool(workers=2) as pool:
+            results = {item: result for item, result, error in pool.map_unordered(_square, range(20))}
+
+        assert results == {n: n * n for n in range(20)}
+
+    def test_runs_in_worker_processes(self):
+        """Work happens outside the calling process"""
+        with ExtractionPool(workers=2) as pool:
+            pids = {result for _, result, _ in pool.map_unordered(_worker_pid, range(4))}
+
+        assert os.getpid() not in pids
+
+    def test_workers_do_not_inherit_held_locks(self):
+        """A lock held by another thread in the parent is free in the workers (no fork)"""
+        with _held:
+            with ExtractionPool(workers=1) as pool:
+                acquired = [result for _, result, _ in pool.map_unordered(_acquire_held, range(1))]
+
+        assert acquired == [True]
+
+    def test_errors_are_yielded_not_raised(self):
+        """A failing item is reported and the rest still complete"""
+        with ExtractionPool(workers=2) as pool:
+            outcomes = {item: (result, error) for item, result, error in pool.map_unordered(_fail_on_three, range(6))}
+
+        assert isinstance(outcomes[3][1], ValueError)
+        assert [outcomes[n][0] for n in (0, 1, 2, 4, 5)] == [0, 1, 2, 4, 5]
+
+    def test_crashed_worker_does_not_lose_other_items(self):
+        """A worker that dies only fails its own item"""
+        with ExtractionPool(workers=2, max_in_flight=2) as pool:
+            outcomes = {item: (result, error) for item, result, error in pool.map_unordered(_crash_on_three, range(6))}
+
+        assert sorted(outcomes) == list(range(6))
+        assert outcomes[3][1] is not None
+        assert all(outcomes[n] == (n, None) for n in (0, 1, 2, 4, 5))
+
+    def test_in_flight_is_bounded(self):
+        """Items are pulled from the input lazily"""
+        pulled = []
+
+        def items():
+            for n in range(100):
+                pulled.append(n)
+                yield n
+
+        with ExtractionPool(workers=2, max_in_flight=3) as pool:
+            stream = pool.map_unordered(_square, items())
+            next(stream)
+            assert len(pulled) <= 4
+            assert len(list(stream)) == 99
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
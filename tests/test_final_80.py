@@ -46,7 +46,7 @@ class TestChunkTextFinalEdgeCases:
 class TestPDFPageIteration:
     """Test PDF page iteration edge cases"""
 
-    @patch("flockparsecli.PdfReader")
+    @patch("pdf_extraction.PdfReader")
     def test_extract_with_many_pages(self, mock_pypdf2):
         """Test extraction with many pages to hit iteration paths"""
         # Create many pages to ensure all iteration paths are hit
@@ -23,7 +23,7 @@ class TestExtractTextFromPDFComplete:
     """Complete coverage of PDF extraction"""
 
     @patch("flockparsecli.subprocess.run")
-    @patch("flockparsecli.PdfReader")
+    @patch("pdf_extraction.PdfReader")
     def test_extract_with_pdftotext_success(self, mock_pypdf2, mock_subprocess):
         """Test extraction with pdftotext when PyPDF2 fails"""
         # PyPDF2 returns empty
@@ -49,7 +49,7 @@ class TestExtractTextFromPDFComplete:
             Path(pdf_path).unlink(missing_ok=True)
 
     @patch("flockparsecli.subprocess.run")
-    @patch("flockparsecli.PdfReader")
+    @patch("pdf_extraction.PdfReader")
     def test_extract_pdftotext_error(self, mock_pypdf2, mock_subprocess):
         """Test extraction when pdftotext errors"""
         # PyPDF2 returns empty
@@ -73,7 +73,7 @@ class TestExtractTextFromPDFComplete:
         finally:
             Path(pdf_path).unlink(missing_ok=True)
 
-    @patch("flockparsecli.PdfReader")
+    @patch("pdf_extraction.PdfReader")
     def test_extract_page_by_page(self, mock_pypdf2):
         """Test extraction processes each page"""
         # Mock multiple pages with varying content
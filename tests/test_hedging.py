@@ -0,0 +1,152 @@
+"""
+Tests for hedged requests
+"""
+
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from hedging import Hedger, LatencyTracker  # noqa: E402
+
+
+def _hedger(budget=1.0, p95=0.05):
+    """Hedger whose "k" latency history has a p95 of ``p95`` seconds."""
+    hedger = Hedger(budget=budget, latency=LatencyTracker(min_samples=5))
+    for _ in range(5):
+        hedger.latency.observe("k", p95)
+    return hedger
+
+
+def _slow(value, seconds):
+    def call():
+        time.sleep(seconds)
+        return value
+
+    return call
+
+
+def _fail(message):
+    def call():
+        raise RuntimeError(message)
+
+    return call
+
+
+class TestLatencyTracker:
+    """Test the rolling percentile"""
+
+    def test_percentile_needs_samples(self):
+        tracker = LatencyTracker(window=100, min_samples=10)
+        for i in range(9):
+            tracker.observe("n", i)
+        assert tracker.percentile("n") is None
+
+        for i in range(9, 100):
+            tracker.observe("n", i)
+        assert tracker.percentile("n") == 95
+        assert tracker.percentile("other") is None
+
+    def test_window_drops_old_samples(self):
+        tracker = LatencyTracker(window=10, min_samples=1)
+        for _ in range(10):
+            tracker.observe("n", 100.0)
+        for _ in range(10):
+            tracker.observe("n", 1.0)
+        assert tracker.percentile("n") == 1.0
+
+
+class TestHedger:
+    """Test racing a request against its duplicate"""
+
+    def test_hedge_wins_when_primary_stalls(self):
+        """A duplicate sent after the p95 answers first and its result is used"""
+        hedger = _hedger()
+
+        start = time.time()
+        assert hedger.run(_slow("primary", 2.0), _slow("hedge", 0.0), hedger.delay("k")) == "hedge"
+
+        assert time.time() - start < 1.0
+        stats = hedger.stats()
+        assert stats["hedged"] == 1
+        assert stats["hedge_wins"] == 1
+        assert stats["hedge_win_rate"] == 1.0
+
+    def test_fast_primary_is_not_hedged(self):
+        hedger = _hedger(p95=1.0)
+
+        assert hedger.run(_slow("primary", 0.0), _fail("must not run"), hedger.delay("k")) == "primary"
+        assert hedger.stats()["hedged"] == 0
+
+    def test_primary_can_still_win(self):
+        """A hedge that fails leaves the answer to the original request"""
+        hedger = _hedger()
+
+        assert hedger.run(_slow("primary", 0.2), _fail("backup down"), hedger.delay("k")) == "primary"
+        assert hedger.stats()["hedged"] == 1
+        assert hedger.stats()["hedge_wins"] == 0
+
+    def test_both_failing_raises_primary_error(self):
+        hedger = _hedger()
+
+        def slow_failure():
+            time.sleep(0.2)
+            raise RuntimeError("primary failed")
+
+        with pytest.raises(RuntimeError, match="primary failed"):
+            hedger.run(slow_failure, _fail("hedge failed"), hedger.delay("k"))
+
+    def test_budget_limits_hedges(self):
+        """With a 10% budget only the saved-up credit is spent on hedges"""
+        hedger = _hedger(budget=0.1)
+
+        for _ in range(3):
+            hedger.run(_slow("primary", 0.1), _slow("hedge", 0.0), hedger.delay("k"))
+
+        stats = hedger.stats()
+        assert stats["hedged"] == 1
+        assert stats["over_budget"] == 2
+
+    def test_queue_wait_does_not_count_towards_delay(self):
+        """A primary stuck behind other work in the pool is not hedged before it is sent"""
+        hedger = _hedger()
+        with patch("hedging.HEDGE_WORKERS", 1):
+            busy = hedger._pool().submit(time.sleep, 0.3)
+
+            assert hedger.run(_slow("primary", 0.01), _fail("must not run"), hedger.delay("k")) == "primary"
+
+        busy.result()
+        assert hedger.stats()["hedged"] == 0
+        assert hedger.stats()["over_budget"] == 0
+
+    def test_disabled_or_unknown_latency_runs_inline(self):
+        assert Hedger(budget=0).delay("k") is None
+        assert Hedger(budget=0.05).delay("no history") is None
+        assert Hedger(budget=0.05).run(lambda: "inline", None, None) == "inline"
+
+
+class TestHedgeTarget:
+    """Test the choice of node for the duplicate"""
+
+    def test_prefers_untried_resident_idle_node(self):
+        sollol_compat = pytest.importorskip("sollol_compat")
+        nodes = [{"host": f"10.0.0.{i}", "port": 11434} for i in (1, 2, 3, 4)]
+        perf = {
+            "10.0.0.2:11434": {"active_requests": 0, "vram_exhausted": True},
+            "10.0.0.3:11434": {"active_requests": 2},
+            "10.0.0.4:11434": {"active_requests": 1},
+        }
+        pool = SimpleNamespace(nodes=nodes, stats={"node_performance": perf}, model_residency=None)
+
+        assert sollol_compat._hedge_node(pool, "m", exclude={"10.0.0.1:11434"}) == nodes[3]
+        assert sollol_compat._hedge_node(pool, "m", exclude={f"10.0.0.{i}:11434" for i in (1, 2, 3, 4)}) is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,83 @@
+"""
+Tests for the shared HTTP connection pool
+"""
+
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import http_pool  # noqa: E402
+
+
+@pytest.fixture
+def ollama_stub():
+    """Local HTTP/1.1 server answering /api/ps, recording the client port of each request."""
+    ports = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            ports.append(self.client_address[1])
+            body = b'{"models": []}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", ports
+    server.shutdown()
+    server.server_close()
+    http_pool.close()
+
+
+class TestHTTPPool:
+    """Test connection reuse and client caching"""
+
+    def test_requests_reuse_one_connection(self, ollama_stub):
+        """Consecutive requests to a node go over the same kept-alive connection"""
+        url, ports = ollama_stub
+
+        for _ in range(3):
+            assert http_pool.get_session().get(f"{url}/api/ps", timeout=5).json() == {"models": []}
+
+        assert len(ports) == 3
+        assert len(set(ports)) == 1
+
+    def test_shared_clients(self):
+        """One session per process and one Ollama client per host"""
+        try:
+            assert http_pool.get_session() is http_pool.get_session()
+            assert http_pool.ollama_client("http://10.0.0.1:11434") is http_pool.ollama_client("http://10.0.0.1:11434")
+            assert http_pool.ollama_client("http://10.0.0.1:11434") is not http_pool.ollama_client(
+                "http://10.0.0.2:11434"
+            )
+        finally:
+            http_pool.close()
+
+    def test_options_follow_settings(self):
+        """Limits and timeouts come from the module settings"""
+        options = http_pool.client_options()
+
+        assert options["limits"].max_connections == http_pool.MAX_CONNECTIONS
+        assert options["limits"].max_keepalive_connections == http_pool.MAX_KEEPALIVE_CONNECTIONS
+        assert options["timeout"].connect == http_pool.CONNECT_TIMEOUT
+        assert options["timeout"].read == http_pool.REQUEST_TIMEOUT
+        assert options["http2"] == http_pool.http2_available()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,333 @@
+"""
+Tests for content-addressed incremental re-ingestion
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import flockparsecli  # noqa: E402
+from ann_index import IVFIndex  # noqa: E402
+from document_index import DocumentIndex, index_path  # noqa: E402
+from embedding_store import EmbeddingNamespace, EmbeddingStore  # noqa: E402
+from flockparsecli import (  # noqa: E402
+    check_ingested,
+    ingest_lookup,
+    load_document_index,
+    process_directory,
+    process_pdf,
+)
+from vector_store import EmbeddingMatrix  # noqa: E402
+
+NS = EmbeddingNamespace("mxbai-embed-large", "sha256:test")
+
+PARAGRAPHS = [f"Paragraph {i}: " + " ".join(f"word{i}_{j}" for j in range(60)) for i in range(6)]
+LONG_PARAGRAPHS = [f"Section {i}: " + " ".join(f"term{i}_{j}" for j in range(60)) for i in range(60)]
+
+
+def _embed_batch(model, inputs, **kwargs):
+    return [{"embeddings": [[float(len(text)), 1.0, 0.5]]} for text in inputs]
+
+
+@pytest.fixture
+def kb():
+    """An isolated knowledge base with a fake embedding backend."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        store = EmbeddingStore(tmpdir / "embedding_cache.db")
+        balancer = Mock(nodes=["http://node:11434"])
+        balancer.embed_batch.side_effect = _embed_batch
+        with (
+            patch.multiple(
+                flockparsecli,
+                INDEX_FILE=tmpdir / "document_index.json",
+                SEGMENTS_DIR=tmpdir / "segments",
+                PROCESSED_DIR=tmpdir,
+                embedding_matrix=EmbeddingMatrix(),
+                ann_index=IVFIndex(tmpdir / "ann_index.npz"),
+                load_balancer=balancer,
+                INGEST_PIPELINE_ENABLED=False,
+                EXTRACTION_WORKERS=1,
+            ),
+            patch("flockparsecli.get_embedding_store", return_value=store),
+            patch("flockparsecli.get_embedding_namespace", return_value=NS),
+            patch("sollol.network_observer.get_observer"),
+            patch("flockparsecli.time.sleep"),
+        ):
+            yield tmpdir, balancer
+        store.close()
+
+
+def _write_pdf(path, paragraphs):
+    """Stand-in PDF whose bytes (and mocked extracted text) follow its paragraphs."""
+    text = "\n\n".join(paragraphs)
+    path.write_bytes(b"%PDF-1.4\n" + text.encode())
+    return text
+
+
+def _extracted(path, on_page=None, page_report=None):
+    return Path(path).read_bytes()[len(b"%PDF-1.4\n") :].decode()
+
+
+class TestChangeDetection:
+    """Test how a PDF is compared with the index"""
+
+    def test_new_unchanged_and_changed(self, kb):
+        """Status follows content, not just timestamps"""
+        tmpdir, _ = kb
+        pdf = tmpdir / "manual.pdf"
+        _write_pdf(pdf, PARAGRAPHS)
+        status, fingerprint, _ = check_ingested(pdf)
+        assert status == "new"
+
+        index = {"documents": [{"id": "doc_1", "original": str(pdf), **fingerprint}]}
+        assert check_ingested(pdf, ingest_lookup(index))[0] == "unchanged"
+
+        os.utime(pdf, (1, 1))
+        assert check_ingested(pdf, ingest_lookup(index))[0] == "unchanged"
+
+        _write_pdf(pdf, PARAGRAPHS[:-1])
+        assert check_ingested(pdf, ingest_lookup(index))[0] == "changed"
+
+    def test_size_and_mtime_match_skips_hashing(self, kb):
+        """An untouched file is not read"""
+        tmpdir, _ = kb
+        pdf = tmpdir / "manual.pdf"
+        _write_pdf(pdf, PARAGRAPHS)
+        _, fingerprint, _ = check_ingested(pdf)
+        index = {"documents": [{"id": "doc_1", "original": str(pdf), **fingerprint}]}
+
+        with patch("flockparsecli.file_sha256") as mock_hash:
+            assert check_ingested(pdf, ingest_lookup(index))[0] == "unchanged"
+            mock_hash.assert_not_called()
+
+
+class TestIncrementalIngest:
+    """Test re-running ingestion over the same files"""
+
+    @patch("flockparsecli.extract_text_from_pdf", side_effect=_extracted)
+    def test_unchanged_pdf_is_skipped(self, mock_extract, kb):
+        """A second run neither extracts nor embeds"""
+        tmpdir, balancer = kb
+        pdf = tmpdir / "manual.pdf"
+        _write_pdf(pdf, PARAGRAPHS)
+
+        first = process_pdf(pdf)
+        calls = balancer.embed_batch.call_count
+        second = process_pdf(pdf)
+
+        assert first["status"] == "added"
+        assert second["status"] == "skipped"
+        assert mock_extract.call_count == 1
+        assert balancer.embed_batch.call_count == calls
+        assert len(load_document_index()["documents"]) == 1
+
+    @patch("flockparsecli.extract_text_from_pdf", side_effect=_extracted)
+    def test_changed_pdf_updates_previous_version(self, mock_extract, kb):
+        """Only changed chunks are embedded and the entry is updated in place"""
+        tmpdir, balancer = kb
+        pdf = tmpdir / "manual.pdf"
+        _write_pdf(pdf, PARAGRAPHS)
+        first = process_pdf(pdf)
+        old_segment = Path(load_document_index()["documents"][0]["segment"])
+
+        _write_pdf(pdf, PARAGRAPHS[:-1] + ["A rewritten final paragraph with new content."])
+        second = process_pdf(pdf)
+
+        documents = load_document_index()["documents"]
+        assert second["status"] == "updated"
+        assert [doc["id"] for doc in documents] == [first["doc_id"]]
+        assert second["doc_id"] == first["doc_id"]
+        assert 0 < second["embedded"] < second["chunks"]
+        assert old_segment.with_name(old_segment.name + ".npy").exists()
+        assert flockparsecli.embedding_matrix.document_ids == [second["doc_id"]]
+
+    @patch("flockparsecli.extract_text_from_pdf", side_effect=_extracted)
+    def test_new_embedding_model_replaces_previous_version(self, mock_extract, kb):
+        """Vectors from another model are not reused; the document gets a new id"""
+        tmpdir, _ = kb
+        pdf = tmpdir / "manual.pdf"
+        _write_pdf(pdf, PARAGRAPHS)
+        first = process_pdf(pdf)
+
+        _write_pdf(pdf, PARAGRAPHS[:-1] + ["A rewritten final paragraph with new content."])
+        with patch("flockparsecli.get_embedding_namespace", return_value=EmbeddingNamespace("other", "sha256:x")):
+            second = process_pdf(pdf)
+
+        assert second["status"] == "updated"
+        assert second["doc_id"] != first["doc_id"]
+        assert [doc["id"] for doc in load_document_index()["documents"]] == [second["doc_id"]]
+
+    @patch("flockparsecli.extract_text_from_pdf", side_effect=_extracted)
+    def test_directory_rerun_only_processes_changes(self, mock_extract, kb):
+        """Re-running a directory processes just the new and modified files"""
+        tmpdir, _ = kb
+        docs = tmpdir / "docs"
+        docs.mkdir()
+        for name in ("a", "b", "c"):
+            _write_pdf(docs / f"{name}.pdf", [f"{name} " + p for p in PARAGRAPHS])
+        process_directory(docs)
+        assert mock_extract.call_count == 3
+
+        _write_pdf(docs / "b.pdf", ["changed " + p for p in PARAGRAPHS])
+        _write_pdf(docs / "d.pdf", ["new " + p for p in PARAGRAPHS])
+        process_directory(docs)
+
+        assert mock_extract.call_count == 5
+        names = sorted(Path(doc["original"]).name for doc in load_document_index()["documents"])
+        assert names == ["a.pdf", "b.pdf", "c.pdf", "d.pdf"]
+
+
+class TestDeltaReembedding:
+    """Test chunk-level updates of a revised document"""
+
+    @patch("flockparsecli.extract_text_from_pdf", side_effect=_extracted)
+    def test_edit_embeds_only_changed_chunks(self, mock_extract, kb):
+        """Editing one section embeds just its chunks, even with an empty embedding cache"""
+        tmpdir, balancer = kb
+        pdf = tmpdir / "long.pdf"
+        _write_pdf(pdf, LONG_PARAGRAPHS)
+        first = process_pdf(pdf)
+        flockparsecli.get_embedding_store().clear()
+        balancer.embed_batch.reset_mock()
+
+        edited = list(LONG_PARAGRAPHS)
+        edited[20] = "An edited paragraph that was rewritten. " + edited[20]
+        _write_pdf(pdf, edited)
+        second = process_pdf(pdf)
+
+        embedded = sum(len(call.kwargs["inputs"]) for call in balancer.embed_batch.call_args_list)
+        assert second["doc_id"] == first["doc_id"]
+        assert embedded == second["embedded"] <= 2
+        assert second["tombstoned"] == embedded
+        assert second["chunks"] == first["chunks"]
+
+        doc = load_document_index()["documents"][0]
+        assert len(doc["segments"]) == 1
+        assert len(doc["chunks"]) == second["chunks"]
+        matrix = flockparsecli.embedding_matrix
+        assert matrix.tombstoned == second["tombstoned"]
+        assert len(matrix) == first["chunks"] + embedded
+
+    @patch("flockparsecli.extract_text_from_pdf", side_effect=_extracted)
+    def test_search_skips_tombstoned_chunks(self, mock_extract, kb):
+        """Replaced chunks are never returned, new ones are"""
+        tmpdir, _ = kb
+        pdf = tmpdir / "manual.pdf"
+        _write_pdf(pdf, PARAGRAPHS)
+        process_pdf(pdf)
+        _write_pdf(pdf, PARAGRAPHS[:-1] + ["short"])
+        process_pdf(pdf)
+
+        texts = [r["text"] for r in flockparsecli.embedding_matrix.search([1.0, 1.0, 0.5], top_k=10)]
+        assert any(text.endswith("short") for text in texts)
+        assert not any(PARAGRAPHS[-1] in text for text in texts)
+        assert len(texts) == len(load_document_index()["documents"][0]["chunks"])
+
+    @patch("flockparsecli.extract_text_from_pdf", side_effect=_extracted)
+    def test_compaction_folds_segments(self, mock_extract, kb):
+        """A mostly rewritten document is compacted into a single segment"""
+        tmpdir, balancer = kb
+        pdf = tmpdir / "manual.pdf"
+        _write_pdf(pdf, PARAGRAPHS)
+        first = process_pdf(pdf)
+        old_segment = load_document_index()["documents"][0]["segment"]
+
+        _write_pdf(pdf, ["rewritten " + p for p in PARAGRAPHS])
+        second = process_pdf(pdf)
+
+        doc = load_document_index()["documents"][0]
+        assert second["doc_id"] == first["doc_id"]
+        assert "segments" not in doc
+        assert doc["segment"] != old_segment
+        assert not Path(old_segment + ".npy").exists()
+        assert sorted(ref["row"] for ref in doc["chunks"]) == list(range(len(doc["chunks"])))
+        assert len(flockparsecli.embedding_matrix) == len(doc["chunks"])
+        assert flockparsecli.embedding_matrix.tombstoned == 0
+
+
+class TestRetrievalSync:
+    """Test how queries keep the resident matrix in line with the index"""
+
+    @patch("flockparsecli.extract_text_from_pdf", side_effect=_extracted)
+    def test_queries_only_load_index_after_writes(self, mock_extract, kb):
+        """Repeated queries do not parse the index; a write from another process is picked up"""
+        tmpdir, _ = kb
+        pdf = tmpdir / "manual.pdf"
+        _write_pdf(pdf, PARAGRAPHS)
+        process_pdf(pdf)
+
+        with (
+            patch("flockparsecli.get_cached_embedding", return_value=[1.0, 1.0, 0.5]),
+            patch("flockparsecli.load_document_index", wraps=load_document_index) as mock_load,
+        ):
+            first = flockparsecli.get_similar_chunks("query")
+            loads = mock_load.call_count
+            second = flockparsecli.get_similar_chunks("query")
+            assert mock_load.call_count == loads
+            assert [r["text"] for r in second] == [r["text"] for r in first]
+
+            other = DocumentIndex(index_path(flockparsecli.INDEX_FILE))
+            other.remove(load_document_index()["documents"][0]["id"])
+            other.close()
+            assert flockparsecli.get_similar_chunks("query") == []
+            assert mock_load.call_count > loads
+
+    @patch("flockparsecli.extract_text_from_pdf", side_effect=_extracted)
+    def test_async_query_awaits_pool_embedding(self, mock_extract, kb):
+        """Async callers embed the query through the pool's asyncio path and share the cache"""
+        tmpdir, balancer = kb
+        pdf = tmpdir / "manual.pdf"
+        _write_pdf(pdf, PARAGRAPHS)
+        process_pdf(pdf)
+        balancer.embed_batch_async = AsyncMock(return_value=[{"embeddings": [[1.0, 1.0, 0.5]]}])
+
+        first = asyncio.run(flockparsecli.get_similar_chunks_async("async query"))
+        second = asyncio.run(flockparsecli.get_similar_chunks_async("async query"))
+
+        assert first and [r["text"] for r in second] == [r["text"] for r in first]
+        balancer.embed_batch_async.assert_awaited_once()
+        balancer.embed.assert_not_called()
+        assert flockparsecli.get_cached_embedding("async query") == [1.0, 1.0, 0.5]
+
+
+class TestReembed:
+    """Test switching the corpus to new embeddings"""
+
+    @patch("flockparsecli.extract_text_from_pdf", side_effect=_extracted)
+    def test_other_instances_pick_up_new_vectors(self, mock_extract, kb):
+        """A matrix loaded before the re-embed (e.g. the API server's) swaps in the new vectors on sync"""
+        tmpdir, balancer = kb
+        pdf = tmpdir / "manual.pdf"
+        _write_pdf(pdf, PARAGRAPHS)
+        process_pdf(pdf)
+        other = EmbeddingMatrix()
+        other.sync(load_document_index())
+        before = load_document_index()["documents"][0]
+
+        balancer.embed_batch.side_effect = lambda model, inputs, **kwargs: [
+            {"embeddings": [[0.0, 0.0, 1.0]]} for _ in inputs
+        ]
+        with patch("flockparsecli.get_embedding_namespace", return_value=EmbeddingNamespace(NS.model, "sha256:new")):
+            with patch.object(flockparsecli, "ANN_INDEX_FILE", tmpdir / "ann_index.npz"):
+                flockparsecli.reembed_corpus()
+
+        doc = load_document_index()["documents"][0]
+        assert doc["revision"] == before.get("revision", 0) + 1
+        assert doc["segment"] != before["segment"]
+        assert other.sync(load_document_index()) == len(doc["chunks"])
+        results = other.search([0.0, 0.0, 1.0], top_k=len(doc["chunks"]))
+        assert len(results) == len(doc["chunks"])
+        assert all(r["similarity"] == pytest.approx(1.0) for r in results)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
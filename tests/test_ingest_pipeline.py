@@ -0,0 +1,174 @@
+"""
+Tests for the pipelined extraction -> chunking -> embedding -> store stages
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ingest_pipeline import IngestPipeline  # noqa: E402
+
+
+def _line_chunker(pages):
+    """One chunk per non-empty line."""
+    for page in pages:
+        for line in page.split("\n"):
+            if line.strip():
+                yield line.strip()
+
+
+def _fake_embed(texts):
+    return [[float(len(text)), 1.0] for text in texts]
+
+
+class _Collector:
+    """Thread-safe store_fn that records everything written."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stored = {}
+
+    def __call__(self, pairs):
+        with self.lock:
+            self.stored.update(pairs)
+
+
+class TestIngestPipeline:
+    """Test that every chunk flows through to the store"""
+
+    def test_all_chunks_embedded_and_stored(self):
+        """Every chunk of every page reaches the store"""
+        store = _Collector()
+        pipeline = IngestPipeline(_line_chunker, _fake_embed, store, batch_size=4, embed_workers=3)
+
+        for p in range(10):
+            pipeline.add_page("\n".join(f"page {p} line {i}" for i in range(7)))
+        stats = pipeline.finish()
+
+        assert len(store.stored) == 70
+        assert store.stored["page 3 line 5"] == [13.0, 1.0]
+        assert stats["pages"] == 10
+        assert stats["chunks"] == 70
+        assert stats["embedded"] == 70
+        assert stats["stored"] == 70
+        assert pipeline.errors == []
+
+    def test_filter_skips_cached_chunks(self):
+        """Chunks rejected by filter_fn are counted as skipped, not embedded"""
+        store = _Collector()
+        embedded = []
+
+        def embed(texts):
+            embedded.extend(texts)
+            return _fake_embed(texts)
+
+        pipeline = IngestPipeline(
+            _line_chunker, embed, store, filter_fn=lambda texts: [t for t in texts if "new" in t], batch_size=2
+        )
+        pipeline.add_page("old a\nnew b\nold c\nnew d")
+        stats = pipeline.finish()
+
+        assert sorted(embedded) == ["new b", "new d"]
+        assert stats["skipped"] == 2
+        assert stats["embedded"] == 2
+
+    def test_duplicate_chunks_embedded_once(self):
+        """Repeated chunk text is only sent for embedding once"""
+        embedded = []
+
+        def embed(texts):
+            embedded.extend(texts)
+            return _fake_embed(texts)
+
+        pipeline = IngestPipeline(_line_chunker, embed, _Collector())
+        pipeline.add_page("header\nbody one")
+        pipeline.add_page("header\nbody two")
+        stats = pipeline.finish()
+
+        assert sorted(embedded) == ["body one", "body two", "header"]
+        assert stats["chunks"] == 4
+
+    def test_embedding_failures_are_counted(self):
+        """Empty embeddings and embed exceptions count as failures and store nothing"""
+        store = _Collector()
+
+        def embed(texts):
+            if "boom" in texts:
+                raise RuntimeError("node down")
+            return [[] if t.startswith("bad") else [1.0] for t in texts]
+
+        pipeline = IngestPipeline(_line_chunker, embed, store, batch_size=2)
+        pipeline.add_page("good\nbad\nboom\nother")
+        stats = pipeline.finish()
+
+        assert list(store.stored) == ["good"]
+        assert stats["embedded"] == 1
+        assert stats["failed"] == 3
+        assert len(pipeline.errors) == 1
+
+
+class TestIngestPipelineFlow:
+    """Test overlap between stages and backpressure"""
+
+    def test_embedding_starts_before_input_finishes(self):
+        """A stalled extractor does not hold back the chunks already produced"""
+        first_batch = threading.Event()
+
+        def embed(texts):
+            first_batch.set()
+            return _fake_embed(texts)
+
+        pipeline = IngestPipeline(_line_chunker, embed, _Collector(), batch_size=100, max_batch_wait=0.05)
+        pipeline.add_page("early chunk")
+
+        assert first_batch.wait(timeout=5)
+        pipeline.add_page("late chunk")
+        assert pipeline.finish()["embedded"] == 2
+
+    def test_backpressure_bounds_in_flight_work(self):
+        """With a slow embedder, add_page blocks instead of buffering without limit"""
+        release = threading.Event()
+
+        def embed(texts):
+            release.wait(timeout=5)
+            return _fake_embed(texts)
+
+        pipeline = IngestPipeline(_line_chunker, embed, _Collector(), batch_size=1, embed_workers=1, queue_size=2)
+
+        def produce():
+            for i in range(50):
+                pipeline.add_page(f"chunk {i}")
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        time.sleep(0.3)
+
+        assert producer.is_alive()
+        assert pipeline.stats["pages"] < 50
+
+        release.set()
+        producer.join(timeout=5)
+        assert pipeline.finish()["embedded"] == 50
+
+    def test_store_errors_do_not_hang(self):
+        """A failing store stage is recorded and finish() still returns"""
+
+        def store(pairs):
+            raise IOError("disk full")
+
+        pipeline = IngestPipeline(_line_chunker, _fake_embed, store)
+        pipeline.add_page("a\nb")
+        stats = pipeline.finish()
+
+        assert stats["stored"] == 0
+        assert pipeline.errors == ["store: disk full"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,150 @@
+"""
+Tests for the persistent background job queue
+"""
+
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from job_queue import JobCancelled, JobContext, JobQueue, JobRunner  # noqa: E402
+
+
+@pytest.fixture
+def queue():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        queue = JobQueue(Path(tmpdir) / "jobs.db")
+        yield queue
+        queue.close()
+
+
+class TestJobQueue:
+    """Test claiming, cancelling and restarting"""
+
+    def test_claims_by_priority_then_age(self, queue):
+        """Higher priority first; equal priorities in submission order"""
+        low = queue.submit("work", {"n": 1}, priority=1)
+        first = queue.submit("work", {"n": 2})
+        second = queue.submit("work", {"n": 3})
+        urgent = queue.submit("work", {"n": 4}, priority=9)
+
+        claimed = [queue.claim()["id"] for _ in range(4)]
+
+        assert claimed == [urgent, first, second, low]
+        assert queue.claim() is None
+        assert queue.get(urgent)["status"] == "running"
+
+    def test_cancel_queued_and_running(self, queue):
+        """Queued jobs are cancelled at once, running ones are flagged"""
+        queued = queue.submit("work", {})
+        running = queue.submit("work", {}, priority=9)
+        queue.claim()
+
+        assert queue.cancel(queued) == "cancelled"
+        assert queue.cancel(running) == "running"
+        assert queue.cancel_requested(running)
+        assert queue.cancel(queued) is None
+        assert queue.cancel("missing") is None
+
+    def test_interrupted_jobs_resume_with_progress(self, queue):
+        """Jobs left running by a stopped process are queued again with their progress"""
+        job_id = queue.submit("work", {"files": ["a", "b"]})
+        queue.claim()
+        queue.update_progress(job_id, {"completed": ["a"]})
+
+        restarted = JobQueue(queue.path)
+        assert restarted.requeue_interrupted() == 1
+
+        job = restarted.claim()
+        assert job["id"] == job_id
+        assert job["progress"] == {"completed": ["a"]}
+        assert job["attempts"] == 2
+        restarted.close()
+
+
+class TestJobRunner:
+    """Test running jobs to completion"""
+
+    def _run_next(self, queue, handlers):
+        runner = JobRunner(queue, handlers)
+        runner.run(queue.claim())
+
+    def test_result_and_failure(self, queue):
+        """Handler results are stored; exceptions fail the job with their message"""
+        ok = queue.submit("ok", {"x": 2})
+        bad = queue.submit("bad", {})
+
+        def fail(ctx):
+            raise ValueError("boom")
+
+        handlers = {"ok": lambda ctx: {"double": ctx.params["x"] * 2}, "bad": fail}
+        self._run_next(queue, handlers)
+        self._run_next(queue, handlers)
+
+        assert queue.get(ok)["status"] == "completed"
+        assert queue.get(ok)["result"] == {"double": 4}
+        assert queue.get(bad)["status"] == "failed"
+        assert queue.get(bad)["error"] == "boom"
+
+    def test_handler_stops_when_cancelled(self, queue):
+        """A running handler sees the cancellation at its next check"""
+        job_id = queue.submit("loop", {})
+        checked = []
+
+        def handler(ctx):
+            for i in range(5):
+                if i == 2:
+                    queue.cancel(job_id)
+                ctx.check_cancelled()
+                checked.append(i)
+                ctx.report(force=True, done=i + 1)
+
+        self._run_next(queue, {"loop": handler})
+
+        job = queue.get(job_id)
+        assert checked == [0, 1]
+        assert job["status"] == "cancelled"
+        assert job["progress"] == {"done": 2}
+
+    def test_progress_writes_are_rate_limited(self, queue):
+        """Unforced reports within the interval only update memory"""
+        job_id = queue.submit("work", {})
+        ctx = JobContext(queue, queue.claim(), report_interval=60)
+
+        ctx.report(pages=1)
+        ctx.report(pages=2)
+
+        assert queue.get(job_id)["progress"] == {"pages": 1}
+        assert ctx.progress == {"pages": 2}
+
+    def test_workers_pick_up_submitted_jobs(self, queue):
+        """Started workers run jobs submitted later"""
+        done = threading.Event()
+        runner = JobRunner(queue, {"work": lambda ctx: done.set()}, workers=2, poll_interval=0.05)
+        runner.start()
+        try:
+            queue.submit("work", {})
+            runner.wake()
+            assert done.wait(5)
+        finally:
+            runner.stop()
+
+    def test_cancelled_exception_is_not_a_failure(self, queue):
+        """JobCancelled raised directly also ends as cancelled"""
+        job_id = queue.submit("work", {})
+
+        def handler(ctx):
+            raise JobCancelled(ctx.job_id)
+
+        self._run_next(queue, {"work": handler})
+
+        assert queue.get(job_id)["status"] == "cancelled"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,140 @@
+"""
+Tests for the background model residency tracker
+"""
+
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import httpx
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from model_residency import ModelResidencyTracker, canonical_model  # noqa: E402
+
+NODES = ["http://10.0.0.1:11434", "http://10.0.0.2:11434", "http://10.0.0.3:11434"]
+
+
+def _fake_ps(loaded, delay=0.0):
+    """HTTP client ``get`` answering /api/ps from ``loaded`` (node URL -> model names; missing = down)."""
+
+    def get(url, timeout=None):
+        time.sleep(delay)
+        node_url = url[: -len("/api/ps")]
+        if node_url not in loaded:
+            raise httpx.ConnectTimeout(url)
+        return Mock(status_code=200, json=lambda: {"models": [{"name": name} for name in loaded[node_url]]})
+
+    return get
+
+
+class TestModelResidencyTracker:
+    """Test the model -> nodes map"""
+
+    def test_poll_builds_placement(self):
+        """Loaded models map to their nodes; a node that does not answer is reported unreachable"""
+        tracker = ModelResidencyTracker(lambda: NODES)
+        loaded = {NODES[0]: ["qwen3:8b", "mxbai-embed-large:latest"], NODES[1]: ["mxbai-embed-large:latest"]}
+
+        with patch("model_residency.get_session", return_value=Mock(get=_fake_ps(loaded))):
+            placement = tracker.poll()
+
+        assert placement["qwen3:8b"] == [NODES[0]]
+        assert sorted(tracker.nodes_with("mxbai-embed-large")) == NODES[:2]
+        assert tracker.unreachable() == {NODES[2]}
+        assert tracker.last_poll is not None
+
+    def test_poll_is_concurrent(self):
+        """Slow nodes are polled in parallel, not one after another"""
+        tracker = ModelResidencyTracker(lambda: NODES)
+
+        start = time.time()
+        with patch(
+            "model_residency.get_session",
+            return_value=Mock(get=_fake_ps({node: ["qwen3:8b"] for node in NODES}, delay=0.3)),
+        ):
+            tracker.poll()
+
+        assert time.time() - start < 0.8
+        assert len(tracker.nodes_with("qwen3:8b")) == 3
+
+    def test_poll_replaces_stale_entries(self):
+        """A model unloaded since the last poll disappears from the map"""
+        tracker = ModelResidencyTracker(lambda: NODES[:1])
+        with patch("model_residency.get_session", return_value=Mock(get=_fake_ps({NODES[0]: ["qwen3:8b"]}))):
+            tracker.poll()
+        with patch("model_residency.get_session", return_value=Mock(get=_fake_ps({NODES[0]: []}))):
+            tracker.poll()
+
+        assert tracker.nodes_with("qwen3:8b") == []
+
+    def test_marks_and_ordering(self):
+        """Marked placements are visible at once, most recently confirmed first"""
+        tracker = ModelResidencyTracker(lambda: NODES)
+        tracker.mark_loaded("llama3.1", NODES[0])
+        time.sleep(0.01)
+        tracker.mark_loaded("llama3.1:latest", NODES[1])
+
+        assert tracker.nodes_with("llama3.1") == [NODES[1], NODES[0]]
+        assert tracker.nodes_with("llama3.1", max_age=60) == [NODES[1], NODES[0]]
+
+        tracker.mark_unloaded("llama3.1", NODES[1])
+        assert tracker.nodes_with("llama3.1") == [NODES[0]]
+        assert canonical_model("qwen3:8b") == "qwen3:8b"
+
+    def test_background_thread_polls(self):
+        """start() polls right away and keeps the map current"""
+        tracker = ModelResidencyTracker(lambda: NODES[:1], interval=0.05)
+        with patch("model_residency.get_session", return_value=Mock(get=_fake_ps({NODES[0]: ["qwen3:8b"]}))):
+            tracker.start()
+            try:
+                deadline = time.time() + 5
+                while not tracker.nodes_with("qwen3:8b") and time.time() < deadline:
+                    time.sleep(0.01)
+            finally:
+                tracker.stop()
+
+        assert tracker.nodes_with("qwen3:8b") == NODES[:1]
+
+
+class TestResidentRouting:
+    """Test request routing from the residency map"""
+
+    def _pool(self, tracker, active=None):
+        nodes = [{"host": f"10.0.0.{i}", "port": 11434} for i in (1, 2, 3)]
+        perf = {f"10.0.0.{i}:11434": {"active_requests": n} for i, n in (active or {}).items()}
+        return SimpleNamespace(nodes=nodes, stats={"node_performance": perf}, model_residency=tracker)
+
+    def test_prefers_least_busy_holder(self):
+        """When some nodes hold the model, the least busy of them is chosen"""
+        sollol_compat = pytest.importorskip("sollol_compat")
+        tracker = ModelResidencyTracker(lambda: NODES)
+        tracker.mark_loaded("qwen3:8b", NODES[0])
+        tracker.mark_loaded("qwen3:8b", NODES[1])
+        pool = self._pool(tracker, active={1: 3, 2: 1})
+
+        assert sollol_compat._select_resident_node(pool, "qwen3:8b") == {"host": "10.0.0.2", "port": 11434}
+        assert sollol_compat._select_resident_node(pool, "qwen3:8b", exclude={"10.0.0.2:11434"}) == {
+            "host": "10.0.0.1",
+            "port": 11434,
+        }
+
+    def test_defers_to_sollol_when_everywhere_or_nowhere(self):
+        """Models loaded on every node (or none) keep SOLLOL's own balancing"""
+        sollol_compat = pytest.importorskip("sollol_compat")
+        tracker = ModelResidencyTracker(lambda: NODES)
+        for node in NODES:
+            tracker.mark_loaded("mxbai-embed-large", node)
+        pool = self._pool(tracker)
+
+        assert sollol_compat._select_resident_node(pool, "mxbai-embed-large") is None
+        assert sollol_compat._select_resident_node(pool, "qwen3:8b") is None
+        assert sollol_compat._select_resident_node(pool, None) is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
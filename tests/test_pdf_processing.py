@@ -4,25 +4,34 @@ Tests PDF extraction, processing pipeline, and format conversion
 """
 
 import pytest
+import subprocess
 import sys
 from pathlib import Path
 from unittest.mock import Mock, patch, MagicMock, mock_open
 import tempfile
+import json
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from flockparsecli import (
+import pdf_extraction  # noqa: E402
+from flockparsecli import (  # noqa: E402
     extract_text_from_pdf,
     process_pdf,
     process_directory,
 )
+from pdf_extraction import _extract_pages  # noqa: E402
+
+
+def _fake_page_records(pdf_path_str, first, last):
+    """Stand-in page extractor: page N's text is "page N" (odd pages empty)."""
+    return [{"text": f"page {n}" if n % 2 == 0 else "", "method": "fake", "seconds": 0.0} for n in range(first, last)]
 
 
 class TestPDFExtraction:
     """Test PDF text extraction"""
 
-    @patch("flockparsecli.PdfReader")
+    @patch("pdf_extraction.PdfReader")
     def test_extract_text_pypdf2(self, mock_pypdf2):
         """Test PDF extraction with PyPDF2 (primary method)"""
         # Mock PDF with pages
@@ -42,7 +51,7 @@ class TestPDFExtraction:
         assert "Page 2 content" in result
 
     @patch("flockparsecli.subprocess.run")
-    @patch("flockparsecli.PdfReader")
+    @patch("pdf_extraction.PdfReader")
     def test_extract_text_fallback_pdftotext(self, mock_pypdf2, mock_subprocess):
         """Test fallback to pdftotext when PyPDF2 fails"""
         # PyPDF2 returns empty
@@ -66,7 +75,7 @@ class TestPDFExtraction:
     @patch("pytesseract.image_to_string")
     @patch("pdf2image.convert_from_path")
     @patch("flockparsecli.subprocess.run")
-    @patch("flockparsecli.PdfReader")
+    @patch("pdf_extraction.PdfReader")
     def test_extract_text_ocr_fallback(self, mock_pypdf2, mock_subprocess, mock_convert, mock_ocr):
         """Test OCR fallback when PyPDF2 and pdftotext fail"""
         # PyPDF2 returns minimal text
@@ -88,7 +97,7 @@ class TestPDFExtraction:
 
         assert "OCR extracted text" in result
 
-    @patch("flockparsecli.PdfReader")
+    @patch("pdf_extraction.PdfReader")
     def test_extract_text_empty_pdf(self, mock_pypdf2):
         """Test extracting text from empty PDF"""
         mock_pdf = Mock()
@@ -165,6 +174,25 @@ class TestDirectoryProcessing:
             # Should process all files
             assert mock_process.call_count == 3
 
+    @patch("extraction_pool.START_METHOD", "fork")  # Workers must inherit the mocks
+    @patch("flockparsecli.EXTRACTION_WORKERS", 2)
+    @patch("pdf_extraction.extract_text_from_pdf")
+    @patch("flockparsecli.process_pdf")
+    def test_process_directory_extraction_pool(self, mock_process, mock_extract):
+        """Test PDFs extracted in worker processes are finished in this process"""
+        mock_extract.side_effect = lambda path, page_report: f"text of {Path(path).name}"
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name in ("a.pdf", "b.pdf", "c.pdf"):
+                Path(tmpdir, name).touch()
+
+            process_directory(tmpdir)
+
+        # Extraction ran in the workers; embedding/registration calls happen here
+        assert mock_extract.call_count == 0
+        texts = sorted(call.kwargs["extracted_text"] for call in mock_process.call_args_list)
+        assert texts == ["text of a.pdf", "text of b.pdf", "text of c.pdf"]
+
     def test_process_directory_empty(self):
         """Test processing empty directory"""
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -203,5 +231,114 @@ class TestFormatConversion:
             Path(pdf_path).unlink(missing_ok=True)
 
 
+class TestPageSharding:
+    """Test page-range extraction of large PDFs"""
+
+    @patch.dict(pdf_extraction._PAGE_EXTRACTORS, {"fake": _fake_page_records})
+    @patch("extraction_pool.START_METHOD", "fork")  # Workers must inherit the patched extractors
+    @patch("pdf_extraction.EXTRACTION_WORKERS", 3)
+    @patch("pdf_extraction.PAGE_SHARD_SIZE", 7)
+    @patch("pdf_extraction.PAGE_SHARD_MIN_PAGES", 20)
+    def test_sharded_pages_reassembled_in_order(self):
+        """Ranges extracted in worker processes come back in page order"""
+        seen = []
+
+        pages = list(_extract_pages("fake", "big.pdf", 60, on_page=seen.append))
+
+        assert [(n, record["text"]) for n, record in pages] == [
+            (n, f"page {n}" if n % 2 == 0 else "") for n in range(60)
+        ]
+        assert seen == [f"page {n}" for n in range(0, 60, 2)]
+
+    @patch.dict(pdf_extraction._PAGE_EXTRACTORS, {"fake": _fake_page_records})
+    @patch("pdf_extraction.ExtractionPool")
+    @patch("pdf_extraction.PAGE_SHARD_SIZE", 7)
+    def test_small_pdf_not_sharded(self, mock_pool):
+        """PDFs below the threshold are extracted in-process"""
+        pages = list(_extract_pages("fake", "small.pdf", 10))
+
+        assert [n for n, _ in pages] == list(range(10))
+        mock_pool.assert_not_called()
+
+    @patch("pytesseract.image_to_string")
+    @patch("pdf2image.convert_from_path")
+    def test_ocr_renders_one_page_at_a_time(self, mock_convert, mock_ocr):
+        """OCR converts each page separately instead of the whole document"""
+        mock_convert.return_value = [Mock()]
+        mock_ocr.side_effect = ["first", "second", "third"]
+
+        pages = list(_extract_pages("ocr", "scan.pdf", 3))
+
+        assert [(n, record["text"]) for n, record in pages] == [(0, "first"), (1, "second"), (2, "third")]
+        assert [c.kwargs["first_page"] for c in mock_convert.call_args_list] == [1, 2, 3]
+        assert all(c.kwargs["last_page"] == c.kwargs["first_page"] for c in mock_convert.call_args_list)
+
+
+class TestWorkerImports:
+    """Test what extraction worker processes have to import"""
+
+    def test_extraction_module_has_no_cli_side_effects(self):
+        """Importing the worker entry points does not pull in the CLI, ChromaDB, SOLLOL or Redis"""
+        code = (
+            "import sys, pdf_extraction; "
+            "print(sorted({m.split('.')[0] for m in sys.modules} & {'flockparsecli', 'chromadb', 'sollol', 'redis'}))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=Path(__file__).parent.parent, capture_output=True, text=True, check=True
+        )
+
+        assert result.stdout.strip() == "[]"
+
+
+class TestPerPageRouting:
+    """Test per-page choice between the text layer and OCR"""
+
+    @patch("pdf_extraction._ocr_page", return_value="Recognised text from a scanned page " * 3)
+    @patch("pdf_extraction.PdfReader")
+    def test_only_sparse_pages_are_ocrd(self, mock_pypdf2, mock_ocr):
+        """Pages with a text layer keep it; only the empty one goes to OCR"""
+        texts = ["Native text layer content " * 5, "", "More native text on the third page " * 4]
+        mock_pdf = Mock()
+        mock_pdf.pages = [Mock(**{"extract_text.return_value": text}) for text in texts]
+        mock_pypdf2.return_value = mock_pdf
+
+        report = []
+        result = extract_text_from_pdf("mixed.pdf", page_report=report)
+
+        assert [page["method"] for page in report] == ["pypdf2", "ocr", "pypdf2"]
+        assert [page["page"] for page in report] == [1, 2, 3]
+        mock_ocr.assert_called_once_with("mixed.pdf", 1)
+        assert "--- Page 2 ---" in result and "Recognised text" in result
+
+    @patch("flockparsecli.register_document")
+    @patch("flockparsecli.extract_text_from_pdf")
+    def test_page_methods_recorded_in_json(self, mock_extract, mock_register):
+        """The JSON metadata records the methods and per-page timings"""
+
+        def extract(path, on_page=None, page_report=None):
+            page_report.extend(
+                [
+                    {"page": 1, "method": "pymupdf", "chars": 900, "seconds": 0.01},
+                    {"page": 2, "method": "ocr", "chars": 700, "seconds": 2.5},
+                ]
+            )
+            return "--- Page 1 ---\n\nNative text\n\n--- Page 2 ---\n\nScanned text"
+
+        mock_extract.side_effect = extract
+        mock_register.return_value = "doc_1"
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pdf_path = Path(tmpdir) / "routing_metadata_test.pdf"
+            pdf_path.touch()
+            with patch("flockparsecli.PROCESSED_DIR", Path(tmpdir)):
+                process_pdf(pdf_path)
+                metadata = json.loads((Path(tmpdir) / "routing_metadata_test.json").read_text())["metadata"]
+
+        assert metadata["extraction_method"] == "pymupdf+ocr"
+        assert metadata["pages_by_method"] == {"pymupdf": 1, "ocr": 1}
+        assert metadata["extraction_seconds"] == pytest.approx(2.51)
+        assert metadata["pages"][1]["method"] == "ocr"
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,159 @@
+"""
+Tests for lock-light request statistics
+"""
+
+import logging
+import sys
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from request_stats import ACTIVE, LATENCY_MS, SUCCEEDED, LogThrottle, RequestStats, node_defaults  # noqa: E402
+
+
+def _pool():
+    """Pool stand-in with the stats dicts SOLLOL keeps."""
+    return SimpleNamespace(
+        _lock=threading.Lock(),
+        stats={"total_requests": 0, "successful_requests": 0, "nodes_used": {}, "node_performance": {}},
+    )
+
+
+def _record(stats, node_key, count, latency_ms=10.0):
+    for _ in range(count):
+        stats.request()
+        stats.started(node_key)
+        stats.succeeded(node_key, latency_ms)
+        stats.finished(node_key)
+
+
+class TestRequestStats:
+    """Test per-thread shards and publishing into pool.stats"""
+
+    def test_concurrent_counts_merge(self):
+        """Counts from many threads add up exactly"""
+        stats = RequestStats()
+        threads = [threading.Thread(target=_record, args=(stats, f"n{i % 2}", 500)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        requests, nodes = stats.merged()
+        assert requests == 4000
+        assert nodes["n0"][SUCCEEDED] == nodes["n1"][SUCCEEDED] == 2000
+        assert nodes["n0"][ACTIVE] == 0
+        assert stats.average_latency_ms("n0") == pytest.approx(10.0)
+
+    def test_publish_folds_deltas(self):
+        """Each publish adds only what was recorded since the previous one"""
+        stats = RequestStats()
+        pool = _pool()
+        pool.stats["node_performance"]["n"] = dict(node_defaults(), total_requests=2, latency_ms=40.0)
+
+        _record(stats, "n", 2, latency_ms=10.0)
+        stats.started("n")
+        stats.publish(pool)
+        stats.publish(pool)  # Nothing new: no change
+
+        perf = pool.stats["node_performance"]["n"]
+        assert pool.stats["total_requests"] == 2
+        assert pool.stats["successful_requests"] == 2
+        assert pool.stats["nodes_used"] == {"n": 2}
+        assert perf["total_requests"] == 4
+        assert perf["latency_ms"] == pytest.approx(25.0)
+        assert perf["active_requests"] == 1
+
+        stats.finished("n")
+        assert perf["active_requests"] == 1
+        stats.publish(pool)
+        assert perf["active_requests"] == 0
+
+    def test_active_requests_live_between_publishes(self):
+        """Passing the node's stats entry keeps active_requests current without a publish"""
+        stats = RequestStats()
+        pool = _pool()
+        perf = pool.stats["node_performance"]["n"] = node_defaults()
+
+        stats.started("n", perf)
+        stats.started("n", perf)
+        assert perf["active_requests"] == 2
+        stats.finished("n", perf)
+        assert perf["active_requests"] == 1
+
+        perf["active_requests"] = 5  # As if concurrent bumps had raced
+        stats.publish(pool)
+        assert perf["active_requests"] == 1
+        stats.finished("n", perf)
+        assert perf["active_requests"] == 0
+
+    def test_exited_threads_are_retired(self):
+        """Shards of finished threads are folded away without losing their counts"""
+        stats = RequestStats()
+        pool = _pool()
+        for _ in range(3):
+            thread = threading.Thread(target=_record, args=(stats, "n", 10))
+            thread.start()
+            thread.join()
+
+        stats.publish(pool)
+
+        assert stats._shards == ()
+        assert stats.merged()[0] == 30
+        assert stats.node("n")[LATENCY_MS] == pytest.approx(300.0)
+        assert pool.stats["total_requests"] == 30
+
+    def test_background_publisher(self):
+        stats = RequestStats()
+        pool = _pool()
+        stats.start(pool, interval=0.01)
+        try:
+            _record(stats, "n", 5)
+            for _ in range(200):
+                if pool.stats["total_requests"] == 5:
+                    break
+                threading.Event().wait(0.01)
+        finally:
+            stats.stop()
+
+        assert pool.stats["total_requests"] == 5
+
+
+class TestLogThrottle:
+    """Test level-guarded, rate-limited logging"""
+
+    def test_disabled_level_builds_no_message(self):
+        log = logging.getLogger("test_request_stats.disabled")
+        log.setLevel(logging.WARNING)
+        throttle = LogThrottle(log, logging.INFO, interval=0)
+
+        def message():
+            raise AssertionError("message built for a disabled level")
+
+        assert throttle("k", message) is False
+
+    def test_rate_limited_per_key(self, caplog):
+        log = logging.getLogger("test_request_stats.enabled")
+        throttle = LogThrottle(log, logging.INFO, interval=60)
+
+        with caplog.at_level(logging.INFO, logger=log.name):
+            assert throttle("a", lambda: "first") is True
+            assert throttle("a", lambda: "second") is False
+            assert throttle("b", lambda: "other key") is True
+            throttle.interval = 0
+            assert throttle("a", lambda: "third") is True
+
+        assert [record.getMessage() for record in caplog.records] == [
+            "first",
+            "other key",
+            "third (+1 more since last report)",
+        ]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
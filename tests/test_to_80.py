@@ -192,7 +192,7 @@ class TestExtractTextEdgeCases:
     """Test PDF extraction edge cases"""
 
     @patch("flockparsecli.subprocess.run")
-    @patch("flockparsecli.PdfReader")
+    @patch("pdf_extraction.PdfReader")
     def test_extract_with_subprocess_error_handling(self, mock_pypdf2, mock_subprocess):
         """Test subprocess error handling"""
         # PyPDF2 returns empty
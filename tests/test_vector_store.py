@@ -0,0 +1,357 @@
+"""
+Tests for the resident embedding matrix used by get_similar_chunks
+"""
+
+import json
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from vector_store import EmbeddingMatrix, Segment, migrate_document, write_segment  # noqa: E402
+
+
+def _write_doc(tmpdir, doc_id, texts, embeddings):
+    """Write legacy per-chunk JSON files and return the index entry."""
+    chunks = []
+    for i, (text, embedding) in enumerate(zip(texts, embeddings)):
+        chunk_file = Path(tmpdir) / f"{doc_id}_chunk_{i}.json"
+        with open(chunk_file, "w") as f:
+            json.dump({"text": text, "embedding": embedding}, f)
+        chunks.append({"chunk_id": f"{doc_id}_chunk_{i}", "file": str(chunk_file)})
+    return {"id": doc_id, "original": f"/docs/{doc_id}.pdf", "chunks": chunks}
+
+
+class TestEmbeddingMatrixSearch:
+    """Test scoring and top-k selection"""
+
+    def test_search_orders_by_similarity(self):
+        """Most similar chunk comes first"""
+        matrix = EmbeddingMatrix()
+        matrix.add_document(
+            "doc_1", "a.pdf", ["c0", "c1", "c2"], ["x", "y", "xy"], [[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]]
+        )
+
+        results = matrix.search([1.0, 0.0], top_k=3)
+
+        assert [r["text"] for r in results] == ["x", "xy", "y"]
+        assert results[0]["similarity"] == pytest.approx(1.0)
+        assert results[1]["similarity"] == pytest.approx(1 / np.sqrt(2), rel=1e-5)
+        assert results[0]["doc_name"] == "a.pdf"
+
+    def test_search_matches_exact_cosine(self):
+        """Scores equal a brute-force cosine similarity"""
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(50, 16))
+        matrix = EmbeddingMatrix()
+        matrix.add_document("doc_1", "a.pdf", [str(i) for i in range(50)], [str(i) for i in range(50)], vectors)
+
+        query = rng.normal(size=16)
+        results = matrix.search(query, top_k=5)
+
+        expected = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+        expected_top = np.argsort(-expected)[:5]
+        assert [r["text"] for r in results] == [str(i) for i in expected_top]
+        assert [r["similarity"] for r in results] == pytest.approx(list(expected[expected_top]), rel=1e-4)
+
+    def test_min_similarity_filters(self):
+        """Chunks below threshold are dropped"""
+        matrix = EmbeddingMatrix()
+        matrix.add_document("doc_1", "a.pdf", ["c0", "c1"], ["x", "y"], [[1.0, 0.0], [0.0, 1.0]])
+
+        results = matrix.search([1.0, 0.0], top_k=5, min_similarity=0.5)
+
+        assert [r["text"] for r in results] == ["x"]
+
+    def test_search_counted(self):
+        """Counts every chunk above the threshold, not just the returned top_k"""
+        matrix = EmbeddingMatrix()
+        matrix.add_document("doc_1", "a.pdf", ["c0", "c1", "c2"], ["x", "y", "z"], [[1.0, 0.0], [1.0, 0.1], [0.0, 1.0]])
+
+        total_found, results = matrix.search_counted([1.0, 0.0], top_k=1, min_similarity=0.5)
+
+        assert total_found == 2
+        assert [r["text"] for r in results] == ["x"]
+        assert matrix.search_counted([1.0, 0.0, 0.0], top_k=1) is None
+
+    def test_search_counted_holds_lock_across_selection(self):
+        """A concurrent re-layout waits until the query has picked its rows"""
+        matrix = EmbeddingMatrix()
+        matrix.add_document("doc_1", "a.pdf", ["a0"], ["old"], [[0.0, 1.0]])
+        matrix.add_document("doc_2", "b.pdf", ["b0"], ["new"], [[1.0, 0.0]])
+        select = matrix.select
+
+        def racing_select(*args, **kwargs):
+            remover = threading.Thread(target=matrix.remove_document, args=("doc_1",))
+            remover.start()
+            remover.join(0.1)
+            return select(*args, **kwargs)
+
+        with patch.object(matrix, "select", side_effect=racing_select):
+            total_found, results = matrix.search_counted([1.0, 0.0], top_k=1, min_similarity=0.5)
+
+        assert total_found == 1
+        assert [r["text"] for r in results] == ["new"]
+
+    def test_dimension_mismatch_returns_empty(self):
+        """Query with wrong dimension returns no results"""
+        matrix = EmbeddingMatrix()
+        matrix.add_document("doc_1", "a.pdf", ["c0"], ["x"], [[1.0, 0.0]])
+
+        assert matrix.search([1.0, 0.0, 0.0], top_k=5) == []
+
+    def test_empty_matrix(self):
+        """Empty matrix returns no results"""
+        assert EmbeddingMatrix().search([1.0], top_k=5) == []
+
+    def test_search_batch_matches_single_queries(self):
+        """A batch returns the same lists as one search per query"""
+        rng = np.random.default_rng(1)
+        matrix = EmbeddingMatrix()
+        matrix.add_document(
+            "doc_1", "a.pdf", [str(i) for i in range(30)], [str(i) for i in range(30)], rng.normal(size=(30, 8))
+        )
+        matrix.add_document(
+            "doc_2", "b.pdf", [f"b{i}" for i in range(20)], [f"b{i}" for i in range(20)], rng.normal(size=(20, 8))
+        )
+        matrix.tombstone(["3", "b4"])
+        queries = rng.normal(size=(4, 8))
+
+        batch = matrix.search_batch(queries, top_k=5)
+
+        assert len(batch) == 4
+        for query, results in zip(queries, batch):
+            single = matrix.search(query, top_k=5)
+            assert [r["text"] for r in results] == [r["text"] for r in single]
+            assert [r["similarity"] for r in results] == pytest.approx([r["similarity"] for r in single], rel=1e-5)
+
+    def test_search_batch_counted_matches_single_queries(self):
+        """Each query keeps its own top_k and threshold; a bad query gets (0, [])"""
+        matrix = EmbeddingMatrix()
+        matrix.add_document("doc_1", "a.pdf", ["c0", "c1", "c2"], ["x", "y", "z"], [[1.0, 0.0], [1.0, 0.1], [0.0, 1.0]])
+        queries = [[1.0, 0.0], [0.0, 1.0], [1.0, 0.0, 0.0]]
+
+        batch = matrix.search_batch_counted(queries, [1, 3, 5], [0.5, 0.0, 0.0])
+
+        assert batch[0] == matrix.search_counted(queries[0], top_k=1, min_similarity=0.5)
+        assert batch[1] == matrix.search_counted(queries[1], top_k=3, min_similarity=0.0)
+        assert batch[2] == (0, [])
+
+    def test_batch_scores_isolates_bad_queries(self):
+        """A query with the wrong dimension or shape finds nothing; the others are unaffected"""
+        matrix = EmbeddingMatrix()
+        matrix.add_document("doc_1", "a.pdf", ["c0"], ["x"], [[1.0, 0.0]])
+
+        scores = matrix.batch_scores([[1.0, 0.0], [1.0, 0.0, 0.0], [], 1.0])
+        assert scores[0] == pytest.approx([1.0])
+        assert np.all(scores[1:] == -np.inf)
+        batch = matrix.search_batch([[1.0, 0.0, 0.0], [0.0, 1.0]], top_k=5, min_similarity=-1.0)
+        assert batch[0] == [] and [r["text"] for r in batch[1]] == ["x"]
+
+    def test_normalize_query_rejects_scalar(self):
+        matrix = EmbeddingMatrix()
+        matrix.add_document("doc_1", "a.pdf", ["c0"], ["x"], [[1.0, 0.0]])
+
+        assert matrix.normalize_query(1.0) is None
+        assert matrix.normalize_query([[1.0, 0.0]]) is None
+        assert matrix.search(1.0, top_k=5) == []
+
+
+class TestEmbeddingMatrixUpdates:
+    """Test incremental loading from the document index"""
+
+    def test_add_document_appends_segments(self):
+        """Adding documents keeps existing rows searchable"""
+        matrix = EmbeddingMatrix()
+        matrix.add_document("doc_1", "a.pdf", ["a0", "a1"], ["a0", "a1"], [[1.0, 0.0], [1.0, 0.1]])
+        matrix.add_document("doc_2", "b.pdf", ["b0", "b1", "b2"], ["b0", "b1", "b2"], [[0.0, 1.0]] * 3)
+
+        assert len(matrix) == 5
+        assert matrix.search([0.0, 1.0], top_k=1)[0]["doc_id"] == "doc_2"
+        assert matrix.search([1.0, 0.0], top_k=1)[0]["doc_id"] == "doc_1"
+
+    def test_skips_missing_embeddings(self):
+        """Chunks without embeddings are not indexed"""
+        matrix = EmbeddingMatrix()
+        added = matrix.add_document("doc_1", "a.pdf", ["c0", "c1"], ["x", "y"], [[1.0, 0.0], []])
+
+        assert added == 1
+        assert len(matrix) == 1
+
+    def test_sync_loads_new_documents_once(self):
+        """sync() only reads documents that are not yet resident"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            doc1 = _write_doc(tmpdir, "doc_1", ["x"], [[1.0, 0.0]])
+            doc2 = _write_doc(tmpdir, "doc_2", ["y"], [[0.0, 1.0]])
+            matrix = EmbeddingMatrix()
+
+            assert matrix.sync({"documents": [doc1]}) == 1
+            assert matrix.sync({"documents": [doc1, doc2]}) == 1
+            assert matrix.sync({"documents": [doc1, doc2]}) == 0
+            assert matrix.document_ids == ["doc_1", "doc_2"]
+
+    def test_sync_rebuilds_when_documents_removed(self):
+        """Removed documents are dropped from the matrix"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            doc1 = _write_doc(tmpdir, "doc_1", ["x"], [[1.0, 0.0]])
+            doc2 = _write_doc(tmpdir, "doc_2", ["y"], [[0.0, 1.0]])
+            matrix = EmbeddingMatrix()
+            matrix.sync({"documents": [doc1, doc2]})
+
+            matrix.sync({"documents": [doc2]})
+
+            assert matrix.document_ids == ["doc_2"]
+            assert len(matrix) == 1
+
+    def test_remove_document_rebases_remaining_rows(self):
+        """Removing a document keeps the others searchable with correct chunk ids"""
+        matrix = EmbeddingMatrix()
+        matrix.add_document("doc_1", "a.pdf", ["a0", "a1"], ["a0", "a1"], [[1.0, 0.0], [1.0, 0.1]])
+        matrix.add_document("doc_2", "b.pdf", ["b0"], ["b0"], [[0.0, 1.0]])
+        matrix.add_document("doc_3", "c.pdf", ["c0"], ["c0"], [[-1.0, 0.0]])
+        generation = matrix.generation
+
+        assert matrix.remove_document("doc_1") == 2
+        assert matrix.remove_document("doc_1") == 0
+
+        assert matrix.document_ids == ["doc_2", "doc_3"]
+        assert matrix.chunk_ids == ["b0", "c0"]
+        assert matrix.search([-1.0, 0.0], top_k=1)[0]["doc_id"] == "doc_3"
+        assert matrix.get_chunk("a0") is None
+        assert matrix.generation > generation
+
+
+class TestTombstones:
+    """Test in-place revisions of a resident document"""
+
+    def test_tombstoned_rows_are_not_returned(self):
+        """Tombstoned chunks vanish from exact and candidate-row search"""
+        matrix = EmbeddingMatrix()
+        matrix.add_document("doc_1", "a.pdf", ["a0", "a1"], ["a0", "a1"], [[1.0, 0.0], [0.0, 1.0]])
+
+        assert matrix.tombstone(["a0", "missing"]) == 1
+
+        assert [r["text"] for r in matrix.search([1.0, 0.0], top_k=2)] == ["a1"]
+        rows = np.arange(2)
+        assert [r["text"] for r in matrix.select(matrix.gather(rows) @ np.array([1.0, 0.0]), 2, rows=rows)] == ["a1"]
+        assert matrix.get_chunk("a0") is None
+        assert matrix.tombstoned == 1
+
+    def test_update_document_appends_delta_segment(self):
+        """A revised entry tombstones dropped chunks and maps its delta segment"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            base, delta = Path(tmpdir) / "doc_1", Path(tmpdir) / "doc_1.1"
+            write_segment(base, ["x", "y"], [[1.0, 0.0], [0.0, 1.0]])
+            write_segment(delta, ["z"], [[0.6, 0.8]])
+            doc = {
+                "id": "doc_1",
+                "original": "/docs/a.pdf",
+                "segment": str(base),
+                "chunks": [{"chunk_id": "c0", "row": 0}, {"chunk_id": "c1", "row": 1}],
+            }
+            revised = {
+                **doc,
+                "segments": [str(delta)],
+                "revision": 1,
+                "chunks": [{"chunk_id": "c0", "row": 0}, {"chunk_id": "c2", "row": 0, "part": 1}],
+            }
+            matrix = EmbeddingMatrix()
+            matrix.sync({"documents": [doc]})
+
+            assert matrix.sync({"documents": [revised]}) == 1
+
+            assert matrix.segment_keys == ["doc_1", "doc_1.1"]
+            assert matrix.chunk_ids == ["c0", None, "c2"]
+            assert [r["text"] for r in matrix.search([0.0, 1.0], top_k=3)] == ["z", "x"]
+
+    def test_remove_document_keeps_tombstones(self):
+        """Re-basing after a removal preserves other documents' tombstones"""
+        matrix = EmbeddingMatrix()
+        matrix.add_document("doc_1", "a.pdf", ["a0"], ["a0"], [[1.0, 0.0]])
+        matrix.add_document("doc_2", "b.pdf", ["b0", "b1"], ["b0", "b1"], [[0.0, 1.0], [1.0, 1.0]])
+        matrix.tombstone(["b1"])
+
+        matrix.remove_document("doc_1")
+
+        assert matrix.chunk_ids == ["b0", None]
+        assert [r["text"] for r in matrix.search([1.0, 1.0], top_k=2)] == ["b0"]
+
+
+class TestSegmentStore:
+    """Test binary on-disk segments"""
+
+    def test_segment_roundtrip_is_memory_mapped(self):
+        """Saved segments reopen as memory maps with identical content"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            base = Path(tmpdir) / "doc_1"
+            kept = write_segment(base, ["alpha", "βeta ünïcode", ""], [[3.0, 4.0], [0.0, 2.0], [1.0, 0.0]])
+
+            segment = Segment.open(base)
+
+            assert kept == [0, 1, 2]
+            assert isinstance(segment.vectors, np.memmap)
+            assert segment.vectors.dtype == np.float32
+            np.testing.assert_allclose(segment.vectors[0], [0.6, 0.8], rtol=1e-6)
+            assert [segment.text(i) for i in range(3)] == ["alpha", "βeta ünïcode", ""]
+
+    def test_segment_skips_chunks_without_embeddings(self):
+        """Only chunks with embeddings are stored"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            base = Path(tmpdir) / "doc_1"
+            kept = write_segment(base, ["a", "b", "c"], [[1.0, 0.0], [], [0.0, 1.0]])
+
+            segment = Segment.open(base)
+
+            assert kept == [0, 2]
+            assert len(segment) == 2
+            assert segment.text(1) == "c"
+
+    def test_matrix_searches_segment_documents(self):
+        """Index entries with a segment are memory-mapped and searchable"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            base = Path(tmpdir) / "doc_1"
+            write_segment(base, ["x", "y"], [[1.0, 0.0], [0.0, 1.0]])
+            doc = {
+                "id": "doc_1",
+                "original": "/docs/a.pdf",
+                "segment": str(base),
+                "chunks": [{"chunk_id": "doc_1_chunk_0", "row": 0}, {"chunk_id": "doc_1_chunk_1", "row": 1}],
+            }
+            legacy = _write_doc(tmpdir, "doc_2", ["z"], [[0.6, 0.8]])
+            matrix = EmbeddingMatrix()
+
+            matrix.sync({"documents": [doc, legacy]})
+            results = matrix.search([0.0, 1.0], top_k=2)
+
+            assert [r["text"] for r in results] == ["y", "z"]
+            assert matrix.get_chunk("doc_1_chunk_1")["text"] == "y"
+            assert matrix.get_chunk("missing") is None
+
+    def test_migrate_document(self):
+        """Legacy chunk JSON files convert to an equivalent segment"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            legacy = _write_doc(tmpdir, "doc_1", ["x", "y"], [[1.0, 0.0], [0.0, 1.0]])
+            legacy["processed_date"] = "2024-01-01T00:00:00"
+
+            migrated, files = migrate_document(legacy, Path(tmpdir) / "segments")
+
+            assert migrated["processed_date"] == legacy["processed_date"]
+            assert migrated["chunks"] == [
+                {"chunk_id": "doc_1_chunk_0", "row": 0},
+                {"chunk_id": "doc_1_chunk_1", "row": 1},
+            ]
+            assert len(files) == 2
+            matrix = EmbeddingMatrix()
+            matrix.sync({"documents": [migrated]})
+            assert matrix.search([1.0, 0.0], top_k=1)[0]["text"] == "x"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,697 @@
+"""
+Binary vector store and resident embedding matrix for FlockParser retrieval.
+
+Each document's chunks are written once as a segment:
+
+    <segment>.npy      float32 (n_chunks, dim) L2-normalised vectors
+    <segment>.txt      UTF-8 chunk texts, concatenated
+    <segment>.off.npy  int64 (n_chunks + 1) byte offsets into the .txt file
+
+Segments are memory-mapped for retrieval, so scoring a query is one
+matrix-vector product per segment with no copies and no JSON parsing.
+A revised document keeps its segment and gains a delta segment holding only
+its new chunks; rows of chunks it no longer has are tombstoned, not rewritten.
+Documents still stored as legacy per-chunk JSON files are loaded into
+in-memory segments until converted with ``migrate_document``.
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTORS_SUFFIX = ".npy"
+TEXTS_SUFFIX = ".txt"
+OFFSETS_SUFFIX = ".off.npy"
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalise rows in place (zero rows are left as zeros)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+def _segment_file(base_path, suffix: str) -> Path:
+    base_path = Path(base_path)
+    return base_path.with_name(base_path.name + suffix)
+
+
+def _atomic_write(path: Path, write):
+    """Write via a temporary file and rename so readers never see a partial file."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Segment:
+    """One document's normalised chunk vectors and their texts."""
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        texts: Optional[List[str]] = None,
+        text_blob: Optional[np.ndarray] = None,
+        offsets: Optional[np.ndarray] = None,
+    ):
+        self.vectors = vectors
+        self._texts = texts
+        self._text_blob = text_blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    def text(self, row: int) -> str:
+        """Decode a single chunk's text (only the requested bytes are touched)."""
+        if self._texts is not None:
+            return self._texts[row]
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return self._text_blob[start:end].tobytes().decode("utf-8")
+
+    @classmethod
+    def from_embeddings(
+        cls, texts: Sequence[str], embeddings: Sequence[Sequence[float]]
+    ) -> Tuple["Segment", List[int]]:
+        """
+        Build an in-memory segment, skipping chunks without a usable embedding.
+
+        Returns the segment and the indices of the input chunks it contains.
+        """
+        kept = [i for i, emb in enumerate(embeddings) if emb is not None and len(emb) > 0]
+        if kept:
+            dim = len(embeddings[kept[0]])
+            mismatched = [i for i in kept if len(embeddings[i]) != dim]
+            if mismatched:
+                logger.warning(f"⚠️ Skipping {len(mismatched)} chunk(s) with embedding dimension != {dim}")
+                kept = [i for i in kept if len(embeddings[i]) == dim]
+            vectors = normalize_rows(np.asarray([embeddings[i] for i in kept], dtype=np.float32))
+        else:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+
+        return cls(vectors, texts=[texts[i] for i in kept]), kept
+
+    def save(self, base_path):
+        """Write the segment files (texts first, vectors last)."""
+        encoded = [self.text(row).encode("utf-8") for row in range(len(self))]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            offsets[1:] = np.cumsum([len(b) for b in encoded])
+
+        Path(base_path).parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(_segment_file(base_path, TEXTS_SUFFIX), lambda f: f.write(b"".join(encoded)))
+        _atomic_write(_segment_file(base_path, OFFSETS_SUFFIX), lambda f: np.save(f, offsets))
+        _atomic_write(
+            _segment_file(base_path, VECTORS_SUFFIX),
+            lambda f: np.save(f, np.ascontiguousarray(self.vectors, dtype=np.float32)),
+        )
+
+    @classmethod
+    def open(cls, base_path) -> "Segment":
+        """Memory-map a segment written by ``save``."""
+        vectors = np.load(_segment_file(base_path, VECTORS_SUFFIX), mmap_mode="r")
+        offsets = np.load(_segment_file(base_path, OFFSETS_SUFFIX), mmap_mode="r")
+        texts_path = _segment_file(base_path, TEXTS_SUFFIX)
+        if texts_path.stat().st_size:
+            text_blob = np.memmap(texts_path, dtype=np.uint8, mode="r")
+        else:
+            text_blob = np.zeros(0, dtype=np.uint8)
+        return cls(vectors, text_blob=text_blob, offsets=offsets)
+
+
+def write_segment(base_path, texts: Sequence[str], embeddings: Sequence[Sequence[float]]) -> List[int]:
+    """Write chunk texts and embeddings as a segment; returns indices of the chunks stored."""
+    segment, kept = Segment.from_embeddings(texts, embeddings)
+    segment.save(base_path)
+    return kept
+
+
+def remove_segment(base_path):
+    """Delete a segment's files if present."""
+    for suffix in (VECTORS_SUFFIX, TEXTS_SUFFIX, OFFSETS_SUFFIX):
+        _segment_file(base_path, suffix).unlink(missing_ok=True)
+
+
+def load_legacy_chunks(doc: Dict[str, Any]) -> Tuple[List[str], List[str], List[Any], List[Path]]:
+    """Read a document's per-chunk JSON files: (chunk_ids, texts, embeddings, files)."""
+    chunk_ids, texts, embeddings, files = [], [], [], []
+    for chunk_ref in doc.get("chunks", []):
+        try:
+            chunk_file = Path(chunk_ref["file"])
+            if not chunk_file.exists():
+                continue
+            with open(chunk_file, "r") as f:
+                chunk_data = json.load(f)
+            chunk_ids.append(chunk_ref.get("chunk_id", chunk_file.stem))
+            texts.append(chunk_data["text"])
+            embeddings.append(chunk_data.get("embedding", []))
+            files.append(chunk_file)
+        except Exception as e:
+            logger.error(f"⚠️ Error loading chunk {chunk_ref.get('chunk_id', chunk_ref)}: {e}")
+    return chunk_ids, texts, embeddings, files
+
+
+def document_segments(doc: Dict[str, Any]) -> List[str]:
+    """
+    Segment paths of an index entry: the base segment, then any delta segments.
+
+    A chunk ref's ``part`` (default 0) indexes this list.
+    """
+    if not doc.get("segment"):
+        return []
+    return [doc["segment"]] + list(doc.get("segments", []))
+
+
+def segment_key(doc: Dict[str, Any], part: int = 0) -> str:
+    """Stable name of one of a document's segments (the file name; the doc id for legacy documents)."""
+    paths = document_segments(doc)
+    return Path(paths[part]).name if paths else doc["id"]
+
+
+def document_segment_keys(doc: Dict[str, Any]) -> List[str]:
+    """``segment_key`` of every segment of an index entry."""
+    return [segment_key(doc, part) for part in range(max(1, len(document_segments(doc))))]
+
+
+def part_chunk_ids(doc: Dict[str, Any], part: int, n_rows: int) -> List[Optional[str]]:
+    """Chunk id of each row of one segment; rows no ref points at (tombstoned) are None."""
+    chunk_ids: List[Optional[str]] = [None] * n_rows
+    for ref in doc.get("chunks", []):
+        if ref.get("part", 0) == part and ref["row"] < n_rows:
+            chunk_ids[ref["row"]] = ref["chunk_id"]
+    return chunk_ids
+
+
+def document_texts(doc: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """(chunk_ids, texts) stored for an index entry, from its segments or legacy files."""
+    if doc.get("segment"):
+        segments = [Segment.open(path) for path in document_segments(doc)]
+        refs = doc.get("chunks", [])
+        return [ref["chunk_id"] for ref in refs], [segments[ref.get("part", 0)].text(ref["row"]) for ref in refs]
+
+    chunk_ids, texts, _, _ = load_legacy_chunks(doc)
+    return chunk_ids, texts
+
+
+def migrate_document(doc: Dict[str, Any], segment_dir) -> Tuple[Dict[str, Any], List[Path]]:
+    """
+    Convert a legacy per-chunk JSON document to a segment.
+
+    Returns the updated index entry and the legacy chunk files it replaces
+    (the caller decides whether to delete them).
+    """
+    chunk_ids, texts, embeddings, files = load_legacy_chunks(doc)
+    base_path = Path(segment_dir) / doc["id"]
+    kept = write_segment(base_path, texts, embeddings)
+
+    migrated = {key: value for key, value in doc.items() if key != "chunks"}
+    migrated["segment"] = str(base_path)
+    migrated["chunks"] = [{"chunk_id": chunk_ids[i], "row": row} for row, i in enumerate(kept)]
+    return migrated, files
+
+
+class EmbeddingMatrix:
+    """
+    Resident view over every document's segments.
+
+    Rows are numbered globally in the order segments were added; ``chunk_ids``
+    is parallel to those rows. Adding a document (or a revised document's delta
+    segment) appends a segment and never rebuilds or copies existing vectors.
+    Rows whose chunk was replaced are tombstoned: their chunk id becomes None
+    and they are masked out of every search until the document is compacted.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """Drop all loaded segments."""
+        with self._lock:
+            self.dim: Optional[int] = None
+            self._segments: List[Segment] = []
+            self._segment_docs: List[int] = []
+            self._segment_keys: List[str] = []
+            self._keys = set()
+            self._bases = np.zeros(0, dtype=np.int64)
+            self._size = 0
+            self._dead = 0
+            self._live_cache: Tuple[int, Optional[np.ndarray]] = (-1, None)
+            self.chunk_ids: List[Optional[str]] = []
+            self._chunk_rows: Dict[str, int] = {}
+            self._docs: List[Dict[str, Any]] = []
+            self._doc_index: Dict[str, int] = {}
+            self.generation = getattr(self, "generation", 0) + 1
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def document_ids(self) -> List[str]:
+        """IDs of documents currently loaded."""
+        return [doc["id"] for doc in self._docs]
+
+    @property
+    def segment_keys(self) -> List[str]:
+        """Keys of the searchable segments, in row order."""
+        return list(self._segment_keys)
+
+    @property
+    def tombstoned(self) -> int:
+        """Number of resident rows masked out of search."""
+        return self._dead
+
+    def has_document(self, doc_id: str) -> bool:
+        return doc_id in self._doc_index
+
+    def add_segment(
+        self,
+        doc_id: str,
+        doc_name: str,
+        chunk_ids: Sequence[Optional[str]],
+        segment: Segment,
+        key: Optional[str] = None,
+    ) -> int:
+        """
+        Append one of a document's segments. Returns the number of rows added.
+
+        ``key`` names the segment (defaults to the document id); a key that is
+        already resident is ignored. Rows whose chunk id is None are tombstoned.
+        """
+        key = key or doc_id
+        with self._lock:
+            if key in self._keys:
+                return 0
+            self._keys.add(key)
+
+            doc_idx = self._doc_index.get(doc_id)
+            if doc_idx is None:
+                doc_idx = len(self._docs)
+                self._docs.append({"id": doc_id, "name": doc_name})
+                self._doc_index[doc_id] = doc_idx
+
+            if not len(segment):
+                return 0
+            if self.dim is None:
+                self.dim = segment.dim
+            elif segment.dim != self.dim:
+                logger.warning(f"⚠️ {doc_id}: embedding dimension {segment.dim} != {self.dim}, not searchable")
+                return 0
+
+            base = self._size
+            rows = list(chunk_ids[: len(segment)])
+            rows += [None] * (len(segment) - len(rows))
+            self._segments.append(segment)
+            self._segment_docs.append(doc_idx)
+            self._segment_keys.append(key)
+            self._bases = np.append(self._bases, base)
+            for row, chunk_id in enumerate(rows):
+                if chunk_id is None:
+                    self._dead += 1
+                else:
+                    self._chunk_rows[chunk_id] = base + row
+            self.chunk_ids.extend(rows)
+            self._size = base + len(segment)
+            self.generation += 1
+            return len(segment)
+
+    def add_document(
+        self,
+        doc_id: str,
+        doc_name: str,
+        chunk_ids: Sequence[str],
+        texts: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+    ) -> int:
+        """
+        Append a document from raw embeddings (kept in memory).
+
+        Chunks without an embedding (or with a mismatched dimension) are
+        skipped. Returns the number of rows added.
+        """
+        segment, kept = Segment.from_embeddings(texts, embeddings)
+        return self.add_segment(doc_id, doc_name, [chunk_ids[i] for i in kept], segment)
+
+    def tombstone(self, chunk_ids: Sequence[str]) -> int:
+        """Mask chunks out of search without touching their vectors. Returns how many were resident."""
+        with self._lock:
+            removed = 0
+            for chunk_id in chunk_ids:
+                row = self._chunk_rows.pop(chunk_id, None)
+                if row is not None:
+                    self.chunk_ids[row] = None
+                    removed += 1
+            if removed:
+                self._dead += removed
+                self.generation += 1
+            return removed
+
+    def live_mask(self) -> Optional[np.ndarray]:
+        """Boolean mask of rows that are not tombstoned, or None when every row is live."""
+        with self._lock:
+            if not self._dead:
+                return None
+            generation, mask = self._live_cache
+            if generation != self.generation:
+                mask = np.fromiter((chunk_id is not None for chunk_id in self.chunk_ids), dtype=bool, count=self._size)
+                self._live_cache = (self.generation, mask)
+            return mask
+
+    def remove_document(self, doc_id: str) -> int:
+        """
+        Drop a document's rows. Returns the number of rows removed.
+
+        Remaining segments are re-based, not copied: their vectors stay
+        memory-mapped and only the row bookkeeping is rebuilt.
+        """
+        with self._lock:
+            if doc_id not in self._doc_index:
+                return 0
+
+            segments = list(zip(self._segments, self._bases, self._segment_docs, self._segment_keys))
+            chunk_ids = self.chunk_ids
+            docs = self._docs
+            removed_idx = self._doc_index[doc_id]
+            generation = self.generation
+            self.reset()
+            self.generation = generation
+
+            for doc_idx, doc in enumerate(docs):
+                if doc_idx != removed_idx:
+                    self._doc_index[doc["id"]] = len(self._docs)
+                    self._docs.append(doc)
+
+            removed = 0
+            for segment, base, doc_idx, key in segments:
+                if doc_idx == removed_idx:
+                    removed += len(segment)
+                    continue
+                doc = docs[doc_idx]
+                self.add_segment(doc["id"], doc["name"], chunk_ids[base : base + len(segment)], segment, key=key)
+            self.generation += 1
+            return removed
+
+    def load_document(self, doc: Dict[str, Any]) -> int:
+        """Load one document index entry, memory-mapping its segments if it has them."""
+        doc_name = Path(doc["original"]).name
+        paths = document_segments(doc)
+        if not paths:
+            chunk_ids, texts, embeddings, _ = load_legacy_chunks(doc)
+            added = self.add_document(doc["id"], doc_name, chunk_ids, texts, embeddings)
+        else:
+            added = 0
+            for part, path in enumerate(paths):
+                key = segment_key(doc, part)
+                if key in self._keys:
+                    continue
+                segment = Segment.open(path)
+                chunk_ids = part_chunk_ids(doc, part, len(segment))
+                added += self.add_segment(doc["id"], doc_name, chunk_ids, segment, key=key)
+
+        with self._lock:
+            if doc["id"] in self._doc_index:
+                self._docs[self._doc_index[doc["id"]]]["revision"] = doc.get("revision", 0)
+        return added
+
+    def update_document(self, doc: Dict[str, Any]) -> int:
+        """
+        Apply a revised index entry to a resident document in place.
+
+        Rows whose chunk is no longer referenced are tombstoned and new delta
+        segments are appended. If a resident segment is gone from the entry
+        (the document was compacted), the document is reloaded instead.
+        Returns the number of rows added.
+        """
+        with self._lock:
+            doc_idx = self._doc_index.get(doc["id"])
+            if doc_idx is None:
+                return self.load_document(doc)
+
+            keys = set(document_segment_keys(doc))
+            resident = [
+                (base, len(segment), key)
+                for segment, base, owner, key in zip(
+                    self._segments, self._bases, self._segment_docs, self._segment_keys
+                )
+                if owner == doc_idx
+            ]
+            if any(key not in keys for _, _, key in resident):
+                self.remove_document(doc["id"])
+                return self.load_document(doc)
+
+            live = {ref["chunk_id"] for ref in doc.get("chunks", [])}
+            stale = [
+                chunk_id
+                for base, n_rows, _ in resident
+                for chunk_id in self.chunk_ids[base : base + n_rows]
+                if chunk_id is not None and chunk_id not in live
+            ]
+            self.tombstone(stale)
+            return self.load_document(doc)
+
+    def sync(self, index_data: Dict[str, Any]) -> int:
+        """
+        Bring the matrix in line with a loaded document index.
+
+        Documents not yet resident are loaded; resident documents that have
+        disappeared from the index (replaced, or after ``clear_db``) are
+        dropped, and documents revised in place get their deltas applied.
+        Returns the number of rows added.
+        """
+        documents = index_data.get("documents", [])
+        index_ids = {doc.get("id") for doc in documents}
+
+        with self._lock:
+            stale = [doc_id for doc_id in self._doc_index if doc_id not in index_ids]
+            if len(stale) == len(self._doc_index) and stale:
+                logger.info("🔄 Document index changed - rebuilding embedding matrix")
+                self.reset()
+            else:
+                for doc_id in stale:
+                    self.remove_document(doc_id)
+
+            added = 0
+            for doc in documents:
+                doc_id = doc.get("id")
+                if not doc_id:
+                    continue
+                try:
+                    if doc_id not in self._doc_index:
+                        added += self.load_document(doc)
+                    elif self._docs[self._doc_index[doc_id]].get("revision", 0) != doc.get("revision", 0):
+                        added += self.update_document(doc)
+                except Exception as e:
+                    logger.error(f"⚠️ Error loading document {doc_id} into embedding matrix: {e}")
+
+        if added:
+            logger.info(f"   🧮 Embedding matrix: +{added} chunks ({self._size} resident)")
+        return added
+
+    def layout(self) -> List[Tuple[str, int, Segment]]:
+        """(segment key, first global row, segment) for every searchable segment, in row order."""
+        with self._lock:
+            return [
+                (key, int(base), segment) for segment, base, key in zip(self._segments, self._bases, self._segment_keys)
+            ]
+
+    def _locate(self, row: int) -> Tuple[Segment, int, int]:
+        """Map a global row to (segment, local row, document index)."""
+        seg_idx = int(np.searchsorted(self._bases, row, side="right")) - 1
+        return self._segments[seg_idx], row - int(self._bases[seg_idx]), self._segment_docs[seg_idx]
+
+    def get_chunk(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        """Return text and normalised embedding for a chunk id, or None."""
+        with self._lock:
+            row = self._chunk_rows.get(chunk_id)
+            if row is None:
+                return None
+            segment, local_row, _ = self._locate(row)
+            return {"text": segment.text(local_row), "embedding": segment.vectors[local_row].tolist()}
+
+    def gather(self, rows: np.ndarray) -> np.ndarray:
+        """Copy the normalised vectors of the given global rows (any order) into one array."""
+        rows = np.asarray(rows, dtype=np.int64)
+        with self._lock:
+            out = np.empty((len(rows), self.dim or 0), dtype=np.float32)
+            if not len(rows):
+                return out
+            seg_idx = np.searchsorted(self._bases, rows, side="right") - 1
+            for idx in np.unique(seg_idx):
+                mask = seg_idx == idx
+                out[mask] = self._segments[idx].vectors[rows[mask] - self._bases[idx]]
+            return out
+
+    def normalize_query(self, query_embedding: Sequence[float]) -> Optional[np.ndarray]:
+        """
+        Return the query as a unit float32 vector.
+
+        Returns None if the query is empty or its dimension does not match.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.ndim != 1:
+            logger.error(f"⚠️ Query embedding has shape {query.shape}, expected a flat vector")
+            return None
+        if query.shape != (self.dim,):
+            logger.error(f"⚠️ Query embedding dimension {query.shape[0]} != index dimension {self.dim}")
+            return None
+
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return None
+        return query / norm
+
+    def scores(self, query_embedding: Sequence[float]) -> Optional[np.ndarray]:
+        """
+        Cosine similarity of the query against every resident row (-inf for tombstoned rows).
+
+        Returns None if the query is empty or its dimension does not match.
+        """
+        with self._lock:
+            if self._size == 0:
+                return np.zeros(0, dtype=np.float32)
+
+            query = self.normalize_query(query_embedding)
+            if query is None:
+                return None
+
+            scores = np.empty(self._size, dtype=np.float32)
+            for segment, base in zip(self._segments, self._bases):
+                scores[base : base + len(segment)] = segment.vectors @ query
+            live = self.live_mask()
+            if live is not None:
+                scores[~live] = -np.inf
+            return scores
+
+    def batch_scores(self, query_embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+        """
+        Cosine similarity of several queries against every resident row, as a (queries, rows) array.
+
+        Each segment is scored for all queries in one matrix-matrix product, so a
+        batch costs about one pass over the vectors. A query that is empty or
+        whose dimension does not match gets a row of -inf (no matches) without
+        affecting the others.
+        """
+        with self._lock:
+            if self._size == 0 or not len(query_embeddings):
+                return np.zeros((len(query_embeddings), self._size), dtype=np.float32)
+
+            queries = np.zeros((len(query_embeddings), self.dim), dtype=np.float32)
+            valid = np.zeros(len(query_embeddings), dtype=bool)
+            for i, query_embedding in enumerate(query_embeddings):
+                query = self.normalize_query(query_embedding)
+                if query is not None:
+                    queries[i] = query
+                    valid[i] = True
+
+            scores = np.empty((len(queries), self._size), dtype=np.float32)
+            for segment, base in zip(self._segments, self._bases):
+                scores[:, base : base + len(segment)] = queries @ segment.vectors.T
+            live = self.live_mask()
+            if live is not None:
+                scores[:, ~live] = -np.inf
+            scores[~valid] = -np.inf
+            return scores
+
+    def select(
+        self, scores: np.ndarray, top_k: int, min_similarity: float = 0.0, rows: Optional[np.ndarray] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Pick the ``top_k`` rows with similarity >= ``min_similarity`` via ``argpartition``.
+
+        ``scores`` covers every resident row, or only the global ``rows`` given;
+        tombstoned rows are never returned.
+        """
+        size = len(scores)
+        if size == 0 or top_k <= 0:
+            return []
+
+        live = self.live_mask()
+        if live is not None and rows is not None:
+            scores = np.where(live[rows], scores, -np.inf)
+
+        k = min(top_k, size)
+        if k < size:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(size)
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        results = []
+        with self._lock:
+            for row in top:
+                similarity = float(scores[row])
+                if similarity < min_similarity or similarity == -np.inf:
+                    break
+                segment, local_row, doc_idx = self._locate(int(row if rows is None else rows[row]))
+                doc = self._docs[doc_idx]
+                results.append(
+                    {
+                        "doc_id": doc["id"],
+                        "doc_name": doc["name"],
+                        "text": segment.text(local_row),
+                        "similarity": similarity,
+                    }
+                )
+        return results
+
+    def search(self, query_embedding: Sequence[float], top_k: int, min_similarity: float = 0.0) -> List[Dict[str, Any]]:
+        """Return the ``top_k`` most similar chunks with similarity >= ``min_similarity``."""
+        with self._lock:
+            scores = self.scores(query_embedding)
+            if scores is None:
+                return []
+            return self.select(scores, top_k, min_similarity)
+
+    def search_counted(
+        self, query_embedding: Sequence[float], top_k: int, min_similarity: float = 0.0
+    ) -> Optional[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        ``search`` plus how many chunks reach ``min_similarity``, as ``(total_found, results)``.
+
+        Scoring, counting and selection share one lock scope, so a concurrent
+        ``sync`` cannot re-layout the rows in between. Returns None if the
+        query is empty or its dimension does not match.
+        """
+        with self._lock:
+            scores = self.scores(query_embedding)
+            if scores is None:
+                return None
+            total_found = int(np.count_nonzero(scores >= min_similarity))
+            return total_found, self.select(scores, top_k, min_similarity)
+
+    def search_batch(
+        self, query_embeddings: Sequence[Sequence[float]], top_k: int, min_similarity: float = 0.0
+    ) -> List[List[Dict[str, Any]]]:
+        """``search`` for several queries with one scan; one result list per query, in order."""
+        with self._lock:
+            return [self.select(row, top_k, min_similarity) for row in self.batch_scores(query_embeddings)]
+
+    def search_batch_counted(
+        self, query_embeddings: Sequence[Sequence[float]], top_ks: Sequence[int], min_similarities: Sequence[float]
+    ) -> List[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        ``search_counted`` for several queries with one scan, each with its own ``top_k`` and threshold.
+
+        The whole batch is scored and selected under one lock. A query that is
+        empty or whose dimension does not match gets ``(0, [])``.
+        """
+        with self._lock:
+            results = []
+            for scores, top_k, min_similarity in zip(self.batch_scores(query_embeddings), top_ks, min_similarities):
+                total_found = int(np.count_nonzero(scores >= min_similarity))
+                results.append((total_found, self.select(scores, top_k, min_similarity)))
+            return results